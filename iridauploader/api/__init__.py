@@ -1,2 +1,31 @@
-from iridauploader.api.api_calls import ApiCalls, MODE_DEFAULT, MODE_ASSEMBLIES, MODE_FAST5, UPLOAD_MODES
+import importlib
+
+from iridauploader.api.upload_modes import MODE_DEFAULT, MODE_ASSEMBLIES, MODE_FAST5, UPLOAD_MODES
 from iridauploader.api import exceptions
+
+# ApiCalls pulls in requests, rauth and requests_toolbelt, which are slow to import.
+# These names, and the modules api_calls imports, are loaded the first time they are used,
+# so a run that does not upload never imports them.
+_API_CALLS_NAMES = [
+    "ApiCalls",
+    "MetadataUploadResult",
+    "METADATA_SENT",
+    "METADATA_UNCHANGED",
+    "METADATA_FAILED",
+]
+_API_CALLS_MODULES = [
+    "api_calls",
+    "connection_pool",
+    "flow_control",
+    "request_stats",
+    "retry_policy",
+]
+
+
+def __getattr__(name):
+    if name in _API_CALLS_NAMES or name in _API_CALLS_MODULES:
+        api_calls = importlib.import_module("iridauploader.api.api_calls")
+        if name in _API_CALLS_NAMES:
+            return getattr(api_calls, name)
+        return importlib.import_module("iridauploader.api." + name)
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
@@ -1,17 +1,18 @@
 import ast
+import concurrent.futures
 import json
 import logging
 import threading
 import time
 
+from collections import namedtuple
 from http import HTTPStatus
 from itertools import zip_longest
-from pathlib import Path
 from rauth import OAuth2Service
 from requests import ConnectionError
-from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
 from requests_toolbelt import MultipartEncoder, MultipartEncoderMonitor
-from urllib3.util.retry import Retry
+from urllib3.exceptions import MaxRetryError
 from urllib.parse import urljoin, urlparse
 from urllib.error import URLError
 
@@ -22,19 +23,14 @@ import iridauploader.model as model
 import iridauploader.progress as progress
 
 from . import exceptions
-
-# These strings are used to determine which upload mode is being used when uploading sequence files
-# They are included in the `api` __init__.py s.t. they can be used by the other modules without interacting with the
-# api layer
-MODE_DEFAULT = "default"
-MODE_ASSEMBLIES = "assemblies"
-MODE_FAST5 = "fast5"
-
-UPLOAD_MODES = [
-    MODE_DEFAULT,
-    MODE_ASSEMBLIES,
-    MODE_FAST5
-]
+from .connection_pool import PooledHTTPAdapter, DEFAULT_POOL_CONNECTIONS, DEFAULT_POOL_MAXSIZE, rate_limit_exempt
+from .retry_policy import (RetryPolicy, RetryBudget, DEFAULT_BACKOFF_MAX, DEFAULT_RETRY_BUDGET,
+                           REFUSED_STATUS_CODES, get_endpoint_template)
+from .request_stats import RequestStats, DEFAULT_SLOW_REQUEST_THRESHOLD
+from .flow_control import (TokenBucket, AIMDController, DEFAULT_RATE_LIMIT, DEFAULT_RATE_BURST,
+                           DEFAULT_UPLOAD_MAX_CONCURRENCY, DEFAULT_LATENCY_THRESHOLD)
+# Upload modes are defined on their own, so they can be used without importing this module
+from .upload_modes import MODE_DEFAULT, MODE_ASSEMBLIES, MODE_FAST5, UPLOAD_MODES
 
 # Timeout values for sequence file data upload
 # Wait at least 1 second for each mb of data
@@ -53,12 +49,40 @@ JSON_HEADERS = {"headers": {'Content-Type': 'application/json', **SESSION_HEADER
 
 MINIMUM_IRIDA_VERSION = "23.01"
 
+# Features of IRIDA the uploader can check for with ApiCalls.supports, and the first IRIDA version that has them
+CAPABILITY_UPLOADER = "uploader"
+IRIDA_CAPABILITIES = {
+    CAPABILITY_UPLOADER: MINIMUM_IRIDA_VERSION,
+}
+
+# Result of each sample in send_metadata_bulk, status is one of the METADATA_* strings, error is the exception or None
+MetadataUploadResult = namedtuple("MetadataUploadResult", ["sample_id", "status", "error"])
+METADATA_SENT = "sent"
+METADATA_UNCHANGED = "unchanged"
+METADATA_FAILED = "failed"
+DEFAULT_METADATA_WORKERS = 8
+
+# Number of projects looked up at the same time by resolve_projects
+DEFAULT_PROJECT_LOOKUP_WORKERS = 8
+# Statuses of a projects/{id} lookup that say whether the project exists, other statuses are not cached
+PROJECT_LOOKUP_STATUSES = (HTTPStatus.OK, HTTPStatus.NOT_FOUND, HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN)
+# Seconds a project that was not found, or not accessible, is remembered for,
+# so a project added or shared on IRIDA afterwards is found by the next upload
+PROJECT_NOT_FOUND_CACHE_TIME = 60
+
 
 class ApiCalls(object):
 
     def __init__(self, client_id, client_secret,
                  base_url, username, password, timeout_multiplier=10, max_wait_time=20,
-                 http_max_retries=5, http_backoff_factor=0):
+                 http_max_retries=5, http_backoff_factor=0,
+                 http_pool_connections=DEFAULT_POOL_CONNECTIONS, http_pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 http_backoff_max=DEFAULT_BACKOFF_MAX, http_retry_budget=DEFAULT_RETRY_BUDGET,
+                 http_rate_limit=DEFAULT_RATE_LIMIT, http_rate_burst=DEFAULT_RATE_BURST,
+                 upload_max_concurrency=DEFAULT_UPLOAD_MAX_CONCURRENCY,
+                 http_latency_threshold=DEFAULT_LATENCY_THRESHOLD,
+                 http_slow_request_threshold=DEFAULT_SLOW_REQUEST_THRESHOLD,
+                 token_cache=None, server_info_cache=None):
         """
         Create OAuth2Session and store it
         Raises IridaConnectionError with description of error if unable to connect
@@ -70,6 +94,17 @@ class ApiCalls(object):
             username -- username for server
             password -- password for given username
             timeout_multiplier -- number of seconds to give per MB of data being transferred
+            http_pool_connections -- number of connection pools (one per host) to keep
+            http_pool_maxsize -- maximum number of keep-alive connections to keep open per host
+            http_backoff_max -- longest time in seconds to wait between two retries
+            http_retry_budget -- seconds each endpoint may spend waiting for retries, 0 for no limit
+            http_rate_limit -- maximum requests per second sent to IRIDA, 0 for no limit
+            http_rate_burst -- number of requests that can be sent at once before the rate limit kicks in
+            upload_max_concurrency -- maximum number of sequence file uploads that can run at the same time
+            http_latency_threshold -- seconds, slower responses are treated as the server being overloaded, 0 disables
+            http_slow_request_threshold -- seconds, slower requests are logged with their endpoint and size, 0 disables
+            token_cache -- TokenCache to reuse access tokens from earlier runs, None logs in every time
+            server_info_cache -- ServerInfoCache to reuse the IRIDA version from earlier runs, None asks every time
 
         return ApiCalls object
         """
@@ -83,34 +118,53 @@ class ApiCalls(object):
         self.max_wait_time = max_wait_time
         self.http_max_retries = http_max_retries
         self.http_backoff_factor = http_backoff_factor
-
+        self.http_pool_connections = http_pool_connections
+        self.http_pool_maxsize = http_pool_maxsize
+        self.http_backoff_max = http_backoff_max
+        self.http_slow_request_threshold = http_slow_request_threshold
+        self._token_cache = token_cache
+        self._access_token = None
+        self._server_info_cache = server_info_cache
+        # calls, time and bytes per endpoint, for every request sent through _request
+        self._request_stats = RequestStats()
+        self._retry_budget = RetryBudget(http_retry_budget)
+        self._rate_limiter = TokenBucket(rate=http_rate_limit, burst=http_rate_burst)
+        # limits concurrent send_sequence_files calls, and backs off when IRIDA is overloaded
+        self._upload_controller = AIMDController(max_limit=upload_max_concurrency,
+                                                 latency_threshold=http_latency_threshold)
+
+        # The adapter holds the connection pool, it is created once and shared by every session we create
+        self._http_adapter = None
         self._session_lock = threading.Lock()
         self._session_set_externally = False
         self._create_session()
         self.cached_projects = None
         self.cached_samples = {}
-
-        # these two are used when sending signals to the progress module
-        self._current_upload_project_id = None
-        self._current_upload_sample_name = None
+        # project id to (status of projects/{id}, time.monotonic() of the lookup)
+        self.cached_project_access = {}
 
         # init irida version and check if version is compatible
         self._irida_version = None
-        if not self._is_irida_version_compatible(self.get_irida_version(), MINIMUM_IRIDA_VERSION):
-            raise exceptions.IridaConnectionError(
-                f"This API requires minimum IRIDA Version '{MINIMUM_IRIDA_VERSION}'. "
-                f"IRIDA Version '{self._irida_version}' is outdated, please contact your system administrator."
-            )
+        self._capabilities = None
+        self._check_irida_version()
 
     @property
     def _session(self):
         try:  # Todo: rework this code without the try/catch/finally and odd exception raise
             self._session_lock.acquire()
-            response = self._session_instance.options(self.base_url)
+            # The check is part of the call that uses the session, so it does not take its own rate limiter token
+            with rate_limit_exempt():
+                response = self._session_instance.options(self.base_url)
             if response.status_code != HTTPStatus.OK:
+                if response.status_code == HTTPStatus.UNAUTHORIZED:
+                    # IRIDA rejected the token, later runs should not reuse it
+                    self._remove_cached_token()
                 raise Exception
             else:
                 logging.debug("Existing session still works, going to reuse it.")
+        except RequestException as e:
+            # IRIDA could not be reached, the token may still be good, so the cache is left alone
+            raise ApiCalls._handle_rest_exception(self.base_url, e)
         except Exception:
             logging.debug("Token is probably expired, going to get a new session.")
             self._reinitialize_session()
@@ -122,27 +176,93 @@ class ApiCalls(object):
     def _reinitialize_session(self):
         oauth_service = self._get_oauth_service()
         access_token = self._get_access_token(oauth_service)
+        self._access_token = access_token
         _sess = oauth_service.get_session(access_token)
+        # Mount the same adapter on every new session, so open connections survive token refreshes
+        if self._http_adapter is None:
+            self._http_adapter = self._build_http_adapter()
+        else:
+            self._http_adapter.stats.record_session_refresh()
+            progress.metrics.record_session_refresh()
+            logging.debug("Reusing connection pool for new session: {}".format(self.get_connection_pool_stats()))
+        _sess.mount('https://', self._http_adapter)
+        _sess.mount('http://', self._http_adapter)
+        self._session_instance = _sess
+
+    def _build_http_adapter(self):
+        """
+        Creates the adapter that holds the connection pool and retry strategy used by all sessions
+
+        :return: PooledHTTPAdapter
+        """
         # We add a HTTPAdapter with max retries so we don't fail out if one request gets lost
-        logging.info("Session configured with {} retries and {} backoff factor.".format(
-            self.http_max_retries, self.http_backoff_factor))
-        # Backoff calculation via Retry
+        logging.info("Session configured with {} retries, {} backoff factor and {} max backoff.".format(
+            self.http_max_retries, self.http_backoff_factor, self.http_backoff_max))
+        logging.info("Connection pool configured with {} pools of {} connections.".format(
+            self.http_pool_connections, self.http_pool_maxsize))
+        if self._rate_limiter.rate:
+            logging.info("Requests are limited to {} per second.".format(self._rate_limiter.rate))
+        # Backoff calculation via Retry, capped at http_backoff_max
         # {backoff factor} * (2 ** ({number of total retries} - 1))
         # example in seconds
         # backoff = 1 = [0.5, 1, 2, 4, 8, 16, 32, 64, 128, 256, ...]
         # backoff = 2 = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, ...]
         # backoff = 10 = [5, 10, 20, 40, 80, 160, 320, 640, 1280, 2560, ...]
-        retry_strategy = Retry(
+        # Non idempotent requests (POST/PATCH) are only retried when the server refused them, see retry_policy.py
+        return PooledHTTPAdapter(pool_connections=self.http_pool_connections,
+                                 pool_maxsize=self.http_pool_maxsize,
+                                 max_retries=self._build_retry_policy(),
+                                 rate_limiter=self._rate_limiter,
+                                 controller=self._upload_controller)
+
+    def _build_retry_policy(self):
+        """
+        :return: RetryPolicy with this instance's retry settings and budget
+        """
+        return RetryPolicy(
             total=self.http_max_retries,
             backoff_factor=self.http_backoff_factor,
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["HEAD", "GET", "PUT", "POST"],  # by default POST is excluded
+            backoff_max=self.http_backoff_max,
+            budget=self._retry_budget,
         )
-        # override retries built in max backoff value
-        Retry.DEFAULT_BACKOFF_MAX = self.http_backoff_factor
-        _sess.mount('https://', HTTPAdapter(max_retries=retry_strategy))
-        _sess.mount('http://', HTTPAdapter(max_retries=retry_strategy))
-        self._session_instance = _sess
+
+    def get_connection_pool_stats(self):
+        """
+        Returns counters for the connection pool shared by this instance's sessions
+        reused_connections counts requests sent over an already open connection,
+        new_tls_connections counts the TLS handshakes that had to be done
+
+        :return: dict of counter names to integers
+        """
+        return self._http_adapter.stats.get_dict()
+
+    def get_retry_stats(self):
+        """
+        Returns the number of retries and seconds spent waiting between retries for each endpoint
+        Endpoints are templated, e.g. /api/samples/{id}/pairs
+
+        :return: dict of endpoint template to dict with 'retries' and 'seconds_waited'
+        """
+        return self._retry_budget.get_dict()
+
+    def get_request_stats(self):
+        """
+        Returns the number of calls, errors, slow calls, seconds and bytes for each endpoint called by this instance
+        Keys are the method and endpoint template, e.g. 'GET /api/samples/{id}/sequenceFiles'
+
+        :return: dict of method and endpoint template to dict of counters
+        """
+        return self._request_stats.get_dict()
+
+    def get_flow_control_stats(self):
+        """
+        Returns the state of the upload concurrency controller
+        concurrency_limit is the number of uploads currently allowed to run at once,
+        it shrinks when IRIDA is overloaded and grows back up to max_concurrency while IRIDA is healthy
+
+        :return: dict with 'concurrency_limit', 'max_concurrency', 'in_flight' and 'congestion_events'
+        """
+        return self._upload_controller.get_dict()
 
     def _create_session(self):
         """
@@ -188,10 +308,47 @@ class ApiCalls(object):
     def _get_access_token(self, oauth_service):
         """
         get access token to be used to get session from oauth_service
+        When there is a token cache, the cached access token is used until it expires, then the cached refresh token,
+        and the password is only sent when neither works
 
         arguments:
             oauth_service -- O2AuthService from get_oauth_service
 
+        returns access token
+        """
+        if self._token_cache is not None:
+            cached_token = self._token_cache.get(self.base_url, self.client_id, self.username)
+            if cached_token is not None and self._token_cache.is_valid(cached_token):
+                logging.debug("Using cached access token")
+                return cached_token.access_token
+            if cached_token is not None and cached_token.refresh_token:
+                try:
+                    access_token = self._request_access_token(oauth_service, {
+                        "grant_type": "refresh_token",
+                        "refresh_token": cached_token.refresh_token,
+                    }, log_errors=False)
+                    logging.debug("Refreshed cached access token")
+                    return access_token
+                except exceptions.IridaConnectionError:
+                    logging.debug("Cached refresh token was not accepted, logging in with password")
+
+        return self._request_access_token(oauth_service, {
+            "grant_type": "password",
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "username": self.username,
+            "password": self.password
+        })
+
+    def _request_access_token(self, oauth_service, data, log_errors=True):
+        """
+        Requests an access token from IRIDA, and stores it in the token cache
+
+        arguments:
+            oauth_service -- O2AuthService from get_oauth_service
+            data -- grant to send to IRIDA's token endpoint
+            log_errors -- False when a failure is expected and handled by the caller
+
         returns access token
         """
 
@@ -214,30 +371,85 @@ class ApiCalls(object):
                 raise ConnectionError("Unexpected response from server, URL may be incorrect")
             return irida_dict
 
-        params = {
-            "data": {
-                "grant_type": "password",
-                "client_id": self.client_id,
-                "client_secret": self.client_secret,
-                "username": self.username,
-                "password": self.password
-            }
-        }
-
         try:
-            access_token = oauth_service.get_access_token(
-                decoder=token_decoder, **params)
+            response = oauth_service.get_raw_access_token(data=data)
+            token_dict = token_decoder(response.content)
+            if not isinstance(token_dict, dict) or "access_token" not in token_dict:
+                raise KeyError("IRIDA did not return an access token: {}".format(response.content))
         except ConnectionError as e:
-            logging.error("Can not connect to IRIDA")
+            if log_errors:
+                logging.error("Can not connect to IRIDA")
             raise exceptions.IridaConnectionError("Could not connect to the IRIDA server. URL may be incorrect."
                                                   " IRIDA returned with error message: {}".format(e.args))
         except KeyError as e:
-            logging.error("Can not get access token from IRIDA")
+            if log_errors:
+                logging.error("Can not get access token from IRIDA")
             raise exceptions.IridaConnectionError("Could not get access token from IRIDA. Credentials may be incorrect."
                                                   " IRIDA returned with error message: {}".format(e.args))
 
+        access_token = token_dict["access_token"]
+        if self._token_cache is not None:
+            self._token_cache.put(self.base_url, self.client_id, self.username, access_token,
+                                  refresh_token=token_dict.get("refresh_token"),
+                                  expires_in=token_dict.get("expires_in"))
         return access_token
 
+    def _remove_cached_token(self):
+        """
+        Removes the access token in use from the token cache, after IRIDA stopped accepting it
+
+        :return: None
+        """
+        if self._token_cache is not None and self._access_token is not None:
+            self._token_cache.remove(self.base_url, self.client_id, self.username, self._access_token)
+
+    def _request(self, method, url, **kwargs):
+        """
+        Sends a request to IRIDA with the current session, every api call goes through here
+        Calls are counted and timed per endpoint template, and requests slower than http_slow_request_threshold are
+        logged. When no response is received, an IridaConnectionError is raised.
+
+        :param method: HTTP method, e.g. "get"
+        :param url: url to send the request to
+        :param kwargs: passed on to the session, e.g. data, params, headers, timeout
+        :return: requests Response, the status code is left for the caller to check
+        """
+        session = self._session
+        endpoint = get_endpoint_template(url)
+        body = kwargs.get("data")
+        bytes_sent = ApiCalls._get_body_size(body)
+        start = time.monotonic()
+        try:
+            response = session.request(method.upper(), url, **kwargs)
+        except Exception as e:
+            self._request_stats.record(method, endpoint, time.monotonic() - start, bytes_sent, error=True)
+            raise ApiCalls._handle_rest_exception(url, e)
+        seconds = time.monotonic() - start
+        bytes_received = len(response.content or b"")
+
+        # Streamed bodies (file uploads) take as long as the file needs, so they are never counted as slow
+        slow = (bool(self.http_slow_request_threshold) and seconds > self.http_slow_request_threshold
+                and not hasattr(body, "read"))
+        if slow:
+            logging.warning("Slow request: {} {} took {:.2f} seconds, sent {} bytes and received {} bytes".format(
+                method.upper(), endpoint, seconds, bytes_sent, bytes_received))
+        self._request_stats.record(method, endpoint, seconds, bytes_sent, bytes_received, slow=slow)
+        return response
+
+    @staticmethod
+    def _get_body_size(body):
+        """
+        :param body: request body, a string, bytes, or an encoder with a len attribute
+        :return: size of the body in bytes, 0 when it can not be determined
+        """
+        if body is None:
+            return 0
+        if isinstance(body, str):
+            return len(body.encode("utf-8"))
+        if isinstance(body, bytes):
+            return len(body)
+        return getattr(body, "len", 0)
+
     @staticmethod
     def _handle_rest_exception(url, e):
         """
@@ -297,6 +509,24 @@ class ApiCalls(object):
                                                     err_msg=response.reason))
         return e
 
+    @staticmethod
+    def _compare_irida_versions(irida_version, minimum_irida_version):
+        """
+        Strips extra data from irida version and compares it to minimum irida version
+        param irida_version: String: actual irida version
+        param minimum_irida_version: String: version to compare with
+        returns: 1 if irida_version is newer, 0 if they are the same, -1 if irida_version is older
+        """
+        # Strip "irida-" and "-SNAPSHOT" if they are on the version id
+        irida_version_stripped = irida_version.replace('-SNAPSHOT', '').replace('irida-', '')
+        v1 = list(map(int, irida_version_stripped.split('.')))
+        v2 = list(map(int, minimum_irida_version.split('.')))
+        for rev1, rev2 in zip_longest(v1, v2, fillvalue=0):
+            if rev1 == rev2:
+                continue
+            return -1 if rev1 < rev2 else 1
+        return 0
+
     @staticmethod
     def _is_irida_version_compatible(irida_version, minimum_irida_version):
         """
@@ -305,23 +535,56 @@ class ApiCalls(object):
         param minimum_irida_version: String: minimum compatible irida version
         returns: boolean: if api version is compatible with irida it is connected to
         """
-        def _compare_version(v1: str, v2: str) -> int:
-            """
-            compares version strings
-            returns: 1 if v1 > v2, 0 if v1 == v2, -1 if v1 < v2
-            """
-            v1, v2 = list(map(int, v1.split('.'))), list(map(int, v2.split('.')))
-            for rev1, rev2 in zip_longest(v1, v2, fillvalue=0):
-                if rev1 == rev2:
-                    continue
-                return -1 if rev1 < rev2 else 1
-            return 0
-
-        # Strip "irida-" and "-SNAPSHOT" if they are on the version id
-        irida_version_stripped = irida_version.replace('-SNAPSHOT', '').replace('irida-', '')
         logging.info("Minimum Compatible IRIDA Version: " + str(minimum_irida_version))
-        logging.info("Current IRIDA Version: " + str(irida_version_stripped))
-        return _compare_version(irida_version_stripped, minimum_irida_version) >= 0
+        logging.info("Current IRIDA Version: " + str(irida_version.replace('-SNAPSHOT', '').replace('irida-', '')))
+        return ApiCalls._compare_irida_versions(irida_version, minimum_irida_version) >= 0
+
+    @staticmethod
+    def _get_irida_capabilities(irida_version):
+        """
+        param irida_version: String: actual irida version
+        returns: dict of each IRIDA_CAPABILITIES name to whether irida_version has it
+        """
+        return {capability: ApiCalls._compare_irida_versions(irida_version, minimum_version) >= 0
+                for capability, minimum_version in IRIDA_CAPABILITIES.items()}
+
+    def _check_irida_version(self):
+        """
+        Gets the IRIDA version and its capabilities, from the server info cache when it has them
+        Raises IridaConnectionError when the version is older than MINIMUM_IRIDA_VERSION
+
+        returns: None
+        """
+        if self._server_info_cache is not None:
+            server_info = self._server_info_cache.get(self.base_url)
+            if server_info is not None:
+                logging.info("Using cached IRIDA Version: " + str(server_info.version))
+                self._irida_version = server_info.version
+                self._capabilities = server_info.capabilities
+                return
+
+        irida_version = self.get_irida_version()
+        if not self._is_irida_version_compatible(irida_version, MINIMUM_IRIDA_VERSION):
+            raise exceptions.IridaConnectionError(
+                f"This API requires minimum IRIDA Version '{MINIMUM_IRIDA_VERSION}'. "
+                f"IRIDA Version '{irida_version}' is outdated, please contact your system administrator."
+            )
+        self._capabilities = self._get_irida_capabilities(irida_version)
+        # only compatible versions are cached, so an outdated server is checked again on every run until it is upgraded
+        if self._server_info_cache is not None:
+            self._server_info_cache.put(self.base_url, irida_version, self._capabilities)
+
+    def supports(self, capability):
+        """
+        Checks if the IRIDA server has a feature, without asking the server
+
+        param capability: one of the CAPABILITY_* names
+        returns: boolean: if the IRIDA server has the feature
+        """
+        if capability not in self._capabilities:
+            # capabilities added after the server info was cached
+            self._capabilities = {**self._capabilities, **self._get_irida_capabilities(self.get_irida_version())}
+        return self._capabilities.get(capability, False)
 
     def get_irida_version(self):
         """
@@ -333,10 +596,7 @@ class ApiCalls(object):
             logging.debug("Fetching IRIDA version")
 
             url = f"{self.base_url}/version"
-            try:
-                response = self._session.get(url)
-            except Exception as e:
-                raise ApiCalls._handle_rest_exception(url, e)
+            response = self._request("get", url)
 
             if response.status_code == HTTPStatus.OK:  # 200
                 result = response.json()['version']
@@ -360,10 +620,7 @@ class ApiCalls(object):
             logging.debug("Loading projects from IRIDA server.")
             url = f"{self.base_url}projects"
 
-            try:
-                response = self._session.get(url)
-            except Exception as e:
-                raise ApiCalls._handle_rest_exception(url, e)
+            response = self._request("get", url)
 
             if response.status_code == HTTPStatus.OK:  # 200
                 result = response.json()["resource"]["resources"]
@@ -371,14 +628,7 @@ class ApiCalls(object):
                 raise self._handle_irida_exception(response)
 
             try:
-                project_list = [
-                    model.Project(
-                        name=project_dict["name"],
-                        description=project_dict["projectDescription"],
-                        id=project_dict["identifier"]
-                    )
-                    for project_dict in result
-                ]
+                project_list = [ApiCalls._build_project_obj_from_resource(project_dict) for project_dict in result]
 
             except KeyError as e:
                 e.args = map(str, e.args)
@@ -414,10 +664,7 @@ class ApiCalls(object):
         if project_id not in self.cached_samples:
             url = f"{self.base_url}projects/{project_id}/samples"
 
-            try:
-                response = self._session.get(url)
-            except Exception as e:
-                raise ApiCalls._handle_rest_exception(url, e)
+            response = self._request("get", url)
 
             if response.status_code != HTTPStatus.OK:  # 200
                 logging.error("Encountered error while getting samples: {} {}"
@@ -466,10 +713,7 @@ class ApiCalls(object):
 
         url = f"{self.base_url}samples/{sample_id}/sequenceFiles"
 
-        try:
-            response = self._session.get(url)
-        except Exception as e:
-            raise ApiCalls._handle_rest_exception(url, e)
+        response = self._request("get", url)
 
         if response.status_code == HTTPStatus.OK:  # 200
             # todo future development
@@ -493,10 +737,7 @@ class ApiCalls(object):
 
         url = f"{self.base_url}samples/{sample_id}/assemblies"
 
-        try:
-            response = self._session.get(url)
-        except Exception as e:
-            raise ApiCalls._handle_rest_exception(url, e)
+        response = self._request("get", url)
 
         if response.status_code == HTTPStatus.OK:  # 200
             # todo future development if needed one day
@@ -530,10 +771,7 @@ class ApiCalls(object):
         sample_id = self.get_sample_id(sample_name, project_id)
         url = f"{self.base_url}samples/{sample_id}/fast5"
 
-        try:
-            response = self._session.get(url)
-        except Exception as e:
-            raise ApiCalls._handle_rest_exception(url, e)
+        response = self._request("get", url)
 
         if response.status_code == HTTPStatus.OK:  # 200
             # todo future development if needed one day
@@ -558,10 +796,7 @@ class ApiCalls(object):
 
         url = f"{self.base_url}samples/{sample_id}/metadata"
 
-        try:
-            response = self._session.get(url)
-        except Exception as e:
-            raise ApiCalls._handle_rest_exception(url, e)
+        response = self._request("get", url)
 
         if response.status_code == HTTPStatus.OK:  # 200
             result = response.json()["resource"]["metadata"]
@@ -591,13 +826,11 @@ class ApiCalls(object):
 
         if clear_cache:
             self.cached_projects = None
+            self.cached_project_access = {}
         url = f"{self.base_url}projects"
         json_obj = json.dumps(project.get_uploadable_dict())
 
-        try:
-            response = self._session.post(url, json_obj, **JSON_HEADERS)
-        except Exception as e:
-            raise ApiCalls._handle_rest_exception(url, e)
+        response = self._request("post", url, data=json_obj, **JSON_HEADERS)
 
         if response.status_code == HTTPStatus.CREATED:  # 201
             json_res = json.loads(response.text)
@@ -625,10 +858,7 @@ class ApiCalls(object):
         url = f"{self.base_url}projects/{project_id}/samples"
         json_obj = json.dumps(sample.get_uploadable_dict())
 
-        try:
-            response = self._session.post(url, json_obj, **JSON_HEADERS)
-        except Exception as e:
-            raise ApiCalls._handle_rest_exception(url, e)
+        response = self._request("post", url, data=json_obj, **JSON_HEADERS)
 
         if response.status_code == HTTPStatus.CREATED:  # 201
             json_res = json.loads(response.text)
@@ -649,10 +879,7 @@ class ApiCalls(object):
 
         url = f"{self.base_url}samples/{sample_id}"
 
-        try:
-            response = self._session.get(url)
-        except Exception as e:
-            raise ApiCalls._handle_rest_exception(url, e)
+        response = self._request("get", url)
 
         if response.status_code == HTTPStatus.OK:  # 200, return sample object
             sample_dict = response.json()["resource"]
@@ -675,10 +902,7 @@ class ApiCalls(object):
         url = f"{self.base_url}projects/{project_id}/samples/bySampleName"
         params = {'sampleName': sample_name}
 
-        try:
-            response = self._session.get(url, params=params)
-        except Exception as e:
-            raise ApiCalls._handle_rest_exception(url, e)
+        response = self._request("get", url, params=params)
         if response.status_code == HTTPStatus.OK:  # 200, return sample object
             logging.debug("sample found")
             sample_dict = response.json()["resource"]
@@ -690,6 +914,17 @@ class ApiCalls(object):
             logging.debug("exception occurred: {}".format(response))
             raise self._handle_irida_exception(response)
 
+    @staticmethod
+    def _build_project_obj_from_resource(resource_dict):
+        """
+        Given a resource dictionary for a project, return a Project object
+        """
+        return model.Project(
+            name=resource_dict["name"],
+            description=resource_dict["projectDescription"],
+            id=resource_dict["identifier"]
+        )
+
     # TODO: in the graphql api rewrite these type of functions should exist in their own files per object type
     @staticmethod
     def _build_sample_obj_from_resource(resource_dict):
@@ -728,41 +963,54 @@ class ApiCalls(object):
         returns result of post request.
         """
 
-        # update which files are being sent
-        self._current_upload_project_id = project_id
-        self._current_upload_sample_name = sample_name
-
-        # Get the url's needed to send sequence files
-        # Need the sample id for upload, not the sample name.
-        # This is cached so it's only 1 call per project uploading to
-        # TODO: In the future, this function should accept sample_id instead of sample_name
-        sample_id = self.get_sample_id(sample_name, project_id)
-        sample_url = f"{self.base_url}samples/{sample_id}"
-        url = ApiCalls._get_sample_upload_url(sequence_file, sample_url, upload_mode)
-
-        # Get the data encoder
-        data_pkg = self._get_sequence_data_pkg(sequence_file, upload_id)
-        # Generate headers from the data encoder
-        headers_pkg = {'Content-Type': data_pkg.content_type, **SESSION_HEADERS}
-
-        logging.debug("Sending files to [{}]".format(url))
-        logging.debug("headers: " + str(headers_pkg))
-
-        timeout = self._get_sequence_file_timeout(sequence_file)
-
-        try:
-            response = self._session.post(url, data=data_pkg, headers=headers_pkg, timeout=timeout)
-        except Exception as e:
-            logging.error("ConnectionError occurred while transferring data: " + str(e))
-            raise ApiCalls._handle_rest_exception(url, e)
-
-        if response.status_code == HTTPStatus.CREATED:
-            json_res = json.loads(response.text)
-        else:
-            logging.error("Error while uploading [{}]: [{}]".format(sample_name, response.reason))
-            raise self._handle_irida_exception(response)
+        # Timed for the run profile, the HTTP calls and bytes sent are counted by the connection pool
+        with progress.span("send_sequence_files", sample_name=sample_name, project_id=project_id):
+            # Get the url's needed to send sequence files
+            # Need the sample id for upload, not the sample name.
+            # This is cached so it's only 1 call per project uploading to
+            # TODO: In the future, this function should accept sample_id instead of sample_name
+            sample_id = self.get_sample_id(sample_name, project_id)
+            sample_url = f"{self.base_url}samples/{sample_id}"
+            url = ApiCalls._get_sample_upload_url(sequence_file, sample_url, upload_mode)
+
+            timeout = self._get_sequence_file_timeout(sequence_file)
+            # The session does not resend uploads the server refused, because the data encoder can only be read once.
+            # They are resent here with a new encoder. The connection pool already told the upload controller about
+            # each refusal, so this policy does not.
+            retry = self._build_retry_policy()
+
+            while True:
+                # Get the data encoder
+                data_pkg = self._get_sequence_data_pkg(sequence_file, upload_id, sample_name, project_id)
+                # Generate headers from the data encoder
+                headers_pkg = {'Content-Type': data_pkg.content_type, **SESSION_HEADERS}
+
+                logging.debug("Sending files to [{}]".format(url))
+                logging.debug("headers: " + str(headers_pkg))
+
+                # Wait for a free upload slot, the number of slots shrinks when IRIDA is overloaded
+                with self._upload_controller.slot():
+                    upload_start = time.monotonic()
+                    response = self._request("post", url, data=data_pkg, headers=headers_pkg, timeout=timeout)
+
+                if response.status_code not in REFUSED_STATUS_CODES:
+                    break
+                try:
+                    retry = retry.increment("POST", url, response=response.raw)
+                except MaxRetryError:
+                    break
+                logging.warning("IRIDA refused upload of [{}] with status {}, sending it again".format(
+                    sample_name, response.status_code))
+                retry.sleep(response.raw)
+
+            if response.status_code == HTTPStatus.CREATED:
+                progress.metrics.record_file_upload(data_pkg.len, time.monotonic() - upload_start)
+                json_res = json.loads(response.text)
+            else:
+                logging.error("Error while uploading [{}]: [{}]".format(sample_name, response.reason))
+                raise self._handle_irida_exception(response)
 
-        return json_res
+            return json_res
 
     @staticmethod
     def _get_sample_upload_url(sequence_file, sample_url, upload_mode):
@@ -803,7 +1051,7 @@ class ApiCalls(object):
         :return:
         """
         # Get approximation for amount of data to send
-        filesize_bytes = Path(sequence_file.file_list[0]).stat().st_size
+        filesize_bytes = sequence_file.get_file_size(sequence_file.file_list[0])
         if sequence_file.is_paired_end():
             filesize_bytes = filesize_bytes * 2
         # Gives timeout_multiplier seconds per mb of data to transfer
@@ -826,10 +1074,7 @@ class ApiCalls(object):
 
         json_obj = json.dumps(metadata.get_uploadable_dict())
 
-        try:
-            response = self._session.put(url, data=json_obj, **JSON_HEADERS)
-        except Exception as e:
-            raise ApiCalls._handle_rest_exception(url, e)
+        response = self._request("put", url, data=json_obj, **JSON_HEADERS)
 
         if response.status_code == HTTPStatus.OK:  # 200
             json_res = json.loads(response.text)
@@ -840,26 +1085,75 @@ class ApiCalls(object):
 
         return json_res
 
-    def _send_file_callback(self, monitor):
+    def send_metadata_bulk(self, metadata_items, max_workers=DEFAULT_METADATA_WORKERS, skip_unchanged=False):
         """
-        Sends data to the progress module to update file percentages
+        Sends metadata to many samples, with up to max_workers requests running at the same time
+        An error on one sample does not stop the others, it is reported in that samples result
+
+        :param metadata_items: iterable of (sample_id, Metadata object) tuples
+        :param max_workers: maximum number of samples being sent at the same time
+        :param skip_unchanged: when True, the current metadata of each sample is fetched first, and the PUT is skipped
+            when it already matches what would be sent
+        :return: list of MetadataUploadResult, in the same order as metadata_items
         """
-        progress_percent = round(monitor.bytes_read / monitor.len * 100, 2)
-        progress.send_progress(progress.ProgressData(
-            sample=self._current_upload_sample_name,
-            project=self._current_upload_project_id,
-            progress=progress_percent
-        ))
-        print("Progress: ", progress_percent, "% Uploaded     \r", end="")
+        metadata_items = list(metadata_items)
+        logging.info("Sending metadata to {} samples".format(len(metadata_items)))
+
+        def send_one(sample_id, metadata):
+            try:
+                if skip_unchanged and self._is_metadata_unchanged(metadata, sample_id):
+                    logging.debug("Metadata on sample '{}' is unchanged, skipping".format(sample_id))
+                    return MetadataUploadResult(sample_id, METADATA_UNCHANGED, None)
+                self.send_metadata(metadata, sample_id)
+                return MetadataUploadResult(sample_id, METADATA_SENT, None)
+            except (exceptions.IridaResourceError, exceptions.IridaConnectionError) as e:
+                logging.error("Could not send metadata to sample '{}': {}".format(sample_id, e))
+                return MetadataUploadResult(sample_id, METADATA_FAILED, e)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+            futures = [executor.submit(send_one, sample_id, metadata) for sample_id, metadata in metadata_items]
+            results = [future.result() for future in futures]
+
+        logging.info("Metadata sent to {} samples, {} unchanged, {} failed".format(
+            len([r for r in results if r.status == METADATA_SENT]),
+            len([r for r in results if r.status == METADATA_UNCHANGED]),
+            len([r for r in results if r.status == METADATA_FAILED])))
+        return results
+
+    def _is_metadata_unchanged(self, metadata, sample_id):
+        """
+        Compares metadata with what is currently on the sample
+        The PUT replaces all of a samples metadata, so it is only unchanged when the fields and values are identical
 
-    def _get_sequence_data_pkg(self, sequence_file, upload_id):
+        :param metadata: Metadata object
+        :param sample_id: id of sample to compare with
+        :return: True when sending the metadata would not change anything
+        """
+        current = {key: field.get("value") for key, field in self.get_metadata(sample_id).items()}
+        new = {key: field["value"] for key, field in metadata.get_uploadable_dict().items()}
+        return current == new
+
+    @staticmethod
+    def _get_send_file_callback(sample_name, project_id):
+        """
+        Creates a callback that sends data to the progress module to update file percentages
+        Each upload gets its own callback, so uploads running at the same time report on the correct sample
+        The callback runs for every chunk read, the progress module only passes updates on to the GUI and console a
+        few times a second
+        """
+        def send_file_callback(monitor):
+            progress.update_transfer(sample_name, project_id, monitor.bytes_read, monitor.len)
+
+        return send_file_callback
+
+    def _get_sequence_data_pkg(self, sequence_file, upload_id, sample_name=None, project_id=None):
         """
         Creates the data encoder, and attaches a monitor for callback functionality
         """
         # build data encoder
         encoder = ApiCalls._get_multipart_encoder(sequence_file, upload_id)
         # create callback monitor for file progress
-        monitor = MultipartEncoderMonitor(encoder, self._send_file_callback)
+        monitor = MultipartEncoderMonitor(encoder, ApiCalls._get_send_file_callback(sample_name, project_id))
         # override max byte read size
         # This lambda overrides httplibs hard coded 8192 byte read size
         # More details: https://github.com/requests/toolbelt/issues/75#issuecomment-237189952
@@ -944,13 +1238,38 @@ class ApiCalls(object):
 
         logging.debug("Creating new sequencing run on IRIDA")
 
+        url = f"{self.base_url}sequencingrun/{sequencing_run_type}"
+
+        json_obj = json.dumps(ApiCalls._get_seq_run_dict(metadata))
+
+        response = self._request("post", url, data=json_obj, **JSON_HEADERS)
+
+        if response.status_code == HTTPStatus.CREATED:  # 201
+            json_res = json.loads(response.text)
+        else:
+            logging.error("Encountered error while creating sequence run: {} {}"
+                          "".format(response.status_code, response.reason))
+            raise self._handle_irida_exception(response)
+
+        # Grab the run identifier from the returned json
+        sequencing_run_id = json_res['resource']['identifier']
+        logging.debug("Sequencing run id '{}' has been created".format(sequencing_run_id))
+        return sequencing_run_id
+
+    @staticmethod
+    def _get_seq_run_dict(metadata):
+        """
+        Builds the dictionary IRIDA expects when creating a sequencing run
+        Everything not in the acceptable_properties list is discarded.
+
+        :param metadata: SequencingRun's metadata
+        :return: dict
+        """
         metadata_dict = metadata.copy()
         # metadata_dict requires the workflow parameter or else IRIDA will not create the seq run
         if 'workflow' not in metadata_dict:
             metadata_dict['workflow'] = 'workflow'
 
-        url = f"{self.base_url}sequencingrun/{sequencing_run_type}"
-
         acceptable_properties = [
             "layoutType", "chemistry", "projectName",
             "experimentName", "application", "uploadStatus",
@@ -967,24 +1286,7 @@ class ApiCalls(object):
         for key in keys_to_remove:
             del metadata_dict[key]
 
-        json_obj = json.dumps(metadata_dict)
-
-        try:
-            response = self._session.post(url, json_obj, **JSON_HEADERS)
-        except Exception as e:
-            raise ApiCalls._handle_rest_exception(url, e)
-
-        if response.status_code == HTTPStatus.CREATED:  # 201
-            json_res = json.loads(response.text)
-        else:
-            logging.error("Encountered error while creating sequence run: {} {}"
-                          "".format(response.status_code, response.reason))
-            raise self._handle_irida_exception(response)
-
-        # Grab the run identifier from the returned json
-        sequencing_run_id = json_res['resource']['identifier']
-        logging.debug("Sequencing run id '{}' has been created".format(sequencing_run_id))
-        return sequencing_run_id
+        return metadata_dict
 
     def get_seq_runs(self):
         """
@@ -996,10 +1298,7 @@ class ApiCalls(object):
 
         url = f"{self.base_url}sequencingrun"
 
-        try:
-            response = self._session.get(url)
-        except Exception as e:
-            raise ApiCalls._handle_rest_exception(url, e)
+        response = self._request("get", url)
 
         if response.status_code == HTTPStatus.OK:  # 200
             json_res_list = response.json()["resource"]["resources"]
@@ -1077,10 +1376,7 @@ class ApiCalls(object):
         update_dict = {"uploadStatus": status}
         json_obj = json.dumps(update_dict)
 
-        try:
-            response = self._session.patch(url, json_obj, **JSON_HEADERS)
-        except Exception as e:
-            raise ApiCalls._handle_rest_exception(url, e)
+        response = self._request("patch", url, data=json_obj, **JSON_HEADERS)
 
         if response.status_code == HTTPStatus.OK:  # 200
             json_res = json.loads(response.text)
@@ -1100,6 +1396,11 @@ class ApiCalls(object):
         """
         logging.debug("project exists: {}".format(project_id))
         project_id = str(project_id)
+        status_code = self.try_project_access(project_id)
+        if status_code in PROJECT_LOOKUP_STATUSES:
+            return status_code == HTTPStatus.OK
+        # IRIDA did not answer the lookup, check the list of projects instead
+        logging.debug("Project lookup returned {}, checking the project list".format(status_code))
         project_list = self.get_projects()
         return any([p.id == project_id for p in project_list])
 
@@ -1108,22 +1409,57 @@ class ApiCalls(object):
         Attempts a get request to a project, and returns the HTTPStatus that IRIDA returns
         This is useful for determining if a user does not have access to a project or if it does not exist at all.
 
+        Found projects are cached until the cache is cleared, projects that were not found or not accessible are
+        cached for PROJECT_NOT_FOUND_CACHE_TIME seconds.
+
         :param project_id:
         :return: HTTPStatus(IntEnum)
         """
+        project_id = str(project_id)
+        cached = self.cached_project_access.get(project_id)
+        if cached is not None:
+            status_code, looked_up_at = cached
+            if status_code == HTTPStatus.OK or time.monotonic() - looked_up_at < PROJECT_NOT_FOUND_CACHE_TIME:
+                logging.debug("Project {} access from cache: {}".format(project_id, status_code))
+                return status_code
+
         logging.debug("Trying to access project: {}".format(project_id))
 
         url = f"{self.base_url}projects/{project_id}"
 
-        try:
-            response = self._session.get(url)
-        except Exception as e:
-            # Handle any exceptions where communication with the server fails
-            raise ApiCalls._handle_rest_exception(url, e)
+        response = self._request("get", url)
 
         logging.debug("IRIDA responded with status code: {}".format(response.status_code))
+        if response.status_code in PROJECT_LOOKUP_STATUSES:
+            self.cached_project_access[project_id] = (response.status_code, time.monotonic())
         return response.status_code
 
+    def resolve_projects(self, project_ids, max_workers=DEFAULT_PROJECT_LOOKUP_WORKERS):
+        """
+        Looks up many projects, with up to max_workers requests running at the same time
+        The results are cached, so project_exists and try_project_access answer these projects without asking IRIDA.
+        A project that can not be looked up is skipped, the error is raised when it is checked again.
+
+        :param project_ids: iterable of project ids
+        :param max_workers: maximum number of projects being looked up at the same time
+        :return: dict of project id to HTTPStatus(IntEnum), for the projects that were looked up
+        """
+        project_ids = list(dict.fromkeys(str(project_id) for project_id in project_ids))
+        logging.debug("Looking up {} projects".format(len(project_ids)))
+
+        def look_up(project_id):
+            try:
+                return self.try_project_access(project_id)
+            except exceptions.IridaConnectionError as e:
+                logging.debug("Could not look up project {}: {}".format(project_id, e))
+                return None
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(min(max_workers, len(project_ids)), 1)) as executor:
+            status_codes = list(executor.map(look_up, project_ids))
+
+        return {project_id: status_code for project_id, status_code in zip(project_ids, status_codes)
+                if status_code is not None}
+
     # TODO: this function should be removed during the graphql api rewrite
     def sample_exists(self, sample_name, project_id):
         """
@@ -0,0 +1,637 @@
+"""
+Asyncio based client for the IRIDA REST api
+
+AsyncApiCalls mirrors the read and write calls of ApiCalls, but every call is a coroutine, so hundreds of requests can
+be in flight on a single thread. It returns the same model objects and raises the same exceptions as ApiCalls.
+
+SyncFacade runs an AsyncApiCalls on a background event loop, so blocking code (like the core module) can use it
+without becoming async itself.
+
+httpx is an optional dependency, install it with `pip install iridauploader[ASYNC]`
+This module is not imported by the api package, import it directly:
+    from iridauploader.api.async_api_calls import AsyncApiCalls, SyncFacade
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from email.utils import parsedate_to_datetime
+from http import HTTPStatus
+from types import SimpleNamespace
+from urllib.parse import urljoin, urlparse
+
+try:
+    import httpx
+except ImportError:  # optional dependency
+    httpx = None
+
+import iridauploader.progress as progress
+
+from . import exceptions
+from .api_calls import (ApiCalls, MODE_DEFAULT, SESSION_HEADERS, MINIMUM_IRIDA_VERSION,
+                        TIMEOUT_BYTES_TO_MB_DIVISOR, TIMEOUT_MINIMUM)
+from .retry_policy import (RetryBudget, get_endpoint_template, IDEMPOTENT_METHODS, RETRY_STATUS_CODES,
+                           REFUSED_STATUS_CODES, DEFAULT_BACKOFF_MAX, DEFAULT_RETRY_BUDGET)
+
+DEFAULT_MAX_IN_FLIGHT = 100
+# Size of the chunks file uploads are read in, same as ApiCalls
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Same as rauth's default timeout for oauth requests
+DEFAULT_REQUEST_TIMEOUT = 300
+
+JSON_CONTENT_HEADERS = {'Content-Type': 'application/json'}
+
+
+class AsyncApiCalls(object):
+
+    def __init__(self, client_id, client_secret, base_url, username, password, timeout_multiplier=10,
+                 max_in_flight=DEFAULT_MAX_IN_FLIGHT, http_max_retries=5, http_backoff_factor=0,
+                 http_backoff_max=DEFAULT_BACKOFF_MAX, http_retry_budget=DEFAULT_RETRY_BUDGET, transport=None):
+        """
+        Stores the connection settings, the connection is made with connect(), or by using the object as an
+        async context manager:
+            async with AsyncApiCalls(...) as api:
+                projects = await api.get_projects()
+
+        arguments:
+            client_id -- client_id for creating access token.
+            client_secret -- client_secret for creating access token.
+            base_url -- url of the IRIDA server
+            username -- username for server
+            password -- password for given username
+            timeout_multiplier -- number of seconds to give per MB of data being transferred
+            max_in_flight -- maximum number of requests sent at the same time, also the connection pool size
+            http_max_retries -- number of times a failed request is retried
+            http_backoff_factor -- backoff time multiplier per retry attempt
+            http_backoff_max -- longest time in seconds to wait between two retries
+            http_retry_budget -- seconds each endpoint may spend waiting for retries, 0 for no limit
+            transport -- httpx transport to send requests with, defaults to a network transport
+        """
+        if httpx is None:
+            raise ImportError("AsyncApiCalls requires httpx, install it with `pip install iridauploader[ASYNC]`")
+
+        if base_url[-1:] != "/":
+            base_url = base_url + "/"
+        if len(urlparse(base_url).scheme) == 0:
+            logging.error("Cannot create session. {} is not a valid URL".format(base_url))
+            raise exceptions.IridaConnectionError("Cannot create session." + base_url + " is not a valid URL")
+
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.base_url = base_url
+        self.username = username
+        self.password = password
+        self.timeout_multiplier = timeout_multiplier
+        self.max_in_flight = max_in_flight
+        self.http_max_retries = http_max_retries
+        self.http_backoff_factor = http_backoff_factor
+        self.http_backoff_max = http_backoff_max
+        self._retry_budget = RetryBudget(http_retry_budget)
+        self._transport = transport
+
+        self._client = None
+        self._access_token = None
+        # created in connect(), as they must belong to the running event loop
+        self._semaphore = None
+        self._token_lock = None
+
+        self.cached_projects = None
+        self.cached_samples = {}
+        self._irida_version = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    async def connect(self):
+        """
+        Opens the connection pool, gets an access token and checks the IRIDA version is compatible
+        Raises IridaConnectionError with description of error if unable to connect
+
+        :return: None
+        """
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._token_lock = asyncio.Lock()
+        self._client = httpx.AsyncClient(
+            headers=SESSION_HEADERS,
+            timeout=DEFAULT_REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_connections=self.max_in_flight,
+                                max_keepalive_connections=self.max_in_flight),
+            transport=self._transport,
+        )
+        await self._refresh_access_token()
+
+        irida_version = await self.get_irida_version()
+        if not ApiCalls._is_irida_version_compatible(irida_version, MINIMUM_IRIDA_VERSION):
+            raise exceptions.IridaConnectionError(
+                f"This API requires minimum IRIDA Version '{MINIMUM_IRIDA_VERSION}'. "
+                f"IRIDA Version '{self._irida_version}' is outdated, please contact your system administrator."
+            )
+
+    async def aclose(self):
+        """
+        Closes all open connections
+
+        :return: None
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def get_retry_stats(self):
+        """
+        Returns the number of retries and seconds spent waiting between retries for each endpoint
+
+        :return: dict of endpoint template to dict with 'retries' and 'seconds_waited'
+        """
+        return self._retry_budget.get_dict()
+
+    async def _refresh_access_token(self, expired_token=None):
+        """
+        Gets a new access token from IRIDA
+
+        :param expired_token: the token that was rejected, when another request already replaced it, nothing is done
+        :return: None
+        """
+        async with self._token_lock:
+            if expired_token is not None and self._access_token != expired_token:
+                return
+
+            url = urljoin(self.base_url, "oauth/token")
+            data = {
+                "grant_type": "password",
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "username": self.username,
+                "password": self.password
+            }
+            try:
+                response = await self._client.post(url, data=data)
+            except httpx.HTTPError as e:
+                logging.error("Can not connect to IRIDA")
+                raise exceptions.IridaConnectionError("Could not connect to the IRIDA server. URL may be incorrect."
+                                                      " IRIDA returned with error message: {}".format(e.args))
+            try:
+                self._access_token = response.json()["access_token"]
+            except ValueError:
+                logging.error("Can not connect to IRIDA")
+                raise exceptions.IridaConnectionError("Could not connect to the IRIDA server. URL may be incorrect."
+                                                      " IRIDA returned with error message: Unexpected response from"
+                                                      " server, URL may be incorrect")
+            except KeyError as e:
+                logging.error("Can not get access token from IRIDA")
+                raise exceptions.IridaConnectionError("Could not get access token from IRIDA. Credentials may be"
+                                                      " incorrect. IRIDA returned with error message: {}"
+                                                      "".format(e.args))
+
+    def _get_retry_wait(self, response, retry_number):
+        """
+        Time to wait before the next retry, the servers Retry-After header when given, otherwise the backoff time
+        Uses the same backoff calculation as urllib3
+
+        :param response: httpx Response or None
+        :param retry_number: how many retries have been done, including this one
+        :return: seconds
+        """
+        if response is not None and response.status_code in REFUSED_STATUS_CODES:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after is not None:
+                try:
+                    return max(float(retry_after), 0)
+                except ValueError:
+                    try:
+                        return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0)
+                    except (TypeError, ValueError):
+                        pass
+        if retry_number <= 1:
+            return 0
+        return min(self.http_backoff_max, self.http_backoff_factor * (2 ** (retry_number - 1)))
+
+    def _should_retry(self, method, response, error):
+        """
+        Follows the same rules as RetryPolicy, non idempotent requests are only retried when the server could not
+        have processed them
+
+        :param method: http method
+        :param response: httpx Response or None
+        :param error: exception raised while sending or None
+        :return: True when the request should be sent again
+        """
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        if error is not None:
+            return idempotent or isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout))
+        if response.status_code in REFUSED_STATUS_CODES:
+            return True
+        return idempotent and response.status_code in RETRY_STATUS_CODES
+
+    async def _request(self, method, url, retry=True, **kwargs):
+        """
+        Sends a request, retrying and refreshing the access token as needed
+
+        :param method: http method
+        :param url: url to send to
+        :param retry: False when the request body can only be sent once (streamed files)
+        :param kwargs: passed to httpx
+        :return: httpx Response
+        """
+        endpoint = get_endpoint_template(url)
+        retry_number = 0
+        refreshed_token = False
+        while True:
+            token = self._access_token
+            headers = {**kwargs.pop("headers", {}), "Authorization": "Bearer {}".format(token)}
+            response = error = None
+            async with self._semaphore:
+                try:
+                    response = await self._client.request(method, url, headers=headers, **kwargs)
+                except httpx.HTTPError as e:
+                    error = e
+            kwargs["headers"] = headers
+
+            # The token has expired, get a new one and send again
+            if response is not None and response.status_code == HTTPStatus.UNAUTHORIZED and not refreshed_token:
+                logging.debug("Token is probably expired, going to get a new token.")
+                refreshed_token = True
+                await self._refresh_access_token(expired_token=token)
+                if retry:
+                    continue
+
+            can_retry = (retry and retry_number < self.http_max_retries
+                         and not self._retry_budget.is_spent(endpoint))
+            if can_retry and self._should_retry(method, response, error):
+                retry_number += 1
+                self._retry_budget.record_retry(endpoint)
+                wait = self._retry_budget.take(endpoint, self._get_retry_wait(response, retry_number))
+                logging.debug("Retrying {} request to endpoint {} in {} seconds".format(method, endpoint, wait))
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                continue
+
+            if error is not None:
+                logging.error("Could not connect to IRIDA, URL '{}' Error: {}".format(url, str(error)))
+                raise exceptions.IridaConnectionError("Could not connect to IRIDA, non URLError Exception occurred. "
+                                                      "URL '{}' Error: {}".format(url, str(error)))
+            return response
+
+    @staticmethod
+    def _handle_irida_exception(response):
+        """
+        Generates and returns an appropriate exception based on the status code in the response returned by irida
+        Uses the same messages as ApiCalls
+
+        :param response: httpx Response
+        :return: Exception Sub Class
+        """
+        return ApiCalls._handle_irida_exception(SimpleNamespace(status_code=response.status_code,
+                                                                text=response.text,
+                                                                reason=response.reason_phrase))
+
+    async def get_irida_version(self):
+        """
+        API call to api/version
+
+        returns: string with version information
+        """
+        if self._irida_version is None:
+            logging.debug("Fetching IRIDA version")
+            response = await self._request("GET", f"{self.base_url}version")
+            if response.status_code == HTTPStatus.OK:  # 200
+                self._irida_version = response.json()['version']
+            else:
+                raise self._handle_irida_exception(response)
+
+        return self._irida_version
+
+    async def get_projects(self):
+        """
+        API call to api/projects to get list of projects
+
+        returns list containing projects. each project is Project object.
+        """
+        logging.info("Loading projects.")
+
+        if self.cached_projects is None:
+            logging.debug("Loading projects from IRIDA server.")
+            response = await self._request("GET", f"{self.base_url}projects")
+            if response.status_code != HTTPStatus.OK:  # 200
+                raise self._handle_irida_exception(response)
+
+            result = response.json()["resource"]["resources"]
+            try:
+                self.cached_projects = [
+                    ApiCalls._build_project_obj_from_resource(project_dict) for project_dict in result
+                ]
+            except KeyError as e:
+                msg_arg = " ".join(map(str, e.args))
+                raise exceptions.IridaResourceError(msg_arg + " not found in data provided by IRIDA. Available keys: "
+                                                    ", ".join(result[0].keys()))
+        else:
+            logging.debug("Loading projects from cache.")
+
+        return self.cached_projects
+
+    async def get_samples(self, project_id):
+        """
+        API call to api/projects/project_id/samples
+
+        arguments:
+            project_id -- project identifier from irida
+
+        returns list of samples for the given project.
+            each sample is a Sample object.
+        """
+        logging.info("Getting samples from project '{}'".format(project_id))
+
+        if project_id not in self.cached_samples:
+            response = await self._request("GET", f"{self.base_url}projects/{project_id}/samples")
+            if response.status_code != HTTPStatus.OK:  # 200
+                logging.error("Encountered error while getting samples: {} {}"
+                              "".format(response.status_code, response.reason_phrase))
+                raise self._handle_irida_exception(response)
+
+            result = response.json()["resource"]["resources"]
+            self.cached_samples[project_id] = [
+                ApiCalls._build_sample_obj_from_resource(sample_dict) for sample_dict in result
+            ]
+
+        return self.cached_samples[project_id]
+
+    async def get_sample_by_name(self, project_id, sample_name):
+        """
+        Given a project id and sample name, returns a Sample object, or None is sample does not exist
+        :param project_id:
+        :param sample_name:
+        :return: Sample obj or None
+        """
+        logging.info("Getting Sample object for project id '{}' and sample name '{}'".format(project_id, sample_name))
+
+        response = await self._request("GET", f"{self.base_url}projects/{project_id}/samples/bySampleName",
+                                       params={'sampleName': sample_name})
+        if response.status_code == HTTPStatus.OK:  # 200, return sample object
+            return ApiCalls._build_sample_obj_from_resource(response.json()["resource"])
+        elif response.status_code == HTTPStatus.NOT_FOUND:  # 404, return None
+            return None
+        else:  # any other exception
+            raise self._handle_irida_exception(response)
+
+    async def get_samples_by_name(self, project_id, sample_names):
+        """
+        Looks up many samples on a project at the same time
+
+        :param project_id: project the samples are on
+        :param sample_names: iterable of sample names
+        :return: dict of sample name to Sample obj or None
+        """
+        sample_names = list(sample_names)
+        samples = await asyncio.gather(*[self.get_sample_by_name(project_id, name) for name in sample_names])
+        return dict(zip(sample_names, samples))
+
+    async def sample_exists(self, sample_name, project_id):
+        """
+        Given a sample name and project id, returns True or False for if sample exists
+        :param sample_name:
+        :param project_id:
+        :return:
+        """
+        return (await self.get_sample_by_name(project_id, sample_name)) is not None
+
+    async def get_sample_id(self, sample_name, project_id):
+        """
+        Given a sample name and project id, returns the sample id, or False if it doesn't exist
+
+        :param sample_name: sample to confirm existence of
+        :param project_id: project that we think the sample is on
+        :return: Integer of the sample identifier if it exists, otherwise False
+        """
+        res = await self.get_sample_by_name(project_id, sample_name)
+        return res.sample_id if (res is not None) else False
+
+    async def project_exists(self, project_id):
+        """
+        Check if a project exists
+
+        :param project_id: project that we are checking for existence
+        :return: True or False
+        """
+        project_id = str(project_id)
+        return any([p.id == project_id for p in await self.get_projects()])
+
+    async def send_sample(self, sample, project_id):
+        """
+        Post request to send a sample to a project
+
+        :param sample: Sample object to send
+        :param project_id: id of project to send sample too
+        :return: json response from server
+        """
+        logging.info("Creating sample '{}' for project '{}' on IRIDA.".format(sample.sample_name, project_id))
+
+        self.cached_samples = {}  # reset the cache, we're updating stuff
+        self.cached_projects = None
+
+        response = await self._request("POST", f"{self.base_url}projects/{project_id}/samples",
+                                       content=json.dumps(sample.get_uploadable_dict()),
+                                       headers=dict(JSON_CONTENT_HEADERS))
+        if response.status_code != HTTPStatus.CREATED:  # 201
+            logging.error("Did not create sample on server. Response code is '{}' and error message is '{}'"
+                          "".format(response.status_code, response.text))
+            raise self._handle_irida_exception(response)
+
+        return response.json()
+
+    async def send_metadata(self, metadata, sample_id):
+        """
+        Put request to add metadata to specific sample ID
+
+        :param metadata: Metadata object
+        :param sample_id: id of sample to add metadata to
+        :return: json response from server
+        """
+        logging.info("Adding metadata to sample '{}' ".format(sample_id))
+
+        response = await self._request("PUT", f"{self.base_url}samples/{sample_id}/metadata",
+                                       content=json.dumps(metadata.get_uploadable_dict()),
+                                       headers=dict(JSON_CONTENT_HEADERS))
+        if response.status_code != HTTPStatus.OK:  # 200
+            logging.error("Did not add metadata to sample. Response code is '{}' and error message is '{}'"
+                          "".format(response.status_code, response.text))
+            raise self._handle_irida_exception(response)
+
+        return response.json()
+
+    async def create_seq_run(self, metadata, sequencing_run_type):
+        """
+        Create a sequencing run.
+
+        arguments:
+            metadata -- SequencingRun's metadata
+            sequencing_run_type -- string: used as the identifier for the type of sequencing run being uploaded
+
+        returns: the sequencing run identifier for the sequencing run that was created
+        """
+        logging.debug("Creating new sequencing run on IRIDA")
+
+        response = await self._request("POST", f"{self.base_url}sequencingrun/{sequencing_run_type}",
+                                       content=json.dumps(ApiCalls._get_seq_run_dict(metadata)),
+                                       headers=dict(JSON_CONTENT_HEADERS))
+        if response.status_code != HTTPStatus.CREATED:  # 201
+            logging.error("Encountered error while creating sequence run: {} {}"
+                          "".format(response.status_code, response.reason_phrase))
+            raise self._handle_irida_exception(response)
+
+        sequencing_run_id = response.json()['resource']['identifier']
+        logging.debug("Sequencing run id '{}' has been created".format(sequencing_run_id))
+        return sequencing_run_id
+
+    async def set_seq_run_complete(self, identifier):
+        return await self._set_seq_run_upload_status(identifier, "COMPLETE")
+
+    async def set_seq_run_uploading(self, identifier):
+        return await self._set_seq_run_upload_status(identifier, "UPLOADING")
+
+    async def set_seq_run_error(self, identifier):
+        return await self._set_seq_run_upload_status(identifier, "ERROR")
+
+    async def _set_seq_run_upload_status(self, identifier, status):
+        """
+        Update a sequencing run's upload status to the given status argument
+
+        arguments:
+            identifier -- the id of the sequencing run to be updated
+            status     -- string that the sequencing run will be updated with
+
+        returns result of patch request
+        """
+        logging.debug("Setting sequencing run '{}' to '{}'".format(identifier, status))
+
+        response = await self._request("PATCH", f"{self.base_url}sequencingrun/{identifier}",
+                                       content=json.dumps({"uploadStatus": status}),
+                                       headers=dict(JSON_CONTENT_HEADERS))
+        if response.status_code != HTTPStatus.OK:  # 200
+            logging.error("Encountered error while changing upload status of run '{}' to '{}': {} {}"
+                          "".format(identifier, status, response.status_code, response.reason_phrase))
+            raise exceptions.IridaConnectionError("Error: {} {}".format(response.status_code,
+                                                                        response.reason_phrase))
+
+        return response.json()
+
+    async def send_sequence_files(self, sequence_file, sample_name, project_id, upload_id, upload_mode=MODE_DEFAULT):
+        """
+        post request to send sequence files found in given sample argument
+        The files are streamed from disk, reads are done in a worker thread so the event loop is never blocked
+
+        arguments:
+            sequence_file -- SequenceFile object to send
+            sample_name -- irida sample name identifier to send to
+            project_id -- irida project identifier
+            upload_id -- the run to upload the files to
+            upload_mode -- default:MODE_DEFAULT -- which upload mode will be used
+
+        returns result of post request.
+        """
+        sample_id = await self.get_sample_id(sample_name, project_id)
+        url = ApiCalls._get_sample_upload_url(sequence_file, f"{self.base_url}samples/{sample_id}", upload_mode)
+
+        # Same multipart body as ApiCalls, so IRIDA sees identical uploads from both clients
+        encoder = ApiCalls._get_multipart_encoder(sequence_file, upload_id)
+        headers = {'Content-Type': encoder.content_type, 'Content-Length': str(encoder.len)}
+
+        async def stream_body():
+            loop = asyncio.get_running_loop()
+            bytes_read = 0
+            while True:
+                chunk = await loop.run_in_executor(None, encoder.read, UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                bytes_read += len(chunk)
+                progress.update_transfer(sample_name, project_id, bytes_read, encoder.len)
+                yield chunk
+
+        logging.debug("Sending files to [{}]".format(url))
+        # A streamed body can only be sent once, so uploads are not retried
+        response = await self._request("POST", url, retry=False, content=stream_body(), headers=headers,
+                                       timeout=self._get_sequence_file_timeout(sequence_file))
+        if response.status_code != HTTPStatus.CREATED:  # 201
+            logging.error("Error while uploading [{}]: [{}]".format(sample_name, response.reason_phrase))
+            raise self._handle_irida_exception(response)
+
+        return response.json()
+
+    def _get_sequence_file_timeout(self, sequence_file):
+        """
+        Approximates transfer time and generates a timeout, same as ApiCalls
+        :param sequence_file:
+        :return:
+        """
+        filesize_bytes = sequence_file.get_file_size(sequence_file.file_list[0])
+        if sequence_file.is_paired_end():
+            filesize_bytes = filesize_bytes * 2
+        timeout_mb = (filesize_bytes * self.timeout_multiplier / TIMEOUT_BYTES_TO_MB_DIVISOR)
+        return timeout_mb if timeout_mb > TIMEOUT_MINIMUM else TIMEOUT_MINIMUM
+
+
+class SyncFacade(object):
+    """
+    Blocking wrapper around AsyncApiCalls
+
+    An event loop runs in a background thread, every coroutine method of AsyncApiCalls can be called as a normal
+    blocking method. Bulk methods like get_samples_by_name still run all of their requests concurrently.
+        api = SyncFacade(client_id, client_secret, base_url, username, password)
+        samples = api.get_samples_by_name(project_id, sample_names)
+        api.close()
+    """
+
+    def __init__(self, *args, **kwargs):
+        """
+        Takes the same arguments as AsyncApiCalls, and connects to IRIDA
+        """
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="irida-async-api", daemon=True)
+        self._thread.start()
+        try:
+            self._api = AsyncApiCalls(*args, **kwargs)
+            self._run(self._api.connect())
+        except Exception:
+            self._stop_loop()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def _stop_loop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __getattr__(self, name):
+        attribute = getattr(self._api, name)
+        if not asyncio.iscoroutinefunction(attribute):
+            return attribute
+
+        def blocking_call(*args, **kwargs):
+            return self._run(attribute(*args, **kwargs))
+
+        return blocking_call
+
+    def close(self):
+        """
+        Closes the connections and stops the event loop
+
+        :return: None
+        """
+        if self._loop.is_closed():
+            return
+        self._run(self._api.aclose())
+        self._stop_loop()
@@ -0,0 +1,50 @@
+"""
+Reading and writing the json files the api caches data in between runs
+
+Files are replaced in one step, so processes sharing a file always read a whole file. Errors are logged and otherwise
+ignored, the uploader works without its caches, it just asks IRIDA again.
+"""
+import json
+import logging
+import os
+import tempfile
+
+
+def read_cache_file(file_path):
+    """
+    :param file_path: path of the cache file
+    :return: dict read from the file, empty when the file does not exist or can not be read
+    """
+    try:
+        with open(file_path, "r") as cache_file:
+            entries = json.load(cache_file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logging.warning("Could not read cache file '{}', ignoring it: {}".format(file_path, e))
+        return {}
+    return entries if isinstance(entries, dict) else {}
+
+
+def write_cache_file(file_path, entries):
+    """
+    Replaces the cache file, the new file is only readable by the user
+
+    :param file_path: path of the cache file, its directory is created when it does not exist
+    :param entries: dict to write
+    :return: None
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # mkstemp creates the file with 0600 permissions
+        file_descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix=".cache")
+        try:
+            with os.fdopen(file_descriptor, "w") as temp_file:
+                json.dump(entries, temp_file)
+            os.replace(temp_path, file_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+    except OSError as e:
+        logging.warning("Could not write cache file '{}': {}".format(file_path, e))
@@ -0,0 +1,243 @@
+"""
+Connection pool management for the api layer
+
+A single PooledHTTPAdapter is created per ApiCalls instance and mounted onto every session the instance creates.
+This lets the pooled (keep-alive) connections survive token refreshes, instead of throwing away the sockets and doing
+a fresh TCP/TLS handshake every time the OAuth2Session is rebuilt.
+
+The adapter also keeps track of how many requests it has sent and how many new connections it had to open,
+so connection reuse can be measured. Every request is also counted towards the timing profile of the run (see
+progress/timing.py) and the uploader metrics (see progress/metrics.py). When given flow control objects (see
+flow_control.py), every attempt at a request, including the retries urllib3 makes, waits for the rate limiter.
+The concurrency controller is told about every attempt once: attempts that the RetryPolicy sends again are reported
+by the policy, and the adapter reports the response or error of the last attempt.
+"""
+
+import threading
+import time
+
+from contextlib import contextmanager, nullcontext
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from iridauploader import progress
+
+from .retry_policy import RetryPolicy, get_endpoint_template, status_retries_disabled
+
+# requests defaults, a single IRIDA server only ever needs one pool, but we keep the defaults for proxies/redirects
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+
+# Per thread state of the request being sent, see rate_limit_exempt and PooledHTTPAdapter.send
+_request_state = threading.local()
+
+
+@contextmanager
+def rate_limit_exempt():
+    """
+    Lets the requests sent in the with block on this thread through without taking a token from the rate limiter
+
+    Used for the OPTIONS request that checks the session before every call, so each call takes a single token
+    """
+    previous = getattr(_request_state, "rate_limit_exempt", False)
+    _request_state.rate_limit_exempt = True
+    try:
+        yield
+    finally:
+        _request_state.rate_limit_exempt = previous
+
+
+class ConnectionPoolStats:
+    """
+    Thread safe counters for connection pool usage
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._new_connections = 0
+        self._new_tls_connections = 0
+        self._session_refreshes = 0
+
+    def record_request(self):
+        with self._lock:
+            self._requests += 1
+
+    def record_new_connection(self, tls):
+        with self._lock:
+            self._new_connections += 1
+            if tls:
+                self._new_tls_connections += 1
+
+    def record_session_refresh(self):
+        with self._lock:
+            self._session_refreshes += 1
+
+    @property
+    def requests(self):
+        return self._requests
+
+    @property
+    def new_connections(self):
+        return self._new_connections
+
+    @property
+    def new_tls_connections(self):
+        return self._new_tls_connections
+
+    @property
+    def session_refreshes(self):
+        return self._session_refreshes
+
+    @property
+    def reused_connections(self):
+        """
+        Number of requests that were sent over an already open connection
+        """
+        with self._lock:
+            return max(self._requests - self._new_connections, 0)
+
+    def get_dict(self):
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "new_connections": self._new_connections,
+                "new_tls_connections": self._new_tls_connections,
+                "reused_connections": max(self._requests - self._new_connections, 0),
+                "session_refreshes": self._session_refreshes,
+            }
+
+
+def _wait_for_rate_limiter():
+    """
+    Takes a token from the rate limiter of the request being sent on this thread, see PooledHTTPAdapter.send
+    """
+    rate_limiter = getattr(_request_state, "rate_limiter", None)
+    if rate_limiter is not None:
+        _request_state.rate_limit_wait += rate_limiter.acquire()
+
+
+def _counting_pool_classes(stats):
+    """
+    Builds connection pool classes that report every new socket connection to the stats object
+
+    The pools also wait for the rate limiter. urllib3 sends retries by calling urlopen again, so every attempt at a
+    request waits, not just the first one.
+
+    :param stats: ConnectionPoolStats object
+    :return: dict of scheme to connection pool class, in the format urllib3's PoolManager expects
+    """
+
+    class _CountingHTTPConnection(HTTPConnection):
+        def connect(self):
+            super().connect()
+            stats.record_new_connection(tls=False)
+
+    class _CountingHTTPSConnection(HTTPSConnection):
+        def connect(self):
+            super().connect()
+            stats.record_new_connection(tls=True)
+
+    class _CountingHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = _CountingHTTPConnection
+
+        def urlopen(self, *args, **kwargs):
+            _wait_for_rate_limiter()
+            return super().urlopen(*args, **kwargs)
+
+    class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = _CountingHTTPSConnection
+
+        def urlopen(self, *args, **kwargs):
+            _wait_for_rate_limiter()
+            return super().urlopen(*args, **kwargs)
+
+    return {
+        "http": _CountingHTTPConnectionPool,
+        "https": _CountingHTTPSConnectionPool,
+    }
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter with configurable pool sizes that records connection reuse in a ConnectionPoolStats object
+
+    The same adapter instance should be mounted on every session created for a server, so connections are reused
+    """
+
+    def __init__(self, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 max_retries=0, pool_block=False, stats=None, rate_limiter=None, controller=None):
+        """
+        :param pool_connections: number of connection pools (one per host) to cache
+        :param pool_maxsize: maximum number of connections to keep open per pool
+        :param max_retries: urllib3 Retry object or int, a RetryPolicy is given the controller
+        :param pool_block: when True, requests wait for a free connection instead of opening a throwaway one
+        :param stats: ConnectionPoolStats object, a new one is created when not given
+        :param rate_limiter: TokenBucket object every attempt at a request has to take a token from, None for no limit
+        :param controller: AIMDController object that is told about every response, None to not report responses
+        """
+        self.stats = stats if stats is not None else ConnectionPoolStats()
+        self.rate_limiter = rate_limiter
+        self.controller = controller
+        super().__init__(pool_connections=pool_connections,
+                         pool_maxsize=pool_maxsize,
+                         max_retries=max_retries,
+                         pool_block=pool_block)
+        if isinstance(self.max_retries, RetryPolicy):
+            # Attempts that are sent again never get back to send, so the retry policy reports them
+            self.max_retries = self.max_retries.new(controller=controller)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        super().init_poolmanager(connections, maxsize, block, **pool_kwargs)
+        # PoolManager references the module level dict by default, so it is replaced instead of modified
+        self.poolmanager.pool_classes_by_scheme = _counting_pool_classes(self.stats)
+
+    def send(self, request, **kwargs):
+        self.stats.record_request()
+        progress.record_http_call(int(request.headers.get("Content-Length") or 0))
+        # The connection pool takes a token for every attempt, the time waited is not counted as latency
+        exempt = getattr(_request_state, "rate_limit_exempt", False)
+        _request_state.rate_limiter = None if exempt else self.rate_limiter
+        _request_state.rate_limit_wait = 0
+        start = time.monotonic()
+        endpoint = get_endpoint_template(request.url)
+        # Streamed bodies (file uploads) are used up by the first attempt, they can not be retried on a status code
+        streamed = hasattr(request.body, "read")
+        try:
+            with status_retries_disabled() if streamed else nullcontext():
+                response = super().send(request, **kwargs)
+        except Exception:
+            progress.metrics.record_http_request(request.method, endpoint, "error", self._get_latency(start))
+            if self.controller is not None:
+                self.controller.record_congestion()
+            raise
+        finally:
+            _request_state.rate_limiter = None
+        latency = self._get_latency(start)
+        progress.metrics.record_http_request(request.method, endpoint, response.status_code, latency)
+        if self.controller is not None:
+            # Streamed bodies (file uploads) take as long as the file needs, so their latency says nothing about load
+            self.controller.record_response(response.status_code, None if streamed else latency)
+        return response
+
+    @staticmethod
+    def _get_latency(start):
+        """
+        :param start: time.monotonic() from before the request was sent
+        :return: seconds since start, without the time spent waiting for the rate limiter
+        """
+        return max(time.monotonic() - start - _request_state.rate_limit_wait, 0)
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state["stats"] = self.stats
+        return state
+
+    def __setstate__(self, state):
+        # stats must exist before the parent rebuilds the pool manager
+        self.stats = state.get("stats", ConnectionPoolStats())
+        # flow control objects are shared with the ApiCalls instance, and are not carried over
+        self.rate_limiter = None
+        self.controller = None
+        super().__setstate__(state)
@@ -0,0 +1,175 @@
+"""
+Client side flow control for the api layer
+
+TokenBucket limits the rate of requests sent to IRIDA.
+
+AIMDController limits how many file uploads run at the same time. It starts at the configured maximum, and like TCP
+congestion control it increases the limit additively while the server is healthy, and cuts it in half when the
+server shows signs of overload (429 / 5xx responses, connection failures, or slow responses).
+After a cut it waits for a cooldown period before reacting again, so one overload event does not collapse
+the limit to the minimum.
+"""
+
+import logging
+import threading
+import time
+
+from contextlib import contextmanager
+
+# 0 means no rate limit
+DEFAULT_RATE_LIMIT = 0
+DEFAULT_RATE_BURST = 10
+DEFAULT_UPLOAD_MAX_CONCURRENCY = 1
+# 0 means latency is not used as an overload signal
+DEFAULT_LATENCY_THRESHOLD = 0
+
+# Seconds to ignore further congestion signals after the limit has been cut
+CONGESTION_COOLDOWN = 5.0
+DECREASE_FACTOR = 0.5
+
+
+def is_congestion_status(status_code):
+    """
+    :param status_code: http status code
+    :return: True when the status code means the server is overloaded
+    """
+    return status_code == 429 or status_code >= 500
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket rate limiter
+
+    Tokens are refilled at rate per second, up to burst tokens. Each request takes a token, and waits when none are
+    left. Waiting requests reserve their token up front, so they are let through in the order they arrived.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE_LIMIT, burst=DEFAULT_RATE_BURST):
+        """
+        :param rate: tokens added per second, 0 or None disables the limiter
+        :param burst: maximum number of tokens that can be saved up
+        """
+        self._rate = rate
+        self._burst = max(burst, 1)
+        self._tokens = float(self._burst)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self._rate
+
+    def acquire(self):
+        """
+        Takes a token, blocking until one is available
+
+        :return: seconds waited
+        """
+        if not self._rate:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._burst, self._tokens + (now - self._last_refill) * self._rate)
+            self._last_refill = now
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class AIMDController:
+    """
+    Thread safe additive increase / multiplicative decrease concurrency limiter
+    """
+
+    def __init__(self, max_limit=DEFAULT_UPLOAD_MAX_CONCURRENCY, min_limit=1,
+                 latency_threshold=DEFAULT_LATENCY_THRESHOLD, cooldown=CONGESTION_COOLDOWN):
+        """
+        :param max_limit: highest number of concurrent operations allowed, this is also the starting limit
+        :param min_limit: lowest the limit can be cut to
+        :param latency_threshold: seconds, responses slower than this count as congestion, 0 disables
+        :param cooldown: seconds after a cut where further congestion signals are ignored
+        """
+        self._max_limit = max(max_limit, 1)
+        self._min_limit = max(min(min_limit, self._max_limit), 1)
+        self._latency_threshold = latency_threshold
+        self._cooldown = cooldown
+        self._limit = float(self._max_limit)
+        self._in_flight = 0
+        self._last_decrease = None
+        self._congestion_events = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self):
+        """
+        Current number of operations allowed to run at once
+        """
+        with self._condition:
+            return int(self._limit)
+
+    def acquire(self):
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self):
+        """
+        Context manager that holds one of the concurrency slots
+        """
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def record_response(self, status_code, latency=None):
+        """
+        Feeds a response into the controller
+
+        :param status_code: http status code of the response
+        :param latency: seconds the response took, None when latency should not be considered
+        :return: None
+        """
+        slow = bool(self._latency_threshold) and latency is not None and latency > self._latency_threshold
+        if is_congestion_status(status_code) or slow:
+            self.record_congestion()
+        else:
+            self.record_success()
+
+    def record_success(self):
+        with self._condition:
+            if self._limit < self._max_limit:
+                # grows by 1 for every window of limit successes
+                self._limit = min(self._max_limit, self._limit + 1 / self._limit)
+                self._condition.notify_all()
+
+    def record_congestion(self):
+        with self._condition:
+            now = time.monotonic()
+            if self._last_decrease is not None and now - self._last_decrease < self._cooldown:
+                return
+            self._congestion_events += 1
+            self._last_decrease = now
+            new_limit = max(self._min_limit, int(self._limit * DECREASE_FACTOR))
+            if new_limit < int(self._limit):
+                logging.warning("IRIDA appears to be overloaded, reducing concurrent uploads from {} to {}".format(
+                    int(self._limit), new_limit))
+            self._limit = float(new_limit)
+
+    def get_dict(self):
+        with self._condition:
+            return {
+                "concurrency_limit": int(self._limit),
+                "max_concurrency": self._max_limit,
+                "in_flight": self._in_flight,
+                "congestion_events": self._congestion_events,
+            }
@@ -0,0 +1,73 @@
+"""
+Accounting for the requests sent by ApiCalls
+
+Every api call is routed through ApiCalls._request, which records the call here by method and endpoint template
+(e.g. GET /api/samples/{id}/sequenceFiles). Counting by template instead of url groups the calls made for each
+sample together, so patterns like one request per sample during validation stand out.
+"""
+
+import threading
+
+# Requests slower than this many seconds are logged, file uploads are not included
+DEFAULT_SLOW_REQUEST_THRESHOLD = 10
+
+
+class RequestStats:
+    """
+    Thread safe counters of requests, time taken and bytes, per method and endpoint template
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, method, endpoint, seconds, bytes_sent=0, bytes_received=0, error=False, slow=False):
+        """
+        :param method: HTTP method
+        :param endpoint: endpoint template
+        :param seconds: time taken by the request
+        :param bytes_sent: size of the request body
+        :param bytes_received: size of the response body
+        :param error: True when no response was received
+        :param slow: True when the request was slower than the slow request threshold
+        :return: None
+        """
+        key = "{} {}".format(method.upper(), endpoint)
+        with self._lock:
+            stats = self._endpoints.setdefault(key, {
+                "calls": 0,
+                "errors": 0,
+                "slow_calls": 0,
+                "total_seconds": 0.0,
+                "max_seconds": 0.0,
+                "bytes_sent": 0,
+                "bytes_received": 0,
+            })
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["slow_calls"] += int(slow)
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            stats["bytes_sent"] += bytes_sent
+            stats["bytes_received"] += bytes_received
+
+    def get_call_count(self, method, endpoint):
+        """
+        :param method: HTTP method
+        :param endpoint: endpoint template
+        :return: number of calls made to the endpoint with the method
+        """
+        with self._lock:
+            stats = self._endpoints.get("{} {}".format(method.upper(), endpoint))
+            return stats["calls"] if stats else 0
+
+    def get_dict(self):
+        """
+        :return: dict of 'METHOD endpoint template' to dict of counters
+        """
+        with self._lock:
+            return {key: dict(stats) for key, stats in self._endpoints.items()}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
@@ -0,0 +1,268 @@
+"""
+Retry policy for http requests made by the api layer
+
+Requests are split into two groups:
+    Idempotent requests (GET, PUT, ...) are retried on connection errors, read errors and server errors.
+    Non idempotent requests (POST, PATCH) could have been processed by the server even when an error is returned,
+    retrying them blindly can create duplicate samples or runs. They are only retried when the connection could
+    not be made, or when the server explicitly refused the request (429 Too Many Requests / 503 Service Unavailable)
+    Streamed bodies (sequence file uploads) are read as they are sent and can not be sent again, so requests with
+    them are never retried on a status code. The caller sees the servers answer instead.
+
+The servers Retry-After header is honoured on 429 and 503 responses.
+
+All the time spent waiting between retries is charged to a per endpoint budget. Once the budget for an endpoint has
+been spent, requests to that endpoint are not retried any more, so a throttled server cannot multiply the total run
+time of an upload. Only the waits of the last budget window count towards the budget, so a long running uploader
+(GUI, --batch) retries an endpoint again once it has recovered.
+"""
+
+import logging
+import re
+import threading
+import time
+
+from collections import deque
+from contextlib import contextmanager
+from itertools import takewhile
+from urllib.parse import urlparse
+from urllib3.util.retry import Retry
+
+import iridauploader.progress as progress
+
+from .flow_control import is_congestion_status
+
+# Methods that are safe to send again when we are unsure if the server processed them
+IDEMPOTENT_METHODS = frozenset(["HEAD", "GET", "PUT", "DELETE", "OPTIONS", "TRACE"])
+# Server responses that are worth retrying for idempotent methods
+RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+# Server responses that mean the request was refused without being processed, these can be retried for any method
+REFUSED_STATUS_CODES = frozenset([429, 503])
+
+# Same as urllib3's default
+DEFAULT_BACKOFF_MAX = 120
+# Seconds that can be spent waiting between retries for a single endpoint, 0 means unlimited
+DEFAULT_RETRY_BUDGET = 300
+# Seconds of waiting that count towards the budget, older waits are given back
+DEFAULT_RETRY_BUDGET_WINDOW = 3600
+
+# Path segments that are resource identifiers, these are templated out so all samples share one endpoint
+_IDENTIFIER_SEGMENT = re.compile(r"^\d+$")
+
+# Set while a request with a streamed body is being sent on this thread, see status_retries_disabled
+_request_state = threading.local()
+
+
+@contextmanager
+def status_retries_disabled():
+    """
+    Stops RetryPolicy from retrying on status codes for the requests sent in the with block on this thread
+
+    urllib3 only gives the Retry object the method and status code, not the body, so the adapter uses this around
+    requests with a body that can not be sent again.
+    """
+    previous = getattr(_request_state, "status_retries_disabled", False)
+    _request_state.status_retries_disabled = True
+    try:
+        yield
+    finally:
+        _request_state.status_retries_disabled = previous
+
+
+def get_endpoint_template(url):
+    """
+    Converts a url or path into an endpoint template, by replacing resource identifiers with {id}
+    example: https://irida/api/samples/12/pairs?x=1 -> /api/samples/{id}/pairs
+
+    :param url: full url or path
+    :return: String
+    """
+    path = urlparse(url).path
+    segments = ["{id}" if _IDENTIFIER_SEGMENT.match(segment) else segment for segment in path.split("/")]
+    return "/".join(segments)
+
+
+class RetryBudget:
+    """
+    Thread safe tracker of retries and seconds spent waiting between retries, per endpoint template
+
+    The budget is a rolling window: each endpoint can wait max_seconds in any window seconds.
+    """
+
+    def __init__(self, max_seconds=DEFAULT_RETRY_BUDGET, window=DEFAULT_RETRY_BUDGET_WINDOW, clock=time.monotonic):
+        """
+        :param max_seconds: seconds each endpoint can spend waiting for retries, 0 or None means unlimited
+        :param window: seconds after which a wait no longer counts towards the budget
+        :param clock: function returning the current time in seconds
+        """
+        self._max_seconds = max_seconds
+        self._window = window
+        self._clock = clock
+        self._lock = threading.Lock()
+        # endpoint -> deque of (time charged, seconds) in the current window
+        self._charges = {}
+        self._seconds_spent = {}
+        self._retry_counts = {}
+
+    @property
+    def max_seconds(self):
+        return self._max_seconds
+
+    @property
+    def window(self):
+        return self._window
+
+    def is_spent(self, endpoint):
+        """
+        :param endpoint: endpoint template
+        :return: True when the endpoint has used its entire budget
+        """
+        if not self._max_seconds:
+            return False
+        with self._lock:
+            return self._get_window_seconds(endpoint) >= self._max_seconds
+
+    def _get_window_seconds(self, endpoint):
+        """
+        Drops the waits that are older than the window, must be called with the lock held
+
+        :param endpoint: endpoint template
+        :return: seconds charged to the endpoint in the current window
+        """
+        charges = self._charges.get(endpoint)
+        if not charges:
+            return 0
+        oldest = self._clock() - self._window
+        while charges and charges[0][0] <= oldest:
+            charges.popleft()
+        return sum(seconds for _, seconds in charges)
+
+    def record_retry(self, endpoint):
+        with self._lock:
+            self._retry_counts[endpoint] = self._retry_counts.get(endpoint, 0) + 1
+
+    def take(self, endpoint, seconds):
+        """
+        Charges seconds of waiting to an endpoint
+
+        :param endpoint: endpoint template
+        :param seconds: seconds we would like to wait
+        :return: seconds that are allowed to be waited, this can be less than requested when the budget runs out
+        """
+        seconds = max(seconds, 0)
+        with self._lock:
+            if self._max_seconds:
+                seconds = min(seconds, max(self._max_seconds - self._get_window_seconds(endpoint), 0))
+                if seconds > 0:
+                    self._charges.setdefault(endpoint, deque()).append((self._clock(), seconds))
+            self._seconds_spent[endpoint] = self._seconds_spent.get(endpoint, 0) + seconds
+        return seconds
+
+    def get_dict(self):
+        """
+        :return: dict of endpoint template to dict with 'retries' and 'seconds_waited', in total and not just in
+            the current window
+        """
+        with self._lock:
+            endpoints = set(self._seconds_spent) | set(self._retry_counts)
+            return {
+                endpoint: {
+                    "retries": self._retry_counts.get(endpoint, 0),
+                    "seconds_waited": self._seconds_spent.get(endpoint, 0),
+                }
+                for endpoint in endpoints
+            }
+
+
+class RetryPolicy(Retry):
+    """
+    urllib3 Retry that treats non idempotent requests differently and charges retries to a RetryBudget
+
+    urllib3 creates a new Retry object for every attempt via new(), so the budget is passed along to each copy.
+    """
+
+    def __init__(self, *args, budget=None, endpoint=None, controller=None, backoff_max=DEFAULT_BACKOFF_MAX, **kwargs):
+        """
+        :param backoff_max: longest time in seconds to wait between two retries. Kept here instead of being passed to
+            urllib3, which only takes it from 2.0
+        :param budget: RetryBudget shared by all requests, when None retries are unlimited in time
+        :param controller: AIMDController that is told about attempts that got an overloaded response or failed
+            to connect and are being retried, None to not report them. The PooledHTTPAdapter sets it to its own
+            controller
+        :param endpoint: endpoint template of the request being retried, filled in on the first retry
+        """
+        kwargs.setdefault("allowed_methods", IDEMPOTENT_METHODS)
+        kwargs.setdefault("status_forcelist", RETRY_STATUS_CODES)
+        super().__init__(*args, **kwargs)
+        self.backoff_max = backoff_max
+        self.budget = budget
+        self.endpoint = endpoint
+        self.controller = controller
+
+    def new(self, **kw):
+        kw.setdefault("backoff_max", self.backoff_max)
+        kw.setdefault("budget", self.budget)
+        kw.setdefault("endpoint", self.endpoint)
+        kw.setdefault("controller", self.controller)
+        return super().new(**kw)
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if getattr(_request_state, "status_retries_disabled", False):
+            # urllib3 would send the headers again with an empty body
+            return False
+        if method.upper() in self.allowed_methods:
+            return super().is_retry(method, status_code, has_retry_after)
+        # The server may have already processed a non idempotent request that returned an error,
+        # so they are only sent again when the server refused them
+        return bool(self.total) and status_code in REFUSED_STATUS_CODES
+
+    def increment(self, method=None, url=None, response=None, error=None, *args, **kwargs):
+        # The first retry of a request figures out which endpoint is being retried, later copies inherit it
+        if self.endpoint is None and url is not None:
+            return self.new(endpoint=get_endpoint_template(url)).increment(
+                method, url, response, error, *args, **kwargs)
+
+        if self.budget is not None:
+            self.budget.record_retry(self.endpoint)
+        progress.metrics.record_http_retry(self.endpoint)
+        new_retry = super().increment(method, url, response, error, *args, **kwargs)
+        # Only attempts that are sent again are reported here, the last attempt is reported by the connection pool
+        overloaded = error is not None or (response is not None and is_congestion_status(response.status))
+        if self.controller is not None and overloaded:
+            self.controller.record_congestion()
+        logging.debug("Retrying {} request to endpoint {}".format(method, self.endpoint))
+        return new_retry
+
+    def is_exhausted(self):
+        if super().is_exhausted():
+            return True
+        if self.budget is not None and self.endpoint is not None and self.budget.is_spent(self.endpoint):
+            logging.warning("Retry budget of {} seconds per {} seconds for endpoint {} has been spent, "
+                            "not retrying".format(self.budget.max_seconds, self.budget.window, self.endpoint))
+            return True
+        return False
+
+    def get_backoff_time(self):
+        """
+        Same as urllib3's backoff, {backoff factor} * (2 ** ({number of consecutive errors} - 1)), capped at
+        backoff_max on every urllib3 version
+        """
+        consecutive_errors = len(list(takewhile(lambda x: x.redirect_location is None, reversed(self.history))))
+        if consecutive_errors <= 1:
+            return 0
+        return float(max(0, min(self.backoff_max, self.backoff_factor * (2 ** (consecutive_errors - 1)))))
+
+    def sleep(self, response=None):
+        """
+        Sleeps for the servers Retry-After time if given, otherwise the backoff time,
+        limited to what is left in the endpoints budget
+        """
+        seconds = None
+        if self.respect_retry_after_header and response:
+            seconds = self.get_retry_after(response)
+        if not seconds:
+            seconds = self.get_backoff_time()
+        if self.budget is not None and self.endpoint is not None:
+            seconds = self.budget.take(self.endpoint, seconds)
+        if seconds > 0:
+            time.sleep(seconds)
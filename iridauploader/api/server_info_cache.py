@@ -0,0 +1,83 @@
+"""
+On disk cache of the IRIDA version, and the features the uploader found in it, for each IRIDA server
+
+Every ApiCalls object asked IRIDA for its version before doing anything else. With the cache, the version and the
+capabilities derived from it are reused by every process for ttl seconds, so only the first run in that time asks.
+
+Servers are keyed on a hash of their url. Only versions the uploader can work with are stored, so an upgraded server
+is used as soon as it is upgraded.
+"""
+import hashlib
+import os
+import threading
+import time
+
+from collections import namedtuple
+
+from appdirs import user_cache_dir
+
+from . import cache_file
+
+DEFAULT_SERVER_INFO_CACHE_FILE = os.path.join(user_cache_dir("irida-uploader"), "irida_servers.json")
+DEFAULT_SERVER_INFO_TTL = 3600
+
+# capabilities is a dict of capability name to bool, checked_at is the unix time the version was fetched
+ServerInfo = namedtuple("ServerInfo", ["version", "capabilities", "checked_at"])
+
+
+def get_cache_key(base_url):
+    """
+    :param base_url: url of the IRIDA server
+    :return: string key of the server in the cache file
+    """
+    return hashlib.sha256(base_url.rstrip("/").encode("utf-8")).hexdigest()
+
+
+class ServerInfoCache:
+    """
+    Reads and writes server info in the cache file
+
+    The file is read on every get, so a version stored by another process is used straight away.
+    """
+
+    def __init__(self, file_path=DEFAULT_SERVER_INFO_CACHE_FILE, ttl=DEFAULT_SERVER_INFO_TTL, clock=time.time):
+        """
+        :param file_path: path of the cache file, it is created when a server is first stored
+        :param ttl: seconds stored server info is used for
+        :param clock: function returning the current unix time
+        """
+        self.file_path = file_path
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def get(self, base_url):
+        """
+        :param base_url: url of the IRIDA server
+        :return: ServerInfo, or None when the server is not stored or was checked more than ttl seconds ago
+        """
+        entry = cache_file.read_cache_file(self.file_path).get(get_cache_key(base_url))
+        if not isinstance(entry, dict) or not entry.get("version") or not isinstance(entry.get("capabilities"), dict):
+            return None
+        checked_at = entry.get("checked_at")
+        if not isinstance(checked_at, (int, float)) or not 0 <= self._clock() - checked_at < self.ttl:
+            return None
+        return ServerInfo(entry["version"], entry["capabilities"], checked_at)
+
+    def put(self, base_url, version, capabilities):
+        """
+        Stores the server info, replacing what was stored for the server
+
+        :param base_url: url of the IRIDA server
+        :param version: version string from IRIDA
+        :param capabilities: dict of capability name to bool
+        :return: None
+        """
+        with self._lock:
+            entries = cache_file.read_cache_file(self.file_path)
+            entries[get_cache_key(base_url)] = {
+                "version": version,
+                "capabilities": capabilities,
+                "checked_at": self._clock(),
+            }
+            cache_file.write_cache_file(self.file_path, entries)
@@ -0,0 +1,118 @@
+"""
+On disk cache of IRIDA access tokens
+
+Each run of the command line uploader is a new process, which had to log in to IRIDA again even when the token it got
+a few minutes earlier was still good. With the cache, a process reuses the last access token until it expires, and
+then uses the refresh token, when IRIDA gave one, before logging in with the password again.
+
+Tokens are kept in a json file only readable by the user (0600), keyed on a hash of the IRIDA url, client id and
+username, so uploaders with different configs can share the file.
+"""
+import hashlib
+import os
+import threading
+import time
+
+from collections import namedtuple
+
+from appdirs import user_config_dir
+
+from . import cache_file
+
+DEFAULT_TOKEN_CACHE_FILE = os.path.join(user_config_dir("irida-uploader"), "token_cache.json")
+# Access tokens that expire within this many seconds are not used, so they do not expire during the first requests
+EXPIRY_MARGIN = 60
+
+# expires_at is a unix time, or None when IRIDA did not say when the token expires
+CachedToken = namedtuple("CachedToken", ["access_token", "refresh_token", "expires_at"])
+
+
+def get_cache_key(base_url, client_id, username):
+    """
+    :param base_url: url of the IRIDA server
+    :param client_id: IRIDA client id
+    :param username: IRIDA user
+    :return: string key of the token in the cache file
+    """
+    return hashlib.sha256("\n".join([base_url, client_id, username]).encode("utf-8")).hexdigest()
+
+
+class TokenCache:
+    """
+    Reads and writes tokens in the cache file
+
+    The file is read on every get, and replaced in one step on every change, so processes using the same file always
+    read a whole file. When two processes change the file at once, the last change is kept.
+    """
+
+    def __init__(self, file_path=DEFAULT_TOKEN_CACHE_FILE, clock=time.time):
+        """
+        :param file_path: path of the cache file, it is created when a token is first stored
+        :param clock: function returning the current unix time
+        """
+        self.file_path = file_path
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def get(self, base_url, client_id, username):
+        """
+        :param base_url: url of the IRIDA server
+        :param client_id: IRIDA client id
+        :param username: IRIDA user
+        :return: CachedToken, or None when there is no token for the user
+        """
+        entry = cache_file.read_cache_file(self.file_path).get(get_cache_key(base_url, client_id, username))
+        if not isinstance(entry, dict) or not entry.get("access_token"):
+            return None
+        return CachedToken(entry["access_token"], entry.get("refresh_token"), entry.get("expires_at"))
+
+    def is_valid(self, token):
+        """
+        :param token: CachedToken
+        :return: True when the access token can still be used
+        """
+        return token.expires_at is not None and token.expires_at - EXPIRY_MARGIN > self._clock()
+
+    def put(self, base_url, client_id, username, access_token, refresh_token=None, expires_in=None):
+        """
+        Stores a token, replacing the user's previous token
+
+        :param base_url: url of the IRIDA server
+        :param client_id: IRIDA client id
+        :param username: IRIDA user
+        :param access_token: access token from IRIDA
+        :param refresh_token: refresh token from IRIDA, or None
+        :param expires_in: seconds until the access token expires, or None when unknown
+        :return: None
+        """
+        expires_at = self._clock() + float(expires_in) if expires_in is not None else None
+        with self._lock:
+            entries = cache_file.read_cache_file(self.file_path)
+            entries[get_cache_key(base_url, client_id, username)] = {
+                "access_token": access_token,
+                "refresh_token": refresh_token,
+                "expires_at": expires_at,
+            }
+            cache_file.write_cache_file(self.file_path, entries)
+
+    def remove(self, base_url, client_id, username, access_token=None):
+        """
+        Removes the user's token, e.g. when IRIDA no longer accepts it
+
+        :param base_url: url of the IRIDA server
+        :param client_id: IRIDA client id
+        :param username: IRIDA user
+        :param access_token: only remove the token if it is this one, so a newer token stored by another process is
+            kept
+        :return: None
+        """
+        key = get_cache_key(base_url, client_id, username)
+        with self._lock:
+            entries = cache_file.read_cache_file(self.file_path)
+            entry = entries.get(key)
+            if entry is None:
+                return
+            if access_token is not None and isinstance(entry, dict) and entry.get("access_token") != access_token:
+                return
+            del entries[key]
+            cache_file.write_cache_file(self.file_path, entries)
@@ -0,0 +1,12 @@
+# These strings are used to determine which upload mode is being used when uploading sequence files
+# They are included in the `api` __init__.py s.t. they can be used by the other modules without interacting with the
+# api layer, this module has no imports so it is cheap to load
+MODE_DEFAULT = "default"
+MODE_ASSEMBLIES = "assemblies"
+MODE_FAST5 = "fast5"
+
+UPLOAD_MODES = [
+    MODE_DEFAULT,
+    MODE_ASSEMBLIES,
+    MODE_FAST5
+]
@@ -1 +1,3 @@
-from iridauploader.config.config import setup, read_config_option, set_config_options, write_config_options_to_file, set_config_file
+from iridauploader.config.config import setup, read_config_option, set_config_options, write_config_options_to_file, set_config_file, \
+    get_config_file, get_settings, reload_settings
+from iridauploader.config.settings import Settings
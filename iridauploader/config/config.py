@@ -5,8 +5,12 @@ from configparser import RawConfigParser, NoOptionError
 from appdirs import user_config_dir
 from collections import namedtuple
 
+from iridauploader.config.settings import Settings, get_option_types
+
 _conf_parser = None
 _user_config_file = None
+# Settings snapshot of the config parser, built when first needed after the parser changes
+_settings = None
 
 _default_user_config_file_path = os.path.join(user_config_dir("irida-uploader"), "config.conf")
 
@@ -26,14 +30,24 @@ def set_config_file(config_file):
     _user_config_file = config_file
 
 
+def get_config_file():
+    """
+    Public function to allow other modules to find the config file in use, e.g. to load it in another process
+    :return: path to the config file, None when setup has not been called and no file was set
+    """
+    return _user_config_file
+
+
 def _init_config_parser():
     """
     Creates the RawConfigParser object, adds the fields and fills with default/empty values
     :return:
     """
     global _conf_parser
+    global _settings
     # Create a new config parser
     _conf_parser = RawConfigParser()
+    _settings = None
     # Put all options under a Settings Header
     _conf_parser.add_section("Settings")
 
@@ -51,7 +65,24 @@ def _init_config_parser():
                         SettingsDefault._make(["minimum_file_size", 0]),  # default minimum file size in kb
                         SettingsDefault._make(["http_max_retries", 5]),
                         SettingsDefault._make(["http_backoff_factor", 0]),
+                        SettingsDefault._make(["http_pool_connections", 10]),
+                        SettingsDefault._make(["http_pool_maxsize", 10]),
+                        SettingsDefault._make(["http_backoff_max", 120]),
+                        SettingsDefault._make(["http_retry_budget", 300]),
+                        SettingsDefault._make(["http_rate_limit", 0]),
+                        SettingsDefault._make(["http_rate_burst", 10]),
+                        SettingsDefault._make(["upload_max_concurrency", 1]),
+                        SettingsDefault._make(["http_latency_threshold", 0]),
+                        SettingsDefault._make(["http_slow_request_threshold", 10]),
                         SettingsDefault._make(["log_directory", ""]),
+                        SettingsDefault._make(["metrics_textfile", ""]),
+                        SettingsDefault._make(["progress_update_frequency", 5]),
+                        SettingsDefault._make(["gui_log_max_lines", 10000]),
+                        SettingsDefault._make(["gui_max_concurrent_uploads", 1]),
+                        SettingsDefault._make(["log_levels", ""]),
+                        SettingsDefault._make(["log_repeat_interval", 5]),
+                        SettingsDefault._make(["token_cache", False]),
+                        SettingsDefault._make(["irida_version_cache_ttl", 0]),
                         ]
     # add defaults to config parser
     for config in default_settings:
@@ -118,7 +149,9 @@ def read_config_file_into_parser(config_file_path):
     """
     try:
         global _conf_parser
+        global _settings
         _conf_parser.read(config_file_path)
+        _settings = None
     except Exception as e:
         logging.warning("Error occurred when trying to load config file")
         raise e
@@ -136,7 +169,24 @@ def set_config_options(client_id=None,
                        minimum_file_size=None,
                        http_max_retries=None,
                        http_backoff_factor=None,
-                       log_directory=None):
+                       log_directory=None,
+                       http_pool_connections=None,
+                       http_pool_maxsize=None,
+                       http_backoff_max=None,
+                       http_retry_budget=None,
+                       http_rate_limit=None,
+                       http_rate_burst=None,
+                       upload_max_concurrency=None,
+                       http_latency_threshold=None,
+                       metrics_textfile=None,
+                       http_slow_request_threshold=None,
+                       progress_update_frequency=None,
+                       gui_log_max_lines=None,
+                       gui_max_concurrent_uploads=None,
+                       log_levels=None,
+                       log_repeat_interval=None,
+                       token_cache=None,
+                       irida_version_cache_ttl=None):
     """
     Updates the config options for all not None parameters
     :param client_id:
@@ -152,6 +202,23 @@ def set_config_options(client_id=None,
     :param http_max_retries:
     :param http_backoff_factor:
     :param log_directory:
+    :param http_pool_connections:
+    :param http_pool_maxsize:
+    :param http_backoff_max:
+    :param http_retry_budget:
+    :param http_rate_limit:
+    :param http_rate_burst:
+    :param upload_max_concurrency:
+    :param http_latency_threshold:
+    :param metrics_textfile:
+    :param http_slow_request_threshold:
+    :param progress_update_frequency:
+    :param gui_log_max_lines:
+    :param gui_max_concurrent_uploads:
+    :param log_levels:
+    :param log_repeat_interval:
+    :param token_cache:
+    :param irida_version_cache_ttl:
     :return:
     """
     global _conf_parser
@@ -205,6 +272,72 @@ def set_config_options(client_id=None,
         # log_directory is always a str
         logging.debug("Setting 'log_directory' config to {}".format(log_directory))
         _update_config_option('log_directory', log_directory)
+    if http_pool_connections is not None:
+        # http_pool_connections is always an int
+        logging.debug("Setting 'http_pool_connections' config to {}".format(http_pool_connections))
+        _update_config_option('http_pool_connections', http_pool_connections)
+    if http_pool_maxsize is not None:
+        # http_pool_maxsize is always an int
+        logging.debug("Setting 'http_pool_maxsize' config to {}".format(http_pool_maxsize))
+        _update_config_option('http_pool_maxsize', http_pool_maxsize)
+    if http_backoff_max is not None:
+        # http_backoff_max is always a float
+        logging.debug("Setting 'http_backoff_max' config to {}".format(http_backoff_max))
+        _update_config_option('http_backoff_max', http_backoff_max)
+    if http_retry_budget is not None:
+        # http_retry_budget is always a float
+        logging.debug("Setting 'http_retry_budget' config to {}".format(http_retry_budget))
+        _update_config_option('http_retry_budget', http_retry_budget)
+    if http_rate_limit is not None:
+        # http_rate_limit is always a float
+        logging.debug("Setting 'http_rate_limit' config to {}".format(http_rate_limit))
+        _update_config_option('http_rate_limit', http_rate_limit)
+    if http_rate_burst is not None:
+        # http_rate_burst is always an int
+        logging.debug("Setting 'http_rate_burst' config to {}".format(http_rate_burst))
+        _update_config_option('http_rate_burst', http_rate_burst)
+    if upload_max_concurrency is not None:
+        # upload_max_concurrency is always an int
+        logging.debug("Setting 'upload_max_concurrency' config to {}".format(upload_max_concurrency))
+        _update_config_option('upload_max_concurrency', upload_max_concurrency)
+    if http_latency_threshold is not None:
+        # http_latency_threshold is always a float
+        logging.debug("Setting 'http_latency_threshold' config to {}".format(http_latency_threshold))
+        _update_config_option('http_latency_threshold', http_latency_threshold)
+    if metrics_textfile is not None:
+        # metrics_textfile is always a str
+        logging.debug("Setting 'metrics_textfile' config to {}".format(metrics_textfile))
+        _update_config_option('metrics_textfile', metrics_textfile)
+    if http_slow_request_threshold is not None:
+        # http_slow_request_threshold is always a float
+        logging.debug("Setting 'http_slow_request_threshold' config to {}".format(http_slow_request_threshold))
+        _update_config_option('http_slow_request_threshold', http_slow_request_threshold)
+    if progress_update_frequency is not None:
+        # progress_update_frequency is always a float
+        logging.debug("Setting 'progress_update_frequency' config to {}".format(progress_update_frequency))
+        _update_config_option('progress_update_frequency', progress_update_frequency)
+    if gui_log_max_lines is not None:
+        # gui_log_max_lines is always an int
+        logging.debug("Setting 'gui_log_max_lines' config to {}".format(gui_log_max_lines))
+        _update_config_option('gui_log_max_lines', gui_log_max_lines)
+    if gui_max_concurrent_uploads is not None:
+        # gui_max_concurrent_uploads is always an int
+        logging.debug("Setting 'gui_max_concurrent_uploads' config to {}".format(gui_max_concurrent_uploads))
+        _update_config_option('gui_max_concurrent_uploads', gui_max_concurrent_uploads)
+    if log_levels is not None:
+        logging.debug("Setting 'log_levels' config to {}".format(log_levels))
+        _update_config_option('log_levels', log_levels)
+    if log_repeat_interval is not None:
+        # log_repeat_interval is always a float
+        logging.debug("Setting 'log_repeat_interval' config to {}".format(log_repeat_interval))
+        _update_config_option('log_repeat_interval', log_repeat_interval)
+    if token_cache is not None:
+        logging.debug("Setting 'token_cache' config to {}".format(token_cache))
+        _update_config_option('token_cache', token_cache)
+    if irida_version_cache_ttl is not None:
+        # irida_version_cache_ttl is always a float
+        logging.debug("Setting 'irida_version_cache_ttl' config to {}".format(irida_version_cache_ttl))
+        _update_config_option('irida_version_cache_ttl', irida_version_cache_ttl)
 
 
 def setup():
@@ -250,17 +383,13 @@ def read_config_option(key, expected_type=None, default_value=None):
             If the default value is not specified, the function will throw whatever
             error was raised by the configuration parser
     """
-    logging.debug("Reading config option {} with expected type {}".format(key, expected_type))
-
+    # Options are read often during uploads, so reading them is not logged
     global _conf_parser
     try:
         if not expected_type:
-            value = _conf_parser.get("Settings", key)
-            logging.debug("Got configuration for key {}: {}".format(key, value))
             return _conf_parser.get("Settings", key)
         elif expected_type is int:
             res = _conf_parser.get("Settings", key)
-            logging.debug("Got configuration for key {}: {}".format(key, res))
             # Return int, or string evaluated to int, or NameError exception otherwise
             if type(res) is int:
                 return res
@@ -273,10 +402,10 @@ def read_config_option(key, expected_type=None, default_value=None):
                     raise NameError(error_msg)
         elif expected_type is float:
             res = _conf_parser.get("Settings", key)
-            logging.debug("Got configuration for key {}: {}".format(key, res))
-            # Return int, or string evaluated to int, or NameError exception otherwise
-            if type(res) is float:
-                return res
+            # Return float, or string evaluated to float, or NameError exception otherwise
+            # Defaults that are not set in the config file can be ints (e.g. http_backoff_factor = 0)
+            if type(res) in (int, float):
+                return float(res)
             elif type(res) is str:
                 try:
                     return float(res)
@@ -286,7 +415,6 @@ def read_config_option(key, expected_type=None, default_value=None):
                     raise NameError(error_msg)
         elif expected_type is bool:
             res = _conf_parser.get("Settings", key)
-            logging.debug("Got configuration for key {}: {}".format(key, res))
             # Return bool, or string evaluated to bool, or NameError exception otherwise
             if type(res) is bool:
                 return res
@@ -311,10 +439,8 @@ def _eval_boolean(string, field):
     """
     caps = string.upper()
     if caps == "TRUE":
-        logging.debug("Evaluated as True")
         return True
     elif caps == "FALSE":
-        logging.debug("Evaluated as False")
         return False
     else:
         error_msg = "Config file field '{}' expected 'True' or 'False' but instead got '{}'".format(field, string)
@@ -330,8 +456,55 @@ def _update_config_option(field_name, field_value):
     :return:
     """
     global _conf_parser
+    global _settings
     logging.debug("Setting [" + field_name + "] to [" + str(field_value) + "]")
     _conf_parser.set("Settings", field_name, field_value)
+    _settings = None
+
+
+def get_settings():
+    """
+    Gets the settings snapshot of the config options
+    The snapshot is built the first time it is needed after the config changes, every option is converted to its
+    type, and all options that can not be converted are reported together
+
+    :return: Settings
+    """
+    global _settings
+    settings = _settings
+    if settings is None:
+        settings = _build_settings()
+        _settings = settings
+    return settings
+
+
+def reload_settings():
+    """
+    Loads the config file again and builds a new settings snapshot, for long running uploaders that pick up changes
+    to the config file. Options set with set_config_options are replaced by the file.
+
+    :return: Settings
+    """
+    setup()
+    return get_settings()
+
+
+def _build_settings():
+    """
+    Reads every config option as its type into a Settings object
+
+    :return: Settings
+    """
+    values = {}
+    errors = []
+    for key, option_type in get_option_types().items():
+        try:
+            values[key] = read_config_option(key, None if option_type is str else option_type)
+        except NameError as e:
+            errors.append(str(e))
+    if errors:
+        raise NameError("Config file is not valid: " + "; ".join(errors))
+    return Settings(**values)
 
 
 def write_config_options_to_file():
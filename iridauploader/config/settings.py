@@ -0,0 +1,65 @@
+from dataclasses import dataclass, fields
+
+
+# Options that are not shown when settings are printed or logged
+SECRET_OPTIONS = ("client_secret", "password")
+
+
+@dataclass(frozen=True, repr=False)
+class Settings:
+    """
+    Snapshot of the config options, with each option converted to its type
+
+    Built from the config parser by config.get_settings(), so the options are converted and checked once instead of
+    every time they are read. Settings can not be changed, config.set_config_options() and config.setup() build a new
+    snapshot the next time one is needed.
+    """
+    __slots__ = ("client_id", "client_secret", "username", "password", "base_url", "parser", "readonly", "delay",
+                 "timeout", "minimum_file_size", "http_max_retries", "http_backoff_factor", "http_pool_connections",
+                 "http_pool_maxsize", "http_backoff_max", "http_retry_budget", "http_rate_limit", "http_rate_burst",
+                 "upload_max_concurrency", "http_latency_threshold", "http_slow_request_threshold", "log_directory",
+                 "metrics_textfile", "progress_update_frequency", "gui_log_max_lines", "gui_max_concurrent_uploads",
+                 "log_levels", "log_repeat_interval", "token_cache", "irida_version_cache_ttl")
+
+    client_id: str
+    client_secret: str
+    username: str
+    password: str
+    base_url: str
+    parser: str
+    readonly: bool
+    delay: int
+    timeout: int
+    minimum_file_size: int
+    http_max_retries: int
+    http_backoff_factor: float
+    http_pool_connections: int
+    http_pool_maxsize: int
+    http_backoff_max: float
+    http_retry_budget: float
+    http_rate_limit: float
+    http_rate_burst: int
+    upload_max_concurrency: int
+    http_latency_threshold: float
+    http_slow_request_threshold: float
+    log_directory: str
+    metrics_textfile: str
+    progress_update_frequency: float
+    gui_log_max_lines: int
+    gui_max_concurrent_uploads: int
+    log_levels: str
+    log_repeat_interval: float
+    token_cache: bool
+    irida_version_cache_ttl: float
+
+    def __repr__(self):
+        options = ("{}={!r}".format(name, "*****" if name in SECRET_OPTIONS else getattr(self, name))
+                   for name in self.__slots__)
+        return "Settings({})".format(", ".join(options))
+
+
+def get_option_types():
+    """
+    :return: dict of config option name to the type it is read as
+    """
+    return {field.name: field.type for field in fields(Settings)}
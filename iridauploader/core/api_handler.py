@@ -8,6 +8,7 @@ import logging
 import concurrent.futures
 
 import iridauploader.api as api
+from iridauploader.api import server_info_cache, token_cache
 import iridauploader.config as config
 import iridauploader.model as model
 import iridauploader.progress as progress
@@ -16,11 +17,16 @@ from iridauploader.core import model_validator
 # The api instance is a global variable which lets the api behave like a singleton
 # managed within this file
 _api_instance = None
+# Number of samples uploaded at the same time, set when the api is initialized
+_upload_max_concurrency = 1
 
 
 def _initialize_api(
         client_id, client_secret, base_url, username, password, timeout_multiplier, max_wait_time=20,
-        http_max_retries=5, http_backoff_factor=0):
+        http_max_retries=5, http_backoff_factor=0, http_pool_connections=10, http_pool_maxsize=10,
+        http_backoff_max=120, http_retry_budget=300, http_rate_limit=0, http_rate_burst=10,
+        upload_max_concurrency=1, http_latency_threshold=0, http_slow_request_threshold=10, token_cache_file=None,
+        irida_version_cache_ttl=0):
     """
     Creates the ApiCalls object from the api layer.
     Sets the instance to use the global _api_instance variable so it behaves as a singleton that can be easily re-init
@@ -32,9 +38,23 @@ def _initialize_api(
     :param password:
     :param timeout_multiplier:
     :param max_wait_time:
+    :param http_max_retries:
+    :param http_backoff_factor:
+    :param http_pool_connections:
+    :param http_pool_maxsize:
+    :param http_backoff_max:
+    :param http_retry_budget:
+    :param http_rate_limit:
+    :param http_rate_burst:
+    :param upload_max_concurrency:
+    :param http_latency_threshold:
+    :param http_slow_request_threshold:
+    :param token_cache_file: file to keep access tokens in between runs, None to log in every time
+    :param irida_version_cache_ttl: seconds the IRIDA version is reused for by later runs, 0 to ask every time
     :return: The ApiCalls instance
     """
     global _api_instance
+    global _upload_max_concurrency
 
     if not base_url.endswith('/api/'):
         logging.warning("base_url does not end in /api/, this configuration might be incorrect")
@@ -49,7 +69,20 @@ def _initialize_api(
         max_wait_time=max_wait_time,
         http_max_retries=http_max_retries,
         http_backoff_factor=http_backoff_factor,
+        http_pool_connections=http_pool_connections,
+        http_pool_maxsize=http_pool_maxsize,
+        http_backoff_max=http_backoff_max,
+        http_retry_budget=http_retry_budget,
+        http_rate_limit=http_rate_limit,
+        http_rate_burst=http_rate_burst,
+        upload_max_concurrency=upload_max_concurrency,
+        http_latency_threshold=http_latency_threshold,
+        http_slow_request_threshold=http_slow_request_threshold,
+        token_cache=token_cache.TokenCache(token_cache_file) if token_cache_file else None,
+        server_info_cache=(server_info_cache.ServerInfoCache(ttl=irida_version_cache_ttl)
+                           if irida_version_cache_ttl > 0 else None),
     )
+    _upload_max_concurrency = max(upload_max_concurrency, 1)
     return _api_instance
 
 
@@ -74,23 +107,27 @@ def initialize_api_from_config():
 
     :return: the api instance
     """
-    client_id = config.read_config_option("client_id")
-    client_secret = config.read_config_option("client_secret")
-    base_url = config.read_config_option("base_url")
-    username = config.read_config_option("username")
-    password = config.read_config_option("password")
-    timeout = config.read_config_option("timeout", expected_type=int)
-    http_max_retries = config.read_config_option("http_max_retries", expected_type=int)
-    http_backoff_factor = config.read_config_option("http_backoff_factor", expected_type=float)
-
-    return _initialize_api(client_id=client_id,
-                           client_secret=client_secret,
-                           base_url=base_url,
-                           username=username,
-                           password=password,
-                           timeout_multiplier=timeout,
-                           http_max_retries=http_max_retries,
-                           http_backoff_factor=http_backoff_factor,
+    settings = config.get_settings()
+
+    return _initialize_api(client_id=settings.client_id,
+                           client_secret=settings.client_secret,
+                           base_url=settings.base_url,
+                           username=settings.username,
+                           password=settings.password,
+                           timeout_multiplier=settings.timeout,
+                           http_max_retries=settings.http_max_retries,
+                           http_backoff_factor=settings.http_backoff_factor,
+                           http_pool_connections=settings.http_pool_connections,
+                           http_pool_maxsize=settings.http_pool_maxsize,
+                           http_backoff_max=settings.http_backoff_max,
+                           http_retry_budget=settings.http_retry_budget,
+                           http_rate_limit=settings.http_rate_limit,
+                           http_rate_burst=settings.http_rate_burst,
+                           upload_max_concurrency=settings.upload_max_concurrency,
+                           http_latency_threshold=settings.http_latency_threshold,
+                           http_slow_request_threshold=settings.http_slow_request_threshold,
+                           token_cache_file=token_cache.DEFAULT_TOKEN_CACHE_FILE if settings.token_cache else None,
+                           irida_version_cache_ttl=settings.irida_version_cache_ttl,
                            )
 
 
@@ -111,6 +148,8 @@ def prepare_and_validate_for_upload(sequencing_run):
     validation_result = model.ValidationResult()
     # Start online validation
     logging.debug("Checking existence of projects")
+    # look up every project at once, the checks below are answered from the api's cache
+    api_instance.resolve_projects([project.id for project in sequencing_run.project_list])
     for project in sequencing_run.project_list:
         # Validate project existence
         logging.debug("Checking existence of project: {}".format(project.id))
@@ -202,28 +241,41 @@ def upload_sequencing_run(sequencing_run, directory_status, upload_mode, run_id=
     try:
         # set seq run to upload
         api_instance.set_seq_run_uploading(run_id)
-        # loop through projects
-        for project in sequencing_run.project_list:
-            # loop through samples
-            for sample in project.sample_list:
-                if sample.skip:
-                    logging.info("Skipping Sample {} on Project {}, already uploaded."
-                                 "".format(sample.sample_name, project.id))
-                else:
-                    logging.info("Uploading to Sample {} on Project {}".format(sample.sample_name, project.id))
-                    # upload files
-                    api_instance.send_sequence_files(sequence_file=sample.sequence_file,
-                                                     sample_name=sample.sample_name,
-                                                     project_id=project.id,
-                                                     upload_id=run_id,
-                                                     upload_mode=upload_mode)
-                # Update status file on progress
-                # Skipped samples are set to uploaded too, s.t. if they are skipped,
-                #   and the upload fails and is continued again, they will be skipped again.
-                directory_status.set_sample_uploaded(sample_name=sample.sample_name,
-                                                     project_id=project.id,
-                                                     uploaded=True)
-                progress.write_directory_status(directory_status)
+        # Samples are uploaded by a pool of workers, the api limits how many uploads actually run at the same
+        # time depending on how loaded IRIDA is. The status file is only written from this thread.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=_upload_max_concurrency) as executor:
+            pending_uploads = {}
+            # loop through projects
+            for project in sequencing_run.project_list:
+                # loop through samples
+                for sample in project.sample_list:
+                    if sample.skip:
+                        logging.info("Skipping Sample {} on Project {}, already uploaded."
+                                     "".format(sample.sample_name, project.id))
+                        # Skipped samples are set to uploaded too, s.t. if they are skipped,
+                        #   and the upload fails and is continued again, they will be skipped again.
+                        _set_sample_uploaded(directory_status, sample.sample_name, project.id)
+                    else:
+                        future = executor.submit(_upload_sample, api_instance, sample, project.id, run_id,
+                                                 upload_mode)
+                        pending_uploads[future] = (sample.sample_name, project.id)
+
+            try:
+                for future in concurrent.futures.as_completed(pending_uploads):
+                    try:
+                        future.result()
+                    except Exception:
+                        progress.metrics.record_sample(uploaded=False)
+                        raise
+                    progress.metrics.record_sample(uploaded=True)
+                    # Update status file on progress
+                    sample_name, project_id = pending_uploads[future]
+                    _set_sample_uploaded(directory_status, sample_name, project_id)
+            except Exception:
+                # Stop uploads that have not started yet, uploads in progress are left to finish
+                for future in pending_uploads:
+                    future.cancel()
+                raise
 
         # set seq run to complete
         api_instance.set_seq_run_complete(run_id)
@@ -243,6 +295,41 @@ def upload_sequencing_run(sequencing_run, directory_status, upload_mode, run_id=
         raise e
 
 
+def _upload_sample(api_instance, sample, project_id, run_id, upload_mode):
+    """
+    Uploads the files of a single sample, run by the upload worker threads
+
+    :param api_instance: ApiCalls instance
+    :param sample: Sample to upload
+    :param project_id: project the sample belongs to
+    :param run_id: sequencing run to upload the files to
+    :param upload_mode: mode of upload
+    :return: None
+    """
+    logging.info("Uploading to Sample {} on Project {}".format(sample.sample_name, project_id))
+    # upload files
+    api_instance.send_sequence_files(sequence_file=sample.sequence_file,
+                                     sample_name=sample.sample_name,
+                                     project_id=project_id,
+                                     upload_id=run_id,
+                                     upload_mode=upload_mode)
+
+
+def _set_sample_uploaded(directory_status, sample_name, project_id):
+    """
+    Marks a sample as uploaded and writes the status file
+
+    :param directory_status: DirectoryStatus object
+    :param sample_name: name of sample
+    :param project_id: project the sample belongs to
+    :return: None
+    """
+    directory_status.set_sample_uploaded(sample_name=sample_name,
+                                         project_id=project_id,
+                                         uploaded=True)
+    progress.write_directory_status(directory_status)
+
+
 def send_project(project):
     """
     Validates and sends a project object to IRIDA
@@ -269,6 +356,23 @@ def send_project(project):
         raise e
 
 
+def send_metadata_bulk(metadata_items, max_workers, skip_unchanged=False):
+    """
+    Sends metadata to many samples concurrently
+
+    Expects api to have been set up
+
+    :param metadata_items: iterable of (sample_id, Metadata object) tuples
+    :param max_workers: maximum number of samples being sent at the same time
+    :param skip_unchanged: skip samples where the metadata on IRIDA already matches
+    :return: list of api.MetadataUploadResult
+    """
+    # get api
+    api_instance = _get_api_instance()
+
+    return api_instance.send_metadata_bulk(metadata_items, max_workers=max_workers, skip_unchanged=skip_unchanged)
+
+
 def get_upload_modes():
     """
     Returns all the upload modes the api supports for sequence files
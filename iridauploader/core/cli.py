@@ -15,6 +15,7 @@ import iridauploader.config as config
 import iridauploader.core as core
 from iridauploader.api import UPLOAD_MODES
 from iridauploader.parsers import supported_parsers
+from iridauploader.core import profiler, run_status
 
 DESCRIPTION = textwrap.dedent('''
 This program parses sequencing runs and uploads them to IRIDA.
@@ -73,6 +74,20 @@ def init_argparser():
                                  action='store',
                                  help='Choose which upload mode to use. '
                                       'Supported modes: ' + str(UPLOAD_MODES))
+    # Optional argument, Profile the upload
+    argument_parser.add_argument('--profile',
+                                 action='store', nargs='?', const=profiler.PROFILE_MODE_CPROFILE, default=None,
+                                 choices=profiler.PROFILE_MODES,
+                                 help='Profile the upload, and write the profile and a summary of the hotspots to the '
+                                      'run log directory. "cprofile" (default) traces every function call, '
+                                      '"sampling" has a low overhead and can be left on for production runs.')
+    # Optional argument, Print run statuses instead of uploading
+    argument_parser.add_argument('--status',
+                                 action='store', nargs='?', const=run_status.STATUS_FORMAT_TEXT, default=None,
+                                 choices=run_status.STATUS_FORMATS,
+                                 help='Print the status of the run (or of every run with --batch) and exit without '
+                                      'uploading. Only status files are read, IRIDA is not contacted. '
+                                      'Use "--status json" for output that can be read by monitoring scripts.')
 
     # Optional arguments for overriding config file settings
     # Explanation:
@@ -220,6 +235,8 @@ def _config_uploader(args):
     config.setup()
     # Override with any passed in options
     _set_config_override(args)
+    # Convert the options to their types now, so invalid options stop the uploader before it starts
+    config.get_settings()
 
 
 def main():
@@ -227,7 +244,11 @@ def main():
     argument_parser = init_argparser()
     args = argument_parser.parse_args()
     # Setup config options
-    _config_uploader(args)
+    try:
+        _config_uploader(args)
+    except NameError as e:
+        print("ERROR! {}".format(e))
+        return 1
 
     # Verify directory is readable before upload
     if not os.access(args.directory, os.R_OK):  # Cannot access upload directory
@@ -241,11 +262,20 @@ def main():
               "To upload all samples from the beginning use --force")
         return 1
 
+    # Print statuses without uploading
+    if args.status:
+        return print_status(args.directory, args.batch, args.status)
+
     # Start Upload
     if args.batch:
-        return upload_batch(args.directory, args.force, args.upload_mode, args.continue_partial)
+        upload_function = upload_batch
     else:
-        return upload(args.directory, args.force, args.upload_mode, args.continue_partial)
+        upload_function = upload
+    upload_args = (args.directory, args.force, args.upload_mode, args.continue_partial)
+    if args.profile:
+        return profiler.run_with_profiler(args.profile, profiler.get_profile_directory(args.directory),
+                                          upload_function, *upload_args)
+    return upload_function(*upload_args)
 
 
 def upload(run_directory, force_upload, upload_mode, continue_partial):
@@ -272,6 +302,23 @@ def upload_batch(batch_directory, force_upload, upload_mode, continue_partial):
     return core.upload.batch_upload_single_entry(batch_directory, force_upload, upload_mode, continue_partial).exit_code
 
 
+def print_status(directory, batch, status_format):
+    """
+    Prints the status of a run directory, or of all run directories in a batch directory
+    :param directory:
+    :param batch:
+    :param status_format:
+    :return: exit code 0 or 1
+    """
+    try:
+        directory_status_list = run_status.get_run_status_list(directory, batch)
+    except Exception as e:
+        print("ERROR! Could not read run status: {}".format(e))
+        return 1
+    print(run_status.format_status_list(directory_status_list, status_format))
+    return 0
+
+
 # This is called when the program is run for the first time
 if __name__ == "__main__":
     main()
@@ -1,5 +1,3 @@
-import os.path
-
 import iridauploader.model as model
 import iridauploader.config as config
 from iridauploader.parsers.exceptions.file_size_error import FileSizeError
@@ -13,7 +11,7 @@ def validate_file_size_minimum(sequencing_run):
     :return: ValidationResult object with list of errors if any
     """
 
-    minimum_file_size = config.read_config_option("minimum_file_size", int, 0)
+    minimum_file_size = config.get_settings().minimum_file_size
 
     validation_result = model.ValidationResult()
 
@@ -30,7 +28,7 @@ def validate_file_size_minimum(sequencing_run):
 
 def _file_size_is_valid(sequence_file, minimum_file_size):
     """
-    Performs a os.path.getsize operation on the sequence file(s) on the sequence_file object
+    Checks the size of the sequence file(s) on the sequence_file object, using the sizes cached on it
     if any files are less than the file minimum, return false, else return true
 
     :param sequence_file: SequenceFile object
@@ -38,7 +36,7 @@ def _file_size_is_valid(sequence_file, minimum_file_size):
     :return: boolean
     """
     for file_name in sequence_file.file_list:
-        file_size_kb = os.path.getsize(file_name) / 1024
+        file_size_kb = sequence_file.get_file_size(file_name) / 1024
         if file_size_kb <= minimum_file_size:
             return False
 
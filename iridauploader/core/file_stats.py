@@ -0,0 +1,149 @@
+"""
+Reads the size and modification time of every file in a sequencing run in one pass
+
+Each directory holding sequence files is listed once with os.scandir, and the entries for the run's files are stat'ed
+on a thread pool. On network file systems every stat is a round trip to the server, so doing them together is much
+faster than one at a time. The results are cached on each SequenceFile, where the file validators, upload timeouts
+and upload size totals read them from.
+
+Before an upload starts, the files are read again to check none of them have changed since they were validated.
+A run that was parsed earlier (e.g. shown in the GUI) is only reused when its directory fingerprint has not changed.
+"""
+
+import concurrent.futures
+import hashlib
+import logging
+import os
+
+from iridauploader.model import FileStat
+
+# Threads stat'ing files, enough to hide network file system latency
+DEFAULT_STAT_WORKERS = 8
+
+# Files written to the run directory by the uploader (status, log, profiles) start with these,
+# they are left out of the directory fingerprint
+UPLOADER_FILE_PREFIXES = ("irida_uploader", "irida-uploader")
+
+
+def scan_file_stats(file_name_list, max_workers=DEFAULT_STAT_WORKERS):
+    """
+    Gets the stat of many files, listing each directory only once
+
+    :param file_name_list: list of file paths
+    :param max_workers: number of threads stat'ing files
+    :return: dict of file path to FileStat, files that do not exist are left out
+    """
+    files_by_directory = {}
+    for file_name in file_name_list:
+        directory, base_name = os.path.split(file_name)
+        files_by_directory.setdefault(directory, {})[base_name] = file_name
+
+    entry_list = []
+    for directory, files in files_by_directory.items():
+        try:
+            with os.scandir(directory or os.curdir) as entries:
+                entry_list.extend((files[entry.name], entry) for entry in entries if entry.name in files)
+        except OSError as e:
+            logging.debug("Could not list directory '{}': {}".format(directory, e))
+
+    def stat_entry(file_name_and_entry):
+        file_name, entry = file_name_and_entry
+        try:
+            return file_name, entry.stat()
+        except OSError:
+            return file_name, None
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        stat_list = list(executor.map(stat_entry, entry_list))
+
+    return {file_name: FileStat(stat.st_size, stat.st_mtime_ns) for file_name, stat in stat_list if stat is not None}
+
+
+def _get_sequence_file_list(sequencing_run):
+    return [s.sequence_file for p in sequencing_run.project_list for s in p.sample_list
+            if s.sequence_file is not None]
+
+
+def stat_sequencing_run(sequencing_run, max_workers=DEFAULT_STAT_WORKERS):
+    """
+    Caches the stat of every file in the sequencing run on its SequenceFile
+
+    Files that can not be found are not cached, and raise the usual os error when they are used
+
+    :param sequencing_run: SequencingRun object
+    :param max_workers: number of threads stat'ing files
+    :return: number of files cached
+    """
+    sequence_file_list = _get_sequence_file_list(sequencing_run)
+    file_stats = scan_file_stats([f for sf in sequence_file_list for f in sf.file_list], max_workers)
+    for sequence_file in sequence_file_list:
+        for file_name in sequence_file.file_list:
+            if file_name in file_stats:
+                sequence_file.set_file_stat(file_name, file_stats[file_name])
+    logging.debug("Cached the stat of {} files".format(len(file_stats)))
+    return len(file_stats)
+
+
+def get_changed_files(sequencing_run, max_workers=DEFAULT_STAT_WORKERS):
+    """
+    Finds files that have changed size or modification time, or have been removed, since their stat was cached
+    Samples that are skipped are not checked
+
+    :param sequencing_run: SequencingRun object
+    :param max_workers: number of threads stat'ing files
+    :return: list of file paths
+    """
+    cached_stats = {}
+    for p in sequencing_run.project_list:
+        for s in p.sample_list:
+            if s.skip or s.sequence_file is None:
+                continue
+            for file_name in s.sequence_file.file_list:
+                try:
+                    cached_stats[file_name] = s.sequence_file.get_file_stat(file_name)
+                except OSError:
+                    # never existed, upload would fail on it
+                    cached_stats[file_name] = None
+
+    current_stats = scan_file_stats(list(cached_stats), max_workers)
+    return [file_name for file_name, file_stat in cached_stats.items()
+            if file_stat is None or current_stats.get(file_name) != file_stat]
+
+
+def get_directory_fingerprint(directory):
+    """
+    Fingerprint of the files and directories at the top of a run directory, from their names, sizes and
+    modification times. Sample sheets and completion files are at the top of the run directory, so any change to
+    what would be parsed changes the fingerprint. Files written by the uploader are left out.
+
+    :param directory: run directory
+    :return: string
+    """
+    entry_list = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.startswith(UPLOADER_FILE_PREFIXES):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entry_list.append("{}\t{}\t{}".format(entry.name, stat.st_size, stat.st_mtime_ns))
+    return hashlib.sha1("\n".join(sorted(entry_list)).encode()).hexdigest()
+
+
+def run_is_unchanged(sequencing_run, directory, directory_fingerprint):
+    """
+    Checks that a parsed run still matches its directory
+
+    :param sequencing_run: SequencingRun parsed from directory, with its file stats cached
+    :param directory: run directory
+    :param directory_fingerprint: get_directory_fingerprint of directory from before the run was parsed
+    :return: True when neither the run directory nor the run's sequence files have changed
+    """
+    try:
+        if get_directory_fingerprint(directory) != directory_fingerprint:
+            return False
+    except OSError:
+        return False
+    return not get_changed_files(sequencing_run)
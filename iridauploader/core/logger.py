@@ -1,5 +1,18 @@
+"""
+Logging for the uploader
+
+Log records are put on a queue by the thread that logs them, and written to the log files and the console by a
+background thread, so uploads never wait on slow (e.g. network) file systems.
+
+The background thread also drops identical messages repeated within `log_repeat_interval` seconds, and logs how many
+were dropped, and modules can be given their own log levels with `set_module_levels`.
+"""
 from appdirs import user_log_dir
+from collections import OrderedDict
+import atexit
 import os
+import queue
+import threading
 import logging.handlers
 
 
@@ -19,6 +32,270 @@ if not os.path.exists(user_log_dir(log_directory_name)):
 # 2019-02-07 14:50:02 INFO     Log message goes here...
 log_format = logging.Formatter('%(asctime)s %(levelname)-8s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
 
+# Seconds that identical messages are dropped for after they are logged, 0 keeps every message
+DEFAULT_REPEAT_INTERVAL = 5
+# Most messages that are remembered to find repeats
+MAX_REPEATS_TRACKED = 10000
+# Seconds to wait for the background thread to write the queued records
+FLUSH_TIMEOUT = 5
+
+# Directory that contains the iridauploader package, used to find the module of records logged with logging.info(...)
+_package_parent_directory = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _get_module_name(pathname):
+    """
+    Gets the dotted module name of a source file, e.g. iridauploader.core.upload
+
+    :param pathname: path of the source file that logged a record
+    :return: module name, or the file name when the file is not part of the package
+    """
+    module_path = os.path.splitext(pathname)[0]
+    if not module_path.startswith(_package_parent_directory + os.sep):
+        return os.path.basename(module_path)
+    module_name = os.path.relpath(module_path, _package_parent_directory).replace(os.sep, ".")
+    if module_name.endswith(".__init__"):
+        module_name = module_name[:-len(".__init__")]
+    return module_name
+
+
+def parse_module_levels(levels_text):
+    """
+    Parses module log levels from a config value
+
+    :param levels_text: comma separated module=LEVEL pairs, e.g. "iridauploader.api=INFO, urllib3=WARNING"
+    :return: dict of module name to level number
+    """
+    levels = {}
+    for entry in levels_text.split(","):
+        if not entry.strip():
+            continue
+        module_name, _, level_name = entry.partition("=")
+        level = logging.getLevelName(level_name.strip().upper())
+        if not module_name.strip() or not isinstance(level, int):
+            raise ValueError("'{}' is not a valid module log level, expected module=LEVEL".format(entry.strip()))
+        levels[module_name.strip()] = level
+    return levels
+
+
+class ModuleLevelFilter(logging.Filter):
+    """
+    Drops records below the level set for the module that logged them
+
+    Modules are matched by their dotted name, and the longest matching name is used, so "iridauploader.api" sets the
+    level of "iridauploader.api.api_calls". Records logged with logging.info(...) are matched by the file they were
+    logged from, records from named loggers (e.g. urllib3) by the name of the logger.
+    """
+
+    def __init__(self, levels=None):
+        """
+        :param levels: dict of module name to level number
+        """
+        super().__init__()
+        # source file -> module name
+        self._module_names = {}
+        # module name -> level, filled as modules log
+        self._module_levels = {}
+        self._levels = {}
+        self.set_levels(levels or {})
+
+    def set_levels(self, levels):
+        """
+        :param levels: dict of module name to level number
+        :return: None
+        """
+        # new dicts are assigned instead of changing the old ones, so logging threads never see a half changed dict
+        self._module_levels = {}
+        self._levels = dict(levels)
+
+    def _get_level(self, module_name):
+        level = self._module_levels.get(module_name)
+        if level is None:
+            level = logging.NOTSET
+            prefix = module_name
+            while prefix:
+                if prefix in self._levels:
+                    level = self._levels[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._module_levels[module_name] = level
+        return level
+
+    def filter(self, record):
+        if not self._levels:
+            return True
+        if record.name == "root":
+            module_name = self._module_names.get(record.pathname)
+            if module_name is None:
+                module_name = _get_module_name(record.pathname)
+                self._module_names[record.pathname] = module_name
+        else:
+            module_name = record.name
+        return record.levelno >= self._get_level(module_name)
+
+
+def _stream_is_closed(handler):
+    """
+    :param handler: logging.Handler
+    :return: True if the handler writes to a stream that has been closed
+    """
+    stream = getattr(handler, "stream", None)
+    return stream is not None and getattr(stream, "closed", False)
+
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on the queue without formatting them
+
+    The queue never leaves this process, so records are formatted by the background thread, when they are written.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class _FlushMarker:
+    """
+    Put on the queue to find out when the records before it have been written
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class _Repeat:
+    """
+    A message that was logged, and the number of times it was repeated since
+    """
+    __slots__ = ("first_time", "count", "last_record")
+
+    def __init__(self, first_time, record):
+        self.first_time = first_time
+        self.count = 0
+        self.last_record = record
+
+
+class LogQueueListener(logging.handlers.QueueListener):
+    """
+    Writes the queued records to the handlers on a background thread
+
+    Identical messages, logged from the same place, are only written once every `repeat_interval` seconds. The number
+    of dropped messages is written with the first record logged after the interval is over, or when the queue is
+    flushed. It is not written when the listener is stopped at exit, since the console may already be closed.
+
+    Handlers whose stream has been closed, e.g. a console captured by a test runner that has finished, are skipped
+    instead of printing a logging error for every record.
+    """
+
+    def __init__(self, log_queue, *handlers, repeat_interval=DEFAULT_REPEAT_INTERVAL):
+        """
+        :param log_queue: queue.Queue the records are put on
+        :param handlers: handlers the records are written to, their levels are respected
+        :param repeat_interval: seconds that repeated messages are dropped for, 0 keeps every message
+        """
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.repeat_interval = repeat_interval
+        # message key -> _Repeat, oldest first
+        self._repeats = OrderedDict()
+
+    def add_handler(self, handler):
+        """
+        :param handler: logging.Handler to write records to
+        :return: None
+        """
+        self.handlers = self.handlers + (handler,)
+
+    def remove_handler(self, handler):
+        """
+        :param handler: logging.Handler to stop writing records to
+        :return: None
+        """
+        self.handlers = tuple(h for h in self.handlers if h is not handler)
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """
+        Waits until every record queued before this call has been written
+
+        :param timeout: seconds to wait at most
+        :return: True if the records were written
+        """
+        if self._thread is None:
+            return True
+        marker = _FlushMarker()
+        self.queue.put_nowait(marker)
+        return marker.done.wait(timeout)
+
+    def handle(self, record):
+        if isinstance(record, _FlushMarker):
+            self._write_repeats(expired_before=None)
+            record.done.set()
+            return
+        if self.repeat_interval > 0 and self._is_repeat(record):
+            return
+        self._write(record)
+
+    def _write(self, record):
+        """
+        Writes a record to the handlers that accept its level and are not closed
+
+        :param record: logging.LogRecord
+        :return: None
+        """
+        record = self.prepare(record)
+        for handler in self.handlers:
+            if record.levelno >= handler.level and not _stream_is_closed(handler):
+                handler.handle(record)
+
+    def _is_repeat(self, record):
+        """
+        Remembers the record, and checks if it repeats a message logged in the last `repeat_interval` seconds
+
+        :param record: logging.LogRecord
+        :return: True if the record should be dropped
+        """
+        try:
+            key = (record.process, record.name, record.levelno, record.pathname, record.lineno, record.getMessage())
+        except Exception:
+            # let the handlers report the broken record
+            return False
+        self._write_repeats(expired_before=record.created - self.repeat_interval)
+
+        repeat = self._repeats.get(key)
+        if repeat is not None:
+            repeat.count += 1
+            repeat.last_record = record
+            return True
+        self._repeats[key] = _Repeat(record.created, record)
+        if len(self._repeats) > MAX_REPEATS_TRACKED:
+            self._write_repeat(self._repeats.popitem(last=False)[1])
+        return False
+
+    def _write_repeats(self, expired_before):
+        """
+        Forgets the messages first logged before a time, and writes how many times they were dropped
+
+        :param expired_before: time from record.created, or None for every message
+        :return: None
+        """
+        while self._repeats:
+            repeat = next(iter(self._repeats.values()))
+            if expired_before is not None and repeat.first_time > expired_before:
+                return
+            self._repeats.popitem(last=False)
+            self._write_repeat(repeat)
+
+    def _write_repeat(self, repeat):
+        if repeat.count == 0:
+            return
+        record = logging.makeLogRecord(repeat.last_record.__dict__)
+        record.msg = "Previous message repeated {} more times: {}".format(repeat.count,
+                                                                          repeat.last_record.getMessage())
+        record.args = None
+        record.exc_info = None
+        record.exc_text = None
+        self._write(record)
+
+
 # setup root logger
 root_logger = logging.getLogger()
 root_logger.handlers = []
@@ -27,27 +304,109 @@ logging.basicConfig(
     handlers=[logging.NullHandler()]  # Default log to Null, so that we can handle it manually
 )
 
-# Log to file
+# Log to file, the file is opened when the first record is written, so upload processes never open it
 rotating_file_handler = logging.handlers.RotatingFileHandler(
     filename=log_file_path,
     maxBytes=(1024 * 1024 * 1024 * 10),  # 10GB max file size
     backupCount=100,
+    delay=True,
 )
 rotating_file_handler.setLevel(logging.DEBUG)
 rotating_file_handler.setFormatter(log_format)
-root_logger.addHandler(rotating_file_handler)
 
 # Log to the user
 console = logging.StreamHandler()
 console.setLevel(logging.INFO)
 console.setFormatter(log_format)
-root_logger.addHandler(console)
+
+# The root logger only queues records, the listener writes them to the file and console
+module_level_filter = ModuleLevelFilter()
+log_queue = queue.Queue()
+queue_handler = LogQueueHandler(log_queue)
+queue_handler.addFilter(module_level_filter)
+root_logger.handlers = [queue_handler]
+listener = LogQueueListener(log_queue, rotating_file_handler, console)
+listener.start()
+# write the queued records before the process exits
+atexit.register(listener.stop)
 
 # manages the logging directory
 # only one directory can have a logger at a time
 directory_logger = None
 
 
+def add_handler(handler):
+    """
+    Writes log records to a handler, on the logging thread
+
+    :param handler: logging.Handler
+    :return: None
+    """
+    listener.add_handler(handler)
+
+
+def remove_handler(handler):
+    """
+    Stops writing log records to a handler, once the records already logged have been written to it
+
+    :param handler: logging.Handler
+    :return: None
+    """
+    listener.flush()
+    listener.remove_handler(handler)
+
+
+def log_to_other_process(handler):
+    """
+    Writes this process's log records to handler instead of the log file and console
+
+    Used by upload processes, the handler sends the records to the process that started the upload, which writes them
+    with its own handlers. The log file can not be rotated safely when several processes write to it.
+
+    :param handler: logging.Handler that passes records to the other process
+    :return: None
+    """
+    # the logging thread may still be writing to the handlers that are closed here
+    listener.flush()
+    listener.remove_handler(rotating_file_handler)
+    listener.remove_handler(console)
+    rotating_file_handler.close()
+    listener.add_handler(handler)
+
+
+def _is_from_this_process(record):
+    return record.process == os.getpid()
+
+
+def flush():
+    """
+    Waits until the records already logged have been written
+
+    :return: None
+    """
+    listener.flush()
+
+
+def set_module_levels(levels):
+    """
+    Sets the lowest level logged for modules
+
+    :param levels: dict of module name to level, or a string of comma separated module=LEVEL pairs
+    :return: None
+    """
+    if isinstance(levels, str):
+        levels = parse_module_levels(levels)
+    module_level_filter.set_levels(levels)
+
+
+def set_repeat_interval(repeat_interval):
+    """
+    :param repeat_interval: seconds that identical messages are dropped for after they are logged, 0 keeps every message
+    :return: None
+    """
+    listener.repeat_interval = repeat_interval
+
+
 def add_log_to_directory(directory):
     """
     Starts up a logging handler that creates a log file in the directory being uploaded
@@ -62,6 +421,8 @@ def add_log_to_directory(directory):
         logging.error("A directory logger already exists!")
         raise Exception("ERROR:add_log_to_directory: A directory logger already exists!")
 
+    # records logged before now should not be written to the new directory log
+    listener.flush()
     logging.info("Adding log file to {}".format(directory))
     log_file = os.path.join(directory, 'irida-uploader.log')
     directory_logger = logging.handlers.RotatingFileHandler(
@@ -71,7 +432,9 @@ def add_log_to_directory(directory):
     )
     directory_logger.setLevel(logging.INFO)
     directory_logger.setFormatter(log_format)
-    root_logger.addHandler(directory_logger)
+    # records of upload processes are logged here too, they belong in their own run's log
+    directory_logger.addFilter(_is_from_this_process)
+    add_handler(directory_logger)
 
 
 def remove_directory_logger():
@@ -81,7 +444,9 @@ def remove_directory_logger():
     :return: None
     """
     global directory_logger
-    root_logger.removeHandler(directory_logger)
+    if directory_logger:
+        remove_handler(directory_logger)
+        directory_logger.close()
     directory_logger = None
     logging.info("Stopped active logging to run directory")
 
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+This file is the entry point for uploading sample metadata from a csv file
+
+The csv file needs a header row, with a column of IRIDA sample identifiers (sample_id by default).
+Every other column is uploaded as a metadata field, empty cells are left out.
+"""
+
+import argparse
+import csv
+import os
+import textwrap
+
+from iridauploader import VERSION_NUMBER
+import iridauploader.api as api
+import iridauploader.config as config
+import iridauploader.model as model
+from iridauploader.core import api_handler
+
+DEFAULT_SAMPLE_ID_COLUMN = "sample_id"
+
+DESCRIPTION = textwrap.dedent('''
+This program uploads sample metadata from a csv file to IRIDA.
+
+required arguments:
+  -f FILE, --file FILE  csv file with a header row and a column of IRIDA sample identifiers.
+                        Every other column is uploaded as a metadata field.
+''')
+
+
+def init_argparser():
+    argument_parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=DESCRIPTION,
+        prog="irida-uploader-metadata -f FILE")
+    argument_parser.add_argument('-f', '--file',
+                                 action='store',
+                                 required=True,
+                                 help=argparse.SUPPRESS)
+    argument_parser.add_argument('--version',
+                                 action='version', version='IRIDA Uploader {}'.format(VERSION_NUMBER))
+    argument_parser.add_argument('-c', '--config',
+                                 action='store',
+                                 help='Path to an alternative configuration file. '
+                                      'This overrides the default config file in the config directory')
+    argument_parser.add_argument('-s', '--sample_id_column',
+                                 action='store',
+                                 default=DEFAULT_SAMPLE_ID_COLUMN,
+                                 help='Name of the column with IRIDA sample identifiers. '
+                                      'Default = ' + DEFAULT_SAMPLE_ID_COLUMN)
+    argument_parser.add_argument('-w', '--workers',
+                                 action='store',
+                                 type=int,
+                                 default=api.api_calls.DEFAULT_METADATA_WORKERS,
+                                 help='Number of samples to send metadata to at the same time. '
+                                      'Default = {}'.format(api.api_calls.DEFAULT_METADATA_WORKERS))
+    argument_parser.add_argument('-u', '--skip_unchanged',
+                                 action='store_true',  # This line makes it not parse a variable
+                                 help='Fetch the current metadata of each sample first, '
+                                      'and skip samples where it already matches the csv file.')
+    return argument_parser
+
+
+def read_metadata_csv(csv_file, sample_id_column=DEFAULT_SAMPLE_ID_COLUMN):
+    """
+    Reads a csv file into (sample_id, Metadata) tuples
+
+    :param csv_file: path to the csv file
+    :param sample_id_column: name of the column with sample identifiers
+    :return: list of (sample_id, Metadata object) tuples
+    """
+    with open(csv_file, newline='') as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None or sample_id_column not in reader.fieldnames:
+            raise ValueError("Column '{}' was not found in the header of '{}'".format(sample_id_column, csv_file))
+
+        metadata_items = []
+        for line_number, row in enumerate(reader, start=2):
+            sample_id = (row.pop(sample_id_column) or "").strip()
+            if not sample_id:
+                raise ValueError("Line {} of '{}' does not have a sample id".format(line_number, csv_file))
+            fields = {key: value for key, value in row.items() if key and value not in (None, "")}
+            metadata_items.append((sample_id, model.Metadata(metadata=fields)))
+
+    return metadata_items
+
+
+def upload_metadata(csv_file, sample_id_column, workers, skip_unchanged):
+    """
+    Uploads the metadata in a csv file, and prints a summary
+
+    :param csv_file: path to the csv file
+    :param sample_id_column: name of the column with sample identifiers
+    :param workers: number of samples to send at the same time
+    :param skip_unchanged: skip samples where the metadata on IRIDA already matches
+    :return: exit code 0 or 1
+    """
+    try:
+        metadata_items = read_metadata_csv(csv_file, sample_id_column)
+    except (OSError, ValueError, csv.Error) as e:
+        print("ERROR! Could not read metadata file: {}".format(e))
+        return 1
+
+    try:
+        api_handler.initialize_api_from_config()
+    except api.exceptions.IridaConnectionError as e:
+        print("ERROR! Could not connect to IRIDA: {}".format(e))
+        return 1
+
+    results = api_handler.send_metadata_bulk(metadata_items, max_workers=workers, skip_unchanged=skip_unchanged)
+
+    failed = [r for r in results if r.status == api.METADATA_FAILED]
+    for result in failed:
+        print("Sample {}: FAILED: {}".format(result.sample_id, result.error))
+    print("Metadata sent: {}, unchanged: {}, failed: {}".format(
+        len([r for r in results if r.status == api.METADATA_SENT]),
+        len([r for r in results if r.status == api.METADATA_UNCHANGED]),
+        len(failed)))
+
+    return 1 if failed else 0
+
+
+def main():
+    argument_parser = init_argparser()
+    args = argument_parser.parse_args()
+
+    if args.config:
+        config.set_config_file(args.config)
+    config.setup()
+    try:
+        config.get_settings()
+    except NameError as e:
+        print("ERROR! {}".format(e))
+        return 1
+
+    if not os.access(args.file, os.R_OK):
+        print("ERROR! Specified file is not readable: {}".format(args.file))
+        return 1
+
+    return upload_metadata(args.file, args.sample_id_column, args.workers, args.skip_unchanged)
+
+
+# This is called when the program is run for the first time
+if __name__ == "__main__":
+    main()
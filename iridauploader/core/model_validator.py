@@ -1,5 +1,3 @@
-from cerberus import Validator
-
 import iridauploader.model as model
 
 
@@ -14,13 +12,22 @@ def validate_sequencing_run(sequencing_run):
     :param sequencing_run: SequencingRun object to validate
     :return: ValidationResult object with list of errors if any
     """
-    validation_result = model.ValidationResult()
-
     # Validation objects
-    v_sequencing_run = Validator(model.SequencingRun.uploadable_schema, allow_unknown=True)
-    v_project = Validator(model.Project.uploadable_schema, allow_unknown=True)
-    v_sample = Validator(model.Sample.uploadable_schema, allow_unknown=True)
-    v_sequence_file = Validator(model.SequenceFile.uploadable_schema, allow_unknown=True)
+    v_sequencing_run = CompiledValidator(model.SequencingRun.uploadable_schema)
+    v_project = CompiledValidator(model.Project.uploadable_schema)
+    v_sample = CompiledValidator(model.Sample.uploadable_schema)
+    v_sequence_file = CompiledValidator(model.SequenceFile.uploadable_schema)
+
+    return _validate_sequencing_run(sequencing_run, v_sequencing_run, v_project, v_sample, v_sequence_file)
+
+
+def _validate_sequencing_run(sequencing_run, v_sequencing_run, v_project, v_sample, v_sequence_file):
+    """
+    Validates a SequencingRun with the given validators, which can be CompiledValidator or cerberus Validator objects
+
+    :return: ValidationResult object with list of errors if any
+    """
+    validation_result = model.ValidationResult()
 
     # validation is nested so we can catch multiple levels of project/sample/file errors
 
@@ -62,8 +69,7 @@ def validate_send_project(project):
 
     :return: raises a ModelValidationError when project is invalid
     """
-
-    v_project = Validator(model.Project.send_project_schema, allow_unknown=True)
+    v_project = CompiledValidator(model.Project.send_project_schema)
     _validate_object(v_project, project)
 
 
@@ -100,3 +106,147 @@ def _validate_sequence_file_names(sequence_file):
                                                             "First letter that is different between files should "
                                                             "identify forward/reverse with one of ['F', 'f', '1'] and "
                                                             "['R', 'r', '2'] respectively.", sequence_file)
+
+
+class CompiledValidator:
+    """
+    Validates documents against a cerberus schema, with the same result as a cerberus Validator with allow_unknown
+
+    The schema is compiled once into plain python checks, which are much faster than cerberus for each document.
+    Documents that fail the checks are validated again with cerberus, so the errors are exactly the ones cerberus
+    gives. Schema rules that are not compiled always fall back to cerberus.
+    """
+
+    def __init__(self, schema):
+        """
+        :param schema: cerberus schema
+        """
+        self._schema = schema
+        self._check = _get_compiled_check(schema)
+        self._validator = None
+        self.errors = {}
+
+    def validate(self, document):
+        """
+        :param document: dict to validate
+        :return: True when the document is valid, otherwise False and the cerberus errors are set on self.errors
+        """
+        if self._check(document):
+            self.errors = {}
+            return True
+
+        # cerberus is imported here so it is only loaded when a document is invalid
+        if self._validator is None:
+            from cerberus import Validator
+            self._validator = Validator(self._schema, allow_unknown=True)
+        valid = self._validator.validate(document)
+        self.errors = self._validator.errors
+        return valid
+
+
+# Compiled checks for each schema, schemas are class attributes on the models so they live as long as the process
+_compiled_checks = {}
+
+# Rules that _compile_rules knows how to check
+_COMPILED_RULES = {'type', 'anyof_type', 'required', 'nullable', 'empty', 'minlength', 'allowed', 'schema'}
+
+
+def _get_compiled_check(schema):
+    check = _compiled_checks.get(id(schema))
+    if check is None:
+        check = _compile_schema(schema)
+        _compiled_checks[id(schema)] = check
+    return check
+
+
+def _compile_schema(schema):
+    """
+    Compiles a cerberus schema for a dict into a function
+
+    The function returns True only when cerberus would find the dict valid.
+    It may return False for a valid dict, which is then given to cerberus.
+
+    :param schema: cerberus schema
+    :return: function that takes a dict and returns a boolean
+    """
+    field_checks = [(field, rules.get('required', False), _compile_rules(rules)) for field, rules in schema.items()]
+
+    def check_schema(document):
+        if not isinstance(document, dict):
+            return False
+        for field, required, check_field in field_checks:
+            if field not in document:
+                if required:
+                    return False
+            elif not check_field(document[field]):
+                return False
+        return True
+
+    return check_schema
+
+
+def _compile_rules(rules):
+    """
+    Compiles the rules for a single field into a function
+
+    :param rules: cerberus rules dict for a field
+    :return: function that takes a value and returns a boolean
+    """
+    if not set(rules).issubset(_COMPILED_RULES):
+        return lambda value: False
+
+    nullable = rules.get('nullable', False)
+    checks = []
+    if 'type' in rules:
+        checks.append(_compile_type_check([rules['type']]))
+    if 'anyof_type' in rules:
+        checks.append(_compile_type_check(rules['anyof_type']))
+    if rules.get('empty', True) is False:
+        checks.append(lambda value: not hasattr(value, '__len__') or len(value) > 0)
+    if 'minlength' in rules:
+        minlength = rules['minlength']
+        checks.append(lambda value: hasattr(value, '__len__') and len(value) >= minlength)
+    if 'allowed' in rules:
+        allowed = rules['allowed']
+        checks.append(lambda value: isinstance(value, (str, int)) and value in allowed)
+    if 'schema' in rules:
+        if rules.get('type') == 'list':
+            check_item = _compile_rules(rules['schema'])
+            checks.append(lambda value: all(check_item(item) for item in value))
+        elif rules.get('type') == 'dict':
+            checks.append(_compile_schema(rules['schema']))
+        else:
+            return lambda value: False
+
+    def check_field(value):
+        if value is None:
+            return nullable
+        for check in checks:
+            if not check(value):
+                return False
+        return True
+
+    return check_field
+
+
+def _compile_type_check(type_names):
+    """
+    Uses the type definitions registered with cerberus, including the model types, so type checks match cerberus
+
+    :param type_names: list of cerberus type names, the value must be one of them
+    :return: function that takes a value and returns a boolean
+    """
+    from cerberus import Validator
+
+    if not all(type_name in Validator.types_mapping for type_name in type_names):
+        return lambda value: False
+    type_definitions = [Validator.types_mapping[type_name] for type_name in type_names]
+
+    def check_type(value):
+        for type_definition in type_definitions:
+            if isinstance(value, type_definition.included_types) \
+                    and not isinstance(value, type_definition.excluded_types):
+                return True
+        return False
+
+    return check_type
@@ -5,7 +5,7 @@ import logging
 
 import iridauploader.config as config
 import iridauploader.parsers as parsers
-from iridauploader.core import model_validator, file_size_validator, uniform_file_count_validator
+from iridauploader.core import model_validator, file_size_validator, uniform_file_count_validator, file_stats
 
 
 def get_parser_from_config():
@@ -13,7 +13,7 @@ def get_parser_from_config():
     Uses the 'parser' field in the config file to find and return the parser
     :return:
     """
-    parser_instance = config.read_config_option("parser")
+    parser_instance = config.get_settings().parser
     return parsers.parser_factory(parser_instance)
 
 
@@ -40,6 +40,9 @@ def parse_and_validate(directory):
         logging.debug("parsing_handler:Exception while getting sequencing run with sample_sheet")
         raise e
 
+    # Read the size of every file once, the validators and the upload use the cached values
+    file_stats.stat_sequencing_run(sequencing_run)
+
     logging.info("Validating sequencing run structure")
     validation_result = model_validator.validate_sequencing_run(sequencing_run)
     if not validation_result.is_valid():
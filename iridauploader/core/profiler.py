@@ -0,0 +1,251 @@
+"""
+Profiling for command line uploads, enabled with the --profile option
+
+Two modes are available:
+    cprofile: Every function call is traced with cProfile. This shows exactly where the time goes, but slows the
+        uploader down, so it is meant for investigating a slow run.
+        Threads started during the run (sample uploads, file stat workers) are traced too, and their calls are
+        merged into the same profile. Threads that were already running when profiling started are not traced.
+        Writes irida_uploader.prof, which can be opened with pstats, snakeviz, etc.
+    sampling: A background thread records the stack of every thread at a fixed interval. The overhead is low
+        enough to leave on for production runs.
+        Writes irida_uploader.folded, in the collapsed stack format used by flamegraph.pl, speedscope and py-spy.
+
+Both modes write a summary of the top hotspots to irida_uploader_hotspots.txt
+"""
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+
+from collections import Counter
+
+import iridauploader.config as config
+
+from . import logger
+
+PROFILE_MODE_CPROFILE = "cprofile"
+PROFILE_MODE_SAMPLING = "sampling"
+PROFILE_MODES = [PROFILE_MODE_CPROFILE, PROFILE_MODE_SAMPLING]
+
+CPROFILE_FILE_NAME = "irida_uploader.prof"
+FOLDED_STACKS_FILE_NAME = "irida_uploader.folded"
+HOTSPOTS_FILE_NAME = "irida_uploader_hotspots.txt"
+
+# Number of functions listed in the hotspot summary
+DEFAULT_TOP_N = 30
+# 100 samples per second, the same default as py-spy
+DEFAULT_SAMPLING_INTERVAL = 0.01
+
+
+class SamplingProfiler:
+    """
+    Records the call stack of every thread at a fixed interval from a background thread
+    """
+
+    def __init__(self, interval=DEFAULT_SAMPLING_INTERVAL):
+        """
+        :param interval: seconds between samples
+        """
+        self.interval = interval
+        self.sample_count = 0
+        # folded stack string -> number of times it was sampled
+        self._stacks = Counter()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="irida-uploader-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+
+    def _run(self):
+        own_thread_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            thread_names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread_id:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append("{} ({}:{})".format(code.co_name, code.co_filename, frame.f_lineno))
+                    frame = frame.f_back
+                frames.append(thread_names.get(thread_id, str(thread_id)))
+                self._stacks[";".join(reversed(frames))] += 1
+            self.sample_count += 1
+
+    def get_folded_stacks(self):
+        """
+        :return: list of lines in the collapsed stack format, 'thread;outer frame;...;inner frame count'
+        """
+        return ["{} {}".format(stack, count) for stack, count in self._stacks.most_common()]
+
+    def get_hotspot_lines(self, top_n=DEFAULT_TOP_N):
+        """
+        Summarizes the samples by function
+        self is the number of samples where the function was running,
+        total is the number of samples where the function was on the stack
+
+        :param top_n: number of functions to list
+        :return: list of strings
+        """
+        self_counts = Counter()
+        total_counts = Counter()
+        for stack, count in self._stacks.items():
+            # first entry is the thread name
+            frames = [_strip_line_number(frame) for frame in stack.split(";")[1:]]
+            if not frames:
+                continue
+            self_counts[frames[-1]] += count
+            for function in set(frames):
+                total_counts[function] += count
+        stack_count = sum(self._stacks.values()) or 1
+
+        header = "{} samples taken every {} seconds, {} thread stacks".format(self.sample_count, self.interval,
+                                                                              stack_count)
+        lines = [header,
+                 "",
+                 "{:>8} {:>8} {:>8} {:>8}  {}".format("self", "self%", "total", "total%", "function")]
+        for function, self_count in self_counts.most_common(top_n):
+            lines.append("{:>8} {:>7.1f}% {:>8} {:>7.1f}%  {}".format(
+                self_count, 100.0 * self_count / stack_count,
+                total_counts[function], 100.0 * total_counts[function] / stack_count, function))
+        return lines
+
+
+def _strip_line_number(frame):
+    """
+    'name (file:line)' -> 'name (file)' so samples at different lines of a function are grouped together
+    """
+    return frame.rsplit(":", 1)[0] + ")" if frame.endswith(")") else frame
+
+
+def get_profile_directory(directory):
+    """
+    Finds where the profile of an upload should be written, the same place as the logs of the run
+
+    :param directory: run directory, or batch directory, being uploaded
+    :return: path to a directory
+    """
+    settings = config.get_settings()
+    log_directory = settings.log_directory
+    if log_directory:
+        profile_directory = os.path.join(log_directory, os.path.basename(os.path.normpath(directory)))
+        os.makedirs(profile_directory, exist_ok=True)
+        return profile_directory
+    if settings.readonly is False:
+        return directory
+    return logger.get_user_log_dir()
+
+
+def run_with_profiler(mode, output_directory, function, *args, top_n=DEFAULT_TOP_N, **kwargs):
+    """
+    Runs a function under a profiler, and writes the profile and hotspot summary to output_directory
+
+    :param mode: one of PROFILE_MODES
+    :param output_directory: directory to write the profile files to
+    :param function: function to run
+    :param args: passed to function
+    :param top_n: number of functions listed in the hotspot summary
+    :param kwargs: passed to function
+    :return: the return value of function
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError("Profile mode '{}' is not valid, profile mode must be one of {}".format(mode, PROFILE_MODES))
+
+    start = time.monotonic()
+    if mode == PROFILE_MODE_CPROFILE:
+        profiler = cProfile.Profile()
+        thread_profilers = []
+        # cProfile only traces the thread that enabled it before python 3.12, from 3.12 it traces every thread
+        trace_new_threads = sys.version_info < (3, 12)
+        if trace_new_threads:
+            threading.setprofile(_get_thread_profiler_hook(thread_profilers))
+        try:
+            return profiler.runcall(function, *args, **kwargs)
+        finally:
+            if trace_new_threads:
+                threading.setprofile(None)
+            _write_profile_files(output_directory, time.monotonic() - start,
+                                 lambda: _write_cprofile(profiler, thread_profilers, output_directory, top_n))
+    else:
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profiler.stop()
+            _write_profile_files(output_directory, time.monotonic() - start,
+                                 lambda: _write_sampling_profile(profiler, output_directory, top_n))
+
+
+def _get_thread_profiler_hook(thread_profilers):
+    """
+    Builds a threading.setprofile hook that starts a cProfile profiler in each new thread
+
+    The hook is only called for the first event in the thread, enabling the profiler replaces it.
+
+    :param thread_profilers: list the profilers are added to
+    :return: function
+    """
+    lock = threading.Lock()
+
+    def start_thread_profiler(frame, event, arg):
+        thread_profiler = cProfile.Profile()
+        with lock:
+            thread_profilers.append(thread_profiler)
+        thread_profiler.enable()
+
+    return start_thread_profiler
+
+
+def _write_profile_files(output_directory, seconds, write_function):
+    """
+    Writes the profile files, a profile that can not be written does not fail the upload
+    """
+    try:
+        written_files = write_function()
+    except OSError as e:
+        logging.warning("Could not write profile to '{}': {}".format(output_directory, e))
+        return
+    logging.info("Profiled {:.1f} seconds, profile written to: {}".format(seconds, ", ".join(written_files)))
+
+
+def _write_cprofile(profiler, thread_profilers, output_directory, top_n):
+    summary = io.StringIO()
+    stats = pstats.Stats(profiler, stream=summary)
+    # for threads that are still running, like pooled workers, the calls they have finished so far are used
+    for thread_profiler in list(thread_profilers):
+        stats.add(thread_profiler)
+
+    prof_file = os.path.join(output_directory, CPROFILE_FILE_NAME)
+    stats.dump_stats(prof_file)
+    summary.write("Top {} functions by cumulative time\n".format(top_n))
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top_n)
+    summary.write("Top {} functions by own time\n".format(top_n))
+    stats.sort_stats(pstats.SortKey.TIME).print_stats(top_n)
+
+    hotspots_file = os.path.join(output_directory, HOTSPOTS_FILE_NAME)
+    with open(hotspots_file, "w") as f:
+        f.write(summary.getvalue())
+    return [prof_file, hotspots_file]
+
+
+def _write_sampling_profile(profiler, output_directory, top_n):
+    folded_file = os.path.join(output_directory, FOLDED_STACKS_FILE_NAME)
+    with open(folded_file, "w") as f:
+        f.write("\n".join(profiler.get_folded_stacks()) + "\n")
+
+    hotspots_file = os.path.join(output_directory, HOTSPOTS_FILE_NAME)
+    with open(hotspots_file, "w") as f:
+        f.write("\n".join(profiler.get_hotspot_lines(top_n)) + "\n")
+    return [folded_file, hotspots_file]
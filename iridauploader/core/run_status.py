@@ -0,0 +1,78 @@
+"""
+Lightweight status query for run directories, used by the --status command line option
+
+Only the file system is read: no parser is created, the api is never initialized, and no status or log files are
+written. This is cheap enough for monitoring scripts to poll often.
+"""
+
+import concurrent.futures
+import json
+import time
+
+import iridauploader.config as config
+import iridauploader.parsers as parsers
+import iridauploader.progress as progress
+from iridauploader.model import DirectoryStatus
+
+STATUS_FORMAT_TEXT = "text"
+STATUS_FORMAT_JSON = "json"
+STATUS_FORMATS = [STATUS_FORMAT_TEXT, STATUS_FORMAT_JSON]
+
+
+def get_run_status_list(directory, batch=False, max_workers=None):
+    """
+    Reads the status of a run directory, or of every run directory in a batch directory
+
+    :param directory: run directory, or batch directory when batch is True
+    :param batch: When True, the status of every directory in directory is read
+    :param max_workers: number of threads reading statuses, None uses the ThreadPoolExecutor default
+    :return: list of DirectoryStatus objects
+    """
+    required_file_list = parsers.get_required_file_list(config.get_settings().parser)
+    if batch:
+        directory_list = sorted(parsers.common.find_directory_list(directory))
+    else:
+        directory_list = [directory]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda d: progress.get_directory_status(d, required_file_list), directory_list))
+
+
+def get_status_dict(directory_status):
+    """
+    :param directory_status: DirectoryStatus object
+    :return: dict of the fields of the status that are useful for monitoring
+    """
+    if directory_status.time is None:
+        status_time = None
+    else:
+        status_time = time.strftime(DirectoryStatus.JSON_DATE_TIME_FORMAT, directory_status.time)
+    return {
+        "directory": directory_status.directory,
+        "status": directory_status.status,
+        "message": directory_status.message,
+        "date_time": status_time,
+        "run_id": directory_status.run_id,
+    }
+
+
+def format_status_list(directory_status_list, status_format=STATUS_FORMAT_TEXT):
+    """
+    :param directory_status_list: list of DirectoryStatus objects
+    :param status_format: one of STATUS_FORMATS
+    :return: string to print
+    """
+    status_dict_list = [get_status_dict(s) for s in directory_status_list]
+    if status_format == STATUS_FORMAT_JSON:
+        return json.dumps(status_dict_list, indent=4)
+    if status_format != STATUS_FORMAT_TEXT:
+        raise ValueError("Status format '{}' is not valid, status format must be one of {}".format(
+            status_format, STATUS_FORMATS))
+
+    lines = ["{:<10} {:<16} {}".format("STATUS", "DATE TIME", "DIRECTORY")]
+    for status_dict in status_dict_list:
+        lines.append("{:<10} {:<16} {}".format(status_dict["status"], status_dict["date_time"] or "",
+                                               status_dict["directory"]))
+        if status_dict["message"]:
+            lines.append("{:<27} {}".format("", status_dict["message"]))
+    return "\n".join(lines)
@@ -14,7 +14,7 @@ import iridauploader.parsers as parsers
 import iridauploader.progress as progress
 from iridauploader.model import DirectoryStatus
 import os
-from . import api_handler, parsing_handler, logger, exit_return, upload_helpers
+from . import api_handler, parsing_handler, logger, exit_return, upload_helpers, file_stats
 
 
 def upload_run_single_entry(directory, force_upload=False, upload_mode=None, continue_upload=False):
@@ -31,6 +31,52 @@ def upload_run_single_entry(directory, force_upload=False, upload_mode=None, con
     """
 
     directory_status = parsing_handler.get_run_status(directory)
+    return _upload_run_with_status(directory, directory_status, force_upload, upload_mode, continue_upload)
+
+
+def upload_parsed_run_single_entry(sequencing_run, directory_status, directory_fingerprint, force_upload=False,
+                                   upload_mode=None, continue_upload=False):
+    """
+    This function acts as a single point of entry for uploading a run that has already been parsed and validated,
+    e.g. by the GUI to show the run before uploading it
+
+    The run is only parsed again when the run directory or sequence files have changed since it was parsed, or when
+    the status file was written to since directory_status was read, e.g. by another uploader.
+
+    :param sequencing_run: SequencingRun parsed and validated from the directory
+    :param directory_status: DirectoryStatus of the directory, read before the run was parsed
+    :param directory_fingerprint: file_stats.get_directory_fingerprint of the directory, taken before parsing
+    :param force_upload: When set to true, the upload status file will be ignored and file will attempt to be uploaded
+    :param upload_mode: String with upload mode to use. When None, default is used.
+    :param continue_upload: When set, a PARTIAL status run will be continued from where it left off.
+    :return: ExitReturn
+    """
+    directory = directory_status.directory
+    if not file_stats.run_is_unchanged(sequencing_run, directory, directory_fingerprint):
+        logging.info("Run directory '{}' has changed since it was parsed, parsing again".format(directory))
+        return upload_run_single_entry(directory, force_upload, upload_mode, continue_upload)
+    if not progress.status_file_is_unchanged(directory_status):
+        logging.info("Status file of run directory '{}' has changed since it was read, parsing again".format(directory))
+        return upload_run_single_entry(directory, force_upload, upload_mode, continue_upload)
+
+    return _upload_run_with_status(directory, directory_status, force_upload, upload_mode, continue_upload,
+                                   sequencing_run)
+
+
+def _upload_run_with_status(directory, directory_status, force_upload, upload_mode, continue_upload,
+                            sequencing_run=None):
+    """
+    Uploads a directory if its status allows it (valid run, new run or forced upload)
+
+    :param directory: Directory of the sequencing run to upload
+    :param directory_status: DirectoryStatus of the directory
+    :param force_upload: When set to true, the upload status file will be ignored and file will attempt to be uploaded
+    :param upload_mode: String with upload mode to use. When None, default is used.
+    :param continue_upload: When set, a PARTIAL status run will be continued from where it left off.
+    :param sequencing_run: Default None, when given this already parsed run is uploaded instead of parsing directory
+    :return: ExitReturn
+    """
+    progress.metrics.set_run_status(directory_status.directory, directory_status.status)
     parse_as_partial = False
 
     # Check that directory is writeable, or readonly mode is enabled
@@ -90,6 +136,8 @@ def upload_run_single_entry(directory, force_upload=False, upload_mode=None, con
         upload_mode = api_handler.get_default_upload_mode()
 
     # upload
+    if sequencing_run is not None:
+        return _validate_and_upload(directory_status, upload_mode, parse_as_partial, sequencing_run=sequencing_run)
     return _validate_and_upload(directory_status, upload_mode, parse_as_partial)
 
 
@@ -114,6 +162,7 @@ def batch_upload_single_entry(batch_directory, force_upload=False, upload_mode=N
     # list info about directories found
     logging.info("Found {} potential run directories".format(len(directory_status_list)))
     for directory_status in directory_status_list:
+        progress.metrics.set_run_status(directory_status.directory, directory_status.status)
         logging.info("DIRECTORY: %s\n"
                      "%30sSTATUS:  %s\n"
                      "%30sDETAILS: %s"
@@ -178,6 +227,11 @@ def batch_upload_single_entry(batch_directory, force_upload=False, upload_mode=N
     else:
         logging.info("Starting upload for all new runs. {} run(s) found.".format(len(upload_list)))
 
+    # Nothing to upload, exit before the api is needed
+    if len(upload_list) == 0:
+        logging.info("Batch upload complete, Exiting!")
+        return exit_success()
+
     # get default upload mode if None
     if upload_mode is None:
         upload_mode = api_handler.get_default_upload_mode()
@@ -198,7 +252,7 @@ def batch_upload_single_entry(batch_directory, force_upload=False, upload_mode=N
     return exit_success()
 
 
-def _validate_and_upload(directory_status, upload_mode, continue_from_partial):
+def _validate_and_upload(directory_status, upload_mode, continue_from_partial, sequencing_run=None):
     """
     This function attempts to upload a single run directory
 
@@ -211,6 +265,7 @@ def _validate_and_upload(directory_status, upload_mode, continue_from_partial):
     :param directory_status: DirectoryStatus object that has directory to try upload
     :param upload_mode: String, mode to use when uploading assemblies
     :param continue_from_partial: when set, already uploaded samples will be skipped, and existing run_id will be used
+    :param sequencing_run: Default None, when given this already parsed and validated run is used instead of parsing
     :return: ExitReturn
     """
     logging_start_block(directory_status.directory)
@@ -220,7 +275,13 @@ def _validate_and_upload(directory_status, upload_mode, continue_from_partial):
 
     try:
         # Starting upload process: Parse and do offline verification
-        sequencing_run = upload_helpers.parse_and_validate(directory_status, continue_from_partial)
+        if sequencing_run is None:
+            sequencing_run = upload_helpers.parse_and_validate(directory_status, continue_from_partial)
+        else:
+            logging.info("Run has not changed since it was parsed and validated, skipping parsing")
+            if continue_from_partial:
+                sequencing_run = upload_helpers.set_uploaded_samples_to_skip(
+                    sequencing_run, directory_status.get_sample_status_list())
         upload_helpers.verify_upload_mode(upload_mode)
         upload_helpers.init_file_status_list_from_sequencing_run(sequencing_run, directory_status)
 
@@ -228,8 +289,10 @@ def _validate_and_upload(directory_status, upload_mode, continue_from_partial):
         upload_helpers.initialize_api(directory_status)
         upload_helpers.irida_prep_and_validation(sequencing_run, directory_status)
 
-        # Upload run
-        upload_helpers.upload_sequencing_run(sequencing_run, directory_status, upload_mode, continue_from_partial)
+        # Upload run, as long as no files have changed since they were validated
+        upload_size = upload_helpers.verify_files_unchanged(sequencing_run, directory_status)
+        upload_helpers.upload_sequencing_run(sequencing_run, directory_status, upload_mode, continue_from_partial,
+                                             upload_size)
 
     except (progress.exceptions.DirectoryError,
             parsers.exceptions.ValidationError,
@@ -239,8 +302,10 @@ def _validate_and_upload(directory_status, upload_mode, continue_from_partial):
             api.exceptions.FileError,
             Exception
             ) as e:
+        progress.metrics.record_run_finished(DirectoryStatus.ERROR)
         return exit_error(e)
 
+    progress.metrics.record_run_finished(DirectoryStatus.COMPLETE)
     logging.info("Samples in directory '{}' have finished uploading!".format(directory_status.directory))
 
     logging_end_block()
@@ -254,6 +319,7 @@ def exit_error(error):
     :return: ExitReturn with EXIT_CODE_ERROR
     """
     logging_end_block()
+    _write_metrics()
     return exit_return.ExitReturn(exit_return.EXIT_CODE_ERROR, error)
 
 
@@ -262,16 +328,48 @@ def exit_success():
     Returns an success run exit code which ends the process when returned
     :return: ExitReturn with EXIT_CODE_SUCCESS
     """
+    _write_metrics()
     return exit_return.ExitReturn(exit_return.EXIT_CODE_SUCCESS)
 
 
+def _write_metrics():
+    """
+    Writes the uploader metrics to the metrics_textfile, when one is configured
+    A failure to write metrics is logged, but does not fail the upload
+    :return: None
+    """
+    metrics_textfile = config.get_settings().metrics_textfile
+    if not metrics_textfile:
+        return
+    try:
+        progress.metrics.write_textfile(metrics_textfile)
+    except OSError as e:
+        logging.warning("Could not write metrics to '{}': {}".format(metrics_textfile, e))
+
+
+def _set_log_options():
+    """
+    Sets the module log levels and how long repeated messages are dropped for from the config
+    :return: None
+    """
+    settings = config.get_settings()
+    try:
+        logger.set_module_levels(settings.log_levels)
+    except ValueError as e:
+        logging.warning("Config option 'log_levels' is not valid, logging every module: {}".format(e))
+        logger.set_module_levels({})
+    logger.set_repeat_interval(settings.log_repeat_interval)
+
+
 def logging_start_block(directory):
     """
     Logs an information block to the console and file which indicates the start of an upload run.
     Includes the uploader version number set in this module
     :return:
     """
-    log_directory = config.read_config_option("log_directory")
+    _set_log_options()
+    settings = config.get_settings()
+    log_directory = settings.log_directory
     if log_directory:
         run_name = os.path.basename(directory)
         log_directory_run_path = os.path.join(log_directory, run_name)
@@ -279,8 +377,12 @@ def logging_start_block(directory):
             os.mkdir(log_directory_run_path)
     else:
         log_directory_run_path = directory
-    if config.read_config_option("readonly", bool, False) is False or bool(log_directory):
+    if settings.readonly is False or bool(log_directory):
         logger.add_log_to_directory(log_directory_run_path)
+        # the timing profile is written next to the log and status files
+        progress.start_profile(directory, log_directory_run_path)
+    else:
+        progress.start_profile(directory)
     logging.info("==================================================")
     logging.info("---------------STARTING UPLOAD RUN----------------")
     logging.info("Uploader Version {}".format(VERSION_NUMBER))
@@ -296,5 +398,8 @@ def logging_end_block():
     logging.info("==================================================")
     logging.info("----------------ENDING UPLOAD RUN-----------------")
     logging.info("==================================================")
-    if config.read_config_option("readonly", bool, False) is False:
+    profile = progress.stop_profile()
+    if profile is not None:
+        progress.log_profile(profile)
+    if config.get_settings().readonly is False:
         logger.remove_directory_logger()
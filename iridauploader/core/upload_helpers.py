@@ -14,9 +14,9 @@ from iridauploader import api
 import iridauploader.config as config
 import iridauploader.parsers as parsers
 import iridauploader.progress as progress
-from iridauploader.model import DirectoryStatus
+from iridauploader.model import DirectoryStatus, ValidationResult
 
-from . import api_handler, parsing_handler
+from . import api_handler, parsing_handler, file_stats
 
 
 def _set_and_write_directory_status(directory_status, status, message=None):
@@ -54,7 +54,7 @@ def directory_has_readonly_conflict(directory):
     :param directory:
     :return: boolean
     """
-    if (config.read_config_option("readonly", bool, False) is False and not os.access(directory, os.W_OK)):
+    if (config.get_settings().readonly is False and not os.access(directory, os.W_OK)):
         return True
     else:
         return False
@@ -83,7 +83,8 @@ def parse_and_validate(directory_status, parse_as_partial):
     """
 
     try:
-        sequencing_run = parsing_handler.parse_and_validate(directory_status.directory)
+        with progress.span("parse_and_validate"):
+            sequencing_run = parsing_handler.parse_and_validate(directory_status.directory)
     except parsers.exceptions.DirectoryError as e:
         # Directory was not valid for some reason
         full_error = "ERROR! An error occurred with directory '{}', with message: {}".format(e.directory, e.message)
@@ -162,7 +163,8 @@ def initialize_api(directory_status):
     :return: None
     """
     try:
-        api_handler.initialize_api_from_config()
+        with progress.span("initialize_api"):
+            api_handler.initialize_api_from_config()
     except api.exceptions.IridaConnectionError as e:
         logging.error("ERROR! Could not initialize irida api.")
         logging.error("Errors: " + pformat(e.args))
@@ -182,7 +184,8 @@ def irida_prep_and_validation(sequencing_run, directory_status):
     """
     logging.info("*** Verifying run (online validation) ***")
     try:
-        validation_result = api_handler.prepare_and_validate_for_upload(sequencing_run)
+        with progress.span("irida_prep_and_validation"):
+            validation_result = api_handler.prepare_and_validate_for_upload(sequencing_run)
     except api.exceptions.IridaConnectionError as e:
         logging.error("Lost connection to Irida")
         logging.error("Errors: " + pformat(e.args))
@@ -201,16 +204,47 @@ def irida_prep_and_validation(sequencing_run, directory_status):
     logging.info("*** Run Verified ***")
 
 
-def upload_sequencing_run(sequencing_run, directory_status, upload_mode, upload_from_partial=False):
+def verify_files_unchanged(sequencing_run, directory_status):
+    """
+    Verifies the files have not changed since the run was parsed and validated, e.g. they are still being written
+    :param sequencing_run:
+    :param directory_status:
+    :return: size in bytes of the files to upload, throws ValidationError when files have changed
+    """
+    # The files are read again, the sizes cached when parsing are not used
+    changed_file_list = file_stats.get_changed_files(sequencing_run)
+    if changed_file_list:
+        validation_result = ValidationResult()
+        for file_name in changed_file_list:
+            validation_result.add_error(parsers.exceptions.SequenceFileError(
+                "File '{}' has changed or been removed since the run was validated".format(file_name)))
+        error_msg = "ERROR! {} file(s) changed since the run was validated. Please verify the files are " \
+                    "complete and try again.".format(len(changed_file_list))
+        logging.error(error_msg)
+        error_list_msg = "Error list: " + pformat(validation_result.error_list)
+        logging.error(error_list_msg)
+        logging.info("Samples not uploaded!")
+        _set_and_write_directory_status(directory_status, DirectoryStatus.ERROR, error_msg + ", " + error_list_msg)
+        raise parsers.exceptions.ValidationError(error_msg, validation_result)
+
+    upload_sample_list = [s for p in sequencing_run.project_list for s in p.sample_list if not s.skip]
+    upload_size = sum(s.sequence_file.get_total_file_size() for s in upload_sample_list)
+    logging.info("{} sample(s) to upload, {:.1f} MB".format(len(upload_sample_list), upload_size / 1024 ** 2))
+    return upload_size
+
+
+def upload_sequencing_run(sequencing_run, directory_status, upload_mode, upload_from_partial=False, upload_size=None):
     """
     Starts the actual upload of the sequencing run
     :param sequencing_run:
     :param directory_status:
     :param upload_mode:
     :param upload_from_partial: Default False, when continuing from a partial run, we can reuse the the run_id
+    :param upload_size: Default None, size in bytes of the files to upload, used for the progress of the whole run
     :return: None
     """
     logging.info("*** Starting Upload ***")
+    progress.start_upload(upload_size)
     try:
         # If continuing a partial run, use the existing run_id
         if upload_from_partial:
@@ -218,12 +252,13 @@ def upload_sequencing_run(sequencing_run, directory_status, upload_mode, upload_
         else:
             run_id = None
         # Upload
-        api_handler.upload_sequencing_run(
-            sequencing_run=sequencing_run,
-            directory_status=directory_status,
-            upload_mode=upload_mode,
-            run_id=run_id
-        )
+        with progress.span("upload_sequencing_run"):
+            api_handler.upload_sequencing_run(
+                sequencing_run=sequencing_run,
+                directory_status=directory_status,
+                upload_mode=upload_mode,
+                run_id=run_id
+            )
     except api.exceptions.IridaConnectionError as e:
         logging.error("Lost connection to Irida")
         logging.error("Errors: " + pformat(e.args))
@@ -242,6 +277,8 @@ def upload_sequencing_run(sequencing_run, directory_status, upload_mode, upload_
         full_error = "Could not upload file to IRIDA. Errors: " + pformat(e.args)
         _set_and_write_directory_status(directory_status, DirectoryStatus.ERROR, full_error)
         raise e
+    finally:
+        progress.finish_upload()
 
     _set_and_write_directory_status(directory_status, DirectoryStatus.COMPLETE)
     logging.info("*** Upload Complete ***")
@@ -0,0 +1,450 @@
+"""
+A queue of runs to upload, used by the GUI to upload several runs without watching each one
+
+Runs are checked (status, parsing and validation) as soon as they are added, several at a time in a thread pool.
+New runs wait for the configured delay, like they do in batch uploads, and are checked again once it has passed.
+Runs that are ready are uploaded in the order they were added, at most max_concurrent_uploads at a time.
+A run is not uploaded at the same time as another run with the same samples, as both would try to create them.
+
+Each upload runs in its own process. The run log, the timing profile and the upload progress can only follow one
+run per process, so separate processes keep the logs and profiles of runs uploading at the same time apart.
+The upload process sends the progress of the upload and its log records back to the queue. The records are logged
+again in this process, so they reach the log file and the GUI's log console.
+"""
+
+import logging
+import logging.handlers
+import multiprocessing
+import queue
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+import iridauploader.config as config
+import iridauploader.parsers as parsers
+import iridauploader.progress as progress
+from iridauploader.model import DirectoryStatus
+
+from . import exit_return, file_stats, logger, parsing_handler, upload, upload_helpers
+
+# Runs checked at the same time, checking is mostly waiting on the file system
+DEFAULT_CHECK_WORKERS = 4
+DEFAULT_MAX_CONCURRENT_UPLOADS = 1
+# Seconds between checks of a delayed run
+DEFAULT_DELAY_CHECK_INTERVAL = 60
+
+# States of a queued run
+STATE_CHECKING = "checking"
+STATE_INVALID = "invalid"
+STATE_SKIPPED = "skipped"
+STATE_DELAYED = "delayed"
+STATE_WAITING = "waiting"
+STATE_UPLOADING = "uploading"
+STATE_COMPLETE = "complete"
+STATE_ERROR = "error"
+
+# Messages sent by the upload process
+_MESSAGE_PROGRESS = "progress"
+_MESSAGE_LOG = "log"
+_MESSAGE_RESULT = "result"
+# Seconds between checks that the upload process is still running
+_PROCESS_POLL_INTERVAL = 1
+# Seconds the upload process has to exit once it has sent its result, before it is stopped
+_PROCESS_EXIT_TIMEOUT = 30
+
+
+class QueuedRun:
+    """
+    A run directory in the upload queue, with its state and upload progress
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.state = STATE_CHECKING
+        self.message = ""
+        self.directory_status = None
+        self.sequencing_run = None
+        self.fingerprint = None
+        self.continue_upload = False
+        # (project id, sample name) of every sample to upload
+        self.sample_keys = frozenset()
+        self.sample_count = 0
+        self.total_bytes = 0
+        self.bytes_sent = 0
+        # bytes per second and seconds left, None when not known
+        self.rate = None
+        self.eta = None
+
+    def get_dict(self):
+        return {
+            "directory": self.directory,
+            "state": self.state,
+            "message": self.message,
+            "sample_count": self.sample_count,
+            "total_bytes": self.total_bytes,
+            "bytes_sent": self.bytes_sent,
+            "rate": self.rate,
+            "eta": self.eta,
+        }
+
+
+class UploadQueue:
+    """
+    Checks runs as they are added, and uploads the runs that are ready once started
+    All methods are thread safe
+    """
+
+    def __init__(self, max_concurrent_uploads=DEFAULT_MAX_CONCURRENT_UPLOADS, upload_mode=None,
+                 check_workers=DEFAULT_CHECK_WORKERS, upload_function=None,
+                 delay_check_interval=DEFAULT_DELAY_CHECK_INTERVAL):
+        """
+        :param max_concurrent_uploads: maximum runs uploading at the same time
+        :param upload_mode: String with upload mode to use. When None, default is used.
+        :param check_workers: maximum runs checked at the same time
+        :param upload_function: function(queued_run, upload_mode, progress_callback) returning an ExitReturn,
+            defaults to upload_in_process. progress_callback takes bytes_sent, total_bytes, rate and eta
+        :param delay_check_interval: seconds between checks of a delayed run
+        """
+        self._lock = threading.Lock()
+        # directory -> QueuedRun, in the order they were added
+        self._runs = {}
+        self._max_concurrent_uploads = max_concurrent_uploads
+        self._upload_mode = upload_mode
+        self._upload_function = upload_function or upload_in_process
+        self._uploading_count = 0
+        self._started = False
+        self._shut_down = False
+        self._check_executor = ThreadPoolExecutor(max_workers=check_workers, thread_name_prefix="irida-queue-check")
+        self._delay_check_interval = delay_check_interval
+        # directory -> Timer that checks a delayed run again
+        self._delay_timers = {}
+
+    def add_run(self, directory):
+        """
+        Adds a run directory to the queue, and starts checking it
+
+        :param directory: run directory
+        :return: False when the directory is already in the queue, otherwise True
+        """
+        with self._lock:
+            if directory in self._runs:
+                return False
+            queued_run = QueuedRun(directory)
+            self._runs[directory] = queued_run
+        self._check_executor.submit(self._check_run, queued_run)
+        return True
+
+    def add_batch(self, batch_directory):
+        """
+        Adds every run directory in a batch directory to the queue
+
+        :param batch_directory: directory containing run directories
+        :return: number of runs added
+        """
+        status_list = parsing_handler.get_run_status_list(batch_directory)
+        return sum(self.add_run(directory_status.directory) for directory_status in status_list)
+
+    def remove_run(self, directory):
+        """
+        Removes a run that is not uploading from the queue
+
+        :param directory: run directory
+        :return: False when the run is uploading or not in the queue, otherwise True
+        """
+        with self._lock:
+            queued_run = self._runs.get(directory)
+            if queued_run is None or queued_run.state == STATE_UPLOADING:
+                return False
+            del self._runs[directory]
+            timer = self._delay_timers.pop(directory, None)
+        if timer is not None:
+            timer.cancel()
+        return True
+
+    def set_max_concurrent_uploads(self, max_concurrent_uploads):
+        """
+        :param max_concurrent_uploads: maximum runs uploading at the same time, uploads already running are not
+            stopped when it is lowered
+        :return: None
+        """
+        with self._lock:
+            self._max_concurrent_uploads = max_concurrent_uploads
+        self._start_waiting_uploads()
+
+    def set_upload_mode(self, upload_mode):
+        """
+        :param upload_mode: String with upload mode to use for uploads started from now on. When None, default is used.
+        :return: None
+        """
+        with self._lock:
+            self._upload_mode = upload_mode
+
+    def start(self):
+        """
+        Starts uploading the runs that are ready, runs that become ready later are uploaded when they are checked
+
+        :return: None
+        """
+        with self._lock:
+            self._started = True
+        self._start_waiting_uploads()
+
+    def is_uploading(self):
+        """
+        :return: True while there are runs uploading, or waiting to upload once started
+        """
+        with self._lock:
+            return self._uploading_count > 0 or (self._started and any(
+                r.state in (STATE_CHECKING, STATE_DELAYED, STATE_WAITING) for r in self._runs.values()))
+
+    def get_runs(self):
+        """
+        :return: list of QueuedRun.get_dict() of every run, in the order they were added
+        """
+        with self._lock:
+            return [queued_run.get_dict() for queued_run in self._runs.values()]
+
+    def shutdown(self):
+        """
+        Stops checking runs, uploads that are running are not stopped
+
+        :return: None
+        """
+        with self._lock:
+            self._shut_down = True
+            timers = list(self._delay_timers.values())
+            self._delay_timers.clear()
+        for timer in timers:
+            timer.cancel()
+        self._check_executor.shutdown(wait=False)
+
+    def _check_run(self, queued_run):
+        """
+        Reads the status of a run, and parses and validates it
+        Sets the run to waiting when it can be uploaded
+        """
+        try:
+            # fingerprint is taken first, so changes made while parsing are found at upload
+            fingerprint = file_stats.get_directory_fingerprint(queued_run.directory)
+            directory_status = parsing_handler.get_run_status(queued_run.directory)
+            if directory_status.status_equals(DirectoryStatus.INVALID):
+                self._finish_check(queued_run, STATE_INVALID, directory_status.message)
+                return
+            if (directory_status.status_equals(DirectoryStatus.COMPLETE)
+                    or directory_status.status_equals(DirectoryStatus.ERROR)):
+                self._finish_check(queued_run, STATE_SKIPPED,
+                                   "Run has status '{}', open it in the main window to upload it again".format(
+                                       directory_status.status))
+                return
+            # New runs wait for the delay from the config, the same as in batch uploads
+            if ((directory_status.status_equals(DirectoryStatus.NEW)
+                 or directory_status.status_equals(DirectoryStatus.DELAYED))
+                    and not progress.run_is_ready_with_delay(directory_status)):
+                self._delay_run(queued_run)
+                return
+
+            sequencing_run = parsing_handler.parse_and_validate(queued_run.directory)
+            continue_upload = directory_status.status_equals(DirectoryStatus.PARTIAL)
+            if continue_upload:
+                sequencing_run = upload_helpers.set_uploaded_samples_to_skip(
+                    sequencing_run, directory_status.get_sample_status_list())
+        except parsers.exceptions.ValidationError as e:
+            self._finish_check(queued_run, STATE_INVALID, "{} {}".format(
+                e.message, "; ".join(str(error) for error in e.validation_result.error_list)))
+            return
+        except (parsers.exceptions.DirectoryError,
+                parsers.exceptions.SampleSheetError,
+                parsers.exceptions.SequenceFileError) as e:
+            self._finish_check(queued_run, STATE_INVALID, e.message)
+            return
+        except Exception as e:
+            logging.exception("Could not check run '{}'".format(queued_run.directory))
+            self._finish_check(queued_run, STATE_INVALID, str(e))
+            return
+
+        sample_list = [s for p in sequencing_run.project_list for s in p.sample_list if not s.skip]
+        with self._lock:
+            queued_run.directory_status = directory_status
+            queued_run.sequencing_run = sequencing_run
+            queued_run.fingerprint = fingerprint
+            queued_run.continue_upload = continue_upload
+            queued_run.sample_keys = frozenset((str(p.id), s.sample_name) for p in sequencing_run.project_list
+                                               for s in p.sample_list if not s.skip)
+            queued_run.sample_count = len(sample_list)
+            queued_run.total_bytes = sum(s.sequence_file.get_total_file_size() for s in sample_list)
+            queued_run.state = STATE_WAITING
+        self._start_waiting_uploads()
+
+    def _delay_run(self, queued_run):
+        """
+        Sets a run to delayed, and checks it again after delay_check_interval seconds
+        """
+        message = "Run is delayed, it will be uploaded once the {} minute delay has passed".format(
+            config.get_settings().delay)
+        logging.info("Run '{}' will not be uploaded yet: {}".format(queued_run.directory, message))
+        with self._lock:
+            if self._shut_down or self._runs.get(queued_run.directory) is not queued_run:
+                return
+            queued_run.state = STATE_DELAYED
+            queued_run.message = message
+            timer = threading.Timer(self._delay_check_interval, self._check_delayed_run, args=(queued_run,))
+            timer.daemon = True
+            self._delay_timers[queued_run.directory] = timer
+        timer.start()
+
+    def _check_delayed_run(self, queued_run):
+        with self._lock:
+            if self._shut_down or self._runs.get(queued_run.directory) is not queued_run:
+                return
+            del self._delay_timers[queued_run.directory]
+            queued_run.state = STATE_CHECKING
+            queued_run.message = ""
+        self._check_executor.submit(self._check_run, queued_run)
+
+    def _finish_check(self, queued_run, state, message):
+        logging.info("Run '{}' will not be uploaded: {}".format(queued_run.directory, message))
+        with self._lock:
+            queued_run.state = state
+            queued_run.message = message
+
+    def _start_waiting_uploads(self):
+        """
+        Starts uploads, in the order the runs were added, until max_concurrent_uploads are running
+        Runs with samples in common with an uploading run wait for it to finish
+        """
+        start_list = []
+        with self._lock:
+            if not self._started:
+                return
+            uploading_keys = set()
+            for queued_run in self._runs.values():
+                if queued_run.state == STATE_UPLOADING:
+                    uploading_keys.update(queued_run.sample_keys)
+            for queued_run in self._runs.values():
+                if self._uploading_count >= self._max_concurrent_uploads:
+                    break
+                if queued_run.state != STATE_WAITING or not uploading_keys.isdisjoint(queued_run.sample_keys):
+                    continue
+                queued_run.state = STATE_UPLOADING
+                self._uploading_count += 1
+                uploading_keys.update(queued_run.sample_keys)
+                start_list.append(queued_run)
+        for queued_run in start_list:
+            threading.Thread(target=self._upload_run, args=(queued_run,), daemon=True,
+                             name="irida-queue-upload").start()
+
+    def _upload_run(self, queued_run):
+        def update_progress(bytes_sent, total_bytes, rate, eta):
+            with self._lock:
+                queued_run.bytes_sent = bytes_sent
+                queued_run.total_bytes = total_bytes
+                queued_run.rate = rate
+                queued_run.eta = eta
+
+        logging.info("Starting queued upload of '{}'".format(queued_run.directory))
+        try:
+            with self._lock:
+                upload_mode = self._upload_mode
+            result = self._upload_function(queued_run, upload_mode, update_progress)
+        except Exception as e:
+            logging.exception("Queued upload of '{}' failed".format(queued_run.directory))
+            result = exit_return.ExitReturn(exit_return.EXIT_CODE_ERROR, e)
+
+        with self._lock:
+            self._uploading_count -= 1
+            queued_run.rate = None
+            queued_run.eta = None
+            # the parsed run is not needed anymore
+            queued_run.sequencing_run = None
+            if result.exit_code == exit_return.EXIT_CODE_SUCCESS:
+                queued_run.state = STATE_COMPLETE
+                queued_run.bytes_sent = queued_run.total_bytes
+            else:
+                queued_run.state = STATE_ERROR
+                queued_run.message = str(result.error)
+        logging.info("Queued upload of '{}' finished with state '{}'".format(queued_run.directory, queued_run.state))
+        self._start_waiting_uploads()
+
+
+def upload_in_process(queued_run, upload_mode, progress_callback):
+    """
+    Uploads a checked run in a new process, and waits for it to finish
+
+    :param queued_run: QueuedRun that has been checked
+    :param upload_mode: String with upload mode to use. When None, default is used.
+    :param progress_callback: function taking bytes_sent, total_bytes, rate and eta, called as the upload progresses
+    :return: ExitReturn
+    """
+    # spawn gives the same behaviour on every platform, and does not copy the GUI's threads into the process
+    context = multiprocessing.get_context("spawn")
+    message_queue = context.Queue()
+    process = context.Process(target=_upload_process_main, daemon=True, args=(
+        config.get_config_file(), queued_run.sequencing_run, queued_run.directory_status, queued_run.fingerprint,
+        upload_mode, queued_run.continue_upload, message_queue))
+    process.start()
+    try:
+        while True:
+            try:
+                message = message_queue.get(timeout=_PROCESS_POLL_INTERVAL)
+            except queue.Empty:
+                if not process.is_alive():
+                    return exit_return.ExitReturn(exit_return.EXIT_CODE_ERROR,
+                                                  "Upload process exited with code {}".format(process.exitcode))
+                continue
+            if message[0] == _MESSAGE_PROGRESS:
+                progress_callback(*message[1:])
+            elif message[0] == _MESSAGE_LOG:
+                record = message[1]
+                logging.getLogger(record.name).handle(record)
+            else:
+                return exit_return.ExitReturn(message[1], message[2] or None)
+    finally:
+        process.join(_PROCESS_EXIT_TIMEOUT)
+        if process.is_alive():
+            logging.error("Upload process of '{}' did not exit after the upload, stopping it".format(
+                queued_run.directory))
+            process.terminate()
+            process.join(_PROCESS_EXIT_TIMEOUT)
+        message_queue.close()
+
+
+def _upload_process_main(config_file, sequencing_run, directory_status, fingerprint, upload_mode, continue_upload,
+                         message_queue):
+    """
+    Runs in the upload process, sends progress, log records and the result of the upload back through message_queue
+    """
+    logger.log_to_other_process(_LogMessageHandler(message_queue))
+    config.set_config_file(config_file)
+    config.setup()
+    progress.subscribe(lambda snapshot: message_queue.put(
+        (_MESSAGE_PROGRESS, snapshot.bytes_sent, snapshot.total_bytes, snapshot.rate, snapshot.eta)))
+    try:
+        # the queue only uploads new, delayed and partial runs, so the status checks and delay are not skipped
+        result = upload.upload_parsed_run_single_entry(sequencing_run, directory_status, fingerprint,
+                                                       upload_mode=upload_mode, continue_upload=continue_upload)
+        error = str(result.error) if result.error else ""
+        result_message = (_MESSAGE_RESULT, result.exit_code, error)
+    except Exception as e:
+        logging.exception("Upload of '{}' failed".format(directory_status.directory))
+        result_message = (_MESSAGE_RESULT, exit_return.EXIT_CODE_ERROR, str(e))
+    # the queue stops reading messages once it has the result, the log records must be sent before it
+    logger.flush()
+    message_queue.put(result_message)
+    # make sure the messages are sent before the process exits
+    message_queue.close()
+    message_queue.join_thread()
+
+
+class _LogMessageHandler(logging.handlers.QueueHandler):
+    """
+    Sends log records from the upload process to the queue through its message queue
+    """
+
+    def prepare(self, record):
+        record = super().prepare(record)
+        # the traceback is part of the message now, it should not be added again when the record is written
+        record.exc_text = None
+        return record
+
+    def enqueue(self, record):
+        self.queue.put_nowait((_MESSAGE_LOG, record))
@@ -1,3 +1,4 @@
+import multiprocessing
 import sys
 # PyQt needs to be imported like this because for whatever reason they decided not to include a __all__ = [...]
 import PyQt5.QtWidgets as QtWidgets
@@ -41,6 +42,8 @@ def main():
     Entry point for GUI
     :return:
     """
+    # The upload queue uploads runs in child processes, which need this in frozen windows builds
+    multiprocessing.freeze_support()
     app = QtWidgets.QApplication(["IRIDA Uploader"])
     dlg = main_dialog.MainDialog()
     dlg.show()
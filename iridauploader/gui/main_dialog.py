@@ -9,6 +9,7 @@ from iridauploader.config import config
 from iridauploader.model import DirectoryStatus
 
 from iridauploader.gui.config import ConfigDialog
+from iridauploader.gui.queue_dialog import QueueDialog
 from iridauploader.gui import tools, widgets, colours, threads
 
 import os
@@ -27,6 +28,8 @@ class MainDialog(QtWidgets.QDialog):
         logging.debug("GUI: Setting up MainDialog")
 
         self.config_dlg = ConfigDialog(parent=self)
+        # created when first opened, after the config is loaded
+        self.queue_dlg = None
 
         # set window title and icon
         self.setWindowTitle("IRIDA Uploader")
@@ -62,6 +65,7 @@ class MainDialog(QtWidgets.QDialog):
         self._dir_button.clicked.connect(self._btn_open_dir)
         self._config_button.clicked.connect(self._btn_show_config)
         self._refresh_button.clicked.connect(self._btn_refresh)
+        self._queue_button.clicked.connect(self._btn_show_queue)
         self._upload_button.clicked.connect(self._btn_upload)
         self._console_button.clicked.connect(self._btn_log)
         self._info_btn.clicked.connect(self._btn_continue)
@@ -73,6 +77,12 @@ class MainDialog(QtWidgets.QDialog):
 
         # init the config file
         config.setup()
+        try:
+            config.get_settings()
+        except NameError as e:
+            # the window still opens, so the settings can be fixed
+            logging.error("{}. Please fix the config using Configure Settings".format(e))
+        self._console.set_max_lines(self._get_log_max_lines())
         # block uploading at start
         self._upload_button.set_block()
 
@@ -96,6 +106,9 @@ class MainDialog(QtWidgets.QDialog):
         # refresh
         self._refresh_button = QtWidgets.QPushButton(self)
         self._refresh_button.setText("Refresh")
+        # upload queue
+        self._queue_button = QtWidgets.QPushButton(self)
+        self._queue_button.setText("Upload Queue")
         # upload mode
         self._upload_mode_label = QtWidgets.QLabel("Upload Mode: ")
         self._upload_mode_combobox = QtWidgets.QComboBox(self)
@@ -131,7 +144,7 @@ class MainDialog(QtWidgets.QDialog):
         self._upload_errors.setStyleSheet("background-color: {}".format(colours.RED_LIGHT))
         self._upload_errors.hide()
         # Logging console
-        self._console = widgets.LogTextBox(self)
+        self._console = widgets.LogConsole(self)
         self._console_button = QtWidgets.QPushButton(self)
         self._console_button.setFixedWidth(100)
         self._console_button.setText("Show Log")
@@ -158,6 +171,7 @@ class MainDialog(QtWidgets.QDialog):
         upload_mode_layout.addWidget(self._upload_mode_combobox)
         config_layout.addLayout(upload_mode_layout)
         config_layout.addWidget(self._refresh_button)
+        config_layout.addWidget(self._queue_button)
         layout.addLayout(config_layout)
 
         # info
@@ -194,7 +208,7 @@ class MainDialog(QtWidgets.QDialog):
         :param event:
         :return:
         """
-        if self._uploading:
+        if self._uploading or (self.queue_dlg is not None and self.queue_dlg.is_uploading()):
             reply = QtWidgets.QMessageBox.question(self, 'Exit Uploader?',
                                                    "Data is still being uploaded! "
                                                    "Are you sure you want to exit the program?",
@@ -236,6 +250,18 @@ class MainDialog(QtWidgets.QDialog):
         # restart the status thread
         self._start_status()
 
+    def _btn_show_queue(self):
+        """
+        Open the upload queue window, where several runs can be uploaded
+        The window keeps uploading when it is closed
+        :return:
+        """
+        logging.debug("GUI: _btn_show_queue clicked")
+        if self.queue_dlg is None:
+            self.queue_dlg = QueueDialog(parent=self)
+        self.queue_dlg.show()
+        self.queue_dlg.raise_()
+
     def _btn_refresh(self):
         """
         Clicking the refresh button re-tries the connection to IRIDA, and then re-tries a parse
@@ -272,6 +298,22 @@ class MainDialog(QtWidgets.QDialog):
             if msg.clickedButton() == p_config_button:
                 self._btn_show_config()
 
+    @staticmethod
+    def _get_log_max_lines():
+        """
+        Reads the number of lines kept by the log console from the config
+        :return: int
+        """
+        try:
+            max_lines = config.get_settings().gui_log_max_lines
+        except NameError:
+            max_lines = 0
+        if max_lines <= 0:
+            logging.warning("Config option 'gui_log_max_lines' must be a whole number greater than 0, using the "
+                            "default of {}".format(widgets.DEFAULT_LOG_MAX_LINES))
+            return widgets.DEFAULT_LOG_MAX_LINES
+        return max_lines
+
     def _btn_log(self):
         """
         If the log is hidden, show, and vice versa
@@ -338,7 +380,7 @@ class MainDialog(QtWidgets.QDialog):
         # lock gui
         self._lock_gui()
         # start parsing
-        self._parse_thread.set_vars(self._run_dir, self._continue_partial)
+        self._parse_thread.set_vars(self._run_dir, self._continue_partial, self._status_thread.get_result())
         self._parse_thread.start()
 
     def _start_upload(self):
@@ -348,8 +390,11 @@ class MainDialog(QtWidgets.QDialog):
         self._uploading = True
         # start upload
         upload_mode = self._upload_mode_combobox.currentText()
+        # the run parsed for the table is uploaded, unless its files have changed since
         self._upload_thread.set_vars(
-            run_dir=self._run_dir, upload_mode=upload_mode, partial_continue=self._continue_partial)
+            run_dir=self._run_dir, upload_mode=upload_mode, partial_continue=self._continue_partial,
+            sequencing_run=self._parse_thread.get_run(), directory_status=self._status_thread.get_result(),
+            fingerprint=self._parse_thread.get_fingerprint())
         self._upload_thread.start()
 
     ##########################
@@ -0,0 +1,202 @@
+import logging
+# PyQt needs to be imported like this because for whatever reason they decided not to include a __all__ = [...]
+import PyQt5.QtWidgets as QtWidgets
+import PyQt5.QtCore as QtCore
+
+from iridauploader.api import UPLOAD_MODES
+from iridauploader.config import config
+from iridauploader.core import upload_queue
+
+from iridauploader.gui import widgets
+
+
+class QueueDialog(QtWidgets.QDialog):
+    """
+    Window to upload several runs
+
+    Runs are checked as soon as they are added, and uploaded one after the other, or several at a time, once started.
+    The table shows the state, throughput and time left of each run.
+    """
+    # Milliseconds between refreshes of the table
+    REFRESH_INTERVAL = 500
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        logging.debug("GUI: Setting up QueueDialog")
+        self.setWindowTitle("IRIDA Uploader Queue")
+
+        self._uploading = False
+        max_concurrent_uploads = self._get_max_concurrent_uploads()
+        self._queue = upload_queue.UploadQueue(max_concurrent_uploads=max_concurrent_uploads)
+
+        self._init_objects(max_concurrent_uploads)
+        self.setLayout(self._init_layout())
+        self.setGeometry(0, 0, 900, 400)
+
+        # Signals and Slots
+        self._add_run_button.clicked.connect(self._btn_add_run)
+        self._add_batch_button.clicked.connect(self._btn_add_batch)
+        self._remove_button.clicked.connect(self._btn_remove)
+        self._start_button.clicked.connect(self._btn_start)
+        self._concurrency_spinbox.valueChanged.connect(self._queue.set_max_concurrent_uploads)
+
+        # refresh the table on a timer, instead of for every change in the queue
+        self._refresh_timer = QtCore.QTimer(self)
+        self._refresh_timer.setInterval(self.REFRESH_INTERVAL)
+        self._refresh_timer.timeout.connect(self._refresh)
+        self._refresh_timer.start()
+
+    def _init_objects(self, max_concurrent_uploads):
+        """
+        Setup all the objects that appear in the window
+        :param max_concurrent_uploads: starting value of the concurrent uploads box
+        :return: None
+        """
+        self._add_run_button = QtWidgets.QPushButton(self)
+        self._add_run_button.setText("Add Run Directory")
+        self._add_batch_button = QtWidgets.QPushButton(self)
+        self._add_batch_button.setText("Add Batch Directory")
+        self._remove_button = QtWidgets.QPushButton(self)
+        self._remove_button.setText("Remove Selected Run")
+        # upload mode
+        self._upload_mode_label = QtWidgets.QLabel("Upload Mode: ")
+        self._upload_mode_combobox = QtWidgets.QComboBox(self)
+        self._upload_mode_combobox.addItems(UPLOAD_MODES)
+        self._upload_mode_combobox.setCurrentIndex(0)
+        # concurrent uploads
+        self._concurrency_label = QtWidgets.QLabel("Concurrent Uploads: ")
+        self._concurrency_spinbox = QtWidgets.QSpinBox(self)
+        self._concurrency_spinbox.setRange(1, 16)
+        self._concurrency_spinbox.setValue(max_concurrent_uploads)
+        # Start button
+        self._start_button = widgets.UploadButton(self)
+        self._start_button.setText("Start Queue")
+        # Table
+        self._table = QtWidgets.QTableView(self)
+        self._table_model = widgets.RunQueueModel(self)
+        self._table.setModel(self._table_model)
+        self._table.setItemDelegateForColumn(widgets.RunQueueModel.TABLE_PROGRESS, widgets.ProgressDelegate(self))
+        self._table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self._table.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
+        self._table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self._table.setColumnWidth(widgets.RunQueueModel.TABLE_RUN, 200)
+        self._table.horizontalHeader().setStretchLastSection(True)
+        self._table.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+
+    def _init_layout(self):
+        """
+        Setup layout
+        :return: QtWidgets.QVBoxLayout
+        """
+        layout = QtWidgets.QVBoxLayout()
+
+        add_layout = QtWidgets.QHBoxLayout()
+        add_layout.addWidget(self._add_run_button)
+        add_layout.addWidget(self._add_batch_button)
+        add_layout.addWidget(self._remove_button)
+        layout.addLayout(add_layout)
+
+        options_layout = QtWidgets.QHBoxLayout()
+        options_layout.addWidget(self._upload_mode_label)
+        options_layout.addWidget(self._upload_mode_combobox)
+        options_layout.addWidget(self._concurrency_label)
+        options_layout.addWidget(self._concurrency_spinbox)
+        layout.addLayout(options_layout)
+
+        layout.addWidget(self._table)
+        layout.addWidget(self._start_button)
+        return layout
+
+    def is_uploading(self):
+        """
+        :return: True while runs are uploading, or waiting to be uploaded
+        """
+        return self._queue.is_uploading()
+
+    @staticmethod
+    def _get_max_concurrent_uploads():
+        """
+        Reads the number of runs uploaded at the same time from the config
+        :return: int
+        """
+        try:
+            max_concurrent_uploads = config.get_settings().gui_max_concurrent_uploads
+        except NameError:
+            max_concurrent_uploads = 0
+        if max_concurrent_uploads <= 0:
+            logging.warning("Config option 'gui_max_concurrent_uploads' must be a whole number greater than 0, "
+                            "using the default of {}".format(upload_queue.DEFAULT_MAX_CONCURRENT_UPLOADS))
+            return upload_queue.DEFAULT_MAX_CONCURRENT_UPLOADS
+        return max_concurrent_uploads
+
+    #################
+    #    Buttons    #
+    #################
+
+    def _btn_add_run(self):
+        """
+        Opens a directory dialog and adds the chosen run directory to the queue
+        :return:
+        """
+        logging.debug("GUI: _btn_add_run clicked")
+        directory = str(QtWidgets.QFileDialog.getExistingDirectory(self, "Select Run Directory"))
+        if directory:
+            self._queue.add_run(directory)
+            self._refresh()
+
+    def _btn_add_batch(self):
+        """
+        Opens a directory dialog and adds every run directory in the chosen directory to the queue
+        :return:
+        """
+        logging.debug("GUI: _btn_add_batch clicked")
+        directory = str(QtWidgets.QFileDialog.getExistingDirectory(self, "Select Batch Directory"))
+        if directory:
+            try:
+                self._queue.add_batch(directory)
+            except Exception as e:
+                logging.error("GUI: Could not add batch directory '{}': {}".format(directory, e))
+                QtWidgets.QMessageBox.warning(self, "Could not add batch directory", str(e))
+            self._refresh()
+
+    def _btn_remove(self):
+        """
+        Removes the selected run from the queue, runs that are uploading can not be removed
+        :return:
+        """
+        for index in self._table.selectionModel().selectedRows():
+            self._queue.remove_run(self._table_model.get_directory(index.row()))
+        self._refresh()
+
+    def _btn_start(self):
+        """
+        Starts uploading the runs in the queue
+        :return:
+        """
+        logging.debug("GUI: _btn_start clicked")
+        self._queue.set_upload_mode(self._upload_mode_combobox.currentText())
+        self._upload_mode_combobox.setEnabled(False)
+        self._start_button.set_uploading()
+        self._uploading = True
+        self._queue.start()
+
+    def _refresh(self):
+        """
+        Updates the table with the state of the queue, and unlocks the start button when the queue is done
+        :return:
+        """
+        self._table_model.set_runs(self._queue.get_runs())
+        if self._uploading and not self._queue.is_uploading():
+            self._uploading = False
+            self._upload_mode_combobox.setEnabled(True)
+            self._start_button.set_ready()
+            self._start_button.setText("Start Queue")
+
+    def closeEvent(self, event):
+        """
+        Closing the window only hides it, the queue keeps uploading
+        :param event:
+        :return:
+        """
+        self.hide()
+        event.ignore()
@@ -4,7 +4,7 @@ import PyQt5.QtCore as QtCore
 
 from pprint import pformat
 
-from iridauploader.core import upload, parsing_handler, exit_return, upload_helpers
+from iridauploader.core import upload, parsing_handler, exit_return, upload_helpers, file_stats
 from iridauploader.parsers import exceptions
 
 
@@ -50,20 +50,32 @@ class ParseThread(QtCore.QThread):
         super().__init__()
         self._directory = ""
         self._parse_as_partial = False
+        self._directory_status = None
         self._run = None
+        self._fingerprint = None
         self._error = None
 
-    def set_vars(self, directory, parse_as_partial):
+    def set_vars(self, directory, parse_as_partial, directory_status=None):
         """
         Sets the variables in the object to the ones passed in
+        :param directory:
+        :param parse_as_partial:
+        :param directory_status: Default None, status found by the StatusThread, read again when not given
         :return:
         """
         self._directory = directory
         self._parse_as_partial = parse_as_partial
+        self._directory_status = directory_status
 
     def get_run(self):
         return self._run
 
+    def get_fingerprint(self):
+        """
+        :return: fingerprint of the run directory from before it was parsed, used to skip parsing again on upload
+        """
+        return self._fingerprint
+
     def get_error(self):
         return self._error
 
@@ -72,8 +84,13 @@ class ParseThread(QtCore.QThread):
         This runs when the threads start call is done
         :return:
         """
+        self._fingerprint = None
         try:
-            status = parsing_handler.get_run_status(self._directory)
+            # fingerprint is taken first, so changes made while parsing are found at upload
+            self._fingerprint = file_stats.get_directory_fingerprint(self._directory)
+            status = self._directory_status
+            if status is None:
+                status = parsing_handler.get_run_status(self._directory)
             seq_run = parsing_handler.parse_and_validate(self._directory)
             if self._parse_as_partial:
                 seq_run = upload_helpers.set_uploaded_samples_to_skip(seq_run, status.get_sample_status_list())
@@ -130,18 +147,29 @@ class UploadThread(QtCore.QThread):
         self._upload_mode = None
         self._exit_return = None
         self._partial_continue = False
+        self._sequencing_run = None
+        self._directory_status = None
+        self._fingerprint = None
 
-    def set_vars(self, run_dir, upload_mode, partial_continue):
+    def set_vars(self, run_dir, upload_mode, partial_continue, sequencing_run=None, directory_status=None,
+                 fingerprint=None):
         """
         Sets the variables in the object to the ones passed in
+        When the run parsed by the ParseThread is given, it is uploaded without parsing again if nothing changed
         :param run_dir:
         :param upload_mode:
         :param partial_continue:
+        :param sequencing_run: Default None, run parsed by the ParseThread
+        :param directory_status: Default None, status of the run the ParseThread parsed
+        :param fingerprint: Default None, fingerprint of the run directory from the ParseThread
         :return:
         """
         self._run_dir = run_dir
         self._upload_mode = upload_mode
         self._partial_continue = partial_continue
+        self._sequencing_run = sequencing_run
+        self._directory_status = directory_status
+        self._fingerprint = fingerprint
 
     def run(self):
         """
@@ -154,10 +182,18 @@ class UploadThread(QtCore.QThread):
         """
 
         force_upload = not self._partial_continue
-        self._exit_return = upload.upload_run_single_entry(directory=self._run_dir,
-                                                           force_upload=force_upload,
-                                                           upload_mode=self._upload_mode,
-                                                           continue_upload=self._partial_continue)
+        if self._sequencing_run is not None and self._directory_status is not None and self._fingerprint is not None:
+            self._exit_return = upload.upload_parsed_run_single_entry(sequencing_run=self._sequencing_run,
+                                                                      directory_status=self._directory_status,
+                                                                      directory_fingerprint=self._fingerprint,
+                                                                      force_upload=force_upload,
+                                                                      upload_mode=self._upload_mode,
+                                                                      continue_upload=self._partial_continue)
+        else:
+            self._exit_return = upload.upload_run_single_entry(directory=self._run_dir,
+                                                               force_upload=force_upload,
+                                                               upload_mode=self._upload_mode,
+                                                               continue_upload=self._partial_continue)
         pass
 
     def is_success(self):
@@ -1,43 +1,46 @@
 import logging
-# PyQt needs to be imported like this because for whatever reason they decided not to include a __all__ = [...]
-import PyQt5.QtCore as QtCore
+
+from collections import deque
 
 from iridauploader.core import api_handler
 
 
-class QtHandler(logging.Handler):
+class BufferedLogHandler(logging.Handler):
     """
     Custom logging handler
-    Overrides the default emit function to call the message writers emit instead
+    Keeps the formatted records in a buffer, which the GUI empties on a timer
 
-    A non Qt object cannot execute Qt emits so we wrap this handler around the MessageWriter
+    The logging threads only append to the buffer, so they never wait on the GUI thread, and the GUI adds the text
+    of many records at once instead of redrawing for every record
     """
-    def __init__(self):
+    def __init__(self, max_lines):
+        """
+        :param max_lines: maximum lines kept until the GUI takes them, older lines are dropped
+        """
         logging.Handler.__init__(self)
-        self._message_writer = MessageWriter()
+        self._buffer = deque(maxlen=max_lines)
 
     def emit(self, record):
-        record = self.format(record)
-        if record:
-            self._message_writer.write(record)
-
-    @property
-    def message_writer(self):
-        return self._message_writer
-
-
-class MessageWriter(QtCore.QObject):
-    """
-    Wrapper the logging handler can use to emit a message,
-    This object is needed to hold the messageWritten signal that needs to belong to Qt
-    """
-    messageWritten = QtCore.pyqtSignal(str)
-
-    def flush(self):
-        pass
-
-    def write(self, msg):
-        self.messageWritten.emit(msg)
+        try:
+            text = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        if text:
+            # deque appends are thread safe
+            self._buffer.append(text)
+
+    def take_lines(self):
+        """
+        Empties the buffer
+        :return: list of formatted records, oldest first
+        """
+        lines = []
+        while True:
+            try:
+                lines.append(self._buffer.popleft())
+            except IndexError:
+                return lines
 
 
 def is_connected_to_irida():
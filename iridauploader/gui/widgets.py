@@ -2,107 +2,240 @@
 
 import logging
 # PyQt needs to be imported like this because for whatever reason they decided not to include a __all__ = [...]
+import PyQt5.QtCore as QtCore
+import PyQt5.QtGui as QtGui
 import PyQt5.QtWidgets as QtWidgets
 
+import datetime
 import os
 
+from collections import deque
+
 from iridauploader.core import logger
 import iridauploader.progress as progress
 
 from . import colours, tools
 
+# Log lines kept by the log console when the gui_log_max_lines config option is not valid
+DEFAULT_LOG_MAX_LINES = 10000
+
 
-class ProgressBarHandler:
+class SampleTableModel(QtCore.QAbstractTableModel):
     """
-    This class handles a dictionary of progress bars, indexed off of the project/sample list in the sequencing run
-    It simplifies updating the progress bars percentage by allowing us to pass it only the sample and project to update
+    Holds the rows of the sample table, and the upload progress of each sample
+    Progress updates are collected and announced to the view in one dataChanged per refresh, so large runs do not
+    redraw the table for every update
     """
-    def __init__(self, q_parent=None):
-        # Create a dictionary for new progress bars
-        self._bar_dict = {}
-        # link the qt parent so things die correctly
-        self._q_parent = q_parent
-
-    @staticmethod
-    def _get_key(sample, project):
-        """
-        Key is created by joining the sample and project id together with a period
-        :param sample:
-        :param project:
-        :return:
-        """
-        return sample + "." + project
+    # X index for the table
+    TABLE_SAMPLE_NAME = 0
+    TABLE_FILE_1 = 1
+    TABLE_FILE_2 = 2
+    TABLE_PROJECT = 3
+    TABLE_PROGRESS = 4
+    HEADERS = ["Sample Name", "File 1", "File 2", "Project", "Progress"]
+
+    # The progress delegate reads the progress value with this role
+    PROGRESS_ROLE = QtCore.Qt.UserRole
+    # Milliseconds between progress refreshes
+    REFRESH_INTERVAL = 100
 
-    def _get_bar(self, sample, project):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # list of [sample name, file 1, file 2, project id, progress]
+        self._rows = []
+        # (sample name, project id) -> row index
+        self._row_index = {}
+        # rows with progress changes not yet announced to the view
+        self._changed_rows = set()
+        self._refresh_timer = QtCore.QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(self.REFRESH_INTERVAL)
+        self._refresh_timer.timeout.connect(self._announce_changed_rows)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        value = self._rows[index.row()][index.column()]
+        if index.column() == self.TABLE_PROGRESS:
+            return value if role == self.PROGRESS_ROLE else None
+        if role == QtCore.Qt.DisplayRole:
+            return value
+        return None
+
+    def set_sequencing_run(self, sequencing_run, partial):
         """
-        Gets the progress bars key and returns is
-        :param sample:
-        :param project:
+        Replaces the rows with the samples of a SequencingRun
+        :param sequencing_run: SequencingRun object
+        :param partial: Indicate already uploaded files in table
         :return:
         """
-        return self._bar_dict[self._get_key(sample, project)]
+        self.beginResetModel()
+        self._rows = []
+        self._row_index = {}
+        self._changed_rows = set()
+        for project in sequencing_run.project_list:
+            for sample in project.sample_list:
+                files = sample.sequence_file.file_list
+                self._row_index[(sample.sample_name, str(project.id))] = len(self._rows)
+                self._rows.append([
+                    sample.sample_name,
+                    os.path.basename(files[0]),
+                    os.path.basename(files[1]) if len(files) == 2 else "",
+                    str(project.id),
+                    100 if sample.skip and partial else 0
+                ])
+        self.endResetModel()
 
-    def add_bar(self, sample, project):
+    def clear(self):
+        self.beginResetModel()
+        self._rows = []
+        self._row_index = {}
+        self._changed_rows = set()
+        self.endResetModel()
+
+    def set_progress(self, sample, project, value):
         """
-        Create a new progress bar given a sample and project id
+        Sets the progress of a sample, the view is updated at the next refresh
         :param sample: sample name
         :param project: project id
-        :return: QUploadProgressBar
+        :param value: value to set (0-100)
+        :return:
         """
-        key = self._get_key(sample, project)
-        bar = self.QUploadProgressBar(parent=self._q_parent)
-        self._bar_dict[key] = bar
-        return bar
-
-    def clear(self):
+        row = self._row_index.get((sample, str(project)))
+        if row is None:
+            return
+        self._rows[row][self.TABLE_PROGRESS] = int(value)
+        self._changed_rows.add(row)
+        if not self._refresh_timer.isActive():
+            self._refresh_timer.start()
+
+    def _announce_changed_rows(self):
         """
-        Clears all the progress bars
-        :return:
+        Tells the view which rows of the progress column changed since the last refresh, with a single signal
         """
-        self._bar_dict.clear()
+        if not self._changed_rows:
+            return
+        top_left = self.index(min(self._changed_rows), self.TABLE_PROGRESS)
+        bottom_right = self.index(max(self._changed_rows), self.TABLE_PROGRESS)
+        self._changed_rows = set()
+        self.dataChanged.emit(top_left, bottom_right, [self.PROGRESS_ROLE])
+
+
+class ProgressDelegate(QtWidgets.QStyledItemDelegate):
+    """
+    Draws the progress column as progress bars, so no widget is created for each row
+    """
+    IN_PROGRESS_COLOUR = QtGui.QColor(colours.BLUE_LIGHT)
+    COMPLETED_COLOUR = QtGui.QColor(colours.GREEN_LIGHT)
+
+    def paint(self, painter, option, index):
+        value = index.data(SampleTableModel.PROGRESS_ROLE) or 0
+
+        progress_option = QtWidgets.QStyleOptionProgressBar()
+        progress_option.rect = option.rect
+        progress_option.minimum = 0
+        progress_option.maximum = 100
+        progress_option.progress = value
+        progress_option.text = "{}%".format(value)
+        progress_option.textVisible = True
+        progress_option.textAlignment = QtCore.Qt.AlignCenter
+        progress_option.state = option.state | QtWidgets.QStyle.State_Horizontal
+        progress_option.palette = QtGui.QPalette(option.palette)
+        progress_option.palette.setColor(QtGui.QPalette.Highlight,
+                                         self.COMPLETED_COLOUR if value >= 100 else self.IN_PROGRESS_COLOUR)
+        progress_option.palette.setColor(QtGui.QPalette.HighlightedText, QtGui.QColor("black"))
+
+        style = option.widget.style() if option.widget else QtWidgets.QApplication.style()
+        style.drawControl(QtWidgets.QStyle.CE_ProgressBar, progress_option, painter, option.widget)
+
+
+class RunQueueModel(QtCore.QAbstractTableModel):
+    """
+    Holds the rows of the upload queue table, from the run dicts of an UploadQueue
+    """
+    # X index for the table
+    TABLE_RUN = 0
+    TABLE_STATE = 1
+    TABLE_SAMPLES = 2
+    TABLE_SIZE = 3
+    TABLE_PROGRESS = 4
+    TABLE_RATE = 5
+    TABLE_ETA = 6
+    TABLE_MESSAGE = 7
+    HEADERS = ["Run", "Status", "Samples", "Size", "Progress", "Speed", "Time Left", "Message"]
 
-    def set_value(self, sample, project, value):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # list of UploadQueue run dicts
+        self._runs = []
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._runs)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        run = self._runs[index.row()]
+        column = index.column()
+        if column == self.TABLE_PROGRESS:
+            if role != SampleTableModel.PROGRESS_ROLE:
+                return None
+            if not run["total_bytes"]:
+                return 0
+            return int(min(run["bytes_sent"] / run["total_bytes"], 1) * 100)
+        if role == QtCore.Qt.ToolTipRole and column in (self.TABLE_RUN, self.TABLE_MESSAGE):
+            return run["directory"] if column == self.TABLE_RUN else run["message"]
+        if role != QtCore.Qt.DisplayRole:
+            return None
+        if column == self.TABLE_RUN:
+            return os.path.basename(os.path.normpath(run["directory"]))
+        if column == self.TABLE_STATE:
+            return run["state"].capitalize()
+        if column == self.TABLE_SAMPLES:
+            return str(run["sample_count"]) if run["sample_count"] else ""
+        if column == self.TABLE_SIZE:
+            return "{:.1f} MB".format(run["total_bytes"] / 1024 ** 2) if run["total_bytes"] else ""
+        if column == self.TABLE_RATE:
+            return "{:.1f} MB/s".format(run["rate"] / 1024 ** 2) if run["rate"] is not None else ""
+        if column == self.TABLE_ETA:
+            return str(datetime.timedelta(seconds=int(run["eta"]))) if run["eta"] is not None else ""
+        return run["message"]
+
+    def get_directory(self, row):
+        return self._runs[row]["directory"]
+
+    def set_runs(self, run_list):
         """
-        Sets the value of a progress bar given a sample and project id
-        :param sample: sample name
-        :param project: project id
-        :param value: value to set (0-100), if the sample is paired end, the progress advances at half rate
+        Updates the table, with one dataChanged when the runs are the same as the last update
+        :param run_list: list of UploadQueue run dicts
         :return:
         """
-        bar = self._get_bar(sample, project)
-        bar.setValue(value)
-
-    class QUploadProgressBar(QtWidgets.QProgressBar):
-        # Styles for progress bar using the Qt style sheet format
-        DEFAULT_STYLE = (
-            "QProgressBar{{text-align: center}}"
-            "QProgressBar::chunk {{background-color: {0}; width: 10px; margin: 0px;}}".format(
-                colours.BLUE_LIGHT
-            )
-        )
-        COMPLETED_STYLE = (
-            "QProgressBar{{text-align: center}}"
-            "QProgressBar::chunk {{background-color: {}; width: 10px; margin: 0px;}}".format(
-                colours.GREEN_LIGHT
-            )
-        )
-
-        def __init__(self, parent=None):
-            super().__init__()
-            QtWidgets.QProgressBar.__init__(self, parent)
-            self.setStyleSheet(self.DEFAULT_STYLE)
-
-        def setValue(self, value):
-            """
-            Sets the value of the progress bar
-            :param value: int or float
-            :return: None
-            """
-            QtWidgets.QProgressBar.setValue(self, int(value))
-
-            # upload is complete, set the style
-            if QtWidgets.QProgressBar.value(self) == 100:
-                self.setStyleSheet(self.COMPLETED_STYLE)
+        if [run["directory"] for run in run_list] != [run["directory"] for run in self._runs]:
+            self.beginResetModel()
+            self._runs = run_list
+            self.endResetModel()
+        elif run_list != self._runs:
+            self._runs = run_list
+            self.dataChanged.emit(self.index(0, 0), self.index(len(run_list) - 1, len(self.HEADERS) - 1))
 
 
 class UploadButton(QtWidgets.QPushButton):
@@ -145,24 +278,25 @@ class UploadButton(QtWidgets.QPushButton):
         self.setStyleSheet("background-color: {}; color: black".format(colours.GREEN_LIGHT))
 
 
-class SampleTable(QtWidgets.QTableWidget):
+class SampleTable(QtWidgets.QTableView):
     """
-    This table extends the basic QTableWidget and manages the creation of Progress bars and other widgets in the table
-    The widget is also responsible to handle the message passing of progress data to the Progress bar handler
+    This table shows the samples of a run from a SampleTableModel, with progress bars drawn by a ProgressDelegate
+    The widget is also responsible to pass progress data to the model
     """
     # X index for the table
-    TABLE_SAMPLE_NAME = 0
-    TABLE_FILE_1 = 1
-    TABLE_FILE_2 = 2
-    TABLE_PROJECT = 3
-    TABLE_PROGRESS = 4
+    TABLE_SAMPLE_NAME = SampleTableModel.TABLE_SAMPLE_NAME
+    TABLE_FILE_1 = SampleTableModel.TABLE_FILE_1
+    TABLE_FILE_2 = SampleTableModel.TABLE_FILE_2
+    TABLE_PROJECT = SampleTableModel.TABLE_PROJECT
+    TABLE_PROGRESS = SampleTableModel.TABLE_PROGRESS
 
     def __init__(self, parent=None):
         super().__init__()
-        QtWidgets.QTableWidget.__init__(self, parent)
-        self.setEditTriggers(QtWidgets.QTableWidget.NoEditTriggers)
-        self.setColumnCount(5)
-        self.setHorizontalHeaderLabels(["Sample Name", "File 1", "File 2", "Project", "Progress"])
+        QtWidgets.QTableView.__init__(self, parent)
+        self._model = SampleTableModel(self)
+        self.setModel(self._model)
+        self.setItemDelegateForColumn(self.TABLE_PROGRESS, ProgressDelegate(self))
+        self.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
         self.setColumnWidth(self.TABLE_SAMPLE_NAME, 170)
         self.setColumnWidth(self.TABLE_FILE_1, 200)
         self.setColumnWidth(self.TABLE_FILE_2, 200)
@@ -170,100 +304,135 @@ class SampleTable(QtWidgets.QTableWidget):
         self.setColumnWidth(self.TABLE_PROGRESS, 135)
         header = self.horizontalHeader()
         header.setSectionResizeMode(self.TABLE_PROGRESS, QtWidgets.QHeaderView.Stretch)
-        # set up progress bar handler
-        self._progress_bars = ProgressBarHandler(self)
+        # Fixed row heights, so rows are not measured when the table is filled
+        self.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
         # subscribe the progress updates signal
         progress.signal_worker.progress_signal.connect(self._update_progress)
 
     def fill_table(self, sequencing_run, partial):
         """
         Given a SequencingRun, fill the table with data
-        includes sample name, file names, project, and progress widget
+        includes sample name, file names, project, and progress
         :param sequencing_run: SequencingRun object
         :param partial: Indicate already uploaded files in table
         :return:
         """
-        # total number of samples
-        sample_count = 0
-
-        project_list = sequencing_run.project_list
-        for project in project_list:
-            sample_list = project.sample_list
-            sample_count = sample_count + len(sample_list)
-
-        # Set the row count to the number of samples in this run
-        self.setRowCount(sample_count)
-        # clear all the progress bars we may have created
-        self._progress_bars.clear()
-
-        y_index = 0
-        for project in project_list:
-            sample_list = project.sample_list
-            for sample in sample_list:
-                files = sample.sequence_file.file_list
-                self.setItem(y_index, self.TABLE_SAMPLE_NAME,
-                             QtWidgets.QTableWidgetItem(sample.sample_name))
-                self.setItem(y_index, self.TABLE_FILE_1,
-                             QtWidgets.QTableWidgetItem(os.path.basename(files[0])))
-                if len(files) == 2:
-                    self.setItem(y_index, self.TABLE_FILE_2,
-                                 QtWidgets.QTableWidgetItem(os.path.basename(files[1])))
-                self.setItem(y_index, self.TABLE_PROJECT, QtWidgets.QTableWidgetItem(project.id))
-
-                new_progress_bar = self._progress_bars.add_bar(sample=sample.sample_name,
-                                                               project=str(project.id))
-                self.setCellWidget(y_index, self.TABLE_PROGRESS, new_progress_bar)
-                print(sample.get_dict())
-                if sample.skip and partial:
-                    self._progress_bars.set_value(sample=sample.sample_name,
-                                                  project=project.id,
-                                                  value=100)
-
-                y_index = y_index + 1
+        self._model.set_sequencing_run(sequencing_run, partial)
 
     def clear_table(self):
         """
         Wipes out tables contents and sets the row count back to 0
         :return:
         """
-        self.clearContents()
-        self.setRowCount(0)
+        self._model.clear()
 
     def _update_progress(self, data):
         """
-        Updates the progress bars in the table
-        receives the ProgressData object signal, and calls to the progress bar handler to update progres
+        Updates the progress in the table
+        receives the ProgressData object signal, and passes it to the model
         :param data: ProgressData
         :return:
         """
-        self._progress_bars.set_value(sample=data.sample,
-                                      project=data.project,
-                                      value=data.progress)
+        self._model.set_progress(sample=data.sample,
+                                 project=data.project,
+                                 value=data.progress)
 
 
 class LogTextBox(QtWidgets.QPlainTextEdit):
-    def __init__(self, parent=None):
+    """
+    Shows the log, the text is added in batches on a timer and the oldest lines are dropped past max_lines
+    Only lines containing the filter text are shown
+    """
+    # Milliseconds between adding the new log lines
+    FLUSH_INTERVAL = 200
+
+    def __init__(self, parent=None, max_lines=DEFAULT_LOG_MAX_LINES):
         super().__init__()
         QtWidgets.QPlainTextEdit.__init__(self, parent)
-        # Set read only mode and hide
+        # Set read only mode
         self.setReadOnly(True)
-        self.hide()
+        self._filter_text = ""
+        # all the lines, used to show the lines matching a new filter
+        self._lines = deque(maxlen=max_lines)
+        self.setMaximumBlockCount(max_lines)
 
         # Setup logging handler
-        handler = tools.QtHandler()
-        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)-8s %(message)s', datefmt='%H:%M:%S'))
-        handler.setLevel(logging.INFO)
-        # connect to the log/redraw function
-        handler.message_writer.messageWritten.connect(self._write)
-        # finally add it to the logging module
-        logger.root_logger.addHandler(handler)
-
-    def _write(self, text):
+        self._handler = tools.BufferedLogHandler(max_lines)
+        self._handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)-8s %(message)s', datefmt='%H:%M:%S'))
+        self._handler.setLevel(logging.INFO)
+        # finally add it to the logging module, records are formatted on the logging thread
+        logger.add_handler(self._handler)
+
+        # add the buffered lines on a timer
+        self._flush_timer = QtCore.QTimer(self)
+        self._flush_timer.setInterval(self.FLUSH_INTERVAL)
+        self._flush_timer.timeout.connect(self._write)
+        self._flush_timer.start()
+
+    def set_max_lines(self, max_lines):
+        """
+        Sets the number of lines kept, older lines are dropped
+        :param max_lines: int
+        :return:
+        """
+        self._write()
+        self._lines = deque(self._lines, maxlen=max_lines)
+        self.setMaximumBlockCount(max_lines)
+
+    def set_filter(self, text):
+        """
+        Shows only the lines containing text, ignoring case
+        :param text: an empty string shows all lines
+        :return:
+        """
+        self._write()
+        self._filter_text = text.lower()
+        self.setPlainText("\n".join(self._filter_lines(self._lines)))
+        self.moveCursor(QtGui.QTextCursor.End)
+
+    def _filter_lines(self, lines):
+        if not self._filter_text:
+            return lines
+        return [line for line in lines if self._filter_text in line.lower()]
+
+    def _write(self):
+        """
+        Adds the lines logged since the last call to the logger box, in one block of text
+        Used as a slot for the flush timer
+        :return:
+        """
+        lines = self._handler.take_lines()
+        if not lines:
+            return
+        self._lines.extend(lines)
+        shown_lines = self._filter_lines(lines)
+        if shown_lines:
+            self.appendPlainText("\n".join(shown_lines))
+
+
+class LogConsole(QtWidgets.QWidget):
+    """
+    The log box, with a line to filter the log
+    """
+    def __init__(self, parent=None):
+        super().__init__()
+        QtWidgets.QWidget.__init__(self, parent)
+        self._filter_line = QtWidgets.QLineEdit(self)
+        self._filter_line.setPlaceholderText("Filter log")
+        self._filter_line.setClearButtonEnabled(True)
+        self._text_box = LogTextBox(self)
+        self._filter_line.textChanged.connect(self._text_box.set_filter)
+
+        layout = QtWidgets.QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self._filter_line)
+        layout.addWidget(self._text_box)
+        self.setLayout(layout)
+        self.hide()
+
+    def set_max_lines(self, max_lines):
         """
-        Adds the text given to the logger box, and repaints so it displays
-        Used as a slot for emits
-        :param text:
+        :param max_lines: number of log lines kept
         :return:
         """
-        self.appendPlainText(text)
-        self.repaint()
+        self._text_box.set_max_lines(max_lines)
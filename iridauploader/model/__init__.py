@@ -1,8 +1,20 @@
-from iridauploader.model.sequencing_run import SequencingRun
 from iridauploader.model.metadata import Metadata
-from iridauploader.model.project import Project
-from iridauploader.model.sample import Sample
-from iridauploader.model.sequence_file import SequenceFile
+from iridauploader.model.sequence_file import SequenceFile, FileStat
 from iridauploader.model.directory_status import DirectoryStatus
 from iridauploader.model.validation_result import ValidationResult
 from iridauploader.model import exceptions
+
+# These models register their types with cerberus, which is slow to import.
+# They are loaded the first time they are used, so checking the status of a run does not import cerberus.
+_CERBERUS_MODELS = {
+    "SequencingRun": "iridauploader.model.sequencing_run",
+    "Project": "iridauploader.model.project",
+    "Sample": "iridauploader.model.sample",
+}
+
+
+def __getattr__(name):
+    if name in _CERBERUS_MODELS:
+        import importlib
+        return getattr(importlib.import_module(_CERBERUS_MODELS[name]), name)
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
@@ -166,7 +166,7 @@ class DirectoryStatus:
     @property
     def irida_instance(self):
         if self._irida_instance is None:
-            self._irida_instance = config.read_config_option('base_url')
+            self._irida_instance = config.get_settings().base_url
         return self._irida_instance
 
     @irida_instance.setter
@@ -7,7 +7,15 @@ index
 i5IndexID
 index2
 etc.
+
+The size and modification time of each file are cached on the SequenceFile, see core/file_stats.py
 """
+import os
+
+from collections import namedtuple
+
+# Size in bytes and modification time in nanoseconds of a file, the same fields as os.stat_result
+FileStat = namedtuple("FileStat", ["st_size", "st_mtime_ns"])
 
 
 class SequenceFile:
@@ -29,6 +37,8 @@ class SequenceFile:
         else:
             self._properties_dict = properties_dict  # Sample metadata, needed run_id gets affixed in upload
         self._file_list = file_list
+        # file name -> FileStat
+        self._file_stats = {}
 
     @property
     def properties_dict(self):
@@ -44,6 +54,38 @@ class SequenceFile:
     def file_list(self):
         return self._file_list
 
+    def set_file_stat(self, file_name, file_stat):
+        """
+        :param file_name: file in file_list
+        :param file_stat: FileStat or os.stat_result
+        :return: None
+        """
+        self._file_stats[file_name] = FileStat(file_stat.st_size, file_stat.st_mtime_ns)
+
+    def get_file_stat(self, file_name):
+        """
+        Returns the cached stat of a file, the file is only read from disk when it has not been cached yet
+
+        :param file_name: file in file_list
+        :return: FileStat
+        """
+        if file_name not in self._file_stats:
+            self.set_file_stat(file_name, os.stat(file_name))
+        return self._file_stats[file_name]
+
+    def get_file_size(self, file_name):
+        """
+        :param file_name: file in file_list
+        :return: size of the file in bytes
+        """
+        return self.get_file_stat(file_name).st_size
+
+    def get_total_file_size(self):
+        """
+        :return: size of all files in file_list in bytes
+        """
+        return sum(self.get_file_size(file_name) for file_name in self._file_list)
+
     def is_paired_end(self):
         return len(self._file_list) == 2
 
@@ -52,4 +94,5 @@ class SequenceFile:
         return str(d)
 
     def get_dict(self):
-        return self.__dict__
+        # the file stats are a cache, not part of the model
+        return {key: value for key, value in self.__dict__.items() if key != '_file_stats'}
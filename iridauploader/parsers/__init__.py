@@ -1,5 +1,6 @@
 from iridauploader.parsers.base_parser import BaseParser
 from iridauploader.parsers.parsers import supported_parsers
 from iridauploader.parsers.parsers import parser_factory
+from iridauploader.parsers.parsers import get_required_file_list
 from iridauploader.parsers import exceptions
 from iridauploader.parsers import common
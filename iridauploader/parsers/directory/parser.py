@@ -5,20 +5,21 @@ import iridauploader.progress as progress
 
 from iridauploader.parsers import exceptions
 from iridauploader.parsers import common
+from iridauploader.parsers import required_files
 from iridauploader.parsers import BaseParser
 from iridauploader.parsers.directory import sample_parser, validation
 
 
 class Parser(BaseParser):
 
-    SAMPLE_SHEET_FILE_NAME = 'SampleList.csv'
+    SAMPLE_SHEET_FILE_NAME = required_files.SAMPLE_LIST_FILE_NAME
 
     def __init__(self, parser_type_name='directory'):
         """
         Initialize the Parser
         :param parser_type_name: string to be included in metadata of sequencing run for type identification in IRIDA
         """
-        super().__init__(parser_type_name=parser_type_name, required_file_list=[Parser.SAMPLE_SHEET_FILE_NAME])
+        super().__init__(parser_type_name=parser_type_name, required_file_list=list(required_files.DIRECTORY_REQUIRED_FILES))
 
     def find_runs(self, directory):
         """
@@ -7,13 +7,14 @@ import iridauploader.progress as progress
 from iridauploader.parsers import BaseParser
 from iridauploader.parsers import exceptions
 from iridauploader.parsers import common
+from iridauploader.parsers import required_files
 from iridauploader.parsers.miniseq import sample_parser, validation
 
 
 class Parser(BaseParser):
 
-    SAMPLE_SHEET_FILE_NAME = 'SampleSheet.csv'
-    UPLOAD_COMPLETE_FILE_NAME = 'CompletedJobInfo.xml'
+    SAMPLE_SHEET_FILE_NAME = required_files.SAMPLE_SHEET_FILE_NAME
+    UPLOAD_COMPLETE_FILE_NAME = required_files.COMPLETED_JOB_INFO_FILE_NAME
 
     def __init__(self, parser_type_name='miniseq'):
         """
@@ -22,10 +23,7 @@ class Parser(BaseParser):
         """
         super().__init__(
             parser_type_name=parser_type_name,
-            required_file_list=[
-                Parser.SAMPLE_SHEET_FILE_NAME,
-                Parser.UPLOAD_COMPLETE_FILE_NAME
-            ])
+            required_file_list=list(required_files.MISEQ_REQUIRED_FILES))
 
     @staticmethod
     def get_relative_data_directory():
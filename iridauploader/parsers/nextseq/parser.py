@@ -7,12 +7,13 @@ import iridauploader.progress as progress
 from iridauploader.parsers import BaseParser
 from iridauploader.parsers import exceptions
 from iridauploader.parsers import common
+from iridauploader.parsers import required_files
 from iridauploader.parsers.nextseq import sample_parser, validation
 
 
 class Parser(BaseParser):
 
-    UPLOAD_COMPLETE_FILE_NAME = 'RTAComplete.txt'
+    UPLOAD_COMPLETE_FILE_NAME = required_files.RTA_COMPLETE_FILE_NAME
 
     def __init__(self, parser_type_name='miseq', sample_sheet_override=None, additional_required_files=None, strict_sample_name_matching=False):
         """
@@ -22,7 +23,7 @@ class Parser(BaseParser):
         if sample_sheet_override is not None:
             self.SAMPLE_SHEET_FILE_NAME = sample_sheet_override
         else:
-            self.SAMPLE_SHEET_FILE_NAME = 'SampleSheet.csv'
+            self.SAMPLE_SHEET_FILE_NAME = required_files.SAMPLE_SHEET_FILE_NAME
 
         req_files = [self.SAMPLE_SHEET_FILE_NAME, Parser.UPLOAD_COMPLETE_FILE_NAME]
         if additional_required_files is not None:
@@ -1,6 +1,7 @@
+import importlib
 import logging
 
-from iridauploader.parsers import directory, miseq, miniseq, nextseq, nextseq2k_nml
+from iridauploader.parsers import required_files
 
 supported_parsers = [
     'miseq',
@@ -17,6 +18,28 @@ supported_parsers = [
     'nextseq_nml_strict_sample_name'
 ]
 
+# Parser packages that parser_factory creates parsers from
+_PARSER_MODULES = ['directory', 'miseq', 'miniseq', 'nextseq', 'nextseq2k_nml']
+
+# Files that must be in a run directory for each parser type, the same lists the parsers are created with.
+# These let the status of runs be checked without importing or creating a parser.
+_REQUIRED_FILE_LISTS = {
+    'directory': required_files.DIRECTORY_REQUIRED_FILES,
+    'nanopore_assemblies': required_files.DIRECTORY_REQUIRED_FILES,
+    'seqfu': required_files.DIRECTORY_REQUIRED_FILES,
+    'miseq': required_files.MISEQ_REQUIRED_FILES,
+    'miseq_v26': required_files.MISEQ_REQUIRED_FILES,
+    'miniseq': required_files.MISEQ_REQUIRED_FILES,
+    'iseq': required_files.MISEQ_REQUIRED_FILES,
+    'miseq_v31': required_files.MISEQ_REQUIRED_FILES,
+    'miseq_win10_jun2021': required_files.MISEQ_REQUIRED_FILES,
+    'nextseq': required_files.NEXTSEQ_REQUIRED_FILES,
+    'nextseq_nml_classic': required_files.NEXTSEQ_CLASSIC_REQUIRED_FILES,
+    'nextseq_nml_dual_upload': required_files.NEXTSEQ_DUAL_UPLOAD_REQUIRED_FILES,
+    'nextseq_nml_strict_sample_name': required_files.NEXTSEQ_REQUIRED_FILES,
+    'nextseq2k_nml': required_files.NEXTSEQ2K_NML_REQUIRED_FILES,
+}
+
 
 def parser_factory(parser_type):
     """
@@ -31,37 +54,65 @@ def parser_factory(parser_type):
     :param parser_type: a String of a valid parser name
     :return:
     """
+    # Parser packages are imported when a parser is created, so only the configured parser is ever loaded
     if parser_type in ['directory', 'nanopore_assemblies', 'seqfu']:
         logging.debug("Creating directory parser")
-        return directory.Parser(parser_type_name=parser_type)
+        return _import_parser_module("directory").Parser(parser_type_name=parser_type)
     if parser_type in ['miseq', 'miseq_v26']:
         logging.debug("Creating miseq (v26) parser")
-        return miseq.Parser(parser_type_name=parser_type)
+        return _import_parser_module("miseq").Parser(parser_type_name=parser_type)
     if parser_type in ['miniseq', 'iseq', 'miseq_v31', 'miseq_win10_jun2021']:
         logging.debug("Creating miniseq/iseq/miseq_v31 parser")
-        return miniseq.Parser(parser_type_name=parser_type)
+        return _import_parser_module("miniseq").Parser(parser_type_name=parser_type)
     if parser_type == "nextseq":
         logging.debug("Creating nextseq parser")
-        return nextseq.Parser(parser_type_name=parser_type)
+        return _import_parser_module("nextseq").Parser(parser_type_name=parser_type)
     if parser_type == "nextseq_nml_classic":
         logging.debug("Creating nml custom nextseq parser")
-        return nextseq.Parser(
+        return _import_parser_module("nextseq").Parser(
             parser_type_name=parser_type,
-            sample_sheet_override='SampleSheetClassic.csv'
+            sample_sheet_override=required_files.CLASSIC_SAMPLE_SHEET_FILE_NAME
         )
     if parser_type == "nextseq_nml_dual_upload":
         logging.debug("Creating nml custom nextseq parser with extra required files")
-        return nextseq.Parser(
+        return _import_parser_module("nextseq").Parser(
             parser_type_name=parser_type,
-            additional_required_files=['RunMetadata.csv']
+            additional_required_files=[required_files.RUN_METADATA_FILE_NAME]
         )
     if parser_type == "nextseq_nml_strict_sample_name":
         logging.debug("Creating nml custom nextseq parser with strict sample name matching")
-        return nextseq.Parser(
+        return _import_parser_module("nextseq").Parser(
             parser_type_name=parser_type,
             strict_sample_name_matching=True
         )
     if parser_type == "nextseq2k_nml":
         logging.debug("Creating nextseq2k_nml parser")
-        return nextseq2k_nml.Parser(parser_type_name=parser_type)
+        return _import_parser_module("nextseq2k_nml").Parser(parser_type_name=parser_type)
     raise AssertionError("Bad parser creation, invalid parser_type given: {}".format(parser_type))
+
+
+def get_required_file_list(parser_type):
+    """
+    Returns the files a run directory must contain for a parser type, without creating the parser
+
+    :param parser_type: a String of a valid parser name
+    :return: list of file names
+    """
+    if parser_type not in _REQUIRED_FILE_LISTS:
+        raise AssertionError("Bad parser type, invalid parser_type given: {}".format(parser_type))
+    return list(_REQUIRED_FILE_LISTS[parser_type])
+
+
+def _import_parser_module(module_name):
+    """
+    :param module_name: name of a parser package in iridauploader.parsers
+    :return: the imported package
+    """
+    return importlib.import_module("iridauploader.parsers." + module_name)
+
+
+def __getattr__(name):
+    # Keeps parsers.parsers.<parser package> working now that the packages are not imported with this module
+    if name in _PARSER_MODULES:
+        return _import_parser_module(name)
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
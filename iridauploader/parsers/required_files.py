@@ -0,0 +1,28 @@
+"""
+Names of the files each parser requires in a run directory
+
+The parsers are created with these lists, and parsers.get_required_file_list returns them without importing the
+parser packages, so the status of runs can be checked without loading a parser.
+"""
+
+# directory, nanopore_assemblies and seqfu
+SAMPLE_LIST_FILE_NAME = 'SampleList.csv'
+DIRECTORY_REQUIRED_FILES = [SAMPLE_LIST_FILE_NAME]
+
+# miseq, miseq_v26, miniseq, iseq, miseq_v31 and miseq_win10_jun2021
+SAMPLE_SHEET_FILE_NAME = 'SampleSheet.csv'
+COMPLETED_JOB_INFO_FILE_NAME = 'CompletedJobInfo.xml'
+MISEQ_REQUIRED_FILES = [SAMPLE_SHEET_FILE_NAME, COMPLETED_JOB_INFO_FILE_NAME]
+
+# nextseq and its nml variants
+RTA_COMPLETE_FILE_NAME = 'RTAComplete.txt'
+CLASSIC_SAMPLE_SHEET_FILE_NAME = 'SampleSheetClassic.csv'
+RUN_METADATA_FILE_NAME = 'RunMetadata.csv'
+NEXTSEQ_REQUIRED_FILES = [SAMPLE_SHEET_FILE_NAME, RTA_COMPLETE_FILE_NAME]
+NEXTSEQ_CLASSIC_REQUIRED_FILES = [CLASSIC_SAMPLE_SHEET_FILE_NAME, RTA_COMPLETE_FILE_NAME]
+NEXTSEQ_DUAL_UPLOAD_REQUIRED_FILES = NEXTSEQ_REQUIRED_FILES + [RUN_METADATA_FILE_NAME]
+
+# nextseq2k_nml
+UPLOAD_LIST_FILE_NAME = 'UploadList.csv'
+COPY_COMPLETE_FILE_NAME = 'CopyComplete.txt'
+NEXTSEQ2K_NML_REQUIRED_FILES = [UPLOAD_LIST_FILE_NAME, COPY_COMPLETE_FILE_NAME]
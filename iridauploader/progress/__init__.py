@@ -1,3 +1,8 @@
-from iridauploader.progress.upload_status import get_directory_status, write_directory_status, run_is_ready_with_delay
+from iridauploader.progress.upload_status import get_directory_status, write_directory_status, run_is_ready_with_delay, \
+    status_file_is_unchanged
 from iridauploader.progress.upload_signals import signal_worker, send_progress, ProgressData
-from iridauploader.progress import exceptions
+from iridauploader.progress.upload_progress import start_upload, update_transfer, finish_upload, subscribe, \
+    unsubscribe, ProgressSnapshot, SampleProgress
+from iridauploader.progress.timing import start_profile, stop_profile, get_active_profile, span, record_http_call, \
+    log_profile
+from iridauploader.progress import exceptions, metrics, upload_progress
@@ -0,0 +1,287 @@
+"""
+Prometheus metrics for the uploader
+
+Counters, gauges and histograms are kept in memory for the life of the process, and are written in the Prometheus
+text format to the file set by the `metrics_textfile` config option. The file is meant to be picked up by the
+node_exporter textfile collector, which lets uploaders started by cron or a scheduled task be monitored without
+running a server. Counters start from 0 in every process, which Prometheus handles as a counter reset.
+
+The api layer records HTTP calls, retries, session refreshes and file uploads.
+The core layer records samples, runs and the status of every run directory it has seen.
+"""
+
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from iridauploader.model.directory_status import DirectoryStatus
+
+# Upload durations range from a fraction of a second for small files to hours for large runs
+UPLOAD_DURATION_BUCKETS = (0.5, 1, 5, 10, 30, 60, 300, 900, 1800, 3600)
+HTTP_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class _Metric:
+    """
+    Base class for metrics, holds a value per combination of label values
+    """
+
+    metric_type = None
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _label_key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError("Metric {} expects labels {}, got {}".format(self.name, self.label_names, sorted(labels)))
+        return tuple(str(labels[label_name]) for label_name in self.label_names)
+
+    def get_value(self, **labels):
+        with self._lock:
+            return self._values.get(self._label_key(labels), 0)
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    def _format_labels(self, label_values, extra=()):
+        pairs = list(zip(self.label_names, label_values)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join('{}="{}"'.format(k, _escape_label_value(v)) for k, v in pairs) + "}"
+
+    def get_lines(self):
+        lines = ["# HELP {} {}".format(self.name, self.documentation),
+                 "# TYPE {} {}".format(self.name, self.metric_type)]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append("{}{} {}".format(self.name, self._format_labels(label_values), _format_value(value)))
+        return lines
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def set(self, value, **labels):
+        key = self._label_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, label_names=(), buckets=HTTP_DURATION_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._label_key(labels)
+        with self._lock:
+            # [count per bucket..., count, sum]
+            observation = self._values.setdefault(key, [0] * len(self.buckets) + [0, 0.0])
+            for i, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    observation[i] += 1
+            observation[-2] += 1
+            observation[-1] += value
+
+    def get_value(self, **labels):
+        """
+        :return: number of observations
+        """
+        with self._lock:
+            observation = self._values.get(self._label_key(labels))
+        return observation[-2] if observation else 0
+
+    def get_lines(self):
+        lines = ["# HELP {} {}".format(self.name, self.documentation),
+                 "# TYPE {} {}".format(self.name, self.metric_type)]
+        with self._lock:
+            for label_values, observation in sorted(self._values.items()):
+                for upper_bound, bucket_count in zip(self.buckets, observation):
+                    le = (("le", _format_value(upper_bound)),)
+                    lines.append("{}_bucket{} {}".format(self.name, self._format_labels(label_values, le),
+                                                         bucket_count))
+                lines.append("{}_bucket{} {}".format(self.name, self._format_labels(label_values, (("le", "+Inf"),)),
+                                                     observation[-2]))
+                labels = self._format_labels(label_values)
+                lines.append("{}_count{} {}".format(self.name, labels, observation[-2]))
+                lines.append("{}_sum{} {}".format(self.name, labels, _format_value(observation[-1])))
+        return lines
+
+
+UPLOADED_BYTES = Counter("irida_uploader_uploaded_bytes_total",
+                         "Bytes of sequence files sent to IRIDA")
+SAMPLES = Counter("irida_uploader_samples_total",
+                  "Samples that finished uploading, by result (uploaded/failed)", ["result"])
+HTTP_REQUESTS = Counter("irida_uploader_http_requests_total",
+                        "HTTP requests sent to IRIDA, by endpoint template and response status",
+                        ["method", "endpoint", "status"])
+HTTP_RETRIES = Counter("irida_uploader_http_retries_total",
+                       "HTTP requests that were retried, by endpoint template", ["endpoint"])
+SESSION_REFRESHES = Counter("irida_uploader_session_refreshes_total",
+                            "Times the IRIDA session was recreated because the token expired")
+RUNS_FINISHED = Counter("irida_uploader_runs_finished_total",
+                        "Run uploads that have ended, by final status", ["status"])
+RUNS = Gauge("irida_uploader_runs",
+             "Run directories seen by this uploader, by current status", ["status"])
+HTTP_REQUEST_DURATION = Histogram("irida_uploader_http_request_duration_seconds",
+                                  "Time taken by HTTP requests to IRIDA, by endpoint template", ["endpoint"],
+                                  buckets=HTTP_DURATION_BUCKETS)
+UPLOAD_DURATION = Histogram("irida_uploader_upload_duration_seconds",
+                            "Time taken to upload the files of one sample", buckets=UPLOAD_DURATION_BUCKETS)
+UPLOAD_PROGRESS_BYTES = Gauge("irida_uploader_upload_progress_bytes",
+                              "Bytes sent and total bytes of the current, or last, run upload", ["type"])
+UPLOAD_RATE = Gauge("irida_uploader_upload_rate_bytes_per_second",
+                    "Upload rate of the current, or last, run upload")
+UPLOAD_ETA = Gauge("irida_uploader_upload_eta_seconds",
+                   "Estimated seconds left in the current run upload, -1 when it can not be estimated")
+LAST_UPDATE = Gauge("irida_uploader_last_update_timestamp_seconds",
+                    "Unix time the metrics were last written")
+
+_ALL_METRICS = [UPLOADED_BYTES, SAMPLES, HTTP_REQUESTS, HTTP_RETRIES, SESSION_REFRESHES, RUNS_FINISHED, RUNS,
+                HTTP_REQUEST_DURATION, UPLOAD_DURATION, UPLOAD_PROGRESS_BYTES, UPLOAD_RATE, UPLOAD_ETA, LAST_UPDATE]
+
+# The last known status of each run directory, used for the RUNS gauge
+_run_statuses = {}
+_run_statuses_lock = threading.Lock()
+
+
+def record_http_request(method, endpoint, status, seconds):
+    """
+    :param method: HTTP method
+    :param endpoint: endpoint template, e.g. /api/samples/{id}/pairs
+    :param status: response status code, or "error" when no response was received
+    :param seconds: time taken by the request
+    :return: None
+    """
+    HTTP_REQUESTS.inc(method=method, endpoint=endpoint, status=status)
+    HTTP_REQUEST_DURATION.observe(seconds, endpoint=endpoint)
+
+
+def record_http_retry(endpoint):
+    HTTP_RETRIES.inc(endpoint=endpoint)
+
+
+def record_session_refresh():
+    SESSION_REFRESHES.inc()
+
+
+def record_file_upload(byte_count, seconds):
+    """
+    :param byte_count: size of the upload sent to IRIDA
+    :param seconds: time taken to upload
+    :return: None
+    """
+    UPLOADED_BYTES.inc(byte_count)
+    UPLOAD_DURATION.observe(seconds)
+
+
+def set_upload_progress(bytes_sent, total_bytes, rate, eta):
+    """
+    :param bytes_sent: bytes sent so far in the run upload
+    :param total_bytes: size of the run upload
+    :param rate: bytes per second, or None when not known
+    :param eta: seconds left, or None when not known
+    :return: None
+    """
+    UPLOAD_PROGRESS_BYTES.set(bytes_sent, type="sent")
+    UPLOAD_PROGRESS_BYTES.set(total_bytes, type="total")
+    UPLOAD_RATE.set(rate or 0)
+    UPLOAD_ETA.set(-1 if eta is None else eta)
+
+
+def record_sample(uploaded):
+    """
+    :param uploaded: True when the sample was uploaded, False when it failed
+    :return: None
+    """
+    SAMPLES.inc(result="uploaded" if uploaded else "failed")
+
+
+def record_run_finished(status):
+    RUNS_FINISHED.inc(status=status)
+
+
+def set_run_status(directory, status):
+    """
+    Updates the status of a run directory, and the count of runs in each status
+
+    :param directory: run directory
+    :param status: one of DirectoryStatus.VALID_STATUS_LIST
+    :return: None
+    """
+    with _run_statuses_lock:
+        _run_statuses[directory] = status
+        counts = {s: 0 for s in DirectoryStatus.VALID_STATUS_LIST}
+        for run_status in _run_statuses.values():
+            counts[run_status] = counts.get(run_status, 0) + 1
+    for run_status, count in counts.items():
+        RUNS.set(count, status=run_status)
+
+
+def generate_text():
+    """
+    :return: all metrics in the Prometheus text format
+    """
+    LAST_UPDATE.set(time.time())
+    lines = []
+    for metric in _ALL_METRICS:
+        lines.extend(metric.get_lines())
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(file_path):
+    """
+    Writes all metrics to a file in the Prometheus text format
+    The file is replaced in one step so the collector never reads a half written file
+
+    :param file_path: file to write, node_exporter only reads files ending in .prom
+    :return: None
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    file_descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix=".irida_uploader_metrics")
+    try:
+        with os.fdopen(file_descriptor, "w") as temp_file:
+            temp_file.write(generate_text())
+        os.replace(temp_path, file_path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    logging.debug("Metrics written to {}".format(file_path))
+
+
+def reset_metrics():
+    """
+    Sets all metrics back to 0 and forgets all run directories
+    :return: None
+    """
+    with _run_statuses_lock:
+        _run_statuses.clear()
+    for metric in _ALL_METRICS:
+        metric.reset()
+
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    return repr(value) if isinstance(value, float) else str(value)
@@ -0,0 +1,253 @@
+"""
+Timing instrumentation for the upload lifecycle
+
+A RunProfile is started for each run that is uploaded. The stages of the upload are wrapped in spans, which record
+how long they took, how many bytes they sent or wrote, and how many HTTP calls were made while they were open.
+
+    with timing.span("parse_and_validate"):
+        ...
+
+Spans are only recorded while a profile is active, otherwise they cost next to nothing.
+HTTP calls are counted by the api layer with record_http_call(), and count towards every open span in the same
+thread. Sample uploads run in worker threads, so their calls count towards the sample's span and the run total,
+but not towards spans opened by the main thread.
+
+When the run ends, the profile is logged as a summary table and written as json to PROFILE_FILE_NAME.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+
+PROFILE_FILE_NAME = "irida_uploader_profile.json"
+
+# The profile of the run being uploaded, only one run is uploaded at a time
+_active_profile = None
+# Spans open in each thread, innermost last
+_thread_spans = threading.local()
+
+
+class Span:
+    """
+    One timed stage of an upload
+    """
+
+    def __init__(self, name, attributes=None):
+        self.name = name
+        self.attributes = attributes or {}
+        self.start_time = time.time()
+        self._start = time.monotonic()
+        self.duration = None
+        self.bytes = 0
+        self.http_calls = 0
+
+    def finish(self):
+        self.duration = time.monotonic() - self._start
+
+    def add_bytes(self, byte_count):
+        self.bytes += byte_count
+
+    def get_dict(self):
+        return {
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration": self.duration,
+            "bytes": self.bytes,
+            "http_calls": self.http_calls,
+            "attributes": self.attributes,
+        }
+
+
+class RunProfile:
+    """
+    Collects the spans of one run upload, spans can be added from any thread
+    """
+
+    def __init__(self, directory, output_directory=None):
+        """
+        :param directory: run directory being uploaded
+        :param output_directory: directory to write the json profile to, None to not write it
+        """
+        self.directory = directory
+        self.output_directory = output_directory
+        self.start_time = time.time()
+        self._start = time.monotonic()
+        self.duration = None
+        self._spans = []
+        self._http_calls = 0
+        self._http_bytes = 0
+        self._lock = threading.Lock()
+
+    def add_span(self, finished_span):
+        with self._lock:
+            self._spans.append(finished_span)
+
+    def record_http_call(self, bytes_sent):
+        with self._lock:
+            self._http_calls += 1
+            self._http_bytes += bytes_sent
+
+    def finish(self):
+        self.duration = time.monotonic() - self._start
+
+    def get_summary(self):
+        """
+        Spans grouped by name, in the order they were first finished
+
+        :return: list of dicts with name, count, total_seconds, max_seconds, bytes and http_calls
+        """
+        summary = {}
+        with self._lock:
+            for s in self._spans:
+                row = summary.setdefault(s.name, {"name": s.name, "count": 0, "total_seconds": 0.0,
+                                                  "max_seconds": 0.0, "bytes": 0, "http_calls": 0})
+                row["count"] += 1
+                row["total_seconds"] += s.duration
+                row["max_seconds"] = max(row["max_seconds"], s.duration)
+                row["bytes"] += s.bytes
+                row["http_calls"] += s.http_calls
+        return list(summary.values())
+
+    def get_summary_lines(self):
+        """
+        :return: list of strings that make up a table of the summary, for logging
+        """
+        row_format = "{:<28} {:>6} {:>10} {:>10} {:>14} {:>10}"
+        lines = [row_format.format("Stage", "Count", "Total (s)", "Max (s)", "Bytes", "HTTP calls")]
+        for row in self.get_summary():
+            lines.append(row_format.format(row["name"][:28], row["count"], "{:.3f}".format(row["total_seconds"]),
+                                           "{:.3f}".format(row["max_seconds"]), row["bytes"], row["http_calls"]))
+        with self._lock:
+            total_calls, total_bytes = self._http_calls, self._http_bytes
+        duration = self.duration if self.duration is not None else time.monotonic() - self._start
+        lines.append(row_format.format("Run total", "", "{:.3f}".format(duration), "", total_bytes, total_calls))
+        return lines
+
+    def get_dict(self):
+        with self._lock:
+            spans = [s.get_dict() for s in self._spans]
+            total_calls, total_bytes = self._http_calls, self._http_bytes
+        return {
+            "directory": self.directory,
+            "start_time": self.start_time,
+            "duration": self.duration,
+            "http_calls": total_calls,
+            "http_bytes": total_bytes,
+            "summary": self.get_summary(),
+            "spans": spans,
+        }
+
+    def write_json(self):
+        """
+        Writes the profile to PROFILE_FILE_NAME in the output directory
+
+        :return: path of the written file, or None when there is no output directory
+        """
+        if not self.output_directory:
+            return None
+        profile_file = os.path.join(self.output_directory, PROFILE_FILE_NAME)
+        with open(profile_file, "w") as json_file:
+            json.dump(self.get_dict(), json_file, indent=4, sort_keys=True)
+            json_file.write("\n")
+        return profile_file
+
+
+def start_profile(directory, output_directory=None):
+    """
+    Starts profiling a run, replacing any active profile
+
+    :param directory: run directory being uploaded
+    :param output_directory: directory to write the json profile to when the run ends, None to not write it
+    :return: RunProfile
+    """
+    global _active_profile
+    _active_profile = RunProfile(directory, output_directory)
+    return _active_profile
+
+
+def stop_profile():
+    """
+    Stops the active profile
+
+    :return: the finished RunProfile, or None if no profile was active
+    """
+    global _active_profile
+    profile = _active_profile
+    _active_profile = None
+    if profile is not None:
+        profile.finish()
+    return profile
+
+
+def get_active_profile():
+    return _active_profile
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Times the code in the with block as a span of the active profile
+
+    :param name: name of the stage, spans with the same name are grouped in the summary
+    :param attributes: extra information saved with the span, e.g. sample name
+    :return: the Span, or None when no profile is active
+    """
+    profile = _active_profile
+    if profile is None:
+        yield None
+        return
+
+    new_span = Span(name, attributes)
+    stack = _get_thread_spans()
+    stack.append(new_span)
+    try:
+        yield new_span
+    finally:
+        stack.remove(new_span)
+        new_span.finish()
+        profile.add_span(new_span)
+
+
+def record_http_call(bytes_sent=0):
+    """
+    Counts a HTTP call towards the active profile and the spans open in this thread
+
+    :param bytes_sent: size of the request body
+    :return: None
+    """
+    profile = _active_profile
+    if profile is None:
+        return
+    profile.record_http_call(bytes_sent)
+    for open_span in _get_thread_spans():
+        open_span.http_calls += 1
+        open_span.add_bytes(bytes_sent)
+
+
+def _get_thread_spans():
+    if not hasattr(_thread_spans, "stack"):
+        _thread_spans.stack = []
+    return _thread_spans.stack
+
+
+def log_profile(profile):
+    """
+    Logs the summary table of a profile, and writes its json file
+
+    :param profile: finished RunProfile
+    :return: None
+    """
+    logging.info("Upload timing summary:")
+    for line in profile.get_summary_lines():
+        logging.info(line)
+    try:
+        profile_file = profile.write_json()
+    except OSError as e:
+        logging.warning("Could not write timing profile: {}".format(e))
+        return
+    if profile_file:
+        logging.info("Timing profile written to {}".format(profile_file))
@@ -0,0 +1,316 @@
+"""
+Coalesced progress of file uploads
+
+File uploads report the bytes they have sent for every chunk they read (1 MiB), which is up to 1,000 reports a second
+on a fast connection. The reports are only recorded here, and a snapshot of the progress is published to subscribers
+at most `progress_update_frequency` times a second. A snapshot has the bytes sent, rate and time left of the samples
+that changed since the last snapshot, and of the whole upload.
+
+Subscribers are functions that take a ProgressSnapshot. The GUI progress signal, the console and the metrics are
+subscribed by default. The console is only written to when stdout is a terminal, so logs and cron mail are not
+filled with progress lines.
+"""
+
+import logging
+import sys
+import threading
+import time
+
+from collections import namedtuple
+
+import iridauploader.config as config
+
+from . import metrics, upload_signals
+
+# Snapshots published per second
+DEFAULT_UPDATE_FREQUENCY = 5
+# Weight of the newest measurement in the rates, lower values give smoother rates that react slower
+RATE_SMOOTHING = 0.3
+
+# rate is in bytes per second, eta is in seconds, both are None until they can be estimated
+SampleProgress = namedtuple("SampleProgress", ["sample", "project", "bytes_sent", "total_bytes", "rate", "eta"])
+ProgressSnapshot = namedtuple("ProgressSnapshot", ["samples", "bytes_sent", "total_bytes", "rate", "eta", "finished"])
+
+
+def get_percent(bytes_sent, total_bytes):
+    """
+    :return: percent of total_bytes sent, between 0 and 100
+    """
+    if not total_bytes:
+        return 0.0
+    return round(min(bytes_sent / total_bytes, 1.0) * 100, 2)
+
+
+class _Transfer:
+    """
+    Bytes sent for the files of one sample
+    """
+    __slots__ = ["bytes_sent", "total_bytes", "published_bytes", "rate"]
+
+    def __init__(self, total_bytes):
+        self.bytes_sent = 0
+        self.total_bytes = total_bytes
+        self.published_bytes = 0
+        self.rate = None
+
+
+class ProgressTracker:
+    """
+    Thread safe record of the bytes sent by uploads, publishes snapshots to subscribers at a fixed maximum frequency
+    """
+
+    def __init__(self, update_frequency=DEFAULT_UPDATE_FREQUENCY, clock=time.monotonic):
+        """
+        :param update_frequency: maximum snapshots published per second
+        :param clock: function returning the time in seconds
+        """
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self.reset(update_frequency)
+
+    def subscribe(self, callback):
+        """
+        :param callback: function that takes a ProgressSnapshot, called from the uploading threads
+        :return: None
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers.remove(callback)
+
+    def reset(self, update_frequency=None, total_bytes=None):
+        """
+        Forgets all transfers, to start tracking a new upload
+
+        :param update_frequency: maximum snapshots published per second, None to keep the current frequency
+        :param total_bytes: size of the upload, when None the size of the transfers started so far is used
+        :return: None
+        """
+        with self._lock:
+            if update_frequency is not None:
+                self._interval = 1.0 / update_frequency
+            # (sample, project) -> _Transfer
+            self._transfers = {}
+            self._changed = set()
+            self._upload_total_bytes = total_bytes
+            self._transfer_total_bytes = 0
+            self._bytes_sent = 0
+            self._published_bytes = 0
+            self._rate = None
+            self._last_publish = self._clock()
+
+    def update(self, sample, project, bytes_sent, total_bytes):
+        """
+        Records the bytes sent for a sample, and publishes a snapshot when one is due
+        A snapshot is always published when a sample finishes, so subscribers see every sample reach 100%
+
+        :param sample: sample name
+        :param project: project id
+        :param bytes_sent: bytes of the sample's upload sent so far
+        :param total_bytes: size of the sample's upload
+        :return: None
+        """
+        key = (sample, project)
+        with self._lock:
+            transfer = self._transfers.get(key)
+            if transfer is None or bytes_sent < transfer.bytes_sent:
+                # new upload, or a failed upload that is being sent again
+                if transfer is not None:
+                    self._bytes_sent -= transfer.bytes_sent
+                    self._published_bytes -= transfer.published_bytes
+                    self._transfer_total_bytes -= transfer.total_bytes
+                transfer = _Transfer(total_bytes)
+                self._transfers[key] = transfer
+                self._transfer_total_bytes += total_bytes
+            self._bytes_sent += bytes_sent - transfer.bytes_sent
+            transfer.bytes_sent = bytes_sent
+            self._changed.add(key)
+
+            now = self._clock()
+            if now - self._last_publish < self._interval and bytes_sent < total_bytes:
+                return
+            snapshot = self._take_snapshot(now, finished=False)
+            subscribers = list(self._subscribers)
+        self._publish(snapshot, subscribers)
+
+    def finish(self):
+        """
+        Publishes a final snapshot, with finished set to True
+
+        :return: the final ProgressSnapshot
+        """
+        with self._lock:
+            snapshot = self._take_snapshot(self._clock(), finished=True)
+            subscribers = list(self._subscribers)
+        self._publish(snapshot, subscribers)
+        return snapshot
+
+    def _take_snapshot(self, now, finished):
+        """
+        Updates the rates, and builds a snapshot of the samples changed since the last snapshot
+        Must be called with the lock held
+        """
+        seconds = now - self._last_publish
+        self._last_publish = now
+        sample_list = []
+        for key in self._changed:
+            transfer = self._transfers[key]
+            if seconds > 0:
+                transfer.rate = _smooth_rate(transfer.rate, (transfer.bytes_sent - transfer.published_bytes) / seconds)
+            transfer.published_bytes = transfer.bytes_sent
+            sample_list.append(SampleProgress(key[0], key[1], transfer.bytes_sent, transfer.total_bytes,
+                                              transfer.rate, _get_eta(transfer.bytes_sent, transfer.total_bytes,
+                                                                      transfer.rate)))
+        self._changed = set()
+
+        if seconds > 0:
+            self._rate = _smooth_rate(self._rate, (self._bytes_sent - self._published_bytes) / seconds)
+        self._published_bytes = self._bytes_sent
+        total_bytes = self._upload_total_bytes
+        if total_bytes is None:
+            total_bytes = self._transfer_total_bytes
+        return ProgressSnapshot(sample_list, self._bytes_sent, total_bytes, self._rate,
+                                _get_eta(self._bytes_sent, total_bytes, self._rate), finished)
+
+    @staticmethod
+    def _publish(snapshot, subscribers):
+        for subscriber in subscribers:
+            try:
+                subscriber(snapshot)
+            except Exception as e:
+                # progress is only informative, it must never fail an upload
+                logging.debug("Progress subscriber {} failed: {}".format(subscriber, e))
+
+
+def _smooth_rate(rate, measured_rate):
+    if rate is None:
+        return measured_rate
+    return RATE_SMOOTHING * measured_rate + (1 - RATE_SMOOTHING) * rate
+
+
+def _get_eta(bytes_sent, total_bytes, rate):
+    if bytes_sent >= total_bytes:
+        return 0.0
+    if not rate:
+        return None
+    return (total_bytes - bytes_sent) / rate
+
+
+def send_signals(snapshot):
+    """
+    Sends the progress of each changed sample to the GUI
+    """
+    for sample in snapshot.samples:
+        upload_signals.send_progress(upload_signals.ProgressData(
+            sample=sample.sample,
+            project=sample.project,
+            progress=get_percent(sample.bytes_sent, sample.total_bytes),
+            bytes_sent=sample.bytes_sent,
+            total_bytes=sample.total_bytes,
+            rate=sample.rate,
+            eta=sample.eta
+        ))
+
+
+class ConsoleWriter:
+    """
+    Writes the progress of the whole upload on one console line, when stdout is a terminal
+    """
+
+    def __init__(self, stream=None):
+        """
+        :param stream: file to write to, defaults to sys.stdout at the time of writing
+        """
+        self._stream = stream
+        self._line_written = False
+
+    def __call__(self, snapshot):
+        stream = self._stream or sys.stdout
+        if not stream.isatty():
+            return
+        if snapshot.samples or snapshot.bytes_sent:
+            stream.write("\r" + format_progress_line(snapshot) + "   ")
+            self._line_written = True
+        if snapshot.finished and self._line_written:
+            stream.write("\n")
+            self._line_written = False
+        stream.flush()
+
+
+def format_progress_line(snapshot):
+    """
+    :param snapshot: ProgressSnapshot
+    :return: e.g. 'Progress: 42.0% Uploaded, 420.0 of 1000.0 MB at 25.0 MB/s, 0:00:23 left'
+    """
+    line = "Progress: {}% Uploaded, {:.1f} of {:.1f} MB".format(get_percent(snapshot.bytes_sent, snapshot.total_bytes),
+                                                                snapshot.bytes_sent / 1024 ** 2,
+                                                                snapshot.total_bytes / 1024 ** 2)
+    if snapshot.rate is not None:
+        line += " at {:.1f} MB/s".format(snapshot.rate / 1024 ** 2)
+    if snapshot.eta is not None and not snapshot.finished:
+        line += ", {} left".format(time.strftime("%H:%M:%S", time.gmtime(snapshot.eta))
+                                   if snapshot.eta < 86400 else ">1 day")
+    return line
+
+
+def record_metrics(snapshot):
+    metrics.set_upload_progress(snapshot.bytes_sent, snapshot.total_bytes, snapshot.rate, snapshot.eta)
+
+
+# Tracker used by the api, with the GUI, console and metrics subscribed
+_tracker = ProgressTracker()
+_tracker.subscribe(send_signals)
+_tracker.subscribe(ConsoleWriter())
+_tracker.subscribe(record_metrics)
+
+
+def subscribe(callback):
+    """
+    :param callback: function that takes a ProgressSnapshot, called from the uploading threads
+    :return: None
+    """
+    _tracker.subscribe(callback)
+
+
+def unsubscribe(callback):
+    _tracker.unsubscribe(callback)
+
+
+def start_upload(total_bytes=None):
+    """
+    Starts tracking a new upload, with the update frequency set by the config
+
+    :param total_bytes: size of the files to upload, when None the size of the files started so far is used
+    :return: None
+    """
+    update_frequency = config.get_settings().progress_update_frequency
+    if update_frequency <= 0:
+        logging.warning("Config option 'progress_update_frequency' must be greater than 0, using the default of "
+                        "{}".format(DEFAULT_UPDATE_FREQUENCY))
+        update_frequency = DEFAULT_UPDATE_FREQUENCY
+    _tracker.reset(update_frequency, total_bytes)
+
+
+def update_transfer(sample, project, bytes_sent, total_bytes):
+    """
+    Records the bytes sent for a sample's upload, this is cheap enough to call for every chunk sent
+
+    :param sample: sample name
+    :param project: project id
+    :param bytes_sent: bytes of the sample's upload sent so far
+    :param total_bytes: size of the sample's upload
+    :return: None
+    """
+    _tracker.update(sample, project, bytes_sent, total_bytes)
+
+
+def finish_upload():
+    """
+    Publishes the final progress of the upload
+
+    :return: the final ProgressSnapshot
+    """
+    return _tracker.finish()
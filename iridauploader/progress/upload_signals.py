@@ -14,11 +14,16 @@ if GUI_PKG_INSTALLED:
 class ProgressData:
     """
     A class to wrap upload progress data with standardised getters/setters
+    rate is in bytes per second and eta is in seconds, they are None when they are not known
     """
-    def __init__(self, sample, project, progress):
+    def __init__(self, sample, project, progress, bytes_sent=None, total_bytes=None, rate=None, eta=None):
         self._sample = sample
         self._project = project
         self._progress = progress
+        self._bytes_sent = bytes_sent
+        self._total_bytes = total_bytes
+        self._rate = rate
+        self._eta = eta
 
     @property
     def sample(self):
@@ -32,6 +37,22 @@ class ProgressData:
     def progress(self):
         return self._progress
 
+    @property
+    def bytes_sent(self):
+        return self._bytes_sent
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+    @property
+    def rate(self):
+        return self._rate
+
+    @property
+    def eta(self):
+        return self._eta
+
 
 # int to none so send_progress knows it exists
 signal_worker = None
@@ -6,7 +6,7 @@ import time
 import iridauploader.config as config
 from iridauploader.model.directory_status import DirectoryStatus
 
-from . import exceptions
+from . import exceptions, metrics, timing
 
 
 # Module level Constants
@@ -28,7 +28,7 @@ def get_directory_status(directory, required_file_list):
     :return: directory and status dictionary
     """
     # Verify directory is readable
-    log_directory = config.read_config_option("log_directory")
+    log_directory = config.get_settings().log_directory
     if not os.access(directory, os.R_OK) and not bool(log_directory):
         return DirectoryStatus(directory=directory,
                                status=DirectoryStatus.INVALID,
@@ -65,6 +65,35 @@ def get_directory_status(directory, required_file_list):
         return DirectoryStatus(directory=directory, status=DirectoryStatus.NEW)
 
 
+def status_file_is_unchanged(directory_status):
+    """
+    Checks that the status file of a directory still holds directory_status, i.e. that no other uploader
+    has written to it since directory_status was read with get_directory_status
+
+    :param directory_status: DirectoryStatus from get_directory_status
+    :return: True when the status file holds the same status, or when there is still no status file
+    """
+    log_directory = config.get_settings().log_directory
+    if log_directory:
+        status_directory = os.path.join(log_directory, directory_status.directory)
+    else:
+        status_directory = directory_status.directory
+    if not os.path.isfile(os.path.join(status_directory, STATUS_FILE_NAME)):
+        # statuses read from a status file always have a time
+        return directory_status.time is None
+
+    file_status = read_directory_status_from_file(status_directory)
+    return _get_status_fields(file_status) == _get_status_fields(directory_status)
+
+
+def _get_status_fields(directory_status):
+    """
+    :return: tuple of the fields of directory_status that are written to the status file
+    """
+    return (directory_status.status, directory_status.message, directory_status.time, directory_status.run_id,
+            directory_status.irida_instance, directory_status.sample_status_to_dict())
+
+
 def read_directory_status_from_file(directory):
     uploader_info_file = os.path.join(directory, STATUS_FILE_NAME)
 
@@ -101,8 +130,10 @@ def write_directory_status(directory_status):
     :param directory_status: DirectoryStatus object containing status to write to directory
     :return: None
     """
-    log_directory = config.read_config_option("log_directory")
-    if config.read_config_option("readonly", bool, False) is False or log_directory:
+    metrics.set_run_status(directory_status.directory, directory_status.status)
+    settings = config.get_settings()
+    log_directory = settings.log_directory
+    if settings.readonly is False or log_directory:
         if not os.access(directory_status.directory, os.W_OK) and not bool(log_directory):  # check if directory can be accessed, or that the log_directory is set
             raise exceptions.DirectoryError("Cannot access directory", directory_status.directory)
         elif bool(log_directory) and not os.access(log_directory, os.W_OK):  # need to check that path is filled out in addition to checking access
@@ -115,9 +146,12 @@ def write_directory_status(directory_status):
             uploader_info_file = os.path.join(run_log_path, STATUS_FILE_NAME)
         else:
             uploader_info_file = os.path.join(directory_status.directory, STATUS_FILE_NAME)
-        with open(uploader_info_file, "w") as json_file:
-            json.dump(json_data, json_file, indent=4, sort_keys=True)
-            json_file.write("\n")
+        with timing.span("write_directory_status", status=directory_status.status) as status_span:
+            with open(uploader_info_file, "w") as json_file:
+                json.dump(json_data, json_file, indent=4, sort_keys=True)
+                json_file.write("\n")
+            if status_span is not None:
+                status_span.add_bytes(os.path.getsize(uploader_info_file))
 
 
 def run_is_ready_with_delay(directory_status):
@@ -132,7 +166,7 @@ def run_is_ready_with_delay(directory_status):
     :param directory_status:
     :return: True when run is ready for upload, otherwise False
     """
-    delay_minutes = config.read_config_option("delay", expected_type=int)
+    delay_minutes = config.get_settings().delay
     logging.debug("delay_minutes is set to: " + str(delay_minutes))
 
     # Check if run is new, check if there's a delay
@@ -1,6 +1,15 @@
+import io
+import time
 import unittest
+from unittest.mock import patch, MagicMock, PropertyMock
+
+from requests import ConnectionError
 
 from iridauploader.api import api_calls
+from iridauploader.api.api_calls import METADATA_SENT, METADATA_UNCHANGED, METADATA_FAILED
+from iridauploader.api.exceptions import IridaResourceError, IridaConnectionError
+from iridauploader.api.request_stats import RequestStats
+from iridauploader.model import Metadata
 
 
 class TestIsIridaVersionCompatible(unittest.TestCase):
@@ -87,3 +96,245 @@ class TestIsIridaVersionCompatible(unittest.TestCase):
             minimum_irida_version="23.01.2"
         )
         self.assertFalse(result)
+
+
+class TestSendMetadataBulk(unittest.TestCase):
+    """
+    Tests the api.api_calls.ApiCalls.send_metadata_bulk function
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+
+    @patch("iridauploader.api.api_calls.ApiCalls._create_session")
+    @patch("iridauploader.api.api_calls.ApiCalls.get_irida_version")
+    def _make_api(self, mock_get_irida_version, mock_create_session):
+        mock_get_irida_version.return_value = "23.01"
+        return api_calls.ApiCalls(client_id="", client_secret="", base_url="", username="", password="")
+
+    def test_results_in_order_with_failures(self):
+        api = self._make_api()
+
+        def fake_send_metadata(metadata, sample_id):
+            if sample_id == 2:
+                raise IridaResourceError("Boom")
+            return {}
+
+        with patch.object(api, "send_metadata", side_effect=fake_send_metadata) as mock_send_metadata:
+            results = api.send_metadata_bulk([(sample_id, Metadata({"a": sample_id})) for sample_id in range(1, 6)],
+                                             max_workers=3)
+
+        self.assertEqual([r.sample_id for r in results], [1, 2, 3, 4, 5])
+        self.assertEqual([r.status for r in results],
+                         [METADATA_SENT, METADATA_FAILED, METADATA_SENT, METADATA_SENT, METADATA_SENT])
+        self.assertIsInstance(results[1].error, IridaResourceError)
+        self.assertEqual(mock_send_metadata.call_count, 5)
+
+    def test_skip_unchanged(self):
+        api = self._make_api()
+        current_metadata = {
+            1: {"a": {"value": "1"}},
+            # different value
+            2: {"a": {"value": "old"}},
+            # extra field would be removed by the PUT, so this is a change
+            3: {"a": {"value": "3"}, "b": {"value": "x"}},
+        }
+
+        with patch.object(api, "get_metadata", side_effect=lambda sample_id: current_metadata[sample_id]), \
+                patch.object(api, "send_metadata") as mock_send_metadata:
+            results = api.send_metadata_bulk([(sample_id, Metadata({"a": sample_id})) for sample_id in [1, 2, 3]],
+                                             skip_unchanged=True)
+
+        self.assertEqual([r.status for r in results], [METADATA_UNCHANGED, METADATA_SENT, METADATA_SENT])
+        self.assertEqual(sorted(c.args[1] for c in mock_send_metadata.call_args_list), [2, 3])
+
+
+class TestRequest(unittest.TestCase):
+    """
+    Tests the api.api_calls.ApiCalls._request function that every api call is sent through
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        self.session = MagicMock()
+        self.response = MagicMock(status_code=200, content=b'{"resource": {}}')
+        self.session.request.return_value = self.response
+        session_patcher = patch("iridauploader.api.api_calls.ApiCalls._session", new_callable=PropertyMock,
+                                return_value=self.session)
+        session_patcher.start()
+        self.addCleanup(session_patcher.stop)
+
+    @patch("iridauploader.api.api_calls.ApiCalls._create_session")
+    @patch("iridauploader.api.api_calls.ApiCalls.get_irida_version")
+    def _make_api(self, mock_get_irida_version, mock_create_session, **kwargs):
+        mock_get_irida_version.return_value = "23.01"
+        return api_calls.ApiCalls(client_id="", client_secret="", base_url="http://irida/api/", username="",
+                                  password="", **kwargs)
+
+    def test_calls_counted_per_endpoint(self):
+        api = self._make_api()
+
+        api._request("get", "http://irida/api/samples/1/sequenceFiles")
+        api._request("get", "http://irida/api/samples/2/sequenceFiles")
+        api._request("put", "http://irida/api/samples/2/metadata", data='{"a": "b"}')
+
+        stats = api.get_request_stats()
+        self.assertEqual(stats["GET /api/samples/{id}/sequenceFiles"]["calls"], 2)
+        self.assertEqual(stats["GET /api/samples/{id}/sequenceFiles"]["bytes_received"], 32)
+        self.assertEqual(stats["PUT /api/samples/{id}/metadata"]["calls"], 1)
+        self.assertEqual(stats["PUT /api/samples/{id}/metadata"]["bytes_sent"], 10)
+        self.session.request.assert_called_with("PUT", "http://irida/api/samples/2/metadata", data='{"a": "b"}')
+
+    def test_connection_error(self):
+        api = self._make_api()
+        self.session.request.side_effect = ConnectionError("Connection refused")
+
+        with self.assertRaises(IridaConnectionError):
+            api._request("get", "http://irida/api/projects")
+
+        self.assertEqual(api.get_request_stats()["GET /api/projects"]["errors"], 1)
+
+    def test_api_calls_use_request(self):
+        api = self._make_api()
+        self.response.json.return_value = {"resource": {"metadata": {"a": {"value": "b"}}}}
+
+        result = api.get_metadata(5)
+
+        self.assertEqual(result, {"a": {"value": "b"}})
+        self.assertEqual(api._request_stats.get_call_count("GET", "/api/samples/{id}/metadata"), 1)
+
+    def test_slow_request_logged(self):
+        api = self._make_api(http_slow_request_threshold=0.001)
+        self.session.request.side_effect = lambda *args, **kwargs: time.sleep(0.01) or self.response
+
+        with self.assertLogs(level="WARNING") as logs:
+            api._request("get", "http://irida/api/projects/1/samples")
+
+        self.assertIn("Slow request: GET /api/projects/{id}/samples", logs.output[0])
+        self.assertEqual(api.get_request_stats()["GET /api/projects/{id}/samples"]["slow_calls"], 1)
+
+    def test_streamed_upload_not_slow(self):
+        api = self._make_api(http_slow_request_threshold=0.001)
+        self.session.request.side_effect = lambda *args, **kwargs: time.sleep(0.01) or self.response
+
+        api._request("post", "http://irida/api/samples/1/pairs", data=io.BytesIO(b"reads"))
+
+        self.assertEqual(api.get_request_stats()["POST /api/samples/{id}/pairs"]["slow_calls"], 0)
+
+
+class TestProjectExists(unittest.TestCase):
+    """
+    Tests the api.api_calls.ApiCalls project_exists, try_project_access and resolve_projects functions
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        # project id to the status of projects/{id}
+        self.project_statuses = {"1": 200, "2": 404, "3": 403}
+        self.session = MagicMock()
+        self.session.request.side_effect = self._request
+        session_patcher = patch("iridauploader.api.api_calls.ApiCalls._session", new_callable=PropertyMock,
+                                return_value=self.session)
+        session_patcher.start()
+        self.addCleanup(session_patcher.stop)
+
+    def _request(self, method, url, **kwargs):
+        if url.endswith("/projects"):
+            response = MagicMock(status_code=200, content=b"")
+            response.json.return_value = {"resource": {"resources": [
+                {"name": "project", "projectDescription": "", "identifier": "4"}]}}
+            return response
+        return MagicMock(status_code=self.project_statuses.get(url.rsplit("/", 1)[1], 503), content=b"")
+
+    def _requested_urls(self):
+        return [c[0][1] for c in self.session.request.call_args_list]
+
+    @patch("iridauploader.api.api_calls.ApiCalls._create_session")
+    @patch("iridauploader.api.api_calls.ApiCalls.get_irida_version")
+    def _make_api(self, mock_get_irida_version, mock_create_session):
+        mock_get_irida_version.return_value = "23.01"
+        return api_calls.ApiCalls(client_id="", client_secret="", base_url="http://irida/api/", username="",
+                                  password="")
+
+    def test_project_exists(self):
+        api = self._make_api()
+
+        self.assertTrue(api.project_exists(1))
+        self.assertFalse(api.project_exists("2"))
+        self.assertFalse(api.project_exists("3"))
+        self.assertEqual(api.try_project_access("3"), 403)
+
+        # only the projects are looked up, once each
+        self.assertEqual(self._requested_urls(), ["http://irida/api/projects/1", "http://irida/api/projects/2",
+                                                  "http://irida/api/projects/3"])
+
+    def test_project_list_fallback(self):
+        api = self._make_api()
+
+        # projects/{id} does not answer, the project list is used
+        self.assertTrue(api.project_exists("4"))
+        self.assertIn("http://irida/api/projects", self._requested_urls())
+
+    def test_not_found_cache_time(self):
+        api = self._make_api()
+
+        with patch("iridauploader.api.api_calls.time.monotonic", return_value=100.0):
+            self.assertFalse(api.project_exists("2"))
+            self.assertTrue(api.project_exists("1"))
+        # the project was created on IRIDA
+        self.project_statuses["2"] = 200
+
+        with patch("iridauploader.api.api_calls.time.monotonic",
+                   return_value=100.0 + api_calls.PROJECT_NOT_FOUND_CACHE_TIME):
+            self.assertTrue(api.project_exists("2"))
+            self.assertTrue(api.project_exists("1"))
+        self.assertEqual(self._requested_urls(), ["http://irida/api/projects/2", "http://irida/api/projects/1",
+                                                  "http://irida/api/projects/2"])
+
+    def test_resolve_projects(self):
+        api = self._make_api()
+
+        result = api.resolve_projects(["1", "2", 3, "1", "5"], max_workers=4)
+
+        self.assertEqual(result, {"1": 200, "2": 404, "3": 403, "5": 503})
+        self.assertEqual(sorted(self._requested_urls()), ["http://irida/api/projects/1", "http://irida/api/projects/2",
+                                                          "http://irida/api/projects/3", "http://irida/api/projects/5"])
+        # answered from the cache
+        self.session.request.reset_mock()
+        self.assertTrue(api.project_exists("1"))
+        self.assertFalse(api.project_exists("3"))
+        self.session.request.assert_not_called()
+
+    def test_resolve_projects_connection_error(self):
+        api = self._make_api()
+        self.session.request.side_effect = ConnectionError("Connection refused")
+
+        self.assertEqual(api.resolve_projects(["1"]), {})
+        with self.assertRaises(IridaConnectionError):
+            api.project_exists("1")
+
+
+class TestRequestStats(unittest.TestCase):
+    """
+    Tests the api.request_stats.RequestStats class
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+
+    def test_record(self):
+        stats = RequestStats()
+
+        stats.record("get", "/api/projects", 0.5, bytes_received=100)
+        stats.record("GET", "/api/projects", 1.5, bytes_received=50, slow=True)
+        stats.record("post", "/api/projects", 0.1, bytes_sent=10, error=True)
+
+        result = stats.get_dict()
+        self.assertEqual(result["GET /api/projects"], {"calls": 2, "errors": 0, "slow_calls": 1, "total_seconds": 2.0,
+                                                       "max_seconds": 1.5, "bytes_sent": 0, "bytes_received": 150})
+        self.assertEqual(result["POST /api/projects"]["errors"], 1)
+        self.assertEqual(stats.get_call_count("get", "/api/projects"), 2)
+        self.assertEqual(stats.get_call_count("delete", "/api/projects"), 0)
+
+        stats.reset()
+        self.assertEqual(stats.get_dict(), {})
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from iridauploader.api import exceptions
+from iridauploader.model import Sample, Metadata, SequenceFile
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+if httpx is not None:
+    from iridauploader.api.async_api_calls import AsyncApiCalls, SyncFacade
+
+BASE_URL = "http://irida.test/api/"
+
+
+class _FakeIrida:
+    """
+    Minimal IRIDA server for httpx.MockTransport, records every request it handles
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.tokens_issued = 0
+        self.expired_tokens = set()
+        # list of status codes to answer sample creation with before succeeding
+        self.sample_post_script = []
+        self.uploaded_body = None
+
+    async def handle(self, request):
+        self.requests.append(request)
+        path = request.url.path
+
+        if path == "/api/oauth/token":
+            self.tokens_issued += 1
+            return httpx.Response(200, json={"access_token": "token{}".format(self.tokens_issued)})
+
+        token = request.headers.get("Authorization", "").replace("Bearer ", "")
+        if token in self.expired_tokens:
+            return httpx.Response(401)
+
+        if path == "/api/version":
+            return httpx.Response(200, json={"version": "23.01"})
+        if path == "/api/projects":
+            return httpx.Response(200, json={"resource": {"resources": [
+                {"name": "project one", "projectDescription": "", "identifier": "1"},
+            ]}})
+        if path == "/api/projects/1/samples/bySampleName":
+            name = request.url.params["sampleName"]
+            if name.startswith("missing"):
+                return httpx.Response(404)
+            return httpx.Response(200, json={"resource": {
+                "sampleName": name, "description": "", "identifier": "10"}})
+        if path == "/api/projects/1/samples" and request.method == "POST":
+            if self.sample_post_script:
+                return httpx.Response(self.sample_post_script.pop(0))
+            return httpx.Response(201, json={"resource": {"identifier": "10"}})
+        if path == "/api/samples/10/metadata":
+            return httpx.Response(200, json=json.loads(request.content))
+        if path == "/api/samples/10/sequenceFiles":
+            self.uploaded_body = await request.aread()
+            return httpx.Response(201, json={"resource": {}})
+        return httpx.Response(404)
+
+
+@unittest.skipUnless(httpx is not None, "httpx is not installed")
+class TestAsyncApiCalls(unittest.TestCase):
+    """
+    Tests the api.async_api_calls.AsyncApiCalls class
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        self.irida = _FakeIrida()
+
+    def _run(self, test_coroutine):
+        async def with_api():
+            async with AsyncApiCalls(client_id="", client_secret="", base_url=BASE_URL, username="", password="",
+                                     transport=httpx.MockTransport(self.irida.handle)) as api:
+                return await test_coroutine(api)
+
+        return asyncio.run(with_api())
+
+    def test_get_projects(self):
+        async def test(api):
+            return await api.get_projects()
+
+        projects = self._run(test)
+
+        self.assertEqual(len(projects), 1)
+        self.assertEqual(projects[0].id, "1")
+        self.assertEqual(projects[0].name, "project one")
+
+    def test_get_samples_by_name(self):
+        async def test(api):
+            return await api.get_samples_by_name("1", ["sample1", "missing1", "sample2"])
+
+        samples = self._run(test)
+
+        self.assertEqual(samples["sample1"].sample_name, "sample1")
+        self.assertEqual(samples["sample1"].sample_id, 10)
+        self.assertIsNone(samples["missing1"])
+        self.assertEqual(samples["sample2"].sample_name, "sample2")
+
+    def test_expired_token_refreshed(self):
+        async def test(api):
+            self.irida.expired_tokens.add(api._access_token)
+            return await api.send_metadata(Metadata({"key": "value"}), 10)
+
+        result = self._run(test)
+
+        self.assertEqual(result, {"key": {"type": "text", "value": "value"}})
+        self.assertEqual(self.irida.tokens_issued, 2)
+
+    def test_send_sample_not_retried_on_server_error(self):
+        self.irida.sample_post_script = [500]
+
+        async def test(api):
+            with self.assertRaises(exceptions.IridaConnectionError):
+                await api.send_sample(Sample("new_sample"), "1")
+
+        self._run(test)
+
+        posts = [r for r in self.irida.requests if r.method == "POST" and r.url.path == "/api/projects/1/samples"]
+        self.assertEqual(len(posts), 1)
+
+    @patch("iridauploader.api.async_api_calls.asyncio.sleep")
+    def test_send_sample_retried_when_refused(self, mock_sleep):
+        self.irida.sample_post_script = [503, 429]
+
+        async def test(api):
+            return await api.send_sample(Sample("new_sample"), "1")
+
+        self._run(test)
+
+        posts = [r for r in self.irida.requests if r.method == "POST" and r.url.path == "/api/projects/1/samples"]
+        self.assertEqual(len(posts), 3)
+
+    def test_send_sequence_files_streamed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "sample1_S1_L001_R1_001.fastq")
+            with open(file_path, "wb") as f:
+                f.write(b"@read\nACGT\n+\nFFFF\n")
+            sequence_file = SequenceFile([file_path])
+
+            async def test(api):
+                return await api.send_sequence_files(sequence_file, "sample1", "1", upload_id=5)
+
+            self._run(test)
+
+        upload = [r for r in self.irida.requests if r.url.path == "/api/samples/10/sequenceFiles"][0]
+        self.assertEqual(int(upload.headers["Content-Length"]), len(self.irida.uploaded_body))
+        self.assertIn(b"@read\nACGT\n+\nFFFF\n", self.irida.uploaded_body)
+        self.assertIn(b'"miseqRunId": "5"', self.irida.uploaded_body)
+
+
+@unittest.skipUnless(httpx is not None, "httpx is not installed")
+class TestSyncFacade(unittest.TestCase):
+    """
+    Tests the api.async_api_calls.SyncFacade class
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+
+    def test_blocking_calls(self):
+        irida = _FakeIrida()
+
+        with SyncFacade(client_id="", client_secret="", base_url=BASE_URL, username="", password="",
+                        transport=httpx.MockTransport(irida.handle)) as api:
+            projects = api.get_projects()
+            samples = api.get_samples_by_name("1", ["sample1", "missing1"])
+
+        self.assertEqual(projects[0].id, "1")
+        self.assertIsNone(samples["missing1"])
+        self.assertTrue(api._loop.is_closed())
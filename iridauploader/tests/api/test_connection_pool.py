@@ -0,0 +1,156 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+
+import requests
+
+from iridauploader import progress
+from iridauploader.api import api_calls
+from iridauploader.api.connection_pool import PooledHTTPAdapter, ConnectionPoolStats
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    """
+    Minimal HTTP/1.1 handler that keeps connections open between requests
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"{}"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestPooledHTTPAdapter(unittest.TestCase):
+    """
+    Tests the api.connection_pool.PooledHTTPAdapter class
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        self.server = HTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+        self.url = "http://127.0.0.1:{}/".format(self.server.server_address[1])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_reused_across_sessions(self):
+        """
+        Mounting one adapter on two sessions should reuse the same keep-alive connection
+        :return:
+        """
+        adapter = PooledHTTPAdapter(pool_connections=1, pool_maxsize=2)
+
+        session_1 = requests.Session()
+        session_1.mount("http://", adapter)
+        session_1.get(self.url)
+        session_1.get(self.url)
+
+        # simulate a token refresh, which creates a brand new session
+        session_2 = requests.Session()
+        session_2.mount("http://", adapter)
+        session_2.get(self.url)
+
+        stats = adapter.stats.get_dict()
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["new_connections"], 1)
+        self.assertEqual(stats["new_tls_connections"], 0)
+        self.assertEqual(stats["reused_connections"], 2)
+
+    def test_requests_recorded_in_metrics(self):
+        """
+        Every request is counted in the metrics by its endpoint template and status
+        :return:
+        """
+        progress.metrics.reset_metrics()
+        adapter = PooledHTTPAdapter()
+        session = requests.Session()
+        session.mount("http://", adapter)
+
+        session.get(self.url + "api/samples/12")
+        session.get(self.url + "api/samples/13")
+
+        self.assertEqual(progress.metrics.HTTP_REQUESTS.get_value(method="GET", endpoint="/api/samples/{id}",
+                                                                  status=200), 2)
+        self.assertEqual(progress.metrics.HTTP_REQUEST_DURATION.get_value(endpoint="/api/samples/{id}"), 2)
+
+    def test_pool_sizes_configured(self):
+        """
+        Pool sizes given to the adapter are passed through to urllib3
+        :return:
+        """
+        adapter = PooledHTTPAdapter(pool_connections=3, pool_maxsize=25)
+
+        pool = adapter.poolmanager.connection_from_url(self.url)
+        self.assertEqual(adapter.poolmanager.pools._maxsize, 3)
+        self.assertEqual(pool.pool.maxsize, 25)
+
+
+class TestConnectionPoolStats(unittest.TestCase):
+    """
+    Tests the api.connection_pool.ConnectionPoolStats class
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+
+    def test_counts(self):
+        stats = ConnectionPoolStats()
+        for _ in range(5):
+            stats.record_request()
+        stats.record_new_connection(tls=True)
+        stats.record_new_connection(tls=False)
+        stats.record_session_refresh()
+
+        self.assertEqual(stats.get_dict(), {
+            "requests": 5,
+            "new_connections": 2,
+            "new_tls_connections": 1,
+            "reused_connections": 3,
+            "session_refreshes": 1,
+        })
+
+
+class TestReinitializeSession(unittest.TestCase):
+    """
+    Tests the api.api_calls.ApiCalls._reinitialize_session function keeps the connection pool
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+
+    @patch("iridauploader.api.api_calls.ApiCalls.get_irida_version")
+    @patch("iridauploader.api.api_calls.ApiCalls._get_access_token")
+    @patch("iridauploader.api.api_calls.ApiCalls._get_oauth_service")
+    def test_adapter_reused_on_refresh(self, mock_get_oauth_service, mock_get_access_token,
+                                       mock_get_irida_version):
+        stub_oauth_service = unittest.mock.MagicMock()
+        stub_oauth_service.get_session.side_effect = lambda token: requests.Session()
+        mock_get_oauth_service.return_value = stub_oauth_service
+        mock_get_access_token.return_value = "token"
+        mock_get_irida_version.return_value = "23.01"
+
+        api = api_calls.ApiCalls(client_id="", client_secret="", base_url="https://irida.test/api/",
+                                 username="", password="", http_pool_connections=2, http_pool_maxsize=20)
+        first_session = api._session_instance
+        first_adapter = first_session.get_adapter("https://irida.test/api/")
+
+        api._reinitialize_session()
+        second_session = api._session_instance
+        second_adapter = second_session.get_adapter("https://irida.test/api/")
+
+        self.assertIsNot(first_session, second_session)
+        self.assertIs(first_adapter, second_adapter)
+        self.assertIsInstance(second_adapter, PooledHTTPAdapter)
+        self.assertEqual(second_adapter._pool_maxsize, 20)
+        self.assertEqual(api.get_connection_pool_stats()["session_refreshes"], 1)
@@ -0,0 +1,124 @@
+import threading
+import unittest
+from unittest.mock import patch
+
+from iridauploader.api.flow_control import TokenBucket, AIMDController
+
+
+class TestTokenBucket(unittest.TestCase):
+    """
+    Tests the api.flow_control.TokenBucket class
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+
+    @patch("iridauploader.api.flow_control.time.sleep")
+    @patch("iridauploader.api.flow_control.time.monotonic")
+    def test_burst_then_rate_limited(self, mock_monotonic, mock_sleep):
+        mock_monotonic.return_value = 100.0
+        bucket = TokenBucket(rate=2, burst=3)
+
+        # the burst goes through without waiting
+        self.assertEqual([bucket.acquire() for _ in range(3)], [0, 0, 0])
+        # then each request reserves the next token, 0.5 seconds apart
+        self.assertEqual(bucket.acquire(), 0.5)
+        self.assertEqual(bucket.acquire(), 1.0)
+        self.assertEqual(mock_sleep.call_count, 2)
+
+        # after waiting, tokens are refilled
+        mock_monotonic.return_value = 110.0
+        self.assertEqual(bucket.acquire(), 0)
+
+    @patch("iridauploader.api.flow_control.time.sleep")
+    def test_disabled(self, mock_sleep):
+        bucket = TokenBucket(rate=0, burst=1)
+
+        for _ in range(100):
+            bucket.acquire()
+
+        mock_sleep.assert_not_called()
+
+
+class TestAIMDController(unittest.TestCase):
+    """
+    Tests the api.flow_control.AIMDController class
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+
+    def test_decrease_on_congestion(self):
+        controller = AIMDController(max_limit=8, cooldown=0)
+
+        controller.record_response(503)
+        self.assertEqual(controller.limit, 4)
+        controller.record_response(429)
+        self.assertEqual(controller.limit, 2)
+        controller.record_response(500)
+        controller.record_response(502)
+        # never goes below the minimum
+        self.assertEqual(controller.limit, 1)
+        self.assertEqual(controller.get_dict()["congestion_events"], 4)
+
+    def test_cooldown_ignores_repeated_signals(self):
+        controller = AIMDController(max_limit=8, cooldown=60)
+
+        for _ in range(5):
+            controller.record_congestion()
+
+        self.assertEqual(controller.limit, 4)
+
+    def test_additive_increase(self):
+        controller = AIMDController(max_limit=4, cooldown=0)
+        controller.record_congestion()
+        self.assertEqual(controller.limit, 2)
+
+        # each success grows the limit by 1/limit, so about one window of successes grows it by 1
+        controller.record_response(200, latency=0.1)
+        controller.record_response(201, latency=0.1)
+        self.assertEqual(controller.limit, 2)
+        controller.record_response(200, latency=0.1)
+        self.assertEqual(controller.limit, 3)
+
+        for _ in range(20):
+            controller.record_success()
+        # never grows above the maximum
+        self.assertEqual(controller.limit, 4)
+
+    def test_latency_signal(self):
+        controller = AIMDController(max_limit=4, latency_threshold=2, cooldown=0)
+
+        controller.record_response(200, latency=1)
+        self.assertEqual(controller.limit, 4)
+        controller.record_response(200, latency=5)
+        self.assertEqual(controller.limit, 2)
+        # latency is ignored when it is not given
+        controller.record_response(200, latency=None)
+        self.assertEqual(controller.get_dict()["congestion_events"], 1)
+
+    def test_slots_limit_concurrency(self):
+        controller = AIMDController(max_limit=2)
+        peak = []
+        in_slot = []
+        lock = threading.Lock()
+        release = threading.Event()
+
+        def worker():
+            with controller.slot():
+                with lock:
+                    in_slot.append(1)
+                    peak.append(len(in_slot))
+                release.wait(5)
+                with lock:
+                    in_slot.pop()
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for t in threads:
+            t.start()
+        release.set()
+        for t in threads:
+            t.join(5)
+
+        self.assertLessEqual(max(peak), 2)
+        self.assertEqual(controller.get_dict()["in_flight"], 0)
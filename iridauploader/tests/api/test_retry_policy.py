@@ -0,0 +1,368 @@
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch, ANY, MagicMock, PropertyMock
+
+import requests
+from requests_toolbelt import MultipartEncoder, MultipartEncoderMonitor
+from urllib3.util.retry import Retry
+
+from iridauploader import model
+from iridauploader.api import api_calls
+from iridauploader.api.connection_pool import PooledHTTPAdapter, rate_limit_exempt
+from iridauploader.api.flow_control import AIMDController, TokenBucket
+from iridauploader.api.retry_policy import RetryPolicy, RetryBudget, get_endpoint_template
+
+
+class _ScriptedHandler(BaseHTTPRequestHandler):
+    """
+    Handler that answers with the next status code from the servers script, then 200 once the script is empty
+    """
+    protocol_version = "HTTP/1.1"
+
+    def _respond(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body_length = 0
+        if length:
+            # a client sending less than it said is cut off, instead of waiting for the rest
+            self.connection.settimeout(1)
+            try:
+                while body_length < length:
+                    data = self.rfile.read1(length - body_length)
+                    if not data:
+                        break
+                    body_length += len(data)
+            except OSError:
+                self.close_connection = True
+        self.server.request_count += 1
+        self.server.received.append((length, body_length))
+        status = self.server.script.pop(0) if self.server.script else 200
+        body = b"{}"
+        self.send_response(status)
+        if status in (429, 503) and self.server.retry_after is not None:
+            self.send_header("Retry-After", str(self.server.retry_after))
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _respond
+    do_POST = _respond
+    do_PATCH = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _start_scripted_server(test_case):
+    """
+    Starts a _ScriptedHandler server that is stopped when the test is done
+
+    :param test_case: TestCase the server is for
+    :return: the server, and a sample pairs url on it
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ScriptedHandler)
+    server.script = []
+    server.retry_after = None
+    server.request_count = 0
+    server.received = []
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    test_case.addCleanup(server.server_close)
+    test_case.addCleanup(server.shutdown)
+    return server, "http://127.0.0.1:{}/api/samples/12/pairs".format(server.server_address[1])
+
+
+class TestRetryPolicy(unittest.TestCase):
+    """
+    Tests the api.retry_policy.RetryPolicy class against a local server
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        self.server, self.url = _start_scripted_server(self)
+
+        self.budget = RetryBudget(max_seconds=10)
+        self.session = requests.Session()
+        self.session.mount("http://", PooledHTTPAdapter(
+            max_retries=RetryPolicy(total=3, backoff_factor=0, raise_on_status=False, budget=self.budget)))
+
+        sleep_patcher = patch("iridauploader.api.retry_policy.time.sleep")
+        self.mock_sleep = sleep_patcher.start()
+        self.addCleanup(sleep_patcher.stop)
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_get_retried_on_server_error(self):
+        self.server.script = [500, 502]
+
+        response = self.session.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.request_count, 3)
+        self.assertEqual(self.budget.get_dict()["/api/samples/{id}/pairs"]["retries"], 2)
+
+    def test_post_not_retried_on_server_error(self):
+        """
+        A POST that got a 500 may have been processed already, it must not be sent again
+        :return:
+        """
+        self.server.script = [500]
+
+        response = self.session.post(self.url, data="{}")
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(self.server.request_count, 1)
+
+    def test_post_retried_when_refused(self):
+        self.server.script = [503, 429]
+
+        response = self.session.post(self.url, data="{}")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.request_count, 3)
+
+    def test_streamed_post_not_retried_when_refused(self):
+        """
+        A streamed file upload is used up by the first attempt, sending it again would send an empty body
+        :return:
+        """
+        self.server.script = [503]
+        encoder = MultipartEncoder({"file": ("reads.fastq", b"ACGT" * 25000, "application/octet-stream")})
+
+        response = self.session.post(self.url, data=MultipartEncoderMonitor(encoder),
+                                     headers={"Content-Type": encoder.content_type})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.server.request_count, 1)
+        self.assertEqual(self.server.received[0][0], self.server.received[0][1])
+        # other requests on the thread are still retried
+        self.server.script = [503]
+        self.assertEqual(self.session.post(self.url, data="{}").status_code, 200)
+
+    @patch("iridauploader.api.api_calls.ApiCalls.get_sample_id")
+    @patch("iridauploader.api.api_calls.ApiCalls._create_session")
+    @patch("iridauploader.api.api_calls.ApiCalls.get_irida_version")
+    def test_send_sequence_files_resent_when_refused(self, mock_get_irida_version, mock_create_session,
+                                                     mock_get_sample_id):
+        """
+        An upload IRIDA refused is sent again with a new encoder, so the whole file is sent every time
+        :return:
+        """
+        mock_get_irida_version.return_value = "23.01"
+        mock_get_sample_id.return_value = 12
+        self.server.script = [503, 429, 201]
+        api = api_calls.ApiCalls(client_id="", client_secret="", base_url=self.url.split("samples")[0], username="",
+                                 password="", http_max_retries=3)
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "reads.fastq")
+            with open(file_path, "wb") as reads_file:
+                reads_file.write(b"ACGT" * 25000)
+
+            with patch("iridauploader.api.api_calls.ApiCalls._session", new_callable=PropertyMock,
+                       return_value=self.session):
+                api.send_sequence_files(model.SequenceFile([file_path]), "sample1", "1", upload_id=5)
+
+        self.assertEqual(self.server.request_count, 3)
+        content_length = self.server.received[0][0]
+        self.assertGreater(content_length, 100000)
+        self.assertEqual(self.server.received, [(content_length, content_length)] * 3)
+        self.assertEqual(api.get_retry_stats()["/api/samples/{id}/sequenceFiles"]["retries"], 2)
+
+    def test_retry_after_honoured(self):
+        self.server.script = [429]
+        self.server.retry_after = 4
+
+        self.session.get(self.url)
+
+        self.mock_sleep.assert_called_once_with(4)
+        self.assertEqual(self.budget.get_dict()["/api/samples/{id}/pairs"]["seconds_waited"], 4)
+
+    def test_retry_after_limited_by_budget(self):
+        """
+        Once the budget is spent the request is not retried any more
+        :return:
+        """
+        self.server.script = [503, 503, 503]
+        self.server.retry_after = 6
+
+        response = self.session.get(self.url)
+
+        # 6 seconds, then the 4 left in the budget, then no more retries
+        self.assertEqual([c.args[0] for c in self.mock_sleep.call_args_list], [6, 4])
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.server.request_count, 3)
+
+
+class TestRetryFlowControl(unittest.TestCase):
+    """
+    Tests the rate limiter and concurrency controller see each attempt at a request once, including retries
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        self.server, self.url = _start_scripted_server(self)
+        self.session = requests.Session()
+        self.addCleanup(self.session.close)
+
+    def _mount_adapter(self, raise_on_status=False):
+        self.rate_limiter = MagicMock(spec=TokenBucket)
+        self.rate_limiter.acquire.return_value = 0
+        self.controller = MagicMock(spec=AIMDController)
+        self.session.mount("http://", PooledHTTPAdapter(
+            max_retries=RetryPolicy(total=3, backoff_factor=0, raise_on_status=raise_on_status),
+            rate_limiter=self.rate_limiter, controller=self.controller))
+
+    def test_token_per_attempt(self):
+        self._mount_adapter()
+        self.server.script = [503, 503]
+
+        response = self.session.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.rate_limiter.acquire.call_count, 3)
+        self.assertEqual(self.controller.record_congestion.call_count, 2)
+        self.controller.record_response.assert_called_once_with(200, ANY)
+
+    def test_congestion_reported_once_when_retries_run_out(self):
+        self._mount_adapter()
+        self.server.script = [503] * 4
+
+        response = self.session.get(self.url)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.server.request_count, 4)
+        self.assertEqual(self.controller.record_congestion.call_count, 3)
+        self.controller.record_response.assert_called_once_with(503, ANY)
+
+        # the same when running out of retries raises
+        self._mount_adapter(raise_on_status=True)
+        self.server.script = [503] * 4
+
+        with self.assertRaises(requests.exceptions.RetryError):
+            self.session.get(self.url)
+        self.assertEqual(self.controller.record_congestion.call_count, 4)
+        self.controller.record_response.assert_not_called()
+
+    def test_rate_limit_exempt(self):
+        self._mount_adapter()
+
+        with rate_limit_exempt():
+            self.session.get(self.url)
+        self.rate_limiter.acquire.assert_not_called()
+
+        self.session.get(self.url)
+        self.rate_limiter.acquire.assert_called_once_with()
+
+
+class TestBackoff(unittest.TestCase):
+    """
+    Tests the api.retry_policy.RetryPolicy backoff time
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+
+    def test_backoff_capped(self):
+        retry = RetryPolicy(total=10, backoff_factor=10, backoff_max=30)
+
+        times = []
+        for _ in range(4):
+            retry = retry.increment("GET", "http://irida/api/projects", error=ConnectionError())
+            times.append(retry.get_backoff_time())
+
+        self.assertEqual(times, [0, 20, 30, 30])
+        self.assertEqual(retry.backoff_max, 30)
+
+    def test_backoff_max_not_passed_to_urllib3(self):
+        """
+        urllib3 before 2.0 does not take backoff_max
+        :return:
+        """
+        retry_init = Retry.__init__
+
+        def urllib3_1_init(retry, *args, **kwargs):
+            if "backoff_max" in kwargs:
+                raise TypeError("__init__() got an unexpected keyword argument 'backoff_max'")
+            retry_init(retry, *args, **kwargs)
+
+        with patch.object(Retry, "__init__", urllib3_1_init):
+            retry = RetryPolicy(total=3, backoff_max=300).new(total=2)
+
+        self.assertEqual(retry.backoff_max, 300)
+
+
+class TestRetryBudget(unittest.TestCase):
+    """
+    Tests the api.retry_policy.RetryBudget class
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+
+    def test_take_limited_to_budget(self):
+        budget = RetryBudget(max_seconds=5)
+
+        self.assertEqual(budget.take("/api/a", 3), 3)
+        self.assertEqual(budget.take("/api/a", 3), 2)
+        self.assertEqual(budget.take("/api/a", 3), 0)
+        self.assertTrue(budget.is_spent("/api/a"))
+        # budgets are per endpoint
+        self.assertFalse(budget.is_spent("/api/b"))
+
+    def test_budget_recovers(self):
+        now = [1000.0]
+        budget = RetryBudget(max_seconds=5, window=60, clock=lambda: now[0])
+        budget.take("/api/a", 3)
+        now[0] += 30
+        budget.take("/api/a", 3)
+        self.assertTrue(budget.is_spent("/api/a"))
+
+        # the first wait is out of the window
+        now[0] += 30
+        self.assertFalse(budget.is_spent("/api/a"))
+        self.assertEqual(budget.take("/api/a", 5), 3)
+        # all the waits are out of the window
+        now[0] += 60
+        self.assertEqual(budget.take("/api/a", 5), 5)
+        self.assertEqual(budget.get_dict()["/api/a"]["seconds_waited"], 13)
+
+    def test_unlimited_budget(self):
+        budget = RetryBudget(max_seconds=0)
+
+        self.assertEqual(budget.take("/api/a", 1000), 1000)
+        self.assertFalse(budget.is_spent("/api/a"))
+
+    def test_endpoint_template(self):
+        self.assertEqual(get_endpoint_template("https://irida/api/projects/3/samples?x=1"),
+                         "/api/projects/{id}/samples")
+        self.assertEqual(get_endpoint_template("/api/samples/12/sequenceFiles/pairs"),
+                         "/api/samples/{id}/sequenceFiles/pairs")
+
+
+class TestBuildHttpAdapter(unittest.TestCase):
+    """
+    Tests the api.api_calls.ApiCalls._build_http_adapter function
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+
+    @patch("iridauploader.api.api_calls.ApiCalls._create_session")
+    @patch("iridauploader.api.api_calls.ApiCalls.get_irida_version")
+    def test_backoff_max_not_global(self, mock_get_irida_version, mock_create_session):
+        mock_get_irida_version.return_value = "23.01"
+        default_backoff_max = Retry.DEFAULT_BACKOFF_MAX
+
+        api = api_calls.ApiCalls(client_id="", client_secret="", base_url="", username="", password="",
+                                 http_max_retries=4, http_backoff_factor=2, http_backoff_max=30)
+        adapter = api._build_http_adapter()
+
+        self.assertEqual(Retry.DEFAULT_BACKOFF_MAX, default_backoff_max)
+        self.assertIsInstance(adapter.max_retries, RetryPolicy)
+        self.assertEqual(adapter.max_retries.total, 4)
+        self.assertEqual(adapter.max_retries.backoff_max, 30)
+        self.assertNotIn("POST", adapter.max_retries.allowed_methods)
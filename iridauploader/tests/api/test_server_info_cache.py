@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from iridauploader.api import api_calls, server_info_cache
+from iridauploader.api.exceptions import IridaConnectionError
+
+BASE_URL = "http://irida/api/"
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestServerInfoCache(unittest.TestCase):
+    """
+    Tests the api.server_info_cache.ServerInfoCache class
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.temp_directory.name, "cache", "irida_servers.json")
+        self.clock = FakeClock()
+        self.cache = server_info_cache.ServerInfoCache(self.file_path, ttl=60, clock=self.clock)
+
+    def tearDown(self):
+        self.temp_directory.cleanup()
+
+    def test_put_and_get(self):
+        self.assertIsNone(self.cache.get(BASE_URL))
+
+        self.cache.put(BASE_URL, "23.01", {"uploader": True})
+
+        # a new cache, like another uploader process
+        server_info = server_info_cache.ServerInfoCache(self.file_path, ttl=60, clock=self.clock).get(BASE_URL)
+        self.assertEqual(server_info, server_info_cache.ServerInfo("23.01", {"uploader": True}, 1000.0))
+        # a trailing slash is the same server
+        self.assertEqual(self.cache.get(BASE_URL.rstrip("/")), server_info)
+        self.assertIsNone(self.cache.get("http://other/api/"))
+
+    def test_ttl(self):
+        self.cache.put(BASE_URL, "23.01", {"uploader": True})
+
+        self.clock.now += 59
+        self.assertIsNotNone(self.cache.get(BASE_URL))
+        self.clock.now += 1
+        self.assertIsNone(self.cache.get(BASE_URL))
+        # checked in the future, the clock was changed
+        self.clock.now = 0
+        self.assertIsNone(self.cache.get(BASE_URL))
+
+    def test_unreadable_file(self):
+        os.makedirs(os.path.dirname(self.file_path))
+        with open(self.file_path, "w") as cache_file:
+            cache_file.write("[1, 2")
+
+        self.assertIsNone(self.cache.get(BASE_URL))
+
+
+class TestApiCallsServerInfoCache(unittest.TestCase):
+    """
+    Tests the api.api_calls.ApiCalls version check with a server info cache
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.clock = FakeClock()
+        self.cache = server_info_cache.ServerInfoCache(os.path.join(self.temp_directory.name, "irida_servers.json"),
+                                                       ttl=3600, clock=self.clock)
+
+    def tearDown(self):
+        self.temp_directory.cleanup()
+
+    @patch("iridauploader.api.api_calls.ApiCalls._create_session")
+    @patch("iridauploader.api.api_calls.ApiCalls.get_irida_version")
+    def _make_api(self, irida_version, mock_get_irida_version, mock_create_session, **kwargs):
+        mock_get_irida_version.return_value = irida_version
+        api = api_calls.ApiCalls(client_id="", client_secret="", base_url=BASE_URL, username="", password="",
+                                 **kwargs)
+        return api, mock_get_irida_version
+
+    def test_no_cache(self):
+        api, mock_get_irida_version = self._make_api("23.01")
+
+        mock_get_irida_version.assert_called_once_with()
+        self.assertTrue(api.supports(api_calls.CAPABILITY_UPLOADER))
+
+    def test_version_cached(self):
+        self._make_api("irida-23.01.2-SNAPSHOT", server_info_cache=self.cache)
+
+        # later ApiCalls do not ask IRIDA
+        api, mock_get_irida_version = self._make_api("23.01", server_info_cache=self.cache)
+
+        mock_get_irida_version.assert_not_called()
+        self.assertEqual(api._irida_version, "irida-23.01.2-SNAPSHOT")
+        self.assertTrue(api.supports(api_calls.CAPABILITY_UPLOADER))
+
+        # until the ttl is up
+        self.clock.now += 3600
+        api, mock_get_irida_version = self._make_api("23.05", server_info_cache=self.cache)
+        mock_get_irida_version.assert_called_once_with()
+        self.assertEqual(self.cache.get(BASE_URL).version, "23.05")
+
+    def test_outdated_version_not_cached(self):
+        with self.assertRaises(IridaConnectionError):
+            self._make_api("22.09", server_info_cache=self.cache)
+
+        self.assertIsNone(self.cache.get(BASE_URL))
+
+    def test_capability_added_after_caching(self):
+        self.cache.put(BASE_URL, "23.01", {})
+        api, _ = self._make_api("23.01", server_info_cache=self.cache)
+
+        with patch.dict(api_calls.IRIDA_CAPABILITIES, {"bulk_upload": "24.01"}):
+            self.assertTrue(api.supports(api_calls.CAPABILITY_UPLOADER))
+            self.assertFalse(api.supports("bulk_upload"))
@@ -0,0 +1,225 @@
+import os
+import stat
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+from requests import ConnectionError
+
+from iridauploader.api import api_calls, token_cache
+from iridauploader.api.exceptions import IridaConnectionError
+
+BASE_URL = "http://irida/api/"
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenCache(unittest.TestCase):
+    """
+    Tests the api.token_cache.TokenCache class
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.temp_directory.name, "config", "token_cache.json")
+        self.clock = FakeClock()
+        self.cache = token_cache.TokenCache(self.file_path, clock=self.clock)
+
+    def tearDown(self):
+        self.temp_directory.cleanup()
+
+    def test_put_and_get(self):
+        self.assertIsNone(self.cache.get(BASE_URL, "uploader", "admin"))
+
+        self.cache.put(BASE_URL, "uploader", "admin", "token1", refresh_token="refresh1", expires_in=3600)
+
+        # a new cache, like a later run of the uploader
+        cached_token = token_cache.TokenCache(self.file_path, clock=self.clock).get(BASE_URL, "uploader", "admin")
+        self.assertEqual(cached_token, token_cache.CachedToken("token1", "refresh1", 4600.0))
+        # tokens are kept per url, client and user
+        self.assertIsNone(self.cache.get(BASE_URL, "uploader", "user"))
+        self.assertIsNone(self.cache.get("http://other/api/", "uploader", "admin"))
+        # nothing about the user is written in the clear
+        with open(self.file_path) as cache_file:
+            self.assertNotIn("admin", cache_file.read())
+
+    @unittest.skipIf(sys.platform == "win32", "file permissions are not used on windows")
+    def test_file_only_readable_by_user(self):
+        self.cache.put(BASE_URL, "uploader", "admin", "token1")
+
+        self.assertEqual(stat.S_IMODE(os.stat(self.file_path).st_mode), 0o600)
+
+    def test_is_valid(self):
+        self.cache.put(BASE_URL, "uploader", "admin", "token1", expires_in=3600)
+        cached_token = self.cache.get(BASE_URL, "uploader", "admin")
+        self.assertTrue(self.cache.is_valid(cached_token))
+
+        # tokens about to expire are not used
+        self.clock.now += 3600 - token_cache.EXPIRY_MARGIN
+        self.assertFalse(self.cache.is_valid(cached_token))
+        # tokens without an expiry time are not used
+        self.assertFalse(self.cache.is_valid(cached_token._replace(expires_at=None)))
+
+    def test_remove(self):
+        self.cache.put(BASE_URL, "uploader", "admin", "token2")
+
+        # another process stored a newer token, it is kept
+        self.cache.remove(BASE_URL, "uploader", "admin", access_token="token1")
+        self.assertEqual(self.cache.get(BASE_URL, "uploader", "admin").access_token, "token2")
+
+        self.cache.remove(BASE_URL, "uploader", "admin", access_token="token2")
+        self.assertIsNone(self.cache.get(BASE_URL, "uploader", "admin"))
+
+    def test_unreadable_file(self):
+        os.makedirs(os.path.dirname(self.file_path))
+        with open(self.file_path, "w") as cache_file:
+            cache_file.write("not json")
+
+        self.assertIsNone(self.cache.get(BASE_URL, "uploader", "admin"))
+
+        # the broken file is replaced
+        self.cache.put(BASE_URL, "uploader", "admin", "token1")
+        self.assertEqual(self.cache.get(BASE_URL, "uploader", "admin").access_token, "token1")
+
+
+class TestApiCallsTokenCache(unittest.TestCase):
+    """
+    Tests the api.api_calls.ApiCalls._get_access_token function with a token cache
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.clock = FakeClock()
+        self.cache = token_cache.TokenCache(os.path.join(self.temp_directory.name, "token_cache.json"),
+                                            clock=self.clock)
+        self.oauth_service = MagicMock()
+        self.grants = []
+
+        def get_raw_access_token(data):
+            self.grants.append(data["grant_type"])
+            if data["grant_type"] == "refresh_token" and data["refresh_token"] != "refresh1":
+                return MagicMock(content=b"{'error': 'invalid_grant'}")
+            token_number = len(self.grants)
+            return MagicMock(content="{{'access_token': 'token{0}', 'refresh_token': 'refresh{0}', "
+                                     "'expires_in': 3600}}".format(token_number).encode())
+        self.oauth_service.get_raw_access_token.side_effect = get_raw_access_token
+
+    def tearDown(self):
+        self.temp_directory.cleanup()
+
+    @patch("iridauploader.api.api_calls.ApiCalls._create_session")
+    @patch("iridauploader.api.api_calls.ApiCalls.get_irida_version")
+    def _make_api(self, mock_get_irida_version, mock_create_session, **kwargs):
+        mock_get_irida_version.return_value = "23.01"
+        return api_calls.ApiCalls(client_id="uploader", client_secret="secret", base_url=BASE_URL, username="admin",
+                                  password="password1", **kwargs)
+
+    def test_no_cache(self):
+        api = self._make_api()
+
+        self.assertEqual(api._get_access_token(self.oauth_service), "token1")
+        self.assertEqual(api._get_access_token(self.oauth_service), "token2")
+        self.assertEqual(self.grants, ["password", "password"])
+
+    def test_cached_token_reused(self):
+        self.assertEqual(self._make_api(token_cache=self.cache)._get_access_token(self.oauth_service), "token1")
+
+        # a later run does not log in
+        self.assertEqual(self._make_api(token_cache=self.cache)._get_access_token(self.oauth_service), "token1")
+        self.assertEqual(self.grants, ["password"])
+
+    def test_expired_token_refreshed(self):
+        self._make_api(token_cache=self.cache)._get_access_token(self.oauth_service)
+        self.clock.now += 3600
+
+        self.assertEqual(self._make_api(token_cache=self.cache)._get_access_token(self.oauth_service), "token2")
+        self.assertEqual(self.grants, ["password", "refresh_token"])
+        self.assertEqual(self.cache.get(BASE_URL, "uploader", "admin").refresh_token, "refresh2")
+
+    def test_refresh_rejected(self):
+        self.cache.put(BASE_URL, "uploader", "admin", "token0", refresh_token="revoked", expires_in=0)
+
+        self.assertEqual(self._make_api(token_cache=self.cache)._get_access_token(self.oauth_service), "token2")
+        self.assertEqual(self.grants, ["refresh_token", "password"])
+
+    def test_rejected_token_removed(self):
+        api = self._make_api(token_cache=self.cache)
+        api._access_token = api._get_access_token(self.oauth_service)
+
+        api._remove_cached_token()
+
+        self.assertIsNone(self.cache.get(BASE_URL, "uploader", "admin"))
+
+    def test_bad_credentials(self):
+        self.oauth_service.get_raw_access_token.side_effect = None
+        self.oauth_service.get_raw_access_token.return_value = MagicMock(content=b"{'error': 'unauthorized'}")
+
+        with self.assertRaises(IridaConnectionError):
+            self._make_api(token_cache=self.cache)._get_access_token(self.oauth_service)
+        self.assertIsNone(self.cache.get(BASE_URL, "uploader", "admin"))
+
+
+class TestSessionTokenCache(unittest.TestCase):
+    """
+    Tests the api.api_calls.ApiCalls._session property removes cached tokens only when IRIDA rejects them
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.cache = token_cache.TokenCache(os.path.join(self.temp_directory.name, "token_cache.json"))
+        self.cache.put(BASE_URL, "uploader", "admin", "token1", refresh_token="refresh1", expires_in=3600)
+
+    def tearDown(self):
+        self.temp_directory.cleanup()
+
+    @patch("iridauploader.api.api_calls.ApiCalls._create_session")
+    @patch("iridauploader.api.api_calls.ApiCalls.get_irida_version")
+    def _make_api(self, mock_get_irida_version, mock_create_session):
+        mock_get_irida_version.return_value = "23.01"
+        api = api_calls.ApiCalls(client_id="uploader", client_secret="secret", base_url=BASE_URL, username="admin",
+                                 password="password1", token_cache=self.cache)
+        api._access_token = "token1"
+        api._session_instance = MagicMock()
+        return api
+
+    @patch("iridauploader.api.api_calls.ApiCalls._reinitialize_session")
+    def test_rejected_token_removed(self, mock_reinitialize_session):
+        api = self._make_api()
+        api._session_instance.options.return_value = MagicMock(status_code=401)
+
+        api._session
+
+        mock_reinitialize_session.assert_called_once_with()
+        self.assertIsNone(self.cache.get(BASE_URL, "uploader", "admin"))
+
+    @patch("iridauploader.api.api_calls.ApiCalls._reinitialize_session")
+    def test_server_error_keeps_token(self, mock_reinitialize_session):
+        api = self._make_api()
+        api._session_instance.options.return_value = MagicMock(status_code=503)
+
+        api._session
+
+        mock_reinitialize_session.assert_called_once_with()
+        self.assertEqual(self.cache.get(BASE_URL, "uploader", "admin").refresh_token, "refresh1")
+
+    @patch("iridauploader.api.api_calls.ApiCalls._reinitialize_session")
+    def test_connection_error_keeps_token(self, mock_reinitialize_session):
+        api = self._make_api()
+        api._session_instance.options.side_effect = ConnectionError("Connection refused")
+
+        with self.assertRaises(IridaConnectionError):
+            api._session
+
+        mock_reinitialize_session.assert_not_called()
+        self.assertEqual(self.cache.get(BASE_URL, "uploader", "admin").access_token, "token1")
@@ -1,3 +1,4 @@
+import dataclasses
 import unittest
 from unittest.mock import patch
 import os
@@ -26,6 +27,7 @@ class TestConfig(unittest.TestCase):
         # set the config module level variables back to None
         config.config._conf_parser = None
         config.config._user_config_file = None
+        config.config._settings = None
 
     @patch("iridauploader.config.config._init_config_parser")
     @patch("iridauploader.config.config._load_config_from_file")
@@ -201,6 +203,18 @@ class TestConfig(unittest.TestCase):
         self.assertEqual(config.read_config_option('http_backoff_factor', float, 0), 0)
         self.assertEqual(config.read_config_option('http_backoff_factor', float, 1), 1)
 
+    def test_read_config_option_float_default(self):
+        """
+        Test float options that are not in the config file return their default as a float
+        :return:
+        """
+        # set up config
+        config.set_config_file(os.path.join(path_to_module, "test_config.conf"))
+        config.setup()
+        # http_backoff_max is not in the test config file, so the int default is used
+        self.assertEqual(config.read_config_option('http_backoff_max', float), 120.0)
+        self.assertIs(type(config.read_config_option('http_backoff_max', float)), float)
+
     def test_set_config_options(self):
         """
         Test writing to config file, make sure writen values are written correctly
@@ -222,3 +236,92 @@ class TestConfig(unittest.TestCase):
         self.assertEqual(config.read_config_option('client_id'), "new_id")
         self.assertEqual(config.read_config_option('http_max_retries', int), 2)
         self.assertEqual(config.read_config_option('http_backoff_factor', float), 2.5)
+
+    def test_set_config_options_clear_string(self):
+        """
+        Test an empty string clears a string option, and options that are not given are kept
+        :return:
+        """
+        config.set_config_file(os.path.join(path_to_module, "test_config.conf"))
+        config.setup()
+
+        config.set_config_options(metrics_textfile="/var/lib/irida_uploader.prom")
+        config.set_config_options(client_id="new_id")
+        self.assertEqual(config.get_settings().metrics_textfile, "/var/lib/irida_uploader.prom")
+
+        config.set_config_options(metrics_textfile="")
+        self.assertEqual(config.get_settings().metrics_textfile, "")
+
+    def test_get_settings(self):
+        """
+        Test the settings snapshot has every option as its type
+        :return:
+        """
+        config.set_config_file(os.path.join(path_to_module, "test_config.conf"))
+        config.setup()
+
+        settings = config.get_settings()
+
+        self.assertEqual(settings.client_id, 'uploader')
+        self.assertEqual(settings.parser, 'miseq')
+        self.assertIs(settings.readonly, False)
+        self.assertEqual(settings.timeout, 5)
+        self.assertEqual(settings.http_backoff_factor, 0.5)
+        # options that are not in the file use the defaults
+        self.assertIs(type(settings.http_backoff_max), float)
+        self.assertEqual(settings.http_backoff_max, 120.0)
+        self.assertEqual(settings.log_directory, '')
+        # the IRIDA version is not cached unless it is turned on
+        self.assertEqual(settings.irida_version_cache_ttl, 0)
+        # the snapshot is only built once
+        self.assertIs(config.get_settings(), settings)
+        # secrets are hidden when settings are logged
+        self.assertNotIn('password1', repr(settings))
+        self.assertNotIn('secret', repr(settings).replace('client_secret', ''))
+
+    def test_settings_can_not_change(self):
+        """
+        Test settings can not be changed, and setting options builds a new snapshot
+        :return:
+        """
+        config.set_config_file(os.path.join(path_to_module, "test_config.conf"))
+        config.setup()
+        settings = config.get_settings()
+
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            settings.timeout = 1
+        self.assertFalse(hasattr(settings, '__dict__'))
+
+        config.set_config_options(timeout=1)
+        self.assertEqual(settings.timeout, 5)
+        self.assertEqual(config.get_settings().timeout, 1)
+
+    def test_get_settings_errors(self):
+        """
+        Test every option with the wrong type is reported when the settings are built
+        :return:
+        """
+        config.set_config_file(os.path.join(path_to_module, "test_config_case_error.conf"))
+        config.setup()
+
+        with self.assertRaises(NameError) as context:
+            config.get_settings()
+
+        self.assertIn("Config file field 'readonly' expected 'True' or 'False'", str(context.exception))
+        self.assertIn("Config file field 'http_max_retries' expected int", str(context.exception))
+        self.assertIn("Config file field 'http_backoff_factor' expected float", str(context.exception))
+
+    def test_reload_settings(self):
+        """
+        Test reloading the settings reads the config file again
+        :return:
+        """
+        config.set_config_file(os.path.join(path_to_module, "test_config.conf"))
+        config.setup()
+        config.set_config_options(client_id="new_id")
+        self.assertEqual(config.get_settings().client_id, "new_id")
+
+        settings = config.reload_settings()
+
+        self.assertEqual(settings.client_id, "uploader")
+        self.assertIs(config.get_settings(), settings)
@@ -53,6 +53,7 @@ class TestPrepareAndValidateForUpload(unittest.TestCase):
 
         # check that each function was called the correct number of times and with the correct data
         res = api_handler.prepare_and_validate_for_upload(sequencing_run)
+        stub_api_instance.resolve_projects.assert_called_once_with(["6"])
         stub_api_instance.project_exists.assert_called_once_with("6")
         stub_api_instance.sample_exists.assert_has_calls([
             unittest.mock.call('01-1111', '6'),
@@ -510,6 +511,74 @@ class TestUploadSequencingRun(unittest.TestCase):
         stub_api_instance.set_seq_run_uploading.assert_called_once_with(mock_sequence_run_id)
         stub_api_instance.set_seq_run_error.assert_called_once_with(mock_sequence_run_id)
 
+    @patch("iridauploader.core.api_handler._get_api_instance")
+    @patch("iridauploader.progress.write_directory_status")
+    @patch("iridauploader.core.api_handler._upload_max_concurrency", 3)
+    def test_valid_concurrent_upload(self, mock_progress, mock_api_instance):
+        """
+        Makes sure every sample is uploaded and marked as uploaded when uploading concurrently
+        :return:
+        """
+        global sequencing_run
+
+        for samp in sequencing_run.project_list[0].sample_list:
+            samp.sequence_file = "mock_sample"
+
+        stub_api_instance = unittest.mock.MagicMock()
+        stub_api_instance.create_seq_run.side_effect = [55]
+        stub_directory_status = unittest.mock.MagicMock()
+
+        mock_api_instance.side_effect = [stub_api_instance]
+
+        api_handler.upload_sequencing_run(sequencing_run,
+                                          directory_status=stub_directory_status,
+                                          upload_mode=MODE_DEFAULT)
+
+        stub_api_instance.send_sequence_files.assert_has_calls([
+            unittest.mock.call(project_id='6', sample_name='01-1111', sequence_file='mock_sample',
+                               upload_id=55, upload_mode=MODE_DEFAULT),
+            unittest.mock.call(project_id='6', sample_name='02-2222', sequence_file='mock_sample',
+                               upload_id=55, upload_mode=MODE_DEFAULT),
+            unittest.mock.call(project_id='6', sample_name='03-3333', sequence_file='mock_sample',
+                               upload_id=55, upload_mode=MODE_DEFAULT)
+        ], any_order=True)
+        stub_directory_status.set_sample_uploaded.assert_has_calls([
+            unittest.mock.call(sample_name='01-1111', project_id='6', uploaded=True),
+            unittest.mock.call(sample_name='02-2222', project_id='6', uploaded=True),
+            unittest.mock.call(sample_name='03-3333', project_id='6', uploaded=True),
+        ], any_order=True)
+        # once for the run id, and once per sample
+        self.assertEqual(mock_progress.call_count, 4)
+        stub_api_instance.set_seq_run_complete.assert_called_once_with(55)
+
+    @patch("iridauploader.core.api_handler._get_api_instance")
+    @patch("iridauploader.progress.write_directory_status")
+    def test_upload_error_stops_remaining_samples(self, mock_progress, mock_api_instance):
+        """
+        Makes sure samples after a failed upload are not uploaded, and the run is set to error
+        :return:
+        """
+        global sequencing_run
+
+        for samp in sequencing_run.project_list[0].sample_list:
+            samp.sequence_file = "mock_sample"
+
+        stub_api_instance = unittest.mock.MagicMock()
+        stub_api_instance.create_seq_run.side_effect = [55]
+        stub_api_instance.send_sequence_files.side_effect = [IridaConnectionError("Boom"), True, True]
+        stub_directory_status = unittest.mock.MagicMock()
+
+        mock_api_instance.side_effect = [stub_api_instance]
+
+        with self.assertRaises(IridaConnectionError):
+            api_handler.upload_sequencing_run(sequencing_run,
+                                              directory_status=stub_directory_status,
+                                              upload_mode=MODE_DEFAULT)
+
+        stub_directory_status.set_sample_uploaded.assert_not_called()
+        stub_api_instance.set_seq_run_error.assert_called_once_with(55)
+        stub_api_instance.set_seq_run_complete.assert_not_called()
+
 
 class TestSendProject(unittest.TestCase):
     """
@@ -1,3 +1,5 @@
+import subprocess
+import sys
 import unittest
 from unittest.mock import patch
 from os import path
@@ -46,6 +48,14 @@ class TestCliEntryPoints(unittest.TestCase):
             def upload_mode(self):
                 return None
 
+            @property
+            def profile(self):
+                return None
+
+            @property
+            def status(self):
+                return None
+
         stub_args_object = StubArgs()
         # stub_argparser returns the above args object
         stub_argparser = unittest.mock.MagicMock()
@@ -98,6 +108,14 @@ class TestCliEntryPoints(unittest.TestCase):
             def upload_mode(self):
                 return None
 
+            @property
+            def profile(self):
+                return None
+
+            @property
+            def status(self):
+                return None
+
         stub_args_object = StubArgs()
         # stub_argparser returns the above args object
         stub_argparser = unittest.mock.MagicMock()
@@ -120,3 +138,43 @@ class TestCliEntryPoints(unittest.TestCase):
                                                                stub_args_object.force,
                                                                stub_args_object.upload_mode,
                                                                stub_args_object.continue_partial)
+
+    @patch("iridauploader.core.upload.upload_run_single_entry")
+    @patch("iridauploader.core.cli._config_uploader")
+    @patch("iridauploader.core.cli.init_argparser")
+    def test_invalid_config(self, mock_init_argparser, mock_configure_uploader, mock_upload_run_single_entry):
+        # the settings could not be converted to their types
+        mock_configure_uploader.side_effect = NameError("Config file field 'timeout' expected int but instead got 'x'")
+
+        with patch("builtins.print") as mock_print:
+            exit_code = cli.main()
+
+        self.assertEqual(exit_code, 1)
+        self.assertIn("'timeout' expected int", mock_print.call_args[0][0])
+        mock_upload_run_single_entry.assert_not_called()
+
+
+class TestCliImports(unittest.TestCase):
+    """
+    Tests that starting the command line uploader does not import modules only needed for an upload
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+
+    def test_upload_modules_not_imported(self):
+        upload_modules = ["requests", "rauth", "requests_toolbelt", "cerberus", "iridauploader.api.api_calls",
+                          "iridauploader.parsers.miseq", "iridauploader.parsers.directory"]
+        code = "import sys, iridauploader.core.cli; print(','.join(m for m in {} if m in sys.modules))".format(
+            upload_modules)
+
+        result = subprocess.run([sys.executable, "-c", code], stdout=subprocess.PIPE, universal_newlines=True,
+                                check=True)
+
+        self.assertEqual(result.stdout.strip(), "")
+
+    def test_upload_modes_available(self):
+        from iridauploader import api
+
+        self.assertIn(api.MODE_DEFAULT, api.UPLOAD_MODES)
+        self.assertIs(api.ApiCalls, sys.modules["iridauploader.api.api_calls"].ApiCalls)
@@ -53,10 +53,10 @@ class TestValidateFileSizeMinimum(unittest.TestCase):
         sequencing_run = model.SequencingRun({"layoutType": "PAIRED_END"}, [project], "miseq")
         return sequencing_run
 
-    @patch("iridauploader.core.file_size_validator.config.read_config_option")
-    def test_files_too_small(self, mock_read_file_size_config_option):
+    @patch("iridauploader.core.file_size_validator.config.get_settings")
+    def test_files_too_small(self, mock_get_settings):
         # force the function to grab 100 (min file size) when it tries to call config
-        mock_read_file_size_config_option.side_effect = [100]
+        mock_get_settings.return_value.minimum_file_size = 100
 
         # make a sequencing run to work with
         sequencing_run = self._make_seq_run()
@@ -68,10 +68,10 @@ class TestValidateFileSizeMinimum(unittest.TestCase):
         self.assertFalse(res.is_valid(), "File size is not too small")
         print(res)
 
-    @patch("iridauploader.core.file_size_validator.config.read_config_option")
-    def test_files_not_too_small(self, mock_read_file_size_config_option):
+    @patch("iridauploader.core.file_size_validator.config.get_settings")
+    def test_files_not_too_small(self, mock_get_settings):
         # force the function to grab 0 (min file size) when it tries to call config
-        mock_read_file_size_config_option.side_effect = [0]
+        mock_get_settings.return_value.minimum_file_size = 0
 
         # make a sequencing run to work with
         sequencing_run = self._make_seq_run()
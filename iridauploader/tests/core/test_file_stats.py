@@ -0,0 +1,105 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from iridauploader import model
+from iridauploader.core import file_stats
+
+
+class TestFileStats(unittest.TestCase):
+    """
+    Tests the core.file_stats module
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.directory = self.temp_directory.name
+        os.mkdir(os.path.join(self.directory, "data"))
+
+        sample_list = []
+        for i, size in enumerate([10, 20]):
+            file_list = []
+            for read in ["R1", "R2"]:
+                file_name = os.path.join(self.directory, "data", "sample{}_{}.fastq".format(i, read))
+                with open(file_name, "w") as f:
+                    f.write("a" * size)
+                file_list.append(file_name)
+            sample = model.Sample("sample{}".format(i))
+            sample.sequence_file = model.SequenceFile(file_list)
+            sample_list.append(sample)
+        self.sample_list = sample_list
+        self.sequencing_run = model.SequencingRun({"layoutType": "PAIRED_END"},
+                                                  [model.Project(sample_list=sample_list, id="1")], "miseq")
+
+    def tearDown(self):
+        self.temp_directory.cleanup()
+
+    def test_scan_file_stats(self):
+        file_list = self.sample_list[0].sequence_file.file_list + [os.path.join(self.directory, "missing.fastq")]
+
+        stats = file_stats.scan_file_stats(file_list)
+
+        self.assertEqual(set(stats), set(self.sample_list[0].sequence_file.file_list))
+        self.assertEqual([s.st_size for s in stats.values()], [10, 10])
+
+    def test_stat_sequencing_run(self):
+        cached_count = file_stats.stat_sequencing_run(self.sequencing_run)
+
+        self.assertEqual(cached_count, 4)
+        # the validators and upload read the cached stats without touching the disk
+        with patch("iridauploader.model.sequence_file.os.stat") as mock_stat:
+            self.assertEqual(self.sample_list[0].sequence_file.get_total_file_size(), 20)
+            self.assertEqual(self.sample_list[1].sequence_file.get_total_file_size(), 40)
+        mock_stat.assert_not_called()
+
+    def test_one_listing_per_directory(self):
+        with patch("iridauploader.core.file_stats.os.scandir", wraps=os.scandir) as mock_scandir:
+            file_stats.stat_sequencing_run(self.sequencing_run)
+
+        mock_scandir.assert_called_once_with(os.path.join(self.directory, "data"))
+
+    def test_no_changed_files(self):
+        file_stats.stat_sequencing_run(self.sequencing_run)
+
+        self.assertEqual(file_stats.get_changed_files(self.sequencing_run), [])
+
+    def test_changed_files(self):
+        file_stats.stat_sequencing_run(self.sequencing_run)
+        grown_file, removed_file = self.sample_list[0].sequence_file.file_list
+        with open(grown_file, "a") as f:
+            f.write("more data")
+        os.remove(removed_file)
+
+        self.assertEqual(file_stats.get_changed_files(self.sequencing_run), [grown_file, removed_file])
+
+    def test_skipped_samples_not_checked(self):
+        file_stats.stat_sequencing_run(self.sequencing_run)
+        self.sample_list[0].skip = True
+        os.remove(self.sample_list[0].sequence_file.file_list[0])
+
+        self.assertEqual(file_stats.get_changed_files(self.sequencing_run), [])
+
+    def test_directory_fingerprint(self):
+        fingerprint = file_stats.get_directory_fingerprint(self.directory)
+        # files written by the uploader do not change the fingerprint
+        with open(os.path.join(self.directory, "irida_uploader_status.info"), "w") as f:
+            f.write("{}")
+        self.assertEqual(file_stats.get_directory_fingerprint(self.directory), fingerprint)
+
+        with open(os.path.join(self.directory, "SampleSheet.csv"), "w") as f:
+            f.write("[Header]")
+        self.assertNotEqual(file_stats.get_directory_fingerprint(self.directory), fingerprint)
+
+    def test_run_is_unchanged(self):
+        fingerprint = file_stats.get_directory_fingerprint(self.directory)
+        file_stats.stat_sequencing_run(self.sequencing_run)
+
+        self.assertTrue(file_stats.run_is_unchanged(self.sequencing_run, self.directory, fingerprint))
+        self.assertFalse(file_stats.run_is_unchanged(self.sequencing_run, self.directory, "old fingerprint"))
+        self.assertFalse(file_stats.run_is_unchanged(self.sequencing_run, os.path.join(self.directory, "missing"),
+                                                     fingerprint))
+
+        os.remove(self.sample_list[1].sequence_file.file_list[0])
+        self.assertFalse(file_stats.run_is_unchanged(self.sequencing_run, self.directory, fingerprint))
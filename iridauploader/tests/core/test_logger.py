@@ -0,0 +1,148 @@
+import io
+import logging
+import queue
+import unittest
+from unittest.mock import patch
+
+from iridauploader.core import logger
+
+
+class ListHandler(logging.Handler):
+    """
+    Keeps the formatted records
+    """
+
+    def __init__(self, level=logging.NOTSET):
+        super().__init__(level)
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+def _make_record(message, level=logging.INFO, created=0.0, pathname="/somewhere/module.py", lineno=1, name="root"):
+    record = logging.makeLogRecord({"name": name, "msg": message, "levelno": level,
+                                    "levelname": logging.getLevelName(level), "pathname": pathname,
+                                    "lineno": lineno})
+    record.created = created
+    return record
+
+
+class TestModuleLevels(unittest.TestCase):
+    """
+    Tests the core.logger.ModuleLevelFilter class and parse_module_levels function
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+
+    def test_parse_module_levels(self):
+        levels = logger.parse_module_levels("iridauploader.api=info, urllib3 = WARNING,")
+
+        self.assertEqual(levels, {"iridauploader.api": logging.INFO, "urllib3": logging.WARNING})
+        self.assertEqual(logger.parse_module_levels(""), {})
+
+    def test_parse_module_levels_invalid(self):
+        with self.assertRaises(ValueError):
+            logger.parse_module_levels("iridauploader.api=LOUD")
+        with self.assertRaises(ValueError):
+            logger.parse_module_levels("iridauploader.api")
+
+    def test_filter(self):
+        level_filter = logger.ModuleLevelFilter({"iridauploader.api": logging.INFO,
+                                                 "iridauploader.api.api_calls": logging.ERROR,
+                                                 "urllib3": logging.WARNING})
+        package_directory = logger._package_parent_directory + "/iridauploader"
+
+        def allowed(level, pathname, name="root"):
+            return bool(level_filter.filter(_make_record("message", level, pathname=pathname, name=name)))
+
+        # longest matching module is used
+        self.assertFalse(allowed(logging.WARNING, package_directory + "/api/api_calls.py"))
+        self.assertTrue(allowed(logging.ERROR, package_directory + "/api/api_calls.py"))
+        self.assertFalse(allowed(logging.DEBUG, package_directory + "/api/__init__.py"))
+        self.assertTrue(allowed(logging.INFO, package_directory + "/api/async_api_calls.py"))
+        # modules without a level log everything
+        self.assertTrue(allowed(logging.DEBUG, package_directory + "/core/upload.py"))
+        # named loggers are matched by name
+        self.assertFalse(allowed(logging.DEBUG, "/site-packages/urllib3/connectionpool.py",
+                                 name="urllib3.connectionpool"))
+
+        level_filter.set_levels({})
+        self.assertTrue(allowed(logging.DEBUG, package_directory + "/api/api_calls.py"))
+
+
+class TestLogQueueListener(unittest.TestCase):
+    """
+    Tests the core.logger.LogQueueListener class
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        self.handler = ListHandler()
+        self.log_queue = queue.Queue()
+        self.listener = logger.LogQueueListener(self.log_queue, self.handler, repeat_interval=5)
+
+    def tearDown(self):
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def test_repeats_dropped(self):
+        for created in range(4):
+            self.listener.handle(_make_record("Retrying", created=created))
+        self.listener.handle(_make_record("Retrying", created=4, lineno=2))
+        self.listener.handle(_make_record("Other message", created=4))
+        self.assertEqual(self.handler.lines, ["Retrying", "Retrying", "Other message"])
+
+        # the count is written with the first record after the interval
+        self.listener.handle(_make_record("Retrying", created=6))
+
+        self.assertEqual(self.handler.lines, ["Retrying", "Retrying", "Other message",
+                                              "Previous message repeated 3 more times: Retrying", "Retrying"])
+
+    def test_repeats_not_dropped(self):
+        self.listener.repeat_interval = 0
+        for created in range(3):
+            self.listener.handle(_make_record("Retrying", created=created))
+
+        self.assertEqual(self.handler.lines, ["Retrying"] * 3)
+
+    def test_flush(self):
+        self.listener.start()
+        for created in range(3):
+            self.log_queue.put_nowait(_make_record("Retrying", created=created))
+
+        self.assertTrue(self.listener.flush())
+
+        self.assertEqual(self.handler.lines, ["Retrying", "Previous message repeated 2 more times: Retrying"])
+
+    def test_handler_levels(self):
+        warning_handler = ListHandler(logging.WARNING)
+        self.listener.add_handler(warning_handler)
+        self.listener.handle(_make_record("info"))
+        self.listener.handle(_make_record("warning", logging.WARNING))
+        self.listener.remove_handler(warning_handler)
+        self.listener.handle(_make_record("error", logging.ERROR))
+
+        self.assertEqual(self.handler.lines, ["info", "warning", "error"])
+        self.assertEqual(warning_handler.lines, ["warning"])
+
+    def test_closed_stream_skipped(self):
+        stream = io.StringIO()
+        stream_handler = logging.StreamHandler(stream)
+        self.listener.add_handler(stream_handler)
+        stream.close()
+
+        with patch("sys.stderr", new_callable=io.StringIO) as stderr:
+            self.listener.handle(_make_record("written after the stream closed"))
+
+        # the record still reaches the open handlers, and no logging error is printed
+        self.assertEqual(self.handler.lines, ["written after the stream closed"])
+        self.assertEqual(stderr.getvalue(), "")
+
+    def test_directory_log_only_this_process(self):
+        record = _make_record("from an upload process")
+        record.process = -1
+
+        self.assertFalse(logger._is_from_this_process(record))
+        self.assertTrue(logger._is_from_this_process(_make_record("from this process")))
@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from iridauploader.api import MetadataUploadResult, METADATA_SENT, METADATA_FAILED
+from iridauploader.api.exceptions import IridaResourceError
+from iridauploader.core import metadata_cli
+
+
+class TestReadMetadataCsv(unittest.TestCase):
+    """
+    Tests the core.metadata_cli.read_metadata_csv function
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        self.directory = tempfile.TemporaryDirectory()
+        self.csv_file = os.path.join(self.directory.name, "metadata.csv")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _write_csv(self, text):
+        with open(self.csv_file, "w", newline="") as f:
+            f.write(text)
+
+    def test_read(self):
+        self._write_csv("sample_id,lineage,qc\n1,B.1.1.7,pass\n2,,fail\n")
+
+        items = metadata_cli.read_metadata_csv(self.csv_file)
+
+        self.assertEqual([sample_id for sample_id, _ in items], ["1", "2"])
+        self.assertEqual(items[0][1].metadata, {"lineage": "B.1.1.7", "qc": "pass"})
+        # empty cells are left out
+        self.assertEqual(items[1][1].metadata, {"qc": "fail"})
+
+    def test_custom_column(self):
+        self._write_csv("lineage,id\nB.1.1.7,5\n")
+
+        items = metadata_cli.read_metadata_csv(self.csv_file, sample_id_column="id")
+
+        self.assertEqual(items[0][0], "5")
+        self.assertEqual(items[0][1].metadata, {"lineage": "B.1.1.7"})
+
+    def test_missing_column(self):
+        self._write_csv("lineage,qc\nB.1.1.7,pass\n")
+
+        with self.assertRaises(ValueError):
+            metadata_cli.read_metadata_csv(self.csv_file)
+
+    def test_missing_sample_id(self):
+        self._write_csv("sample_id,qc\n,pass\n")
+
+        with self.assertRaises(ValueError):
+            metadata_cli.read_metadata_csv(self.csv_file)
+
+
+class TestUploadMetadata(unittest.TestCase):
+    """
+    Tests the core.metadata_cli.upload_metadata function
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+
+    @patch("iridauploader.core.metadata_cli.api_handler")
+    @patch("iridauploader.core.metadata_cli.read_metadata_csv")
+    def test_exit_code(self, mock_read_metadata_csv, mock_api_handler):
+        mock_read_metadata_csv.return_value = [("1", None), ("2", None)]
+        mock_api_handler.send_metadata_bulk.side_effect = [
+            [MetadataUploadResult("1", METADATA_SENT, None), MetadataUploadResult("2", METADATA_SENT, None)],
+            [MetadataUploadResult("1", METADATA_SENT, None),
+             MetadataUploadResult("2", METADATA_FAILED, IridaResourceError("Boom"))],
+        ]
+
+        self.assertEqual(metadata_cli.upload_metadata("file.csv", "sample_id", 4, False), 0)
+        self.assertEqual(metadata_cli.upload_metadata("file.csv", "sample_id", 4, True), 1)
+
+        mock_api_handler.send_metadata_bulk.assert_called_with([("1", None), ("2", None)],
+                                                               max_workers=4, skip_unchanged=True)
@@ -0,0 +1,139 @@
+import itertools
+import random
+import unittest
+
+from cerberus import Validator
+
+from iridauploader import model
+from iridauploader.core import model_validator
+
+
+def _build_sequencing_run(sample_count, invalid_every=None):
+    """
+    Builds a paired end run, every invalid_every sample has an invalid name or files
+    """
+    sample_list = []
+    for i in range(sample_count):
+        files = ["sample{}_R1.fastq.gz".format(i), "sample{}_R2.fastq.gz".format(i)]
+        name = "sample{}".format(i)
+        if invalid_every and i % invalid_every == 0:
+            if i % (2 * invalid_every) == 0:
+                name = "s"
+            else:
+                files = ["sample{}_A.fastq.gz".format(i), "sample{}_B.fastq.gz".format(i)]
+        sample = model.Sample(name, sample_number=i + 1)
+        sample.sequence_file = model.SequenceFile(files)
+        sample_list.append(sample)
+    project = model.Project(sample_list=sample_list, id="1")
+    return model.SequencingRun({"layoutType": "PAIRED_END"}, [project], "miseq")
+
+
+def _get_cerberus_validators():
+    schemas = [model.SequencingRun.uploadable_schema, model.Project.uploadable_schema,
+               model.Sample.uploadable_schema, model.SequenceFile.uploadable_schema]
+    return [Validator(schema, allow_unknown=True) for schema in schemas]
+
+
+class TestCompiledValidator(unittest.TestCase):
+    """
+    Tests that core.model_validator.CompiledValidator gives the same result as cerberus
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+
+    def _assert_same_as_cerberus(self, schema, value_pool):
+        compiled_validator = model_validator.CompiledValidator(schema)
+        cerberus_validator = Validator(schema, allow_unknown=True)
+        fields = list(schema)
+        missing = object()
+        rng = random.Random(0)
+        for _ in range(300):
+            document = {"unknown_field": 1}
+            for field in fields:
+                value = rng.choice(value_pool + [missing])
+                if value is not missing:
+                    document[field] = value
+            self.assertEqual(compiled_validator.validate(document), cerberus_validator.validate(document), document)
+            self.assertEqual(compiled_validator.errors, cerberus_validator.errors, document)
+
+    def _get_value_pool(self):
+        sequence_file = model.SequenceFile(["a_R1.fastq", "a_R2.fastq"])
+        sample = model.Sample("sample")
+        return [None, "", "ab", "abcde", 0, 5, True, False, 1.5, [], ["a"], ["a", 1], {},
+                {"layoutType": "PAIRED_END"}, {"layoutType": "NOT_A_LAYOUT"}, {"layoutType": None},
+                {"other": "value"}, sequence_file, sample, [sample], [sample, "b"],
+                model.Project(sample_list=[sample], id="1"), [model.Project(id="1")]]
+
+    def test_sequencing_run_schema(self):
+        self._assert_same_as_cerberus(model.SequencingRun.uploadable_schema, self._get_value_pool())
+
+    def test_project_schemas(self):
+        self._assert_same_as_cerberus(model.Project.uploadable_schema, self._get_value_pool())
+        self._assert_same_as_cerberus(model.Project.send_project_schema, self._get_value_pool())
+
+    def test_sample_schema(self):
+        self._assert_same_as_cerberus(model.Sample.uploadable_schema, self._get_value_pool())
+
+    def test_sequence_file_schema(self):
+        self._assert_same_as_cerberus(model.SequenceFile.uploadable_schema, self._get_value_pool())
+
+    def test_unknown_rule_uses_cerberus(self):
+        schema = {"_name": {"type": "string", "regex": "^[a-z]+$"}}
+        compiled_validator = model_validator.CompiledValidator(schema)
+
+        self.assertTrue(compiled_validator.validate({"_name": "abc"}))
+        self.assertFalse(compiled_validator.validate({"_name": "ABC"}))
+        self.assertEqual(compiled_validator.errors, {"_name": ["value does not match regex '^[a-z]+$'"]})
+
+
+class TestValidateSequencingRun(unittest.TestCase):
+    """
+    Tests the core.model_validator.validate_sequencing_run function
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+
+    def test_valid(self):
+        result = model_validator.validate_sequencing_run(_build_sequencing_run(20))
+
+        self.assertTrue(result.is_valid())
+
+    def test_same_errors_as_cerberus(self):
+        sequencing_run = _build_sequencing_run(20, invalid_every=3)
+
+        result = model_validator.validate_sequencing_run(sequencing_run)
+        cerberus_result = model_validator._validate_sequencing_run(sequencing_run, *_get_cerberus_validators())
+
+        self.assertEqual(result.error_count(), 7)
+        for error, cerberus_error in itertools.zip_longest(result.error_list, cerberus_result.error_list):
+            self.assertEqual(error.message, cerberus_error.message)
+            self.assertIs(error.object, cerberus_error.object)
+
+    def test_invalid_run(self):
+        sequencing_run = _build_sequencing_run(2)
+        sequencing_run.metadata = {"layoutType": "NOT_A_LAYOUT"}
+
+        result = model_validator.validate_sequencing_run(sequencing_run)
+
+        self.assertEqual(result.error_count(), 1)
+        self.assertEqual(result.error_list[0].message, {"_metadata": [{"layoutType": ["unallowed value NOT_A_LAYOUT"]}]})
+
+
+class TestValidateSendProject(unittest.TestCase):
+    """
+    Tests the core.model_validator.validate_send_project function
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+
+    def test_valid(self):
+        model_validator.validate_send_project(model.Project(name="Project Name"))
+
+    def test_short_name(self):
+        with self.assertRaises(model.exceptions.ModelValidationError) as context:
+            model_validator.validate_send_project(model.Project(name="abc"))
+
+        self.assertEqual(context.exception.message, {"_name": ["min length is 5"]})
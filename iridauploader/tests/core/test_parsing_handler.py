@@ -18,19 +18,19 @@ class TestGetParserFromConfig(unittest.TestCase):
     def setUp(self):
         print("\nStarting " + self.__module__ + ": " + self._testMethodName)
 
-    @patch("iridauploader.core.parsing_handler.config.read_config_option")
-    def test_get_miseq_parser(self, mock_read_config_option):
+    @patch("iridauploader.core.parsing_handler.config.get_settings")
+    def test_get_miseq_parser(self, mock_get_settings):
         # force the handler to grab 'miseq' when it tries to call config
-        mock_read_config_option.side_effect = ["miseq"]
+        mock_get_settings.return_value.parser = "miseq"
 
         res = parsing_handler.get_parser_from_config()
         # verify we grabbed the right parser
         self.assertEqual(type(res), parsers.parsers.miseq.Parser)
 
-    @patch("iridauploader.core.parsing_handler.config.read_config_option")
-    def test_get_directory_parser(self, mock_read_config_option):
+    @patch("iridauploader.core.parsing_handler.config.get_settings")
+    def test_get_directory_parser(self, mock_get_settings):
         # force the handler to grab 'directory' when it tries to call config
-        mock_read_config_option.side_effect = ["directory"]
+        mock_get_settings.return_value.parser = "directory"
 
         res = parsing_handler.get_parser_from_config()
         # verify we grabbed the right parser
@@ -44,6 +44,10 @@ class TestParseAndValidate(unittest.TestCase):
 
     def setUp(self):
         print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        # the sequencing runs in these tests are strings, there are no files to stat
+        stat_patcher = patch("iridauploader.core.parsing_handler.file_stats.stat_sequencing_run")
+        self.mock_stat_sequencing_run = stat_patcher.start()
+        self.addCleanup(stat_patcher.stop)
 
     @patch("iridauploader.core.uniform_file_count_validator.validate_uniform_file_count")
     @patch("iridauploader.core.file_size_validator.validate_file_size_minimum")
@@ -80,6 +84,7 @@ class TestParseAndValidate(unittest.TestCase):
         mock_parser_instance.get_sequencing_run.assert_called_once_with("mock_sample_sheet")
         mock_validate_model.assert_called_once_with("mock_sequencing_run")
         mock_validate_file_size.assert_called_once_with("mock_sequencing_run")
+        self.mock_stat_sequencing_run.assert_called_once_with("mock_sequencing_run")
         self.assertEqual(res, "mock_sequencing_run")
 
     @patch("iridauploader.core.parsing_handler.model_validator.validate_sequencing_run")
@@ -0,0 +1,140 @@
+import os
+import pstats
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from iridauploader.core import profiler, cli
+
+
+def _busy_function(seconds):
+    end = time.monotonic() + seconds
+    total = 0
+    while time.monotonic() < end:
+        total += 1
+    return "done"
+
+
+class TestRunWithProfiler(unittest.TestCase):
+    """
+    Tests the core.profiler.run_with_profiler function
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.directory = self.temp_directory.name
+
+    def tearDown(self):
+        self.temp_directory.cleanup()
+
+    def test_cprofile(self):
+        result = profiler.run_with_profiler(profiler.PROFILE_MODE_CPROFILE, self.directory, _busy_function, 0.05)
+
+        self.assertEqual(result, "done")
+        stats = pstats.Stats(os.path.join(self.directory, profiler.CPROFILE_FILE_NAME))
+        self.assertTrue(any(function_name == "_busy_function" for _, _, function_name in stats.stats))
+        with open(os.path.join(self.directory, profiler.HOTSPOTS_FILE_NAME)) as f:
+            self.assertIn("_busy_function", f.read())
+
+    def test_cprofile_worker_threads(self):
+        def upload_in_workers():
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                return list(executor.map(_busy_function, [0.05, 0.05]))
+
+        result = profiler.run_with_profiler(profiler.PROFILE_MODE_CPROFILE, self.directory, upload_in_workers)
+
+        self.assertEqual(result, ["done", "done"])
+        stats = pstats.Stats(os.path.join(self.directory, profiler.CPROFILE_FILE_NAME))
+        busy_function_calls = [call_count for (_, _, function_name), (_, call_count, _, _, _) in stats.stats.items()
+                               if function_name == "_busy_function"]
+        self.assertEqual(busy_function_calls, [2])
+
+    def test_sampling(self):
+        result = profiler.run_with_profiler(profiler.PROFILE_MODE_SAMPLING, self.directory, _busy_function, 0.2)
+
+        self.assertEqual(result, "done")
+        with open(os.path.join(self.directory, profiler.FOLDED_STACKS_FILE_NAME)) as f:
+            folded = f.read().splitlines()
+        self.assertTrue(any("_busy_function" in line for line in folded))
+        # each line ends with the number of samples
+        for line in folded:
+            self.assertTrue(line.rsplit(" ", 1)[1].isdigit())
+        with open(os.path.join(self.directory, profiler.HOTSPOTS_FILE_NAME)) as f:
+            self.assertIn("_busy_function", f.read())
+
+    def test_profile_written_on_exception(self):
+        def failing_function():
+            raise RuntimeError("upload failed")
+
+        with self.assertRaises(RuntimeError):
+            profiler.run_with_profiler(profiler.PROFILE_MODE_SAMPLING, self.directory, failing_function)
+
+        self.assertTrue(os.path.exists(os.path.join(self.directory, profiler.HOTSPOTS_FILE_NAME)))
+
+    def test_invalid_mode(self):
+        with self.assertRaises(ValueError):
+            profiler.run_with_profiler("not_a_mode", self.directory, _busy_function, 0)
+
+
+class TestSamplingProfiler(unittest.TestCase):
+    """
+    Tests the core.profiler.SamplingProfiler summary
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+
+    def test_hotspot_lines(self):
+        sampler = profiler.SamplingProfiler()
+        sampler.sample_count = 4
+        sampler._stacks.update({
+            "MainThread;main (cli.py:10);parse (parser.py:5)": 3,
+            "MainThread;main (cli.py:10);parse (parser.py:7)": 1,
+            "MainThread;main (cli.py:12)": 2,
+        })
+
+        lines = sampler.get_hotspot_lines(top_n=1)
+
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(lines[3].split(), ["4", "66.7%", "4", "66.7%", "parse", "(parser.py)"])
+
+
+class TestProfileArgument(unittest.TestCase):
+    """
+    Tests the --profile command line argument
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+
+    def test_default_mode(self):
+        args = cli.init_argparser().parse_args(["-d", "run", "--profile"])
+
+        self.assertEqual(args.profile, profiler.PROFILE_MODE_CPROFILE)
+
+    def test_sampling_mode(self):
+        args = cli.init_argparser().parse_args(["-d", "run", "--profile", "sampling"])
+
+        self.assertEqual(args.profile, profiler.PROFILE_MODE_SAMPLING)
+
+    def test_not_profiled(self):
+        args = cli.init_argparser().parse_args(["-d", "run"])
+
+        self.assertIsNone(args.profile)
+
+    @patch("iridauploader.core.cli.upload")
+    @patch("iridauploader.core.cli._config_uploader")
+    def test_main_profiles_upload(self, mock_config_uploader, mock_upload):
+        mock_upload.return_value = 0
+        with tempfile.TemporaryDirectory() as directory, \
+                patch("iridauploader.core.profiler.get_profile_directory", return_value=directory), \
+                patch("sys.argv", ["irida-uploader", "-d", directory, "--profile", "sampling"]):
+            exit_code = cli.main()
+
+            self.assertTrue(os.path.exists(os.path.join(directory, profiler.FOLDED_STACKS_FILE_NAME)))
+
+        self.assertEqual(exit_code, 0)
+        mock_upload.assert_called_once_with(directory, False, None, False)
@@ -0,0 +1,161 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+from iridauploader import parsers
+from iridauploader.config import Settings
+from iridauploader.core import run_status, cli
+from iridauploader.model import DirectoryStatus
+from iridauploader.progress.upload_status import STATUS_FILE_NAME
+
+
+SETTINGS = Mock(spec=Settings, parser="miseq", log_directory="")
+
+
+def _make_run(directory, name, status=None):
+    run_directory = os.path.join(directory, name)
+    os.mkdir(run_directory)
+    for file_name in ["SampleSheet.csv", "CompletedJobInfo.xml"]:
+        open(os.path.join(run_directory, file_name), "w").close()
+    if status is not None:
+        with open(os.path.join(run_directory, STATUS_FILE_NAME), "w") as f:
+            json.dump({"Upload Status": status, "Date Time": "2020-01-01 12:00", "Message": "",
+                       "Run ID": "5"}, f)
+    return run_directory
+
+
+@patch("iridauploader.config.get_settings", return_value=SETTINGS)
+class TestGetRunStatusList(unittest.TestCase):
+    """
+    Tests the core.run_status.get_run_status_list function
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.directory = self.temp_directory.name
+
+    def tearDown(self):
+        self.temp_directory.cleanup()
+
+    def test_single_run(self, mock_get_settings):
+        run_directory = _make_run(self.directory, "run")
+
+        status_list = run_status.get_run_status_list(run_directory)
+
+        self.assertEqual(len(status_list), 1)
+        self.assertEqual(status_list[0].status, DirectoryStatus.NEW)
+
+    def test_batch(self, mock_get_settings):
+        _make_run(self.directory, "run_1", DirectoryStatus.COMPLETE)
+        _make_run(self.directory, "run_2")
+        os.mkdir(os.path.join(self.directory, "not_a_run"))
+
+        status_list = run_status.get_run_status_list(self.directory, batch=True, max_workers=2)
+
+        self.assertEqual([os.path.basename(s.directory) for s in status_list], ["not_a_run", "run_1", "run_2"])
+        self.assertEqual([s.status for s in status_list],
+                         [DirectoryStatus.INVALID, DirectoryStatus.COMPLETE, DirectoryStatus.NEW])
+
+    def test_no_parser_created(self, mock_get_settings):
+        _make_run(self.directory, "run", DirectoryStatus.DELAYED)
+        with patch("iridauploader.parsers.parser_factory") as mock_parser_factory:
+            run_status.get_run_status_list(self.directory, batch=True)
+
+        mock_parser_factory.assert_not_called()
+
+
+class TestFormatStatusList(unittest.TestCase):
+    """
+    Tests the core.run_status.format_status_list function
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        complete = DirectoryStatus(directory="/runs/run_1", status=DirectoryStatus.COMPLETE)
+        complete.time = "2020-01-01 12:00"
+        complete.run_id = "5"
+        invalid = DirectoryStatus(directory="/runs/run_2", status=DirectoryStatus.INVALID,
+                                  message="Directory is missing required file")
+        self.status_list = [complete, invalid]
+
+    def test_json(self):
+        output = json.loads(run_status.format_status_list(self.status_list, run_status.STATUS_FORMAT_JSON))
+
+        self.assertEqual(output[0], {"directory": "/runs/run_1", "status": DirectoryStatus.COMPLETE,
+                                     "message": None, "date_time": "2020-01-01 12:00", "run_id": "5"})
+        self.assertEqual(output[1]["status"], DirectoryStatus.INVALID)
+        self.assertIsNone(output[1]["date_time"])
+
+    def test_text(self):
+        lines = run_status.format_status_list(self.status_list).splitlines()
+
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(lines[1].split(), [DirectoryStatus.COMPLETE, "2020-01-01", "12:00", "/runs/run_1"])
+        self.assertEqual(lines[3].strip(), "Directory is missing required file")
+
+    def test_invalid_format(self):
+        with self.assertRaises(ValueError):
+            run_status.format_status_list(self.status_list, "xml")
+
+
+class TestRequiredFileList(unittest.TestCase):
+    """
+    Tests that the required files used for status queries match the parsers
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+
+    def test_matches_parsers(self):
+        parser_types = parsers.supported_parsers + ["nextseq_nml_classic", "nextseq_nml_dual_upload"]
+        for parser_type in parser_types:
+            with self.subTest(parser_type=parser_type):
+                self.assertEqual(parsers.get_required_file_list(parser_type),
+                                 parsers.parser_factory(parser_type).get_required_file_list())
+
+    def test_invalid_parser(self):
+        with self.assertRaises(AssertionError):
+            parsers.get_required_file_list("not_a_parser")
+
+
+@patch("iridauploader.config.get_settings", return_value=SETTINGS)
+class TestStatusArgument(unittest.TestCase):
+    """
+    Tests the --status command line argument
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.directory = self.temp_directory.name
+
+    def tearDown(self):
+        self.temp_directory.cleanup()
+
+    def test_default_format(self, mock_get_settings):
+        args = cli.init_argparser().parse_args(["-d", "run", "--status"])
+
+        self.assertEqual(args.status, run_status.STATUS_FORMAT_TEXT)
+
+    @patch("iridauploader.core.cli.upload_batch")
+    @patch("iridauploader.core.cli._config_uploader")
+    def test_main_prints_status(self, mock_config_uploader, mock_upload_batch, mock_get_settings):
+        _make_run(self.directory, "run_1", DirectoryStatus.COMPLETE)
+
+        with patch("sys.argv", ["irida-uploader", "-d", self.directory, "--batch", "--status", "json"]), \
+                patch("builtins.print") as mock_print:
+            exit_code = cli.main()
+
+        self.assertEqual(exit_code, 0)
+        mock_upload_batch.assert_not_called()
+        output = json.loads(mock_print.call_args[0][0])
+        self.assertEqual(output[0]["status"], DirectoryStatus.COMPLETE)
+        self.assertEqual(output[0]["run_id"], "5")
+
+    def test_unreadable_batch_directory(self, mock_get_settings):
+        exit_code = cli.print_status(os.path.join(self.directory, "missing"), True, run_status.STATUS_FORMAT_TEXT)
+
+        self.assertEqual(exit_code, 1)
@@ -497,6 +497,92 @@ class TestUploadRunSingleEntry(unittest.TestCase):
         mock_validate_and_upload.assert_not_called()
 
 
+class TestUploadParsedRunSingleEntry(unittest.TestCase):
+    """
+    Tests the core.upload.upload_parsed_run_single_entry function
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        config._init_config_parser()
+        self.directory_status = DirectoryStatus(directory="fake_directory", status=DirectoryStatus.NEW)
+
+    @patch("iridauploader.core.upload.upload_helpers")
+    @patch("iridauploader.core.upload._validate_and_upload")
+    @patch("iridauploader.core.upload.parsing_handler")
+    @patch("iridauploader.core.upload.file_stats")
+    def test_unchanged_run_not_parsed(self, mock_file_stats, mock_parsing_handler, mock_validate_and_upload,
+                                      mock_upload_helpers):
+        mock_file_stats.run_is_unchanged.side_effect = [True]
+        mock_validate_and_upload.side_effect = ["mock_result"]
+        mock_upload_helpers.directory_has_readonly_conflict.side_effect = [False]
+
+        result = upload.upload_parsed_run_single_entry("mock_sequencing_run", self.directory_status,
+                                                       "mock_fingerprint", force_upload=True, upload_mode=MODE_DEFAULT)
+
+        self.assertEqual(result, "mock_result")
+        mock_file_stats.run_is_unchanged.assert_called_once_with("mock_sequencing_run", "fake_directory",
+                                                                 "mock_fingerprint")
+        mock_parsing_handler.get_run_status.assert_not_called()
+        mock_validate_and_upload.assert_called_once_with(self.directory_status, MODE_DEFAULT, False,
+                                                         sequencing_run="mock_sequencing_run")
+
+    @patch("iridauploader.core.upload.upload_helpers")
+    @patch("iridauploader.core.upload._validate_and_upload")
+    @patch("iridauploader.core.upload.parsing_handler")
+    @patch("iridauploader.core.upload.file_stats")
+    def test_changed_run_parsed_again(self, mock_file_stats, mock_parsing_handler, mock_validate_and_upload,
+                                      mock_upload_helpers):
+        new_directory_status = DirectoryStatus(directory="fake_directory", status=DirectoryStatus.NEW)
+        mock_file_stats.run_is_unchanged.side_effect = [False]
+        mock_parsing_handler.get_run_status.side_effect = [new_directory_status]
+        mock_validate_and_upload.side_effect = ["mock_result"]
+        mock_upload_helpers.directory_has_readonly_conflict.side_effect = [False]
+
+        result = upload.upload_parsed_run_single_entry("mock_sequencing_run", self.directory_status,
+                                                       "mock_fingerprint", force_upload=True, upload_mode=MODE_DEFAULT)
+
+        self.assertEqual(result, "mock_result")
+        mock_parsing_handler.get_run_status.assert_called_once_with("fake_directory")
+        mock_validate_and_upload.assert_called_once_with(new_directory_status, MODE_DEFAULT, False)
+
+    @patch("iridauploader.core.upload.upload_helpers")
+    @patch("iridauploader.core.upload._validate_and_upload")
+    @patch("iridauploader.core.upload.parsing_handler")
+    @patch("iridauploader.core.upload.progress.status_file_is_unchanged")
+    @patch("iridauploader.core.upload.file_stats")
+    def test_changed_status_file_parsed_again(self, mock_file_stats, mock_status_file_is_unchanged,
+                                              mock_parsing_handler, mock_validate_and_upload, mock_upload_helpers):
+        # another uploader finished the run after it was parsed
+        new_directory_status = DirectoryStatus(directory="fake_directory", status=DirectoryStatus.COMPLETE)
+        mock_file_stats.run_is_unchanged.side_effect = [True]
+        mock_status_file_is_unchanged.side_effect = [False]
+        mock_parsing_handler.get_run_status.side_effect = [new_directory_status]
+        mock_upload_helpers.directory_has_readonly_conflict.side_effect = [False]
+
+        result = upload.upload_parsed_run_single_entry("mock_sequencing_run", self.directory_status,
+                                                       "mock_fingerprint", upload_mode=MODE_DEFAULT)
+
+        self.assertEqual(result.exit_code, exit_return.EXIT_CODE_ERROR)
+        mock_status_file_is_unchanged.assert_called_once_with(self.directory_status)
+        mock_parsing_handler.get_run_status.assert_called_once_with("fake_directory")
+        mock_validate_and_upload.assert_not_called()
+
+    @patch("iridauploader.core.upload.upload_helpers")
+    @patch("iridauploader.core.upload._validate_and_upload")
+    @patch("iridauploader.core.upload.file_stats")
+    def test_status_still_checked(self, mock_file_stats, mock_validate_and_upload, mock_upload_helpers):
+        self.directory_status.status = DirectoryStatus.COMPLETE
+        mock_file_stats.run_is_unchanged.side_effect = [True]
+        mock_upload_helpers.directory_has_readonly_conflict.side_effect = [False]
+
+        result = upload.upload_parsed_run_single_entry("mock_sequencing_run", self.directory_status,
+                                                       "mock_fingerprint")
+
+        self.assertEqual(result.exit_code, exit_return.EXIT_CODE_ERROR)
+        mock_validate_and_upload.assert_not_called()
+
+
 class TestBatchUploadSingleEntry(unittest.TestCase):
     """
     Tests the core.upload.batch_upload_single_entry function
@@ -583,3 +669,32 @@ class TestBatchUploadSingleEntry(unittest.TestCase):
             call(stub_directory_status_partial, MODE_DEFAULT, False)
         ]
         self.assertEqual(mock_validate_and_upload.call_args_list, expected_call_args, "Call args do not match expected")
+
+    @patch("iridauploader.core.upload._validate_and_upload")
+    @patch("iridauploader.core.upload.api_handler")
+    @patch("iridauploader.core.upload.parsing_handler")
+    def test_nothing_to_upload(self, mock_parsing_handler, mock_api_handler, mock_validate_and_upload):
+        """
+        Makes sure that the api is not used when no run can be uploaded
+        :return:
+        """
+        class StubDirectoryStatus:
+            def __init__(self, directory, status):
+                self.directory = directory
+                self.status = status
+                self.message = None
+
+            def status_equals(self, other_status):
+                return self.status == other_status
+
+        mock_parsing_handler.get_run_status_list.side_effect = [
+            [StubDirectoryStatus("invalid", DirectoryStatus.INVALID),
+             StubDirectoryStatus("complete", DirectoryStatus.COMPLETE)]
+        ]
+
+        # start
+        result = upload.batch_upload_single_entry("fake_directory")
+
+        self.assertEqual(result.exit_code, 0)
+        mock_api_handler.get_default_upload_mode.assert_not_called()
+        mock_validate_and_upload.assert_not_called()
@@ -4,7 +4,7 @@ from os import path
 
 from iridauploader.api import UPLOAD_MODES, MODE_DEFAULT, MODE_FAST5, MODE_ASSEMBLIES
 from iridauploader.core import upload_helpers
-from iridauploader.model import DirectoryStatus, SequencingRun, Project, Sample
+from iridauploader.model import DirectoryStatus, SequencingRun, Project, Sample, SequenceFile, FileStat
 from iridauploader import progress
 from iridauploader import parsers
 from iridauploader.api.exceptions import FileError, IridaResourceError, IridaConnectionError
@@ -123,8 +123,8 @@ class TestDirectoryHasReadonlyConflict(unittest.TestCase):
         # access
         # T        X  X
         # F        X  O
-        mock_config.read_config_option.side_effect = [
-            True, True, False, False
+        mock_config.get_settings.side_effect = [
+            MagicMock(readonly=True), MagicMock(readonly=True), MagicMock(readonly=False), MagicMock(readonly=False)
         ]
         mock_access.side_effect = [
             True, False, True, False
@@ -454,6 +454,44 @@ class TestIridaPrepAndValidation(unittest.TestCase):
                                               'Sequencing run can not be uploaded, Errors: []')
 
 
+class TestVerifyFilesUnchanged(unittest.TestCase):
+    """
+    Tests core.upload_helpers.verify_files_unchanged
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        sample = Sample("sample")
+        sample.sequence_file = SequenceFile(["file_R1.fastq", "file_R2.fastq"])
+        sample.sequence_file.set_file_stat("file_R1.fastq", FileStat(1024, 1))
+        sample.sequence_file.set_file_stat("file_R2.fastq", FileStat(1024, 1))
+        self.sequencing_run = SequencingRun({"layoutType": "PAIRED_END"}, [Project(sample_list=[sample], id="1")],
+                                            "miseq")
+
+    @patch("iridauploader.core.upload_helpers._set_and_write_directory_status")
+    @patch("iridauploader.core.upload_helpers.file_stats.get_changed_files")
+    def test_unchanged(self, mock_get_changed_files, mock_set_and_write):
+        mock_get_changed_files.side_effect = [[]]
+
+        upload_helpers.verify_files_unchanged(self.sequencing_run, "status")
+
+        mock_get_changed_files.assert_called_once_with(self.sequencing_run)
+        mock_set_and_write.assert_not_called()
+
+    @patch("iridauploader.core.upload_helpers._set_and_write_directory_status")
+    @patch("iridauploader.core.upload_helpers.file_stats.get_changed_files")
+    def test_changed(self, mock_get_changed_files, mock_set_and_write):
+        mock_get_changed_files.side_effect = [["file_R2.fastq"]]
+
+        with self.assertRaises(parsers.exceptions.ValidationError) as context:
+            upload_helpers.verify_files_unchanged(self.sequencing_run, "status")
+
+        error_list = context.exception.validation_result.error_list
+        self.assertEqual(len(error_list), 1)
+        self.assertIn("file_R2.fastq", error_list[0].message)
+        self.assertEqual(mock_set_and_write.call_args[0][:2], ("status", DirectoryStatus.ERROR))
+
+
 class TestUploadSequencingRun(unittest.TestCase):
     """
     Tests core.upload_helpers.upload_sequencing_run
@@ -0,0 +1,297 @@
+import logging
+import pickle
+import sys
+import queue as message_queues
+import threading
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+
+from iridauploader.config import config
+from iridauploader.core import upload_queue, exit_return
+from iridauploader.model import DirectoryStatus, SequencingRun, Project, Sample, SequenceFile, FileStat
+from iridauploader.parsers import exceptions
+
+
+def _make_run(sample_names, project_id="1"):
+    sample_list = []
+    for sample_name in sample_names:
+        sample = Sample(sample_name=sample_name)
+        sample.sequence_file = SequenceFile(file_list=[sample_name + "_R1.fastq.gz"])
+        sample.sequence_file.set_file_stat(sample_name + "_R1.fastq.gz", FileStat(100, 0))
+        sample_list.append(sample)
+    return SequencingRun(metadata={"layoutType": "SINGLE_END"}, project_list=[Project(project_id, sample_list)],
+                         sequencing_run_type="miseq")
+
+
+class StubUploads:
+    """
+    Upload function that waits until the test releases each upload
+    """
+
+    def __init__(self, exit_code=exit_return.EXIT_CODE_SUCCESS):
+        self.exit_code = exit_code
+        self.lock = threading.Lock()
+        self.running = []
+        self.max_running = 0
+        self.release = threading.Event()
+
+    def __call__(self, queued_run, upload_mode, progress_callback):
+        with self.lock:
+            self.running.append(queued_run.directory)
+            self.max_running = max(self.max_running, len(self.running))
+        progress_callback(50, 100, 10.0, 5.0)
+        self.release.wait(5)
+        with self.lock:
+            self.running.remove(queued_run.directory)
+        return exit_return.ExitReturn(self.exit_code, None if self.exit_code == 0 else "upload failed")
+
+
+def _wait_for(condition, timeout=5):
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            raise AssertionError("Timed out waiting for queue")
+        time.sleep(0.01)
+
+
+@patch("iridauploader.core.upload_queue.file_stats.get_directory_fingerprint", return_value="fingerprint")
+@patch("iridauploader.core.upload_queue.parsing_handler")
+class TestUploadQueue(unittest.TestCase):
+    """
+    Tests the core.upload_queue.UploadQueue class
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        config._init_config_parser()
+        self.runs = {}
+        self.statuses = {}
+
+    def _mock_parsing(self, mock_parsing_handler):
+        mock_parsing_handler.get_run_status.side_effect = \
+            lambda directory: self.statuses.get(directory, DirectoryStatus(directory, DirectoryStatus.NEW))
+
+        def parse_and_validate(directory):
+            run = self.runs[directory]
+            if isinstance(run, Exception):
+                raise run
+            return run
+        mock_parsing_handler.parse_and_validate.side_effect = parse_and_validate
+
+    def _get_states(self, queue):
+        return {run["directory"]: run["state"] for run in queue.get_runs()}
+
+    def test_runs_checked(self, mock_parsing_handler, mock_fingerprint):
+        self._mock_parsing(mock_parsing_handler)
+        self.runs = {"run1": _make_run(["a", "b"]),
+                     "run2": exceptions.DirectoryError("no sample sheet", "run2")}
+        self.statuses = {"run3": DirectoryStatus("run3", DirectoryStatus.COMPLETE),
+                         "run4": DirectoryStatus("run4", DirectoryStatus.INVALID, "bad run")}
+        queue = upload_queue.UploadQueue(upload_function=StubUploads())
+
+        for directory in ["run1", "run2", "run3", "run4"]:
+            self.assertTrue(queue.add_run(directory))
+        self.assertFalse(queue.add_run("run1"))
+        _wait_for(lambda: upload_queue.STATE_CHECKING not in self._get_states(queue).values())
+
+        runs = {run["directory"]: run for run in queue.get_runs()}
+        self.assertEqual(list(runs), ["run1", "run2", "run3", "run4"])
+        self.assertEqual(runs["run1"]["state"], upload_queue.STATE_WAITING)
+        self.assertEqual(runs["run1"]["sample_count"], 2)
+        self.assertEqual(runs["run1"]["total_bytes"], 200)
+        self.assertEqual(runs["run2"]["state"], upload_queue.STATE_INVALID)
+        self.assertEqual(runs["run2"]["message"], "no sample sheet")
+        self.assertEqual(runs["run3"]["state"], upload_queue.STATE_SKIPPED)
+        self.assertEqual(runs["run4"]["state"], upload_queue.STATE_INVALID)
+        self.assertEqual(runs["run4"]["message"], "bad run")
+        # nothing is uploaded until the queue is started
+        self.assertFalse(queue.is_uploading())
+        queue.shutdown()
+
+    def test_concurrency_cap(self, mock_parsing_handler, mock_fingerprint):
+        self._mock_parsing(mock_parsing_handler)
+        self.runs = {"run{}".format(i): _make_run(["sample{}".format(i)]) for i in range(5)}
+        uploads = StubUploads()
+        queue = upload_queue.UploadQueue(max_concurrent_uploads=2, upload_function=uploads)
+        for directory in self.runs:
+            queue.add_run(directory)
+        _wait_for(lambda: upload_queue.STATE_CHECKING not in self._get_states(queue).values())
+        queue.start()
+
+        _wait_for(lambda: len(uploads.running) == 2)
+        time.sleep(0.05)
+        self.assertEqual(len(uploads.running), 2)
+        runs = {run["directory"]: run for run in queue.get_runs()}
+        self.assertEqual(runs["run0"]["bytes_sent"], 50)
+        self.assertEqual(runs["run0"]["rate"], 10.0)
+
+        uploads.release.set()
+        _wait_for(lambda: not queue.is_uploading())
+
+        self.assertEqual(uploads.max_running, 2)
+        self.assertEqual(set(self._get_states(queue).values()), {upload_queue.STATE_COMPLETE})
+        queue.shutdown()
+
+    def test_shared_samples_not_concurrent(self, mock_parsing_handler, mock_fingerprint):
+        self._mock_parsing(mock_parsing_handler)
+        self.runs = {"run1": _make_run(["a", "b"]), "run2": _make_run(["b", "c"]), "run3": _make_run(["d"])}
+        uploads = StubUploads()
+        queue = upload_queue.UploadQueue(max_concurrent_uploads=3, upload_function=uploads)
+        for directory in self.runs:
+            queue.add_run(directory)
+        _wait_for(lambda: upload_queue.STATE_CHECKING not in self._get_states(queue).values())
+        queue.start()
+
+        _wait_for(lambda: len(uploads.running) == 2)
+        self.assertEqual(sorted(uploads.running), ["run1", "run3"])
+        self.assertEqual(self._get_states(queue)["run2"], upload_queue.STATE_WAITING)
+
+        uploads.release.set()
+        _wait_for(lambda: not queue.is_uploading())
+        self.assertEqual(self._get_states(queue)["run2"], upload_queue.STATE_COMPLETE)
+        queue.shutdown()
+
+    def test_upload_error(self, mock_parsing_handler, mock_fingerprint):
+        self._mock_parsing(mock_parsing_handler)
+        self.runs = {"run1": _make_run(["a"])}
+        uploads = StubUploads(exit_code=exit_return.EXIT_CODE_ERROR)
+        uploads.release.set()
+        queue = upload_queue.UploadQueue(upload_function=uploads)
+        queue.add_run("run1")
+        queue.start()
+
+        _wait_for(lambda: not queue.is_uploading())
+
+        run = queue.get_runs()[0]
+        self.assertEqual(run["state"], upload_queue.STATE_ERROR)
+        self.assertEqual(run["message"], "upload failed")
+        queue.shutdown()
+
+    def test_remove_run(self, mock_parsing_handler, mock_fingerprint):
+        self._mock_parsing(mock_parsing_handler)
+        self.runs = {"run1": _make_run(["a"]), "run2": _make_run(["b"])}
+        uploads = StubUploads()
+        queue = upload_queue.UploadQueue(upload_function=uploads)
+        queue.add_run("run1")
+        queue.add_run("run2")
+        _wait_for(lambda: upload_queue.STATE_CHECKING not in self._get_states(queue).values())
+        queue.start()
+        _wait_for(lambda: len(uploads.running) == 1)
+
+        self.assertFalse(queue.remove_run("run1"))
+        self.assertTrue(queue.remove_run("run2"))
+        self.assertFalse(queue.remove_run("run3"))
+
+        uploads.release.set()
+        _wait_for(lambda: not queue.is_uploading())
+        self.assertEqual(list(self._get_states(queue)), ["run1"])
+        queue.shutdown()
+
+    @patch("iridauploader.core.upload_queue.progress.run_is_ready_with_delay")
+    def test_delayed_run(self, mock_run_is_ready_with_delay, mock_parsing_handler, mock_fingerprint):
+        self._mock_parsing(mock_parsing_handler)
+        self.runs = {"run1": _make_run(["a"])}
+        self.statuses = {"run1": DirectoryStatus("run1", DirectoryStatus.DELAYED)}
+        ready = threading.Event()
+        mock_run_is_ready_with_delay.side_effect = lambda directory_status: ready.is_set()
+        uploads = StubUploads()
+        uploads.release.set()
+        queue = upload_queue.UploadQueue(upload_function=uploads, delay_check_interval=0.01)
+        queue.add_run("run1")
+        queue.start()
+
+        _wait_for(lambda: mock_run_is_ready_with_delay.call_count >= 2)
+        self.assertEqual(self._get_states(queue)["run1"], upload_queue.STATE_DELAYED)
+        self.assertTrue(queue.is_uploading())
+        mock_parsing_handler.parse_and_validate.assert_not_called()
+
+        # checked again until the delay has passed
+        ready.set()
+        _wait_for(lambda: not queue.is_uploading())
+        self.assertEqual(self._get_states(queue)["run1"], upload_queue.STATE_COMPLETE)
+        queue.shutdown()
+
+    @patch("iridauploader.core.upload_queue.progress.run_is_ready_with_delay", return_value=False)
+    def test_delayed_run_removed(self, mock_run_is_ready_with_delay, mock_parsing_handler, mock_fingerprint):
+        self._mock_parsing(mock_parsing_handler)
+        queue = upload_queue.UploadQueue(upload_function=StubUploads(), delay_check_interval=60)
+        queue.add_run("run1")
+        _wait_for(lambda: self._get_states(queue)["run1"] == upload_queue.STATE_DELAYED)
+
+        self.assertTrue(queue.remove_run("run1"))
+
+        self.assertEqual(queue._delay_timers, {})
+        queue.shutdown()
+
+
+class TestUploadInProcess(unittest.TestCase):
+    """
+    Tests the core.upload_queue.upload_in_process function and the upload process
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+
+    @patch("iridauploader.core.upload_queue._PROCESS_EXIT_TIMEOUT", 0)
+    @patch("iridauploader.core.upload_queue.multiprocessing.get_context")
+    def test_hung_process_stopped(self, mock_get_context):
+        message_queue = message_queues.Queue()
+        message_queue.put((upload_queue._MESSAGE_RESULT, exit_return.EXIT_CODE_SUCCESS, ""))
+        message_queue.close = MagicMock()
+        mock_get_context.return_value.Queue.return_value = message_queue
+        process = mock_get_context.return_value.Process.return_value
+        process.is_alive.return_value = True
+
+        with self.assertLogs(level=logging.ERROR) as logs:
+            result = upload_queue.upload_in_process(upload_queue.QueuedRun("run1"), None, lambda *args: None)
+
+        self.assertEqual(result.exit_code, exit_return.EXIT_CODE_SUCCESS)
+        process.terminate.assert_called_once_with()
+        self.assertIn("did not exit", logs.output[0])
+
+    @patch("iridauploader.core.upload_queue.logger")
+    @patch("iridauploader.core.upload_queue.config")
+    @patch("iridauploader.core.upload_queue.progress")
+    @patch("iridauploader.core.upload_queue.upload.upload_parsed_run_single_entry")
+    def test_upload_not_forced(self, mock_upload, mock_progress, mock_config, mock_logger):
+        mock_upload.return_value = exit_return.ExitReturn(exit_return.EXIT_CODE_SUCCESS)
+        directory_status = DirectoryStatus("run1", DirectoryStatus.DELAYED)
+        message_queue = MagicMock()
+
+        upload_queue._upload_process_main("config.conf", "sequencing_run", directory_status, "fingerprint",
+                                          "default", False, message_queue)
+
+        # the delay of new and delayed runs is checked again
+        mock_upload.assert_called_once_with("sequencing_run", directory_status, "fingerprint",
+                                            upload_mode="default", continue_upload=False)
+        message_queue.put.assert_called_with((upload_queue._MESSAGE_RESULT, exit_return.EXIT_CODE_SUCCESS, ""))
+
+
+class TestUploadProcessLogging(unittest.TestCase):
+    """
+    Tests the log records sent by the upload process
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+
+    def test_log_message_handler(self):
+        message_queue = message_queues.Queue()
+        handler = upload_queue._LogMessageHandler(message_queue)
+        try:
+            raise ValueError("bad file")
+        except ValueError:
+            record = logging.LogRecord("root", logging.ERROR, "/somewhere/upload.py", 10, "Upload of %s failed",
+                                       ("run1",), exc_info=sys.exc_info())
+
+        handler.handle(record)
+
+        message_type, sent_record = message_queue.get_nowait()
+        self.assertEqual(message_type, upload_queue._MESSAGE_LOG)
+        # records cross the process boundary pickled
+        sent_record = pickle.loads(pickle.dumps(sent_record))
+        self.assertTrue(sent_record.getMessage().startswith("Upload of run1 failed\nTraceback"))
+        self.assertIn("ValueError: bad file", sent_record.getMessage())
+        # the traceback is not written twice
+        self.assertEqual(logging.Formatter().format(sent_record), sent_record.getMessage())
@@ -120,6 +120,32 @@ class TestSequenceFile(unittest.TestCase):
         d = {'_file_list': ['file1', 'file2'], '_properties_dict': {'some': 'thing'}}
         self.assertEqual(d, seq.get_dict())
 
+    def test_file_stat_cached(self):
+        """
+        test file stats are read from disk once, and cached
+        """
+        file_name = os.path.join(path_to_module, "test_models.py")
+        seq = model.SequenceFile([file_name])
+
+        with patch("iridauploader.model.sequence_file.os.stat", wraps=os.stat) as mock_stat:
+            size = seq.get_file_size(file_name)
+            self.assertEqual(size, seq.get_total_file_size())
+
+        mock_stat.assert_called_once_with(file_name)
+        self.assertEqual(size, os.path.getsize(file_name))
+
+    def test_file_stat_set(self):
+        """
+        test a file stat set on the sequence file is used without reading the file
+        """
+        seq = model.SequenceFile(["file1", "file2"])
+        seq.set_file_stat("file1", model.FileStat(100, 1))
+        seq.set_file_stat("file2", model.FileStat(50, 1))
+
+        self.assertEqual(seq.get_file_stat("file1"), model.FileStat(100, 1))
+        self.assertEqual(seq.get_total_file_size(), 150)
+        self.assertNotIn("_file_stats", seq.get_dict())
+
 
 class TestModelValidationError(unittest.TestCase):
     """
@@ -0,0 +1,116 @@
+import os
+import tempfile
+import unittest
+
+from iridauploader.model import DirectoryStatus
+from iridauploader.progress import metrics
+
+
+class TestMetrics(unittest.TestCase):
+    """
+    Tests the metric types and the Prometheus text they generate
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+
+    def test_counter(self):
+        counter = metrics.Counter("test_total", "Test counter", ["endpoint"])
+
+        counter.inc(endpoint="/api/samples")
+        counter.inc(3, endpoint="/api/samples")
+
+        self.assertEqual(counter.get_value(endpoint="/api/samples"), 4)
+        self.assertEqual(counter.get_value(endpoint="/api/projects"), 0)
+        self.assertEqual(counter.get_lines(), ["# HELP test_total Test counter",
+                                               "# TYPE test_total counter",
+                                               'test_total{endpoint="/api/samples"} 4'])
+
+    def test_counter_wrong_labels(self):
+        counter = metrics.Counter("test_total", "Test counter", ["endpoint"])
+
+        with self.assertRaises(ValueError):
+            counter.inc(status=200)
+
+    def test_gauge(self):
+        gauge = metrics.Gauge("test", "Test gauge")
+
+        gauge.set(5)
+        gauge.set(2)
+
+        self.assertEqual(gauge.get_lines()[-1], "test 2")
+
+    def test_histogram(self):
+        histogram = metrics.Histogram("test_seconds", "Test histogram", buckets=(1, 5))
+
+        histogram.observe(0.5)
+        histogram.observe(3)
+        histogram.observe(10)
+
+        self.assertEqual(histogram.get_value(), 3)
+        self.assertEqual(histogram.get_lines()[2:], ['test_seconds_bucket{le="1"} 1',
+                                                     'test_seconds_bucket{le="5"} 2',
+                                                     'test_seconds_bucket{le="+Inf"} 3',
+                                                     'test_seconds_count 3',
+                                                     'test_seconds_sum 13.5'])
+
+    def test_label_values_escaped(self):
+        counter = metrics.Counter("test_total", "Test counter", ["message"])
+
+        counter.inc(message='a "quoted"\\path\n')
+
+        self.assertEqual(counter.get_lines()[-1], 'test_total{message="a \\"quoted\\"\\\\path\\n"} 1')
+
+
+class TestRecordMetrics(unittest.TestCase):
+    """
+    Tests the functions used by the api and core to record metrics
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        metrics.reset_metrics()
+        self.temp_directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        metrics.reset_metrics()
+        self.temp_directory.cleanup()
+
+    def test_run_statuses(self):
+        metrics.set_run_status("/runs/1", DirectoryStatus.NEW)
+        metrics.set_run_status("/runs/2", DirectoryStatus.NEW)
+        metrics.set_run_status("/runs/1", DirectoryStatus.PARTIAL)
+
+        self.assertEqual(metrics.RUNS.get_value(status=DirectoryStatus.NEW), 1)
+        self.assertEqual(metrics.RUNS.get_value(status=DirectoryStatus.PARTIAL), 1)
+        self.assertEqual(metrics.RUNS.get_value(status=DirectoryStatus.COMPLETE), 0)
+
+    def test_samples_and_uploads(self):
+        metrics.record_sample(uploaded=True)
+        metrics.record_sample(uploaded=False)
+        metrics.record_file_upload(1024, 2.5)
+        metrics.record_file_upload(1024, 0.1)
+
+        self.assertEqual(metrics.SAMPLES.get_value(result="uploaded"), 1)
+        self.assertEqual(metrics.SAMPLES.get_value(result="failed"), 1)
+        self.assertEqual(metrics.UPLOADED_BYTES.get_value(), 2048)
+        self.assertEqual(metrics.UPLOAD_DURATION.get_value(), 2)
+
+    def test_write_textfile(self):
+        metrics.record_http_request("GET", "/api/projects", 200, 0.02)
+        metrics.record_http_retry("/api/projects")
+        metrics.record_session_refresh()
+        metrics.record_run_finished(DirectoryStatus.COMPLETE)
+        file_path = os.path.join(self.temp_directory.name, "irida_uploader.prom")
+
+        metrics.write_textfile(file_path)
+
+        with open(file_path) as f:
+            lines = f.read().splitlines()
+        self.assertIn('irida_uploader_http_requests_total{method="GET",endpoint="/api/projects",status="200"} 1', lines)
+        self.assertIn('irida_uploader_http_retries_total{endpoint="/api/projects"} 1', lines)
+        self.assertIn('irida_uploader_session_refreshes_total 1', lines)
+        self.assertIn('irida_uploader_runs_finished_total{status="complete"} 1', lines)
+        self.assertIn("# TYPE irida_uploader_upload_duration_seconds histogram", lines)
+        # no temporary files are left behind
+        self.assertEqual(os.listdir(self.temp_directory.name), ["irida_uploader.prom"])
@@ -0,0 +1,146 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from iridauploader.progress import timing
+
+
+class TestSpans(unittest.TestCase):
+    """
+    Tests recording spans and HTTP calls into a run profile
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+
+    def tearDown(self):
+        timing.stop_profile()
+
+    def test_span_without_profile(self):
+        with timing.span("parse_and_validate") as s:
+            timing.record_http_call(100)
+
+        self.assertIsNone(s)
+        self.assertIsNone(timing.get_active_profile())
+
+    def test_span_recorded(self):
+        profile = timing.start_profile("/run")
+        with timing.span("initialize_api", attempt=1) as s:
+            timing.record_http_call()
+            timing.record_http_call(10)
+        timing.stop_profile()
+
+        self.assertIsNotNone(s.duration)
+        self.assertEqual(s.http_calls, 2)
+        self.assertEqual(s.bytes, 10)
+        self.assertEqual(s.attributes, {"attempt": 1})
+        self.assertEqual(profile.get_dict()["spans"], [s.get_dict()])
+        self.assertIsNotNone(profile.duration)
+
+    def test_nested_spans(self):
+        timing.start_profile("/run")
+        with timing.span("upload_sequencing_run") as outer:
+            timing.record_http_call(1)
+            with timing.span("send_sequence_files") as inner:
+                timing.record_http_call(5)
+
+        self.assertEqual(outer.http_calls, 2)
+        self.assertEqual(outer.bytes, 6)
+        self.assertEqual(inner.http_calls, 1)
+        self.assertEqual(inner.bytes, 5)
+
+    def test_span_recorded_on_exception(self):
+        profile = timing.start_profile("/run")
+        with self.assertRaises(ValueError):
+            with timing.span("parse_and_validate"):
+                raise ValueError()
+
+        self.assertEqual(profile.get_summary()[0]["count"], 1)
+
+    def test_calls_in_other_threads(self):
+        profile = timing.start_profile("/run")
+
+        def upload():
+            with timing.span("send_sequence_files"):
+                timing.record_http_call(100)
+
+        with timing.span("upload_sequencing_run") as outer:
+            threads = [threading.Thread(target=upload) for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        summary = {row["name"]: row for row in profile.get_summary()}
+        self.assertEqual(summary["send_sequence_files"]["count"], 4)
+        self.assertEqual(summary["send_sequence_files"]["http_calls"], 4)
+        self.assertEqual(summary["send_sequence_files"]["bytes"], 400)
+        self.assertEqual(outer.http_calls, 0)
+        self.assertEqual(profile.get_dict()["http_calls"], 4)
+        self.assertEqual(profile.get_dict()["http_bytes"], 400)
+
+
+class TestRunProfile(unittest.TestCase):
+    """
+    Tests the summary and json output of a run profile
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        self.temp_directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        timing.stop_profile()
+        self.temp_directory.cleanup()
+
+    def _make_profile(self, output_directory=None):
+        profile = timing.start_profile("/run", output_directory)
+        for size in [10, 30]:
+            with timing.span("send_sequence_files"):
+                timing.record_http_call(size)
+        with timing.span("write_directory_status") as s:
+            s.add_bytes(7)
+        return timing.stop_profile()
+
+    def test_summary(self):
+        profile = self._make_profile()
+
+        summary = profile.get_summary()
+
+        self.assertEqual([row["name"] for row in summary], ["send_sequence_files", "write_directory_status"])
+        self.assertEqual(summary[0]["count"], 2)
+        self.assertEqual(summary[0]["bytes"], 40)
+        self.assertEqual(summary[0]["http_calls"], 2)
+        self.assertGreaterEqual(summary[0]["total_seconds"], summary[0]["max_seconds"])
+        self.assertEqual(summary[1]["bytes"], 7)
+
+    def test_summary_lines(self):
+        profile = self._make_profile()
+
+        lines = profile.get_summary_lines()
+
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[0].startswith("Stage"))
+        self.assertTrue(lines[1].startswith("send_sequence_files"))
+        self.assertTrue(lines[3].startswith("Run total"))
+        self.assertTrue(lines[3].split()[-1] == "2")
+
+    def test_write_json(self):
+        profile = self._make_profile(self.temp_directory.name)
+
+        profile_file = profile.write_json()
+
+        self.assertEqual(profile_file, os.path.join(self.temp_directory.name, timing.PROFILE_FILE_NAME))
+        with open(profile_file) as f:
+            data = json.load(f)
+        self.assertEqual(data["directory"], "/run")
+        self.assertEqual(data["http_calls"], 2)
+        self.assertEqual(len(data["spans"]), 3)
+        self.assertEqual(len(data["summary"]), 2)
+
+    def test_write_json_no_output_directory(self):
+        profile = self._make_profile()
+
+        self.assertIsNone(profile.write_json())
@@ -0,0 +1,164 @@
+import io
+import unittest
+from unittest.mock import patch
+
+from iridauploader.config import config
+from iridauploader.progress import upload_progress, metrics
+
+MB = 1024 ** 2
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestProgressTracker(unittest.TestCase):
+    """
+    Tests the progress.upload_progress.ProgressTracker class
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        self.clock = FakeClock()
+        self.tracker = upload_progress.ProgressTracker(update_frequency=5, clock=self.clock)
+        self.snapshots = []
+        self.tracker.subscribe(self.snapshots.append)
+
+    def test_updates_coalesced(self):
+        # 1 MiB chunks sent at 1 GB/s, for one second
+        for chunk in range(1, 1001):
+            self.clock.now = chunk / 1000
+            self.tracker.update("sample1", "1", chunk * MB, 1000 * MB)
+
+        self.assertEqual(len(self.snapshots), 5)
+        self.assertEqual(self.snapshots[-1].bytes_sent, 1000 * MB)
+        self.assertAlmostEqual(self.snapshots[-1].rate, 1000 * MB)
+
+    def test_finished_sample_published(self):
+        self.tracker.update("sample1", "1", 10, 100)
+        self.assertEqual(self.snapshots, [])
+
+        self.tracker.update("sample1", "1", 100, 100)
+
+        self.assertEqual(len(self.snapshots), 1)
+        sample = self.snapshots[0].samples[0]
+        self.assertEqual((sample.sample, sample.project, sample.bytes_sent, sample.total_bytes),
+                         ("sample1", "1", 100, 100))
+        self.assertEqual(sample.eta, 0.0)
+
+    def test_rate_and_eta(self):
+        self.tracker.reset(total_bytes=1000)
+        self.clock.now = 1
+        self.tracker.update("sample1", "1", 100, 500)
+        self.clock.now = 2
+        self.tracker.update("sample2", "1", 100, 500)
+
+        first, second = self.snapshots
+        self.assertEqual(first.rate, 100)
+        self.assertEqual(first.eta, 9)
+        self.assertEqual(first.samples[0].eta, 4)
+        self.assertEqual(second.bytes_sent, 200)
+        self.assertEqual(second.total_bytes, 1000)
+        self.assertEqual([s.sample for s in second.samples], ["sample2"])
+
+    def test_total_from_transfers(self):
+        self.tracker.update("sample1", "1", 50, 100)
+        self.tracker.update("sample2", "1", 50, 300)
+
+        snapshot = self.tracker.finish()
+
+        self.assertTrue(snapshot.finished)
+        self.assertEqual(snapshot.bytes_sent, 100)
+        self.assertEqual(snapshot.total_bytes, 400)
+        self.assertEqual(len(snapshot.samples), 2)
+
+    def test_restarted_transfer(self):
+        self.tracker.update("sample1", "1", 80, 100)
+        # the upload failed and is sent again
+        self.tracker.update("sample1", "1", 10, 100)
+
+        snapshot = self.tracker.finish()
+
+        self.assertEqual(snapshot.bytes_sent, 10)
+        self.assertEqual(snapshot.total_bytes, 100)
+
+    def test_failing_subscriber(self):
+        def failing_subscriber(snapshot):
+            raise RuntimeError("gui closed")
+
+        self.tracker.subscribe(failing_subscriber)
+        self.tracker.subscribe(self.snapshots.append)
+
+        self.tracker.finish()
+
+        self.assertEqual(len(self.snapshots), 2)
+
+
+class TestConsoleWriter(unittest.TestCase):
+    """
+    Tests the progress.upload_progress.ConsoleWriter class
+    """
+
+    class StubStream(io.StringIO):
+
+        def __init__(self, tty):
+            super().__init__()
+            self.tty = tty
+
+        def isatty(self):
+            return self.tty
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        self.snapshot = upload_progress.ProgressSnapshot([], 420 * MB, 1000 * MB, 25 * MB, 23.2, False)
+
+    def test_terminal(self):
+        stream = self.StubStream(tty=True)
+        writer = upload_progress.ConsoleWriter(stream)
+
+        writer(self.snapshot)
+        writer(self.snapshot._replace(finished=True))
+
+        self.assertEqual(stream.getvalue().count("\r"), 2)
+        self.assertTrue(stream.getvalue().endswith("\n"))
+        self.assertIn("Progress: 42.0% Uploaded, 420.0 of 1000.0 MB at 25.0 MB/s, 00:00:23 left",
+                      stream.getvalue())
+
+    def test_not_terminal(self):
+        stream = self.StubStream(tty=False)
+        writer = upload_progress.ConsoleWriter(stream)
+
+        writer(self.snapshot)
+        writer(self.snapshot._replace(finished=True))
+
+        self.assertEqual(stream.getvalue(), "")
+
+
+class TestDefaultSubscribers(unittest.TestCase):
+    """
+    Tests the module level functions and default subscribers
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        config._init_config_parser()
+        metrics.reset_metrics()
+
+    @patch("iridauploader.progress.upload_progress.upload_signals.send_progress")
+    def test_upload(self, mock_send_progress):
+        upload_progress.start_upload(total_bytes=200)
+        upload_progress.update_transfer("sample1", "1", 100, 100)
+        snapshot = upload_progress.finish_upload()
+
+        self.assertTrue(snapshot.finished)
+        self.assertEqual(snapshot.bytes_sent, 100)
+        progress_data = mock_send_progress.call_args[0][0]
+        self.assertEqual((progress_data.sample, progress_data.project, progress_data.progress), ("sample1", "1", 100))
+        self.assertEqual(progress_data.bytes_sent, 100)
+        self.assertEqual(metrics.UPLOAD_PROGRESS_BYTES.get_value(type="sent"), 100)
+        self.assertEqual(metrics.UPLOAD_PROGRESS_BYTES.get_value(type="total"), 200)
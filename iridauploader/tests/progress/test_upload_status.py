@@ -177,6 +177,53 @@ class TestWriteDirectoryStatus(unittest.TestCase):
         self.assertEqual(DirectoryStatus.NEW, status.status)
 
 
+class TestStatusFileIsUnchanged(unittest.TestCase):
+    """
+    This class tests that statuses written by another uploader after the status was read are found
+    """
+    directory = path.join(path_to_module, 'write_status_dir')
+    status_file = path.join(directory, "irida_uploader_status.info")
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        config._init_config_parser()
+
+    def tearDown(self):
+        # remove status file after using it
+        if path.exists(self.status_file):
+            os.remove(self.status_file)
+
+    def test_new_run(self):
+        status = progress.get_directory_status(self.directory, ["SampleSheet.csv"])
+        self.assertTrue(progress.status_file_is_unchanged(status))
+
+        # another uploader starts the run
+        progress.write_directory_status(DirectoryStatus(self.directory, status=DirectoryStatus.PARTIAL))
+
+        self.assertFalse(progress.status_file_is_unchanged(status))
+
+    def test_run_with_status_file(self):
+        directory_status = DirectoryStatus(self.directory, status=DirectoryStatus.ERROR, message="Upload failed")
+        progress.write_directory_status(directory_status)
+        status = progress.get_directory_status(self.directory, ["SampleSheet.csv"])
+        self.assertTrue(progress.status_file_is_unchanged(status))
+
+        # another uploader finishes the run
+        directory_status.status = DirectoryStatus.COMPLETE
+        directory_status.message = None
+        progress.write_directory_status(directory_status)
+
+        self.assertFalse(progress.status_file_is_unchanged(status))
+
+    def test_status_file_removed(self):
+        progress.write_directory_status(DirectoryStatus(self.directory, status=DirectoryStatus.COMPLETE))
+        status = progress.get_directory_status(self.directory, ["SampleSheet.csv"])
+
+        os.remove(self.status_file)
+
+        self.assertFalse(progress.status_file_is_unchanged(status))
+
+
 class TestDelayedTimeHasPassed(unittest.TestCase):
     """
     Tests core.upload_helpers.delayed_time_has_passed
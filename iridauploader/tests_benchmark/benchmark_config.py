@@ -0,0 +1,52 @@
+"""
+Sizes of the generated runs, and the config file used by the benchmarks
+"""
+import iridauploader.config as config
+
+# Size of the runs used by the benchmarks
+SAMPLE_COUNT = 200
+UPLOAD_SAMPLE_COUNT = 50
+FILE_SIZE = 64 * 1024
+# Samples in the run built in memory to compare the model validators
+VALIDATOR_SAMPLE_COUNT = 10000
+
+# Size of the opt in large runs, run them with IRIDA_UPLOADER_BENCHMARK_SCALE=True
+SCALE_SAMPLE_COUNT = 5000
+SCALE_EXTRA_FILES = 90000
+SCALE_FILE_SIZE = 2 * 1024 ** 3
+
+# Seconds the command line entry point may take to import, measured with python -X importtime
+IMPORT_TIME_BUDGET = 0.15
+
+
+def write_config(config_file, base_url, parser, **extra_options):
+    """
+    Writes a config file for the benchmarks and loads it
+
+    :param config_file: path of the config file to write
+    :param base_url: url of the fake IRIDA server
+    :param parser: parser to use
+    :param extra_options: any other config options to set
+    :return: None
+    """
+    options = {
+        "client_id": "benchmark",
+        "client_secret": "benchmark",
+        "username": "benchmark",
+        "password": "benchmark",
+        "base_url": base_url,
+        "parser": parser,
+        "readonly": False,
+        "delay": 0,
+        "timeout": 10,
+        "minimum_file_size": 0,
+        "http_max_retries": 5,
+        "http_backoff_factor": 0,
+        **extra_options,
+    }
+    with open(config_file, "w") as f:
+        f.write("[Settings]\n")
+        for key, value in options.items():
+            f.write("{} = {}\n".format(key, value))
+    config.set_config_file(config_file)
+    config.setup()
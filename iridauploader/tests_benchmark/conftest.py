@@ -0,0 +1,46 @@
+"""
+Shared fixtures for the benchmarks
+
+Run with:
+    make benchmarks
+or
+    IRIDA_UPLOADER_TEST=True pytest iridauploader/tests_benchmark
+"""
+import os
+
+import pytest
+
+# Log to the test log directory, this must be set before the logger module is imported
+os.environ.setdefault("IRIDA_UPLOADER_TEST", "True")
+
+from iridauploader.tests_benchmark.fake_irida import FakeIrida  # noqa: E402
+from iridauploader.tests_benchmark.run_generator import generate_run  # noqa: E402
+from iridauploader.tests_benchmark.benchmark_config import SAMPLE_COUNT, FILE_SIZE  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def generated_runs(tmp_path_factory):
+    """
+    One generated run directory per parser, shared by the parse and validate benchmarks
+
+    :return: function that takes a parser type and returns its run directory
+    """
+    runs = {}
+
+    def get_run(parser_type):
+        if parser_type not in runs:
+            directory = str(tmp_path_factory.mktemp(parser_type))
+            runs[parser_type] = generate_run(parser_type, directory, sample_count=SAMPLE_COUNT, file_size=FILE_SIZE,
+                                             projects=("1", "2"))
+        return runs[parser_type]
+
+    return get_run
+
+
+@pytest.fixture
+def fake_irida():
+    """
+    A running fake IRIDA server, worse server behaviour can be set on it before use
+    """
+    with FakeIrida() as irida:
+        yield irida
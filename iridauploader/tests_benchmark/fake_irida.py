@@ -0,0 +1,441 @@
+"""
+A local stand in for the IRIDA REST api, used by the benchmarks
+
+It answers the endpoints the uploader uses (oauth token, version, projects, samples, bySampleName, metadata,
+sequencingrun and the pairs / sequenceFiles / assemblies / fast5 upload endpoints) from memory, so a full upload can
+run against it without an IRIDA instance.
+
+Server behaviour can be made worse on purpose:
+    latency -- seconds added to every response
+    bandwidth -- bytes per second request bodies are read at, 0 for no cap
+    error_rate -- fraction of requests answered with error_status instead of being handled
+    error_methods -- http methods errors are injected on. Defaults to GET only. With error_status 429 or 503 the
+                     uploader also resends POST and PATCH requests, including sequence file uploads.
+
+Errors are picked with a seeded random number generator, so the same seed gives the same errors on every run.
+
+Example:
+    with FakeIrida(latency=0.01, error_rate=0.05) as irida:
+        api = ApiCalls(client_id="", client_secret="", base_url=irida.base_url, username="", password="")
+        ...
+        print(irida.get_stats())
+"""
+
+import json
+import random
+import re
+import threading
+import time
+
+from collections import Counter
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+IRIDA_VERSION = "23.01"
+DEFAULT_PROJECTS = {"1": "Benchmark Project 1", "2": "Benchmark Project 2"}
+
+# Size of the chunks request bodies are read in
+READ_CHUNK_SIZE = 64 * 1024
+UPLOAD_ENDPOINTS = ["pairs", "sequenceFiles", "assemblies", "fast5"]
+# Marks the start of each file in a multipart body
+_MULTIPART_FILE_MARKER = b'filename="'
+
+
+class FakeIrida:
+    """
+    In memory IRIDA server running on a background thread
+    """
+
+    def __init__(self, projects=None, latency=0, bandwidth=0, error_rate=0, error_status=HTTPStatus.SERVICE_UNAVAILABLE,
+                 error_methods=("GET",), seed=0, host="127.0.0.1", port=0):
+        """
+        :param projects: dict of project id to project name, defaults to DEFAULT_PROJECTS
+        :param latency: seconds added to every response
+        :param bandwidth: bytes per second request bodies are read at, 0 for no cap
+        :param error_rate: fraction (0 to 1) of requests that get error_status back
+        :param error_status: status code used for injected errors
+        :param error_methods: http methods errors are injected on
+        :param seed: seed for the random number generator that picks errors
+        :param host: interface to listen on
+        :param port: port to listen on, 0 picks a free port
+        """
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.error_methods = set(error_methods)
+
+        self._seed = seed
+        self._lock = threading.Lock()
+        self._projects = dict(projects if projects is not None else DEFAULT_PROJECTS)
+        self.reset()
+
+        self._server = ThreadingHTTPServer((host, port), _FakeIridaRequestHandler)
+        self._server.daemon_threads = True
+        self._server.fake_irida = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return "http://{}:{}/api/".format(host, port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def reset(self):
+        """
+        Removes every sample, metadata and run, and starts the stats and error sequence over
+        """
+        with self._lock:
+            self._random = random.Random(self._seed)
+            # project id -> {sample name -> sample id}
+            self._samples = {project_id: {} for project_id in self._projects}
+            self._sample_names = {}
+            self._metadata = {}
+            self._runs = {}
+            self._next_id = 1
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {
+                "requests": Counter(),
+                "errors_injected": 0,
+                "bytes_received": 0,
+                # files and bytes of the uploads that were accepted
+                "files_received": 0,
+                "upload_bytes_received": 0,
+                # uploads whose body was shorter than their Content-Length, e.g. a resent stream that was used up
+                "incomplete_uploads": 0,
+                "tokens_issued": 0,
+            }
+
+    def get_stats(self):
+        """
+        :return: dict of request counts per endpoint, injected errors, and bytes / files received
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["requests"] = dict(self._stats["requests"])
+            return stats
+
+    def get_samples(self, project_id):
+        """
+        :param project_id: project to list
+        :return: dict of sample name to sample id for the samples created on a project
+        """
+        with self._lock:
+            return dict(self._samples.get(str(project_id), {}))
+
+    def get_runs(self):
+        """
+        :return: dict of sequencing run id to the run dict, including its uploadStatus
+        """
+        with self._lock:
+            return {run_id: dict(run) for run_id, run in self._runs.items()}
+
+    def _new_id(self):
+        # Called with the lock held
+        new_id = self._next_id
+        self._next_id += 1
+        return new_id
+
+    def _record(self, endpoint, body_bytes=0):
+        with self._lock:
+            self._stats["requests"][endpoint] += 1
+            self._stats["bytes_received"] += body_bytes
+
+    def _record_upload(self, body_bytes, content_length, files, accepted):
+        with self._lock:
+            if body_bytes < content_length:
+                self._stats["incomplete_uploads"] += 1
+            if accepted:
+                self._stats["files_received"] += files
+                self._stats["upload_bytes_received"] += body_bytes
+
+    def _should_fail(self, method):
+        if not self.error_rate or method not in self.error_methods:
+            return False
+        with self._lock:
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self._stats["errors_injected"] += 1
+        return fail
+
+    # Endpoint implementations, each returns (status, json dict or None)
+
+    def issue_token(self):
+        with self._lock:
+            self._stats["tokens_issued"] += 1
+            token = "token{}".format(self._stats["tokens_issued"])
+        # The uploader decodes the token with ast.literal_eval, so the body must not contain json true/false/null
+        return HTTPStatus.OK, {"access_token": token, "token_type": "bearer", "expires_in": 43199}
+
+    def get_version(self):
+        return HTTPStatus.OK, {"version": IRIDA_VERSION}
+
+    def list_projects(self):
+        with self._lock:
+            resources = [_project_resource(p_id, name) for p_id, name in self._projects.items()]
+        return HTTPStatus.OK, {"resource": {"resources": resources}}
+
+    def get_project(self, project_id):
+        with self._lock:
+            if project_id not in self._projects:
+                return HTTPStatus.NOT_FOUND, None
+            return HTTPStatus.OK, {"resource": _project_resource(project_id, self._projects[project_id])}
+
+    def list_samples(self, project_id):
+        with self._lock:
+            if project_id not in self._projects:
+                return HTTPStatus.NOT_FOUND, None
+            resources = [_sample_resource(s_id, name) for name, s_id in self._samples[project_id].items()]
+        return HTTPStatus.OK, {"resource": {"resources": resources}}
+
+    def get_sample_by_name(self, project_id, sample_name):
+        with self._lock:
+            sample_id = self._samples.get(project_id, {}).get(sample_name)
+        if sample_id is None:
+            return HTTPStatus.NOT_FOUND, None
+        return HTTPStatus.OK, {"resource": _sample_resource(sample_id, sample_name)}
+
+    def create_sample(self, project_id, body):
+        sample_name = json.loads(body)["sampleName"]
+        with self._lock:
+            if project_id not in self._projects:
+                return HTTPStatus.NOT_FOUND, None
+            if sample_name in self._samples[project_id]:
+                return HTTPStatus.CONFLICT, None
+            sample_id = self._new_id()
+            self._samples[project_id][sample_name] = sample_id
+            self._sample_names[sample_id] = sample_name
+        return HTTPStatus.CREATED, {"resource": _sample_resource(sample_id, sample_name)}
+
+    def get_sample(self, sample_id):
+        with self._lock:
+            sample_name = self._sample_names.get(sample_id)
+        if sample_name is None:
+            return HTTPStatus.NOT_FOUND, None
+        return HTTPStatus.OK, {"resource": _sample_resource(sample_id, sample_name)}
+
+    def get_metadata(self, sample_id):
+        with self._lock:
+            if sample_id not in self._sample_names:
+                return HTTPStatus.NOT_FOUND, None
+            metadata = dict(self._metadata.get(sample_id, {}))
+        return HTTPStatus.OK, {"resource": {"metadata": metadata}}
+
+    def put_metadata(self, sample_id, body):
+        metadata = json.loads(body)
+        with self._lock:
+            if sample_id not in self._sample_names:
+                return HTTPStatus.NOT_FOUND, None
+            self._metadata[sample_id] = metadata
+        return HTTPStatus.OK, {"resource": {"metadata": metadata}}
+
+    def list_sample_files(self, sample_id):
+        with self._lock:
+            if sample_id not in self._sample_names:
+                return HTTPStatus.NOT_FOUND, None
+        return HTTPStatus.OK, {"resource": {"resources": []}}
+
+    def upload_files(self, sample_id):
+        with self._lock:
+            if sample_id not in self._sample_names:
+                return HTTPStatus.NOT_FOUND, None
+        return HTTPStatus.CREATED, {"resource": {"sampleId": sample_id}}
+
+    def list_runs(self):
+        with self._lock:
+            resources = [dict(run, identifier=run_id) for run_id, run in self._runs.items()]
+        return HTTPStatus.OK, {"resource": {"resources": resources}}
+
+    def create_run(self, run_type, body):
+        run = json.loads(body)
+        run["sequencingRunType"] = run_type
+        with self._lock:
+            run_id = self._new_id()
+            self._runs[run_id] = run
+        return HTTPStatus.CREATED, {"resource": dict(run, identifier=run_id)}
+
+    def update_run(self, run_id, body):
+        with self._lock:
+            if run_id not in self._runs:
+                return HTTPStatus.NOT_FOUND, None
+            self._runs[run_id].update(json.loads(body))
+            run = dict(self._runs[run_id], identifier=run_id)
+        return HTTPStatus.OK, {"resource": run}
+
+
+def _project_resource(project_id, name):
+    return {"identifier": project_id, "name": name, "projectDescription": ""}
+
+
+def _sample_resource(sample_id, sample_name):
+    return {"identifier": str(sample_id), "sampleName": sample_name, "description": ""}
+
+
+# (method, path regex, endpoint name used in the stats, handler)
+# handlers are called with the FakeIrida, the regex groups, the query dict and the request body
+_ROUTES = [
+    ("POST", r"oauth/token", "oauth/token",
+     lambda irida, groups, query, body: irida.issue_token()),
+    ("GET", r"version", "version",
+     lambda irida, groups, query, body: irida.get_version()),
+    ("GET", r"projects", "projects",
+     lambda irida, groups, query, body: irida.list_projects()),
+    ("GET", r"projects/(\w+)", "projects/{id}",
+     lambda irida, groups, query, body: irida.get_project(groups[0])),
+    ("GET", r"projects/(\w+)/samples", "projects/{id}/samples",
+     lambda irida, groups, query, body: irida.list_samples(groups[0])),
+    ("POST", r"projects/(\w+)/samples", "projects/{id}/samples",
+     lambda irida, groups, query, body: irida.create_sample(groups[0], body)),
+    ("GET", r"projects/(\w+)/samples/bySampleName", "projects/{id}/samples/bySampleName",
+     lambda irida, groups, query, body: irida.get_sample_by_name(groups[0], query.get("sampleName", [""])[0])),
+    ("GET", r"samples/(\d+)", "samples/{id}",
+     lambda irida, groups, query, body: irida.get_sample(int(groups[0]))),
+    ("GET", r"samples/(\d+)/metadata", "samples/{id}/metadata",
+     lambda irida, groups, query, body: irida.get_metadata(int(groups[0]))),
+    ("PUT", r"samples/(\d+)/metadata", "samples/{id}/metadata",
+     lambda irida, groups, query, body: irida.put_metadata(int(groups[0]), body)),
+    ("GET", r"samples/(\d+)/(sequenceFiles|assemblies|fast5)", "samples/{id}/files",
+     lambda irida, groups, query, body: irida.list_sample_files(int(groups[0]))),
+    ("GET", r"sequencingrun", "sequencingrun",
+     lambda irida, groups, query, body: irida.list_runs()),
+    ("POST", r"sequencingrun/(\w+)", "sequencingrun/{type}",
+     lambda irida, groups, query, body: irida.create_run(groups[0], body)),
+    ("PATCH", r"sequencingrun/(\d+)", "sequencingrun/{id}",
+     lambda irida, groups, query, body: irida.update_run(int(groups[0]), body)),
+]
+_ROUTES = [(method, re.compile("^" + pattern + "$"), name, handler) for method, pattern, name, handler in _ROUTES]
+_UPLOAD_ROUTE = re.compile(r"^samples/(\d+)/({})$".format("|".join(UPLOAD_ENDPOINTS)))
+
+
+class _FakeIridaRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, without this small responses wait on delayed acks
+    disable_nagle_algorithm = True
+    # Do not let a client that stopped sending hang a server thread forever
+    timeout = 60
+
+    def log_message(self, format, *args):
+        # Keep the benchmark output clean
+        pass
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def do_OPTIONS(self):
+        # The uploader sends OPTIONS to the base url before requests to check its token is still good
+        irida = self.server.fake_irida
+        self._read_body(irida)
+        irida._record("OPTIONS")
+        self._respond(irida, HTTPStatus.OK, None)
+
+    def _handle(self, method):
+        irida = self.server.fake_irida
+        parsed = urlparse(self.path)
+        # The uploader sometimes builds urls with a double slash, IRIDA ignores them
+        path = re.sub("/+", "/", parsed.path).strip("/")
+        if path.startswith("api/"):
+            path = path[len("api/"):]
+        query = parse_qs(parsed.query)
+
+        upload_match = _UPLOAD_ROUTE.match(path) if method == "POST" else None
+        if upload_match is not None:
+            # Multipart uploads are streamed through and counted, not kept in memory
+            body_bytes, files = self._read_body(irida, count_files=True)
+            endpoint = "samples/{id}/" + upload_match.group(2)
+            irida._record(endpoint, body_bytes)
+            if irida._should_fail(method):
+                status, body_dict = irida.error_status, None
+            else:
+                status, body_dict = irida.upload_files(int(upload_match.group(1)))
+            irida._record_upload(body_bytes, int(self.headers.get("Content-Length", 0)), files,
+                                 accepted=status == HTTPStatus.CREATED)
+            self._respond(irida, status, body_dict)
+            return
+
+        body = self._read_body(irida, keep=True)
+        for route_method, regex, name, handler in _ROUTES:
+            match = regex.match(path)
+            if route_method == method and match is not None:
+                irida._record(name, len(body))
+                if name != "oauth/token" and irida._should_fail(method):
+                    self._respond(irida, irida.error_status, None)
+                else:
+                    self._respond(irida, *handler(irida, match.groups(), query, body))
+                return
+
+        irida._record("unknown")
+        self._respond(irida, HTTPStatus.NOT_FOUND, None)
+
+    def _read_body(self, irida, keep=False, count_files=False):
+        """
+        Reads the request body, at most irida.bandwidth bytes per second
+
+        :return: the body when keep is set, (bytes read, files seen) when count_files is set, otherwise bytes read
+        """
+        remaining = int(self.headers.get("Content-Length", 0))
+        total = 0
+        files = 0
+        kept = []
+        tail = b""
+        start = time.monotonic()
+        while remaining > 0:
+            chunk = self.rfile.read(min(READ_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            total += len(chunk)
+            if keep:
+                kept.append(chunk)
+            if count_files:
+                # keep the end of the last chunk, in case a marker is split between two chunks
+                window = tail + chunk
+                files += window.count(_MULTIPART_FILE_MARKER)
+                tail = window[-(len(_MULTIPART_FILE_MARKER) - 1):]
+            if irida.bandwidth:
+                ahead = total / irida.bandwidth - (time.monotonic() - start)
+                if ahead > 0:
+                    time.sleep(ahead)
+        if keep:
+            return b"".join(kept).decode("utf-8")
+        if count_files:
+            return total, files
+        return total
+
+    def _respond(self, irida, status, body_dict):
+        if irida.latency:
+            time.sleep(irida.latency)
+        body = json.dumps(body_dict).encode("utf-8") if body_dict is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
@@ -0,0 +1,398 @@
+"""
+Generates synthetic sequencing run directories for each parser
+
+The layouts mirror what the parsers expect (see the fake_*_data directories in tests_integration), at any scale:
+number of samples, lanes, paired or single end reads, file sizes, and extra files in the data directory.
+Sequence files can be written as sparse files, so a run with terabytes of data takes almost no disk space.
+
+The uploader expects one file per read per sample, so runs with more than one lane are rejected by the parsers.
+They are useful for measuring how long it takes to get to that error on a large run.
+
+Example:
+    run_directory = generate_run("miseq", "/tmp/bench_run", sample_count=5000, file_size=2 * 1024 ** 3, sparse=True)
+
+From the command line:
+    python -m iridauploader.tests_benchmark.run_generator -p miseq -s 5000 --file_size 2G --sparse /tmp/bench_run
+"""
+
+import argparse
+import os
+
+from collections import namedtuple
+
+SUPPORTED_PARSERS = ["miseq", "miseq_v26", "miniseq", "iseq", "miseq_v31", "miseq_win10_jun2021", "nextseq",
+                     "nextseq_nml_classic", "nextseq_nml_dual_upload", "nextseq_nml_strict_sample_name",
+                     "nextseq2k_nml", "directory"]
+# default: as written by the sequencer software
+# crlf: windows line endings
+# padded: every line padded with commas to the width of the sample table, as spreadsheet programs save them
+SHEET_VARIANTS = ["default", "crlf", "padded"]
+
+DEFAULT_SAMPLE_COUNT = 10
+DEFAULT_FILE_SIZE = 4096
+DEFAULT_PROJECTS = ("1",)
+READ_LENGTH = 151
+
+# A small fastq record, repeated to fill files up to the requested size
+_FASTQ_RECORD = b"@read\n" + b"ACGT" * 38 + b"\n+\n" + b"F" * 152 + b"\n"
+# Files are written in blocks of about 1MB
+_FASTQ_BLOCK = _FASTQ_RECORD * (1024 * 1024 // len(_FASTQ_RECORD))
+
+_SIZE_UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+# Everything about a run that is not per sample
+RunOptions = namedtuple("RunOptions", ["reads", "lanes", "file_size", "sparse", "sheet_variant", "complete",
+                                       "extra_files"])
+
+
+def get_sample_name(index):
+    """
+    :param index: 0 based sample index
+    :return: name of the generated sample
+    """
+    return "bench-{:05d}".format(index + 1)
+
+
+def generate_run(parser_type, directory, sample_count=DEFAULT_SAMPLE_COUNT, paired=True, file_size=DEFAULT_FILE_SIZE,
+                 projects=DEFAULT_PROJECTS, lanes=1, sparse=False, sheet_variant="default", complete=True,
+                 extra_files=0):
+    """
+    Writes a run directory laid out the way parser_type expects it
+
+    :param parser_type: one of SUPPORTED_PARSERS
+    :param directory: run directory to create, it must not exist or be empty
+    :param sample_count: number of samples in the run
+    :param paired: True for paired end (R1 and R2) files, False for single end files
+    :param file_size: size in bytes of each sequence file
+    :param projects: project ids, samples are spread across them round robin
+    :param lanes: number of lanes each sample has files for, the parsers only accept 1
+    :param sparse: write sequence files as sparse files, they take no disk space but read as zeros
+    :param sheet_variant: one of SHEET_VARIANTS
+    :param complete: write the file that marks the run as finished by the sequencer
+    :param extra_files: number of files that do not belong to a sample to add to the data directory
+    :return: the run directory
+    """
+    try:
+        generator = _GENERATORS[parser_type]
+    except KeyError:
+        raise ValueError("No run generator for parser '{}'. Supported parsers are {}".format(
+            parser_type, SUPPORTED_PARSERS))
+    if sheet_variant not in SHEET_VARIANTS:
+        raise ValueError("Sheet variant '{}' is not one of {}".format(sheet_variant, SHEET_VARIANTS))
+    if lanes < 1:
+        raise ValueError("A run needs at least 1 lane")
+
+    os.makedirs(directory, exist_ok=True)
+    samples = [(get_sample_name(i), i + 1, projects[i % len(projects)]) for i in range(sample_count)]
+    options = RunOptions(reads=[1, 2] if paired else [1], lanes=lanes, file_size=file_size, sparse=sparse,
+                         sheet_variant=sheet_variant, complete=complete, extra_files=extra_files)
+    generator(directory, samples, options)
+    return directory
+
+
+def generate_batch(parser_type, directory, run_count, **run_options):
+    """
+    Writes run_count runs into directory, for batch uploads and find_runs
+
+    :param parser_type: one of SUPPORTED_PARSERS
+    :param directory: directory to create the runs in
+    :param run_count: number of runs
+    :param run_options: any other arguments of generate_run
+    :return: list of run directories
+    """
+    return [generate_run(parser_type, os.path.join(directory, "run_{:04d}".format(i + 1)), **run_options)
+            for i in range(run_count)]
+
+
+def parse_size(size):
+    """
+    Parses a size like 512, 64K, 10M or 2G into bytes
+
+    :param size: string
+    :return: int number of bytes
+    """
+    size = size.strip().upper().rstrip("B")
+    if size and size[-1] in _SIZE_UNITS:
+        return int(float(size[:-1]) * _SIZE_UNITS[size[-1]])
+    return int(size)
+
+
+def _write_file(file_path, size, sparse=False):
+    with open(file_path, "wb") as f:
+        if sparse:
+            f.truncate(size)
+            return
+        full_blocks, remainder = divmod(size, len(_FASTQ_BLOCK))
+        for _ in range(full_blocks):
+            f.write(_FASTQ_BLOCK)
+        f.write(_FASTQ_BLOCK[:remainder])
+
+
+def _write_sequence_files(data_directory, file_names, options):
+    os.makedirs(data_directory, exist_ok=True)
+    for file_name in file_names:
+        _write_file(os.path.join(data_directory, file_name), options.file_size, options.sparse)
+
+
+def _write_extra_files(data_directory, options):
+    # Leftovers of the sequencer software that no sample claims
+    os.makedirs(data_directory, exist_ok=True)
+    for i in range(options.extra_files):
+        _write_file(os.path.join(data_directory, "Undetermined_S0_L001_I{}_001.fastq.gz".format(i + 1)), 0)
+
+
+def _write_sheet(file_path, rows, sheet_variant):
+    """
+    Writes the rows of a sample sheet
+
+    :param file_path: sample sheet to write
+    :param rows: list of rows, each a list of cells
+    :param sheet_variant: one of SHEET_VARIANTS
+    :return: None
+    """
+    if sheet_variant == "padded":
+        width = max(len(row) for row in rows)
+        rows = [row + [""] * (width - len(row)) for row in rows]
+    line_ending = "\r\n" if sheet_variant == "crlf" else "\n"
+    # newline="" so the line endings are written as given
+    with open(file_path, "w", newline="") as f:
+        f.write(line_ending.join(",".join(row) for row in rows) + line_ending)
+
+
+def _write_complete_marker(file_path, options, content=""):
+    if options.complete:
+        with open(file_path, "w") as f:
+            f.write(content)
+
+
+def _illumina_file_names(name, number, options, lane_in_name=True):
+    """
+    :return: file names of a sample, named the way bcl2fastq names them
+    """
+    names = []
+    for lane in range(1, options.lanes + 1):
+        lane_part = "_L{:03d}".format(lane) if lane_in_name else ""
+        names += ["{}_S{}{}_R{}_001.fastq.gz".format(name, number, lane_part, read) for read in options.reads]
+    return names
+
+
+def _index(number):
+    # A unique looking 8 base index per sample
+    bases = "ACGT"
+    return "".join(bases[(number >> (2 * i)) % 4] for i in range(8))
+
+
+def _illumina_sheet_rows(options, extra_header_rows=()):
+    rows = [["[Header]"],
+            ["IEMFileVersion", "4"],
+            ["Investigator Name", "Benchmark"],
+            ["Experiment Name", "benchmark"],
+            ["Date", "2020-01-01"],
+            ["Workflow", "GenerateFASTQ"],
+            ["Application", "FASTQ Only"],
+            ["Assay", "Nextera XT"],
+            ["Description", "Synthetic benchmark run"],
+            ["Chemistry", "Amplicon"],
+            *extra_header_rows,
+            [""],
+            ["[Reads]"]]
+    rows += [[str(READ_LENGTH)] for _ in options.reads]
+    rows += [[""],
+             ["[Settings]"],
+             ["ReverseComplement", "0"],
+             ["Adapter", "CTGTCTCTTATACACATCT"],
+             [""],
+             ["[Data]"]]
+    return rows
+
+
+def _miseq_sheet_rows(samples, options):
+    rows = _illumina_sheet_rows(options)
+    rows.append(["Sample_ID", "Sample_Name", "Sample_Plate", "Sample_Well", "I7_Index_ID", "index", "Sample_Project",
+                 "Description"])
+    for name, number, project in samples:
+        rows.append([name, name, "1", "A01", "N{}".format(number), _index(number), project, ""])
+    return rows
+
+
+def _generate_miseq(directory, samples, options):
+    _write_sheet(os.path.join(directory, "SampleSheet.csv"), _miseq_sheet_rows(samples, options),
+                 options.sheet_variant)
+    _write_complete_marker(os.path.join(directory, "CompletedJobInfo.xml"), options, "<CompletedJobInfo/>\n")
+
+    data_directory = os.path.join(directory, "Data", "Intensities", "BaseCalls")
+    for name, number, project in samples:
+        _write_sequence_files(data_directory, _illumina_file_names(name, number, options), options)
+    _write_extra_files(data_directory, options)
+
+
+def _generate_miniseq(directory, samples, options):
+    rows = _illumina_sheet_rows(options, extra_header_rows=[["Local Run Manager Analysis Id", "4004"]])
+    rows.append(["Sample_ID", "Sample_Name", "index", "I7_Index_ID", "Sample_Project"])
+    for name, number, project in samples:
+        rows.append(["{}-4004".format(name), name, _index(number), "N{}".format(number), project])
+    _write_sheet(os.path.join(directory, "SampleSheet.csv"), rows, options.sheet_variant)
+    _write_complete_marker(os.path.join(directory, "CompletedJobInfo.xml"), options, "<CompletedJobInfo/>\n")
+
+    data_directory = os.path.join(directory, "Alignment_1", "20200101_000000", "Fastq")
+    for name, number, project in samples:
+        _write_sequence_files(data_directory, _illumina_file_names(name, number, options), options)
+    _write_extra_files(data_directory, options)
+
+
+def _generate_nextseq(directory, samples, options, sample_sheet_name="SampleSheet.csv", extra_required_files=()):
+    _write_sheet(os.path.join(directory, sample_sheet_name), _miseq_sheet_rows(samples, options),
+                 options.sheet_variant)
+    _write_complete_marker(os.path.join(directory, "RTAComplete.txt"), options)
+    for file_name in extra_required_files:
+        _write_complete_marker(os.path.join(directory, file_name), options)
+
+    # NextSeq runs put the files of each project in their own directory, lanes are usually merged
+    base_directory = os.path.join(directory, "Data", "Intensities", "BaseCalls")
+    for name, number, project in samples:
+        _write_sequence_files(os.path.join(base_directory, project),
+                              _illumina_file_names(name, number, options, lane_in_name=options.lanes > 1), options)
+    if samples:
+        _write_extra_files(os.path.join(base_directory, samples[0][2]), options)
+
+
+def _generate_nextseq2k_nml(directory, samples, options):
+    rows = [["[Header]"],
+            ["FileFormatVersion", "2"],
+            ["RunName", "benchmark"],
+            ["InstrumentPlatform", "NextSeq1k2k"],
+            ["InstrumentType", "NextSeq2000"],
+            [""],
+            ["[Reads]"]]
+    rows += [["Read{}Cycles".format(read), str(READ_LENGTH)] for read in options.reads]
+    rows += [["Index1Cycles", "8"],
+             [""],
+             ["[BCLConvert_Settings]"],
+             ["SoftwareVersion", "3.5.8"],
+             [""],
+             ["[BCLConvert_Data]"],
+             ["Sample_ID", "Index", "Sample_Project"]]
+    for name, number, project in samples:
+        rows.append([name, _index(number), project])
+    _write_sheet(os.path.join(directory, "UploadList.csv"), rows, options.sheet_variant)
+    _write_complete_marker(os.path.join(directory, "CopyComplete.txt"), options)
+
+    data_directory = os.path.join(directory, "Analysis", "1", "Data", "fastq")
+    for name, number, project in samples:
+        _write_sequence_files(data_directory, _illumina_file_names(name, number, options), options)
+    _write_extra_files(data_directory, options)
+
+
+def _generate_directory(directory, samples, options):
+    if options.lanes > 1:
+        raise ValueError("Directory runs list one file per read, they can not have more than 1 lane")
+    # The directory parser has no completion marker, the sample list is what makes it a run
+    rows = [["[Data]"], ["Sample_Name", "Project_ID", "File_Forward", "File_Reverse"]]
+    for name, number, project in samples:
+        file_names = ["{}_R{}.fastq.gz".format(name, read) for read in options.reads]
+        _write_sequence_files(directory, file_names, options)
+        rows.append([name, project, file_names[0], file_names[1] if len(file_names) > 1 else ""])
+    _write_sheet(os.path.join(directory, "SampleList.csv"), rows, options.sheet_variant)
+    _write_extra_files(directory, options)
+
+
+_GENERATORS = {
+    "miseq": _generate_miseq,
+    "miseq_v26": _generate_miseq,
+    "miniseq": _generate_miniseq,
+    "iseq": _generate_miniseq,
+    "miseq_v31": _generate_miniseq,
+    "miseq_win10_jun2021": _generate_miniseq,
+    "nextseq": _generate_nextseq,
+    "nextseq_nml_classic": lambda directory, samples, options: _generate_nextseq(
+        directory, samples, options, sample_sheet_name="SampleSheetClassic.csv"),
+    "nextseq_nml_dual_upload": lambda directory, samples, options: _generate_nextseq(
+        directory, samples, options, extra_required_files=["RunMetadata.csv"]),
+    "nextseq_nml_strict_sample_name": _generate_nextseq,
+    "nextseq2k_nml": _generate_nextseq2k_nml,
+    "directory": _generate_directory,
+}
+
+
+def init_argparser():
+    argument_parser = argparse.ArgumentParser(
+        description="Generates a synthetic sequencing run for benchmarking the IRIDA Uploader.",
+        prog="python -m iridauploader.tests_benchmark.run_generator")
+    argument_parser.add_argument('directory',
+                                 help='Directory to write the run to. With --runs, the directory to write runs into.')
+    argument_parser.add_argument('-p', '--parser',
+                                 action='store',
+                                 default='miseq',
+                                 choices=SUPPORTED_PARSERS,
+                                 help='Parser to lay the run out for. Default = miseq')
+    argument_parser.add_argument('-s', '--samples',
+                                 action='store',
+                                 type=int,
+                                 default=DEFAULT_SAMPLE_COUNT,
+                                 help='Number of samples. Default = {}'.format(DEFAULT_SAMPLE_COUNT))
+    argument_parser.add_argument('-l', '--lanes',
+                                 action='store',
+                                 type=int,
+                                 default=1,
+                                 help='Number of lanes. Runs with more than 1 lane are rejected by the parsers.')
+    argument_parser.add_argument('--single_end',
+                                 action='store_true',  # This line makes it not parse a variable
+                                 help='Write single end reads instead of paired end reads.')
+    argument_parser.add_argument('-f', '--file_size',
+                                 action='store',
+                                 default=str(DEFAULT_FILE_SIZE),
+                                 help='Size of each sequence file, e.g. 4096, 64K, 10M, 2G. '
+                                      'Default = {}'.format(DEFAULT_FILE_SIZE))
+    argument_parser.add_argument('--sparse',
+                                 action='store_true',  # This line makes it not parse a variable
+                                 help='Write sparse sequence files, which take no disk space.')
+    argument_parser.add_argument('--projects',
+                                 action='store',
+                                 default=",".join(DEFAULT_PROJECTS),
+                                 help='Comma separated project ids, samples are spread across them. Default = 1')
+    argument_parser.add_argument('--sheet_variant',
+                                 action='store',
+                                 default='default',
+                                 choices=SHEET_VARIANTS,
+                                 help='How the sample sheet is formatted. Default = default')
+    argument_parser.add_argument('--incomplete',
+                                 action='store_true',  # This line makes it not parse a variable
+                                 help='Leave out the file that marks the run as finished.')
+    argument_parser.add_argument('--extra_files',
+                                 action='store',
+                                 type=int,
+                                 default=0,
+                                 help='Number of files that do not belong to a sample to add to the data directory.')
+    argument_parser.add_argument('--runs',
+                                 action='store',
+                                 type=int,
+                                 default=0,
+                                 help='Write this many runs into the directory, for batch uploads.')
+    return argument_parser
+
+
+def main():
+    args = init_argparser().parse_args()
+    run_options = {
+        "sample_count": args.samples,
+        "paired": not args.single_end,
+        "file_size": parse_size(args.file_size),
+        "projects": args.projects.split(","),
+        "lanes": args.lanes,
+        "sparse": args.sparse,
+        "sheet_variant": args.sheet_variant,
+        "complete": not args.incomplete,
+        "extra_files": args.extra_files,
+    }
+    if args.runs:
+        run_directories = generate_batch(args.parser, args.directory, args.runs, **run_options)
+    else:
+        run_directories = [generate_run(args.parser, args.directory, **run_options)]
+
+    files_per_run = args.samples * args.lanes * (1 if args.single_end else 2)
+    print("Wrote {} {} run(s) with {} samples and {} sequence files each to {}".format(
+        len(run_directories), args.parser, args.samples, files_per_run, args.directory))
+
+
+if __name__ == "__main__":
+    main()
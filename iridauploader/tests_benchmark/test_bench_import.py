@@ -0,0 +1,39 @@
+"""
+Benchmarks for the time taken to import the command line entry point
+"""
+import subprocess
+import sys
+
+from iridauploader.tests_benchmark.benchmark_config import IMPORT_TIME_BUDGET
+
+ENTRY_POINT_MODULE = "iridauploader.core.cli"
+
+
+def _get_import_times(module_name):
+    """
+    Imports a module in a new interpreter with python -X importtime
+
+    :param module_name: module to import
+    :return: dict of module name to cumulative import time in seconds
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module_name],
+                            stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    import_times = {}
+    # lines look like 'import time:       367 |      58648 | iridauploader.core.cli', times are in microseconds
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            import_times[name.strip()] = int(cumulative) / 1000000
+    return import_times
+
+
+def test_cli_import_time(benchmark):
+    import_times = benchmark.pedantic(_get_import_times, args=(ENTRY_POINT_MODULE,), rounds=5)
+
+    assert import_times[ENTRY_POINT_MODULE] < IMPORT_TIME_BUDGET
+    # the api stack and the parsers are loaded when an upload starts
+    assert "requests" not in import_times
+    assert "cerberus" not in import_times
+    assert "iridauploader.parsers.miseq" not in import_times
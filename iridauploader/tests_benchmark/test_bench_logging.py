@@ -0,0 +1,101 @@
+"""
+Benchmarks for the time logging takes on the thread that logs
+
+Compares writing straight to a log file, as the uploader used to, with queueing the records for the logging thread
+"""
+import logging
+import logging.handlers
+import queue
+import time
+
+import pytest
+
+from iridauploader.config import config
+from iridauploader.core import logger
+from iridauploader.tests_benchmark.benchmark_config import write_config
+
+# Messages logged per benchmark round
+MESSAGE_COUNT = 1000
+# Seconds each write takes on the slow disk, like a busy network file system
+SLOW_DISK_WRITE_TIME = 0.0001
+
+
+class SlowDiskHandler(logging.handlers.RotatingFileHandler):
+    """
+    Log file handler that waits after every write
+    """
+
+    def flush(self):
+        super().flush()
+        time.sleep(SLOW_DISK_WRITE_TIME)
+
+
+def _log_messages(bench_logger, level):
+    for i in range(MESSAGE_COUNT):
+        bench_logger.log(level, "Uploading file {} of sample {}".format(i, i // 10))
+
+
+@pytest.fixture
+def bench_logger():
+    """
+    A logger that does not pass its records to the uploader's own log
+    """
+    bench_logger = logging.getLogger("iridauploader_benchmark")
+    bench_logger.propagate = False
+    yield bench_logger
+    bench_logger.handlers = []
+
+
+def _file_handler(tmp_path, slow_disk=False):
+    handler_class = SlowDiskHandler if slow_disk else logging.handlers.RotatingFileHandler
+    handler = handler_class(str(tmp_path / "irida-uploader.log"))
+    handler.setFormatter(logger.log_format)
+    return handler
+
+
+def _count_lines(tmp_path):
+    with open(str(tmp_path / "irida-uploader.log")) as log_file:
+        return sum(1 for _ in log_file)
+
+
+@pytest.mark.parametrize("slow_disk", [False, True])
+def test_log_to_file(benchmark, bench_logger, tmp_path, slow_disk):
+    file_handler = _file_handler(tmp_path, slow_disk)
+    bench_logger.addHandler(file_handler)
+
+    benchmark(_log_messages, bench_logger, logging.INFO)
+
+    file_handler.close()
+    assert _count_lines(tmp_path) >= MESSAGE_COUNT
+
+
+@pytest.mark.parametrize("slow_disk", [False, True])
+@pytest.mark.parametrize("module_level", [logging.NOTSET, logging.INFO])
+def test_log_to_queue(benchmark, bench_logger, tmp_path, module_level, slow_disk):
+    file_handler = _file_handler(tmp_path, slow_disk)
+    log_queue = queue.Queue()
+    queue_handler = logger.LogQueueHandler(log_queue)
+    queue_handler.addFilter(logger.ModuleLevelFilter({bench_logger.name: module_level}))
+    bench_logger.addHandler(queue_handler)
+    listener = logger.LogQueueListener(log_queue, file_handler, repeat_interval=0)
+    listener.start()
+
+    # debug messages are dropped before they are queued when the module logs at INFO
+    benchmark(_log_messages, bench_logger, logging.DEBUG)
+
+    listener.stop()
+    file_handler.close()
+    if module_level == logging.NOTSET:
+        assert _count_lines(tmp_path) >= MESSAGE_COUNT
+    else:
+        assert _count_lines(tmp_path) == 0
+
+
+def test_read_config_option(benchmark, tmp_path):
+    write_config(str(tmp_path / "config.conf"), base_url="http://localhost/api/", parser="directory")
+
+    def read_options():
+        for _ in range(MESSAGE_COUNT):
+            config.read_config_option("http_max_retries", int)
+
+    benchmark(read_options)
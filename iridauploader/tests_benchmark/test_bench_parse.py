@@ -0,0 +1,35 @@
+"""
+Benchmarks for finding and parsing runs with each parser
+"""
+import pytest
+
+from iridauploader import parsers
+from iridauploader.tests_benchmark.benchmark_config import SAMPLE_COUNT, write_config
+from iridauploader.tests_benchmark.run_generator import SUPPORTED_PARSERS
+
+
+@pytest.fixture(autouse=True)
+def uploader_config(tmp_path):
+    # Finding runs reads the log directory from the config
+    write_config(str(tmp_path / "config.conf"), base_url="http://localhost/api/", parser="directory")
+
+
+@pytest.mark.parametrize("parser_type", SUPPORTED_PARSERS)
+def test_find_single_run(benchmark, generated_runs, parser_type):
+    directory = generated_runs(parser_type)
+    parser_instance = parsers.parser_factory(parser_type)
+
+    status = benchmark(parser_instance.find_single_run, directory)
+
+    assert status.directory == directory
+
+
+@pytest.mark.parametrize("parser_type", SUPPORTED_PARSERS)
+def test_get_sequencing_run(benchmark, generated_runs, parser_type):
+    directory = generated_runs(parser_type)
+    parser_instance = parsers.parser_factory(parser_type)
+    sample_sheet = parser_instance.get_sample_sheet(directory)
+
+    sequencing_run = benchmark(parser_instance.get_sequencing_run, sample_sheet)
+
+    assert sum(len(project.sample_list) for project in sequencing_run.project_list) == SAMPLE_COUNT
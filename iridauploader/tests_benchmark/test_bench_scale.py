@@ -0,0 +1,57 @@
+"""
+Benchmarks for finding and parsing very large runs
+
+5,000 samples with 100,000 files in the data directory, written as sparse 2GB files.
+These take minutes, so they only run when IRIDA_UPLOADER_BENCHMARK_SCALE is set:
+
+    IRIDA_UPLOADER_BENCHMARK_SCALE=True make benchmarks args="-k scale"
+"""
+import os
+
+import pytest
+
+from iridauploader import parsers
+from iridauploader.core import parsing_handler
+from iridauploader.tests_benchmark.benchmark_config import (SCALE_SAMPLE_COUNT, SCALE_EXTRA_FILES, SCALE_FILE_SIZE,
+                                                            write_config)
+from iridauploader.tests_benchmark.run_generator import generate_run
+
+SCALE_PARSERS = ["miseq", "nextseq", "nextseq2k_nml", "directory"]
+
+pytestmark = pytest.mark.skipif(not os.environ.get("IRIDA_UPLOADER_BENCHMARK_SCALE"),
+                                reason="set IRIDA_UPLOADER_BENCHMARK_SCALE to run the large run benchmarks")
+
+
+@pytest.fixture(scope="module")
+def scale_runs(tmp_path_factory):
+    runs = {}
+
+    def get_run(parser_type):
+        if parser_type not in runs:
+            runs[parser_type] = generate_run(parser_type, str(tmp_path_factory.mktemp("scale_" + parser_type)),
+                                             sample_count=SCALE_SAMPLE_COUNT, file_size=SCALE_FILE_SIZE,
+                                             sparse=True, extra_files=SCALE_EXTRA_FILES)
+        return runs[parser_type]
+
+    return get_run
+
+
+@pytest.mark.parametrize("parser_type", SCALE_PARSERS)
+def test_scale_find_runs(benchmark, tmp_path, scale_runs, parser_type):
+    directory = scale_runs(parser_type)
+    write_config(str(tmp_path / "config.conf"), base_url="http://localhost/api/", parser=parser_type)
+    parser_instance = parsers.parser_factory(parser_type)
+
+    statuses = benchmark(parser_instance.find_runs, os.path.dirname(directory))
+
+    assert directory in [status.directory for status in statuses]
+
+
+@pytest.mark.parametrize("parser_type", SCALE_PARSERS)
+def test_scale_parse_and_validate(benchmark, tmp_path, scale_runs, parser_type):
+    directory = scale_runs(parser_type)
+    write_config(str(tmp_path / "config.conf"), base_url="http://localhost/api/", parser=parser_type)
+
+    sequencing_run = benchmark.pedantic(parsing_handler.parse_and_validate, args=(directory,), rounds=1)
+
+    assert sum(len(project.sample_list) for project in sequencing_run.project_list) == SCALE_SAMPLE_COUNT
@@ -0,0 +1,65 @@
+"""
+Benchmarks for a full upload against the fake IRIDA server
+
+Each round starts with an empty server, so samples and the sequencing run are created every time.
+The server stats (requests per endpoint, errors injected, bytes received) are saved with the results as extra_info.
+"""
+import os
+
+from http import HTTPStatus
+
+import pytest
+
+from iridauploader.core import upload, exit_return
+from iridauploader.tests_benchmark.benchmark_config import UPLOAD_SAMPLE_COUNT, FILE_SIZE, write_config
+from iridauploader.tests_benchmark.run_generator import generate_run
+
+ROUNDS = 3
+# Most bytes of an upload body that are not file contents: the multipart headers and the file parameters
+MULTIPART_OVERHEAD = 4096
+
+# scenario name -> (fake IRIDA settings, extra uploader config options)
+SCENARIOS = {
+    "baseline": ({}, {}),
+    "latency_5ms": ({"latency": 0.005}, {}),
+    "bandwidth_20MBps": ({"bandwidth": 20 * 1024 * 1024}, {}),
+    "get_errors_5pct": ({"error_rate": 0.05}, {}),
+    # refused POST and PATCH requests are resent, including the streamed sequence file uploads
+    "post_503_10pct": ({"error_rate": 0.1, "error_methods": {"POST", "PATCH"}}, {}),
+    "post_429_10pct": ({"error_rate": 0.1, "error_methods": {"POST", "PATCH"},
+                        "error_status": HTTPStatus.TOO_MANY_REQUESTS}, {}),
+    "latency_5ms_4_uploads": ({"latency": 0.005}, {"upload_max_concurrency": 4}),
+}
+
+
+@pytest.mark.parametrize("scenario", SCENARIOS.keys())
+def test_upload_run(benchmark, tmp_path, fake_irida, scenario):
+    irida_settings, config_options = SCENARIOS[scenario]
+    for key, value in irida_settings.items():
+        setattr(fake_irida, key, value)
+    directory = generate_run("miseq", str(tmp_path / "run"), sample_count=UPLOAD_SAMPLE_COUNT, file_size=FILE_SIZE)
+    write_config(str(tmp_path / "config.conf"), base_url=fake_irida.base_url, parser="miseq", **config_options)
+
+    result = benchmark.pedantic(upload.upload_run_single_entry, args=(directory,), kwargs={"force_upload": True},
+                                setup=fake_irida.reset, rounds=ROUNDS)
+
+    stats = fake_irida.get_stats()
+    benchmark.extra_info["irida"] = stats
+    assert result.exit_code == exit_return.EXIT_CODE_SUCCESS, result.error
+    assert stats["files_received"] == UPLOAD_SAMPLE_COUNT * 2
+    assert stats["incomplete_uploads"] == 0
+    # every file was received whole, once
+    file_bytes = _get_fastq_bytes(directory)
+    assert file_bytes <= stats["upload_bytes_received"] <= file_bytes + UPLOAD_SAMPLE_COUNT * MULTIPART_OVERHEAD
+    assert len(fake_irida.get_samples("1")) == UPLOAD_SAMPLE_COUNT
+    if irida_settings.get("error_methods"):
+        assert stats["errors_injected"] > 0
+
+
+def _get_fastq_bytes(directory):
+    """
+    :return: total size of the fastq files in the run directory
+    """
+    return sum(os.path.getsize(os.path.join(root, file_name))
+               for root, _, file_names in os.walk(directory)
+               for file_name in file_names if ".fastq" in file_name)
@@ -0,0 +1,76 @@
+"""
+Benchmarks for the offline validation done before an upload
+"""
+import pytest
+
+from cerberus import Validator
+
+from iridauploader import model, parsers
+from iridauploader.core import parsing_handler, model_validator, file_size_validator, uniform_file_count_validator
+from iridauploader.tests_benchmark.benchmark_config import SAMPLE_COUNT, VALIDATOR_SAMPLE_COUNT, write_config
+from iridauploader.tests_benchmark.run_generator import SUPPORTED_PARSERS
+
+
+@pytest.mark.parametrize("parser_type", SUPPORTED_PARSERS)
+def test_parse_and_validate(benchmark, tmp_path, generated_runs, parser_type):
+    directory = generated_runs(parser_type)
+    write_config(str(tmp_path / "config.conf"), base_url="http://localhost/api/", parser=parser_type)
+
+    sequencing_run = benchmark(parsing_handler.parse_and_validate, directory)
+
+    assert sum(len(project.sample_list) for project in sequencing_run.project_list) == SAMPLE_COUNT
+
+
+@pytest.fixture
+def sequencing_run(tmp_path, generated_runs):
+    write_config(str(tmp_path / "config.conf"), base_url="http://localhost/api/", parser="miseq")
+    parser_instance = parsers.parser_factory("miseq")
+    return parser_instance.get_sequencing_run(parser_instance.get_sample_sheet(generated_runs("miseq")))
+
+
+def test_validate_sequencing_run(benchmark, sequencing_run):
+    result = benchmark(model_validator.validate_sequencing_run, sequencing_run)
+
+    assert result.is_valid()
+
+
+def test_validate_uniform_file_count(benchmark, sequencing_run):
+    result = benchmark(uniform_file_count_validator.validate_uniform_file_count, sequencing_run)
+
+    assert result.is_valid()
+
+
+def test_validate_file_size_minimum(benchmark, sequencing_run):
+    result = benchmark(file_size_validator.validate_file_size_minimum, sequencing_run)
+
+    assert result.is_valid()
+
+
+@pytest.fixture(scope="module")
+def large_sequencing_run():
+    """
+    A paired end run with VALIDATOR_SAMPLE_COUNT samples, built in memory as the validators never read the files
+    """
+    sample_list = []
+    for i in range(VALIDATOR_SAMPLE_COUNT):
+        sample = model.Sample("sample{}".format(i), sample_number=i + 1)
+        sample.sequence_file = model.SequenceFile(["sample{}_R1.fastq.gz".format(i), "sample{}_R2.fastq.gz".format(i)])
+        sample_list.append(sample)
+    project = model.Project(sample_list=sample_list, id="1")
+    return model.SequencingRun({"layoutType": "PAIRED_END"}, [project], "miseq")
+
+
+@pytest.mark.parametrize("validator_type", ["compiled", "cerberus"])
+def test_validate_large_sequencing_run(benchmark, large_sequencing_run, validator_type):
+    schemas = [model.SequencingRun.uploadable_schema, model.Project.uploadable_schema,
+               model.Sample.uploadable_schema, model.SequenceFile.uploadable_schema]
+    if validator_type == "compiled":
+        validators = [model_validator.CompiledValidator(schema) for schema in schemas]
+    else:
+        validators = [Validator(schema, allow_unknown=True) for schema in schemas]
+
+    # cerberus takes seconds per round on a run this size
+    result = benchmark.pedantic(model_validator._validate_sequencing_run, args=(large_sequencing_run, *validators),
+                                rounds=3)
+
+    assert result.is_valid()
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+
+from iridauploader import parsers
+from iridauploader.model import DirectoryStatus
+from iridauploader.tests_benchmark import run_generator
+from iridauploader.tests_benchmark.benchmark_config import write_config
+
+
+class TestRunGenerator(unittest.TestCase):
+    """
+    Tests that the generated runs are accepted by the parsers
+    """
+
+    def setUp(self):
+        print("\nStarting " + self.__module__ + ": " + self._testMethodName)
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.directory = self.temp_directory.name
+        # Finding runs reads the log directory from the config
+        write_config(os.path.join(self.directory, "config.conf"), base_url="http://localhost/api/", parser="miseq")
+
+    def tearDown(self):
+        self.temp_directory.cleanup()
+
+    def _parse(self, parser_type, run_directory):
+        parser_instance = parsers.parser_factory(parser_type)
+        sequencing_run = parser_instance.get_sequencing_run(parser_instance.get_sample_sheet(run_directory))
+        return [sample for project in sequencing_run.project_list for sample in project.sample_list]
+
+    def test_every_parser_and_sheet_variant(self):
+        for parser_type in run_generator.SUPPORTED_PARSERS:
+            for sheet_variant in run_generator.SHEET_VARIANTS:
+                for paired in [True, False]:
+                    with self.subTest(parser=parser_type, variant=sheet_variant, paired=paired):
+                        run_directory = run_generator.generate_run(
+                            parser_type, os.path.join(self.directory, parser_type + sheet_variant + str(paired)),
+                            sample_count=4, paired=paired, projects=("1", "2"), sheet_variant=sheet_variant,
+                            extra_files=3)
+
+                        status = parsers.parser_factory(parser_type).find_single_run(run_directory)
+                        samples = self._parse(parser_type, run_directory)
+
+                        self.assertEqual(status.status, DirectoryStatus.NEW)
+                        self.assertEqual([s.sample_name for s in samples if s.get("sample_project") == "2"
+                                          or s.get("Project_ID") == "2"], ["bench-00002", "bench-00004"])
+                        for sample in samples:
+                            self.assertEqual(sample.sequence_file.is_paired_end(), paired)
+
+    def test_incomplete_run(self):
+        run_directory = run_generator.generate_run("nextseq2k_nml", self.directory, complete=False)
+
+        status = parsers.parser_factory("nextseq2k_nml").find_single_run(run_directory)
+
+        self.assertEqual(status.status, DirectoryStatus.INVALID)
+
+    def test_lanes_are_rejected_by_parser(self):
+        run_directory = run_generator.generate_run("miseq", self.directory, sample_count=2, lanes=4)
+
+        file_count = len(os.listdir(os.path.join(run_directory, "Data", "Intensities", "BaseCalls")))
+        self.assertEqual(file_count, 2 * 4 * 2)
+        with self.assertRaises(parsers.exceptions.ValidationError):
+            self._parse("miseq", run_directory)
+
+    def test_sparse_files(self):
+        run_directory = run_generator.generate_run("directory", self.directory, sample_count=1, paired=False,
+                                                   file_size=run_generator.parse_size("1G"), sparse=True)
+
+        file_stat = os.stat(os.path.join(run_directory, "bench-00001_R1.fastq.gz"))
+        self.assertEqual(file_stat.st_size, 1024 ** 3)
+        self.assertLess(file_stat.st_blocks * 512, 1024 ** 2)
+
+    def test_file_size(self):
+        run_directory = run_generator.generate_run("directory", self.directory, sample_count=1, paired=False,
+                                                   file_size=3 * 1024 * 1024 + 7)
+
+        with open(os.path.join(run_directory, "bench-00001_R1.fastq.gz"), "rb") as f:
+            data = f.read()
+        self.assertEqual(len(data), 3 * 1024 * 1024 + 7)
+        self.assertTrue(data.startswith(b"@read\nACGT"))
+
+    def test_batch(self):
+        run_directories = run_generator.generate_batch("miniseq", self.directory, 3, sample_count=2)
+
+        statuses = parsers.parser_factory("miniseq").find_runs(self.directory)
+
+        self.assertEqual(sorted(s.directory for s in statuses), run_directories)
+
+    def test_parse_size(self):
+        self.assertEqual(run_generator.parse_size("512"), 512)
+        self.assertEqual(run_generator.parse_size("64K"), 64 * 1024)
+        self.assertEqual(run_generator.parse_size("1.5mb"), int(1.5 * 1024 * 1024))
+        self.assertEqual(run_generator.parse_size("2T"), 2 * 1024 ** 4)
@@ -32,10 +32,13 @@ setuptools.setup(
         "GUI": ["PyQt5==5.15.2", "PyQt5-stubs==5.14.2.2"],
         "TEST": ["pytest", "coverage"],
         "WINDOWS": ["pynsist"],
+        "ASYNC": ["httpx"],
+        "BENCHMARK": ["pytest", "pytest-benchmark"],
     },
     entry_points={
         'console_scripts': [
             'irida-uploader=iridauploader.core.cli:main',
+            'irida-uploader-metadata=iridauploader.core.metadata_cli:main',
             'irida-uploader-gui=iridauploader.gui.gui:main [GUI]',
             'integration-test=iridauploader.tests_integration.start_integration_tests:main [TEST]'
         ],